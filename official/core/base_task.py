@@ -14,6 +14,7 @@
 
 """Defines the base task abstraction."""
 import abc
+import functools
 from typing import Optional
 
 from absl import logging
@@ -294,3 +295,19 @@ class Task(tf.Module, metaclass=abc.ABCMeta):
   def reduce_aggregated_logs(self, aggregated_logs):
     """Optional reduce of aggregated logs over validation steps."""
     return {}
+
+  def aggregated_logs_reducer(self, aggregated_logs):
+    """Returns a callable running `reduce_aggregated_logs(aggregated_logs)`.
+
+    Trainers that defer the reduction call it in a background thread or in a
+    subprocess, while the task aggregates the next evaluation. Tasks whose
+    aggregated state is reused across evaluations, or that are not picklable,
+    override this to return an independent, picklable callable.
+
+    Args:
+      aggregated_logs: the state returned by the last `aggregate_logs` call.
+
+    Returns:
+      A callable without arguments returning the dictionary of metrics.
+    """
+    return functools.partial(self.reduce_aggregated_logs, aggregated_logs)
@@ -26,6 +26,7 @@ import tensorflow as tf
 
 from official.core import base_task
 from official.core import config_definitions
+from official.core import eval_pipeline
 
 ExperimentConfig = config_definitions.ExperimentConfig
 TrainerConfig = config_definitions.TrainerConfig
@@ -117,7 +118,24 @@ class Trainer(orbit.StandardTrainer, orbit.StandardEvaluator):
     self._model = model
     self._optimizer = optimizer
     self._checkpoint_exporter = checkpoint_exporter
+    self._is_training = train
     self._recovery = None
+    self._startup_profile = None
+    self._startup_profile_path = None
+
+    self._aggregation_worker = None
+    self._deferred_reducer = None
+    if evaluate and config.trainer.pipelined_eval:
+      self._aggregation_worker = eval_pipeline.AggregationWorker(
+          self.task.aggregate_logs,
+          max_pending=config.trainer.max_pending_eval_outputs)
+    if evaluate and config.trainer.deferred_eval_reduce:
+      if config.trainer.deferred_eval_reduce not in ("thread", "process"):
+        raise ValueError(
+            "`deferred_eval_reduce` must be '', 'thread' or 'process', got "
+            f"{config.trainer.deferred_eval_reduce!r}.")
+      self._deferred_reducer = eval_pipeline.DeferredReducer(
+          use_process=config.trainer.deferred_eval_reduce == "process")
 
     # global_step increases by 1 after each training iteration.
     # We should have global_step.numpy() == self.optimizer.iterations.numpy()
@@ -259,8 +277,31 @@ class Trainer(orbit.StandardTrainer, orbit.StandardEvaluator):
           recovery_max_trials=params.recovery_max_trials,
           checkpoint_manager=checkpoint_manager)
 
+  def report_startup(self, startup_profile, path=None):
+    """Reports `startup_profile` after the first training or evaluation loop.
+
+    The first loop is timed as the last phase of the profile, which is then
+    logged, and written to `path` as json if it is set.
+
+    Args:
+      startup_profile: a `warm_start.StartupProfile` instance.
+      path: optional path of the json file.
+    """
+    self._startup_profile = startup_profile
+    self._startup_profile_path = path
+
+  def _maybe_report_startup(self):
+    if self._startup_profile is None:
+      return
+    profile, self._startup_profile = self._startup_profile, None
+    profile.mark("first_loop")
+    logging.info("Startup breakdown:\n%s", profile.report())
+    if self._startup_profile_path:
+      profile.write(self._startup_profile_path)
+
   def train_loop_end(self):
     """See base class."""
+    self._maybe_report_startup()
     # Checks if the model numeric status is stable and conducts the checkpoint
     # recovery accordingly.
     if self._recovery:
@@ -294,6 +335,8 @@ class Trainer(orbit.StandardTrainer, orbit.StandardEvaluator):
     """Sets up metrics."""
     for metric in self.validation_metrics + [self.validation_loss]:
       metric.reset_states()
+    if self._aggregation_worker is not None:
+      self._aggregation_worker.start()
 
   def eval_step(self, iterator):
     """See base class."""
@@ -311,6 +354,7 @@ class Trainer(orbit.StandardTrainer, orbit.StandardEvaluator):
 
   def eval_end(self, aggregated_logs=None):
     """Processes evaluation results."""
+    self._maybe_report_startup()
     logs = {}
     for metric in self.validation_metrics:
       logs[metric.name] = metric.result()
@@ -320,7 +364,11 @@ class Trainer(orbit.StandardTrainer, orbit.StandardEvaluator):
       # `self.validation_loss` metric was not updated, because the validation
       # loss was not returned from the task's `validation_step` method.
       logging.info("The task did not report validation loss.")
-    if aggregated_logs:
+    if self._aggregation_worker is not None:
+      aggregated_logs = self._aggregation_worker.result()
+    if self._deferred_reducer is not None:
+      logs.update(self._reduce_deferred(aggregated_logs))
+    elif aggregated_logs:
       metrics = self.task.reduce_aggregated_logs(aggregated_logs)
       logs.update(metrics)
 
@@ -334,4 +382,49 @@ class Trainer(orbit.StandardTrainer, orbit.StandardEvaluator):
     return logs
 
   def eval_reduce(self, state=None, step_outputs=None):
+    if self._aggregation_worker is not None:
+      # The worker holds the state, `eval_end` collects it.
+      self._aggregation_worker.submit(step_outputs)
+      return None
     return self.task.aggregate_logs(state, step_outputs)
+
+  def _reduce_deferred(self, aggregated_logs):
+    """Schedules the reduction and returns the metrics that are ready.
+
+    The reduction is waited for when the best checkpoint exporter needs its
+    metrics, when the trainer does not train, and at the end of training.
+    Otherwise the metrics of the earlier evaluations that finished are
+    returned, with the step they belong to.
+    """
+    step = int(self.global_step.numpy())
+    if aggregated_logs:
+      self._deferred_reducer.submit(
+          self.task.aggregated_logs_reducer(aggregated_logs), step)
+    wait = (not self._is_training or self._checkpoint_exporter is not None or
+            step >= self.config.trainer.train_steps)
+    return self._pop_deferred(wait)
+
+  def _pop_deferred(self, wait):
+    logs = {}
+    for reduced_step, metrics in self._deferred_reducer.pop_results(wait):
+      logging.info("Evaluation metrics of step %d: %s", reduced_step, metrics)
+      logs.update(metrics)
+      logs["reduced_step"] = reduced_step
+    return logs
+
+  def close(self):
+    """Finishes the deferred reductions and stops their executor.
+
+    The metrics of the reductions that were still pending are logged and
+    returned. Evaluations after `close` are reduced in the loop.
+
+    Returns:
+      The metrics of the pending reductions, like `eval_end` returns them.
+    """
+    if self._deferred_reducer is None:
+      return {}
+    try:
+      return self._pop_deferred(wait=True)
+    finally:
+      self._deferred_reducer.close()
+      self._deferred_reducer = None
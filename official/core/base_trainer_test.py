@@ -97,6 +97,47 @@ class TrainerTest(tf.test.TestCase, parameterized.TestCase):
       self.assertEqual(logs['counter'], 5. * distribution.num_replicas_in_sync)
       self.assertNotIn('validation_loss', logs)
 
+  @combinations.generate(
+      combinations.combine(
+          distribution=[strategy_combinations.default_strategy],
+          deferred_eval_reduce=['', 'thread']))
+  def test_trainer_validate_pipelined(self, distribution,
+                                      deferred_eval_reduce):
+    config = cfg.ExperimentConfig(
+        trainer=cfg.TrainerConfig(
+            pipelined_eval=True,
+            deferred_eval_reduce=deferred_eval_reduce,
+            optimizer_config=self._config.trainer.optimizer_config))
+    with distribution.scope():
+      trainer = self.create_test_trainer(config)
+      for _ in range(2):
+        logs = trainer.evaluate(tf.convert_to_tensor(5, dtype=tf.int32))
+        self.assertEqual(logs['counter'], 5.)
+        self.assertIn('validation_loss', logs)
+    if deferred_eval_reduce:
+      # train_steps is 0, so the reduction is waited for.
+      self.assertEqual(logs['reduced_step'], 0)
+    trainer.close()
+
+  def test_deferred_reduce_without_training(self):
+    config = cfg.ExperimentConfig(
+        trainer=cfg.TrainerConfig(
+            train_steps=100,
+            deferred_eval_reduce='thread',
+            optimizer_config=self._config.trainer.optimizer_config))
+    task = mock_task.MockTask(config.task)
+    trainer = trainer_lib.Trainer(
+        config,
+        task,
+        model=task.build_model(),
+        optimizer=task.create_optimizer(config.trainer.optimizer_config,
+                                        config.runtime),
+        train=False)
+    # The trainer never trains, so every reduction is waited for.
+    logs = trainer.evaluate(tf.convert_to_tensor(5, dtype=tf.int32))
+    self.assertEqual(logs['reduced_step'], 0)
+    self.assertEqual(trainer.close(), {})
+
   @combinations.generate(
       combinations.combine(
           mixed_precision_dtype=['float32', 'bfloat16', 'float16'],
@@ -51,6 +51,8 @@ class DataConfig(base_config.Config):
     block_length: The number of consecutive elements to produce from each input
       element before cycling to another input element when interleaving files.
     deterministic: A boolean controlling whether determinism should be enforced.
+    seed: An optional int, the seed of the shuffles and of the example seeds of
+      an `InputReader` with `example_seed_key`. If None, a random seed is used.
     sharding: Whether sharding is used in the input pipeline.
     enable_tf_data_service: A boolean indicating whether to enable tf.data
       service for the input pipeline.
@@ -84,6 +86,7 @@ class DataConfig(base_config.Config):
   cycle_length: Optional[int] = None
   block_length: int = 1
   deterministic: Optional[bool] = None
+  seed: Optional[int] = None
   sharding: bool = True
   enable_tf_data_service: bool = False
   tf_data_service_address: Optional[str] = None
@@ -166,6 +169,13 @@ class TrainerConfig(base_config.Config):
     summary_interval: number of steps between each summary.
     checkpoint_interval: number of steps between checkpoints.
     max_to_keep: max checkpoints to keep.
+    async_checkpointing: whether checkpoints are written in a background thread,
+      training only pauses while the variables are copied to host memory.
+    max_in_flight_checkpoints: number of background checkpoints that may be
+      pending before training waits for the oldest one.
+    warm_start: whether the train and eval loops are traced in background
+      threads at startup, once the checkpoint is restored. The first loop
+      reuses its trace, the eval loop is traced while the model trains.
     continuous_eval_timeout: maximum number of seconds to wait between
       checkpoints, if set to None, continuous eval will wait indefinitely. This
       is only used continuous_train_and_eval and continuous_eval modes. Default
@@ -174,6 +184,15 @@ class TrainerConfig(base_config.Config):
     validation_steps: number of eval steps. If `None`, the entire eval dataset
       is used.
     validation_interval: number of training steps to run between evaluations.
+    pipelined_eval: whether the outputs of the evaluation steps are aggregated
+      in a background thread while the device runs the next steps.
+    max_pending_eval_outputs: number of evaluation step outputs that may wait
+      to be aggregated before the evaluation loop waits.
+    deferred_eval_reduce: where the final reduction of an evaluation runs.
+      "" runs it before the evaluation returns, "thread" or "process" run it in
+      the background and report its metrics with a later evaluation, with the
+      step they belong to as `reduced_step`. The last evaluation of training,
+      and any evaluation when exporting the best checkpoint, still waits.
     best_checkpoint_export_subdir: if set, the trainer will keep track of the
       best evaluation metric, and export the corresponding best checkpoint under
       `model_dir/best_checkpoint_export_subdir`. Note that this only works if
@@ -199,12 +218,18 @@ class TrainerConfig(base_config.Config):
   checkpoint_interval: int = 1000
   # Checkpoint manager.
   max_to_keep: int = 5
+  async_checkpointing: bool = False
+  max_in_flight_checkpoints: int = 1
+  warm_start: bool = False
   continuous_eval_timeout: int = 60 * 60
   # Train/Eval routines.
   train_steps: int = 0
   # Sets validation steps to be -1 to evaluate the entire dataset.
   validation_steps: int = -1
   validation_interval: int = 1000
+  pipelined_eval: bool = False
+  max_pending_eval_outputs: int = 16
+  deferred_eval_reduce: str = ""
   # Best checkpoint export.
   best_checkpoint_export_subdir: str = ""
   best_checkpoint_eval_metric: str = ""
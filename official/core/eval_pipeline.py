@@ -0,0 +1,178 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs the evaluation aggregation and reduction off the evaluation loop.
+
+`AggregationWorker` aggregates the outputs of the evaluation steps in a
+background thread, so the device keeps running steps while the host converts
+and accumulates the previous ones. `DeferredReducer` runs the final reduction,
+e.g. the COCO evaluation, in a background thread or process, so training can
+resume before the metrics of an evaluation are ready.
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+_DONE = object()
+
+
+class AggregationWorker:
+  """Calls `aggregate_fn(state, step_outputs)` in a background thread.
+
+  The step outputs are aggregated in the order they are submitted, exactly
+  like the evaluation loop would. At most `max_pending` step outputs wait to
+  be aggregated; once that many do, `submit` blocks, which bounds the host
+  memory they use. Errors of `aggregate_fn` are raised by `result`.
+  """
+
+  def __init__(self,
+               aggregate_fn: Callable[[Any, Any], Any],
+               max_pending: int = 16):
+    """Initializes the `AggregationWorker` instance.
+
+    Args:
+      aggregate_fn: The aggregation, usually `Task.aggregate_logs`.
+      max_pending: The number of step outputs that may wait to be aggregated
+        before `submit` blocks.
+
+    Raises:
+      ValueError: If `max_pending` is not a positive integer.
+    """
+    if max_pending < 1:
+      raise ValueError(
+          f"`max_pending` ({max_pending}) must be a positive integer.")
+    self._aggregate_fn = aggregate_fn
+    self._queue = queue.Queue(max_pending)
+    self._thread = None
+    self._state = None
+    self._error = None
+
+  def start(self, state=None):
+    """Starts aggregating an evaluation from `state`."""
+    if self._thread is not None:
+      raise RuntimeError("The previous aggregation was not finished.")
+    self._state = state
+    self._error = None
+    self._thread = threading.Thread(
+        target=self._aggregate_loop, name="eval_aggregation", daemon=True)
+    self._thread.start()
+
+  def submit(self, step_outputs):
+    """Schedules aggregating the outputs of one evaluation step."""
+    if self._thread is None:
+      raise RuntimeError("`start` must be called before `submit`.")
+    self._queue.put(step_outputs)
+
+  def result(self):
+    """Waits for the submitted step outputs and returns the aggregated state."""
+    if self._thread is None:
+      raise RuntimeError("`start` must be called before `result`.")
+    self._queue.put(_DONE)
+    self._thread.join()
+    self._thread = None
+    state, self._state = self._state, None
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+    return state
+
+  def _aggregate_loop(self):
+    while True:
+      step_outputs = self._queue.get()
+      if step_outputs is _DONE:
+        return
+      # After an error the remaining outputs are drained, so `submit` never
+      # blocks forever.
+      if self._error is None:
+        try:
+          self._state = self._aggregate_fn(self._state, step_outputs)
+        except Exception as e:  # pylint: disable=broad-except
+          self._error = e
+
+
+def _hide_accelerators():
+  # The reductions run on the host, a subprocess must not claim a GPU.
+  os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+
+
+def _reduce(reduce_fn):
+  if isinstance(reduce_fn, bytes):
+    reduce_fn = pickle.loads(reduce_fn)
+  return reduce_fn()
+
+
+class DeferredReducer:
+  """Runs the reductions of evaluations in a background thread or process.
+
+  The reductions run one at a time in the order they are submitted. With
+  `use_process`, they run in a spawned subprocess, so a reduction that holds
+  the GIL, like pycocotools does, does not slow down the training loop; the
+  reduction function and its arguments must then be picklable.
+  """
+
+  def __init__(self, use_process: bool = False):
+    """Initializes the `DeferredReducer` instance.
+
+    Args:
+      use_process: Whether the reductions run in a subprocess instead of a
+        background thread.
+    """
+    self._use_process = use_process
+    if use_process:
+      self._executor = concurrent.futures.ProcessPoolExecutor(
+          max_workers=1,
+          mp_context=multiprocessing.get_context("spawn"),
+          initializer=_hide_accelerators)
+    else:
+      self._executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=1, thread_name_prefix="eval_reduce")
+    self._pending = []
+
+  @property
+  def num_pending(self) -> int:
+    """The number of reductions whose results were not returned yet."""
+    return len(self._pending)
+
+  def submit(self, reduce_fn: Callable[[], Dict[str, Any]], step: int):
+    """Schedules `reduce_fn()`, the reduction of the evaluation at `step`."""
+    if self._use_process:
+      # Pickled now, so later changes to the aggregated state do not race
+      # with the executor's feeder thread, and errors surface here.
+      reduce_fn = pickle.dumps(reduce_fn)
+    self._pending.append((step, self._executor.submit(_reduce, reduce_fn)))
+
+  def pop_results(self,
+                  wait: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+    """Returns the `(step, metrics)` of the finished reductions, oldest first.
+
+    Args:
+      wait: Whether to wait for every submitted reduction.
+
+    Returns:
+      The results that were not returned by an earlier call.
+    """
+    results = []
+    while self._pending and (wait or self._pending[0][1].done()):
+      step, future = self._pending.pop(0)
+      results.append((step, future.result()))
+    return results
+
+  def close(self):
+    """Waits for the submitted reductions and stops the executor."""
+    self._executor.shutdown(wait=True)
@@ -0,0 +1,69 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.core.eval_pipeline."""
+import functools
+
+from absl.testing import parameterized
+import tensorflow as tf
+
+from official.core import eval_pipeline
+
+
+def _append(state, step_outputs):
+  return (state or []) + [step_outputs]
+
+
+def _total(values):
+  return {'total': sum(values)}
+
+
+class EvalPipelineTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_aggregation_worker(self):
+    worker = eval_pipeline.AggregationWorker(_append, max_pending=2)
+    for _ in range(2):
+      worker.start()
+      for i in range(10):
+        worker.submit(i)
+      self.assertEqual(worker.result(), list(range(10)))
+
+  def test_aggregation_worker_error(self):
+
+    def aggregate(state, step_outputs):
+      if step_outputs == 3:
+        raise ValueError('bad step')
+      return _append(state, step_outputs)
+
+    worker = eval_pipeline.AggregationWorker(aggregate, max_pending=1)
+    worker.start()
+    for i in range(10):
+      worker.submit(i)
+    with self.assertRaisesRegex(ValueError, 'bad step'):
+      worker.result()
+
+  @parameterized.parameters(False, True)
+  def test_deferred_reducer(self, use_process):
+    reducer = eval_pipeline.DeferredReducer(use_process=use_process)
+    reducer.submit(functools.partial(_total, [1, 2]), step=10)
+    reducer.submit(functools.partial(_total, [3, 4]), step=20)
+    self.assertEqual(
+        reducer.pop_results(wait=True), [(10, {'total': 3}),
+                                         (20, {'total': 7})])
+    self.assertEqual(reducer.num_pending, 0)
+    reducer.close()
+
+
+if __name__ == '__main__':
+  tf.test.main()
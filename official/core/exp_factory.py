@@ -26,6 +26,14 @@ def register_config_factory(name):
   return registry.register(_REGISTERED_CONFIGS, name)
 
 
+def register_config_factory_module(name: str, module_name: str):
+  """Registers experiment `name` to be imported from `module_name` on lookup.
+
+  The module has to register `name` with `register_config_factory`.
+  """
+  registry.register_lazy(_REGISTERED_CONFIGS, name, module_name)
+
+
 def get_exp_config_creater(exp_name: str):
   """Looks up ExperimentConfig factory methods."""
   exp_creater = registry.lookup(_REGISTERED_CONFIGS, exp_name)
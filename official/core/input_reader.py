@@ -13,14 +13,18 @@
 # limitations under the License.
 
 """A common dataset reader."""
+import functools
 import random
 from typing import Any, Callable, Optional
 
 from absl import logging
 import tensorflow as tf
-import tensorflow_datasets as tfds
 
 from official.core import config_definitions as cfg
+from official.utils.misc import lazy_loader
+
+# Only jobs reading from tfds pay for importing it.
+tfds = lazy_loader.LazyModule('tensorflow_datasets')
 
 
 def _get_random_integer():
@@ -43,7 +47,8 @@ class InputReader:
                transform_and_batch_fn: Optional[Callable[
                    [tf.data.Dataset, Optional[tf.distribute.InputContext]],
                    tf.data.Dataset]] = None,
-               postprocess_fn: Optional[Callable[..., Any]] = None):
+               postprocess_fn: Optional[Callable[..., Any]] = None,
+               example_seed_key: Optional[str] = None):
     """Initializes an InputReader instance.
 
     Args:
@@ -66,6 +71,16 @@ class InputReader:
         batch size.
       postprocess_fn: A optional `callable` that processes batched tensors. It
         will be executed after batching.
+      example_seed_key: An optional str. If set, every decoded tensors dict
+        gets an int64 [2] stateless seed under this key, for stateless random
+        ops in `parser_fn`. It is `index` folded into `[seed, pipeline_id]`
+        with `tf.random.experimental.stateless_fold_in`. `seed` is
+        `params.seed`, `pipeline_id` the id of the input pipeline, and `index`
+        numbers the examples of the pipeline in the order they are read and
+        shuffled in, counting on through the repeated epochs. The examples are
+        numbered before any parallel map, so with the same seed an example
+        gets the same key on every run, even if `params.deterministic` is
+        False.
     """
     if params.input_path and params.tfds_name:
       raise ValueError('At most one of `input_path` and `tfds_name` can be '
@@ -135,7 +150,9 @@ class InputReader:
     self._parser_fn = parser_fn
     self._transform_and_batch_fn = transform_and_batch_fn
     self._postprocess_fn = postprocess_fn
-    self._seed = _get_random_integer()
+    self._example_seed_key = example_seed_key
+    self._seed = (
+        _get_random_integer() if params.seed is None else params.seed)
 
     self._enable_tf_data_service = (
         params.enable_tf_data_service and params.tf_data_service_address)
@@ -175,7 +192,9 @@ class InputReader:
         cycle_length=self._cycle_length,
         block_length=self._block_length,
         num_parallel_calls=tf.data.experimental.AUTOTUNE,
-        deterministic=self._deterministic)
+        # The example seeds follow the order the examples are read in.
+        deterministic=(True if self._example_seed_key is not None else
+                       self._deterministic))
     return dataset
 
   def _read_files_then_shard(
@@ -210,6 +229,7 @@ class InputReader:
       self._tfds_builder.download_and_prepare()
 
     read_config = tfds.ReadConfig(
+        shuffle_seed=self._seed,
         interleave_cycle_length=self._cycle_length,
         interleave_block_length=self._block_length,
         input_context=input_context)
@@ -228,8 +248,15 @@ class InputReader:
       dataset = dataset.repeat()
     return dataset
 
+  def _decode_with_seed(self, pipeline_seed, index, value):
+    """Decodes an enumerated example and adds its seed to the tensors dict."""
+    decoded = value if self._decoder_fn is None else self._decoder_fn(value)
+    seed = tf.random.experimental.stateless_fold_in(
+        tf.constant(pipeline_seed, tf.int64), index)
+    return dict(decoded, **{self._example_seed_key: seed})
+
   @property
-  def tfds_info(self) -> tfds.core.DatasetInfo:
+  def tfds_info(self) -> 'tfds.core.DatasetInfo':
     """Returns TFDS dataset info, if available."""
     if self._tfds_builder:
       return self._tfds_builder.info
@@ -265,13 +292,24 @@ class InputReader:
       dataset = dataset.cache()
 
     if self._is_training:
-      dataset = dataset.shuffle(self._shuffle_buffer_size)
+      dataset = dataset.shuffle(self._shuffle_buffer_size, seed=self._seed)
 
     def maybe_map_fn(dataset, fn):
       return dataset if fn is None else dataset.map(
           fn, num_parallel_calls=tf.data.experimental.AUTOTUNE)
 
-    dataset = maybe_map_fn(dataset, self._decoder_fn)
+    if self._example_seed_key is not None:
+      # The input pipelines number their examples from 0 each, so their id is
+      # part of the seed for the hosts to augment differently.
+      pipeline_seed = [
+          self._seed,
+          input_context.input_pipeline_id if input_context else 0
+      ]
+      dataset = maybe_map_fn(
+          dataset.enumerate(),
+          functools.partial(self._decode_with_seed, pipeline_seed))
+    else:
+      dataset = maybe_map_fn(dataset, self._decoder_fn)
     if self._sample_fn is not None:
       dataset = dataset.apply(self._sample_fn)
     dataset = maybe_map_fn(dataset, self._parser_fn)
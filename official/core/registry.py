@@ -14,6 +14,35 @@
 
 """Registry utility."""
 
+import importlib
+
+
+class LazyRegistration:
+  """Stands for a registration made when `module_name` is imported."""
+
+  def __init__(self, module_name):
+    self.module_name = module_name
+
+  def __repr__(self):
+    return "LazyRegistration({!r})".format(self.module_name)
+
+
+def _collection_of(registered_collection, reg_key):
+  """Returns the collection holding reg_key, and the key inside of it."""
+  if not isinstance(reg_key, str):
+    return registered_collection, reg_key
+  hierarchy = reg_key.split("/")
+  collection = registered_collection
+  for h_idx, entry_name in enumerate(hierarchy[:-1]):
+    if entry_name not in collection:
+      collection[entry_name] = {}
+    collection = collection[entry_name]
+    if not isinstance(collection, dict):
+      raise KeyError(
+          "Collection path {} at position {} already registered as "
+          "a function or class.".format(entry_name, h_idx))
+  return collection, hierarchy[-1]
+
 
 def register(registered_collection, reg_key):
   """Register decorated function or class to collection.
@@ -37,23 +66,12 @@ def register(registered_collection, reg_key):
   """
   def decorator(fn_or_cls):
     """Put fn_or_cls in the dictionary."""
-    if isinstance(reg_key, str):
-      hierarchy = reg_key.split("/")
-      collection = registered_collection
-      for h_idx, entry_name in enumerate(hierarchy[:-1]):
-        if entry_name not in collection:
-          collection[entry_name] = {}
-        collection = collection[entry_name]
-        if not isinstance(collection, dict):
-          raise KeyError(
-              "Collection path {} at position {} already registered as "
-              "a function or class.".format(entry_name, h_idx))
-      leaf_reg_key = hierarchy[-1]
-    else:
-      collection = registered_collection
-      leaf_reg_key = reg_key
-
-    if leaf_reg_key in collection:
+    collection, leaf_reg_key = _collection_of(registered_collection,
+                                               reg_key)
+
+    # A lazy registration is replaced by the one its module makes.
+    if (leaf_reg_key in collection and
+        not isinstance(collection[leaf_reg_key], LazyRegistration)):
       raise KeyError("Function or class {} registered multiple times.".format(
           leaf_reg_key))
 
@@ -62,6 +80,30 @@ def register(registered_collection, reg_key):
   return decorator
 
 
+def register_lazy(registered_collection, reg_key, module_name):
+  """Registers reg_key to be resolved by importing module_name.
+
+  The module is imported by the first lookup() of reg_key, and has to register
+  reg_key with register() when it is imported. This keeps heavy modules, and
+  the libraries they import, out of programs that never use them.
+
+  Args:
+    registered_collection: a dictionary, as for register().
+    reg_key: the key the module registers, as for register().
+    module_name: the absolute name of the module to import.
+  Raises:
+    KeyError: when reg_key is already registered by another module.
+  """
+  collection, leaf_reg_key = _collection_of(registered_collection, reg_key)
+  registered = collection.get(leaf_reg_key)
+  if registered is None:
+    collection[leaf_reg_key] = LazyRegistration(module_name)
+  elif (isinstance(registered, LazyRegistration) and
+        registered.module_name != module_name):
+    raise KeyError("{} is registered lazily by both {} and {}.".format(
+        leaf_reg_key, registered.module_name, module_name))
+
+
 def lookup(registered_collection, reg_key):
   """Lookup and return decorated function or class in the collection.
 
@@ -90,8 +132,17 @@ def lookup(registered_collection, reg_key):
             "collection path {} at position {} never registered.".format(
                 entry_name, h_idx))
       collection = collection[entry_name]
-    return collection
+    registered = collection
   else:
     if reg_key not in registered_collection:
       raise LookupError("registration key {} never registered.".format(reg_key))
-    return registered_collection[reg_key]
+    registered = registered_collection[reg_key]
+
+  if isinstance(registered, LazyRegistration):
+    importlib.import_module(registered.module_name)
+    collection, leaf_reg_key = _collection_of(registered_collection, reg_key)
+    if isinstance(collection[leaf_reg_key], LazyRegistration):
+      raise LookupError("importing {} did not register {}.".format(
+          registered.module_name, reg_key))
+    registered = collection[leaf_reg_key]
+  return registered
@@ -87,6 +87,31 @@ class RegistryTest(tf.test.TestCase):
     with self.assertRaises(LookupError):
       registry.lookup(collection, 'non-exist')
 
+  def test_register_lazy(self):
+    collection = {}
+    registry.register_lazy(collection, 'functions/func_0', 'json')
+
+    @registry.register(collection, 'functions/func_0')
+    def func_test():
+      pass
+
+    self.assertEqual(registry.lookup(collection, 'functions/func_0'), func_test)
+    # A real registration is kept over a later lazy one.
+    registry.register_lazy(collection, 'functions/func_0', 'json')
+    self.assertEqual(registry.lookup(collection, 'functions/func_0'), func_test)
+
+  def test_register_lazy_error(self):
+    collection = {}
+    registry.register_lazy(collection, 'functions/func_0', 'json')
+    registry.register_lazy(collection, 'functions/func_0', 'json')
+
+    with self.assertRaises(KeyError):
+      registry.register_lazy(collection, 'functions/func_0', 'os')
+
+    # Importing json does not register the key.
+    with self.assertRaises(LookupError):
+      registry.lookup(collection, 'functions/func_0')
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -14,9 +14,16 @@
 
 """A global factory to register and access all registered tasks."""
 
+import importlib
+
 from official.core import registry
 
 _REGISTERED_TASK_CLS = {}
+_TASK_CLS_MODULES = {}
+
+
+def _class_path(cls):
+  return "{}.{}".format(cls.__module__, cls.__qualname__)
 
 
 # TODO(b/158741360): Add type annotations once pytype checks across modules.
@@ -55,6 +62,20 @@ def register_task_cls(task_config_cls):
   return registry.register(_REGISTERED_TASK_CLS, task_config_cls)
 
 
+def register_task_cls_module(task_config_cls_path, module_name):
+  """Registers the module that registers the task of a TaskConfig subclass.
+
+  The module is imported the first time a task is looked up for the config
+  class, so programs that never build the task do not import it.
+
+  Args:
+    task_config_cls_path: the full path of the TaskConfig subclass, e.g.
+      "my_project.configs.MyTaskConfig". The class is not imported either.
+    module_name: the module that registers the task with register_task_cls.
+  """
+  _TASK_CLS_MODULES[task_config_cls_path] = module_name
+
+
 def get_task(task_config, **kwargs):
   """Creates a Task (of suitable subclass type) from task_config."""
   return get_task_cls(task_config.__class__)(task_config, **kwargs)
@@ -63,5 +84,8 @@ def get_task(task_config, **kwargs):
 # The user-visible get_task() is defined after classes have been registered.
 # TODO(b/158741360): Add type annotations once pytype checks across modules.
 def get_task_cls(task_config_cls):
+  module_name = _TASK_CLS_MODULES.get(_class_path(task_config_cls))
+  if task_config_cls not in _REGISTERED_TASK_CLS and module_name:
+    importlib.import_module(module_name)
   task_cls = registry.lookup(_REGISTERED_TASK_CLS, task_config_cls)
   return task_cls
@@ -15,7 +15,7 @@
 """TFM common training driver library."""
 # pytype: disable=attribute-error
 import os
-from typing import Any, Mapping, Tuple
+from typing import Any, Mapping, Optional, Tuple
 
 # Import libraries
 from absl import logging
@@ -25,6 +25,7 @@ import tensorflow as tf
 from official.core import base_task
 from official.core import config_definitions
 from official.core import train_utils
+from official.core import warm_start
 
 BestCheckpointExporter = train_utils.BestCheckpointExporter
 
@@ -55,7 +56,9 @@ def run_experiment(distribution_strategy: tf.distribute.Strategy,
                    params: config_definitions.ExperimentConfig,
                    model_dir: str,
                    run_post_eval: bool = False,
-                   save_summary: bool = True) \
+                   save_summary: bool = True,
+                   startup_profile: Optional[
+                       warm_start.StartupProfile] = None) \
 -> Tuple[tf.keras.Model, Mapping[str, Any]]:
   """Runs train/eval configured by the experiment params.
 
@@ -69,6 +72,9 @@ def run_experiment(distribution_strategy: tf.distribute.Strategy,
     run_post_eval: Whether to run post eval once after training, metrics logs
       are returned.
     save_summary: Whether to save train and validation summary.
+    startup_profile: The `warm_start.StartupProfile` started by the caller,
+      e.g. before its imports. The startup breakdown is written to `model_dir`
+      after the first loop.
 
   Returns:
     A 2-tuple of (model, eval_logs).
@@ -77,13 +83,16 @@ def run_experiment(distribution_strategy: tf.distribute.Strategy,
         otherwise, returns {}.
   """
 
+  startup_profile = startup_profile or warm_start.StartupProfile()
+  startup_profile.mark('setup')
   with distribution_strategy.scope():
     trainer = train_utils.create_trainer(
         params,
         task,
         train='train' in mode,
         evaluate=('eval' in mode) or run_post_eval,
-        checkpoint_exporter=maybe_create_best_ckpt_exporter(params, model_dir))
+        checkpoint_exporter=maybe_create_best_ckpt_exporter(params, model_dir),
+        startup_profile=startup_profile)
 
   if trainer.checkpoint:
     checkpoint_manager = tf.train.CheckpointManager(
@@ -105,43 +114,69 @@ def run_experiment(distribution_strategy: tf.distribute.Strategy,
       global_step=trainer.global_step,
       steps_per_loop=params.trainer.steps_per_loop,
       checkpoint_manager=checkpoint_manager,
+      enable_async_checkpointing=params.trainer.async_checkpointing,
+      max_in_flight_checkpoints=params.trainer.max_in_flight_checkpoints,
       summary_dir=os.path.join(model_dir, 'train') if (save_summary) else None,
       eval_summary_dir=os.path.join(model_dir, 'validation') if
       (save_summary) else None,
       summary_interval=params.trainer.summary_interval if
       (save_summary) else None)
+  # The controller restores the checkpoint, or initializes the model.
+  startup_profile.mark('weights')
+  # Tracing builds the train step, which creates the optimizer slots, so it
+  # starts after the restore: slots created by a trace thread while the
+  # checkpoint is read could miss their deferred restoration. The loops are
+  # not waited for, the first call of each loop joins its trace.
+  pretracer = None
+  if params.trainer.warm_start:
+    pretracer = warm_start.Pretracer(
+        trainer,
+        train='train' in mode,
+        evaluate=('eval' in mode) or run_post_eval,
+        startup_profile=startup_profile)
+    pretracer.start()
+  trainer.report_startup(startup_profile,
+                         os.path.join(model_dir, f'startup_{mode}.json'))
 
   logging.info('Starts to execute mode: %s', mode)
-  with distribution_strategy.scope():
-    if mode == 'train':
-      controller.train(steps=params.trainer.train_steps)
-    elif mode == 'train_and_eval':
-      controller.train_and_evaluate(
-          train_steps=params.trainer.train_steps,
-          eval_steps=params.trainer.validation_steps,
-          eval_interval=params.trainer.validation_interval)
-    elif mode == 'eval':
-      controller.evaluate(steps=params.trainer.validation_steps)
-    elif mode == 'continuous_eval':
-
-      def timeout_fn():
-        if trainer.global_step.numpy() >= params.trainer.train_steps:
-          return True
-        return False
-
-      controller.evaluate_continuously(
-          steps=params.trainer.validation_steps,
-          timeout=params.trainer.continuous_eval_timeout,
-          timeout_fn=timeout_fn)
-    else:
-      raise NotImplementedError('The mode is not implemented: %s' % mode)
+  try:
+    with distribution_strategy.scope():
+      if mode == 'train':
+        controller.train(steps=params.trainer.train_steps)
+      elif mode == 'train_and_eval':
+        controller.train_and_evaluate(
+            train_steps=params.trainer.train_steps,
+            eval_steps=params.trainer.validation_steps,
+            eval_interval=params.trainer.validation_interval)
+      elif mode == 'eval':
+        controller.evaluate(steps=params.trainer.validation_steps)
+      elif mode == 'continuous_eval':
+
+        def timeout_fn():
+          if trainer.global_step.numpy() >= params.trainer.train_steps:
+            return True
+          return False
+
+        controller.evaluate_continuously(
+            steps=params.trainer.validation_steps,
+            timeout=params.trainer.continuous_eval_timeout,
+            timeout_fn=timeout_fn)
+      else:
+        raise NotImplementedError('The mode is not implemented: %s' % mode)
+  finally:
+    if pretracer is not None:
+      pretracer.wait()
+    # Writes the checkpoints and summaries still pending in the background.
+    controller.close()
 
   if hasattr(trainer.model, 'count_params'):
     logging.info('Number of trainable params in model: %f Millions.',
                  trainer.model.count_params() / 10.**6)
+  eval_logs = {}
   if run_post_eval:
     with distribution_strategy.scope():
-      return trainer.model, trainer.evaluate(
+      eval_logs = trainer.evaluate(
           tf.convert_to_tensor(params.trainer.validation_steps))
-  else:
-    return trainer.model, {}
+  # Waits for the evaluation metrics that are still reduced in the background.
+  trainer.close()
+  return trainer.model, eval_logs
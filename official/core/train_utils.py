@@ -29,6 +29,7 @@ from official.core import base_task
 from official.core import base_trainer
 from official.core import config_definitions
 from official.core import exp_factory
+from official.core import warm_start
 from official.modeling import hyperparams
 
 
@@ -129,13 +130,17 @@ def create_trainer(params: config_definitions.ExperimentConfig,
                    train: bool,
                    evaluate: bool,
                    checkpoint_exporter: Optional[BestCheckpointExporter] = None,
-                   trainer_cls=base_trainer.Trainer) -> base_trainer.Trainer:
+                   trainer_cls=base_trainer.Trainer,
+                   startup_profile: Optional[warm_start.StartupProfile] = None
+                  ) -> base_trainer.Trainer:
   """Create trainer."""
   logging.info('Running default trainer.')
   model = task.build_model()
   optimizer = task.create_optimizer(params.trainer.optimizer_config,
                                     params.runtime)
-  return trainer_cls(
+  if startup_profile:
+    startup_profile.mark('model')
+  trainer = trainer_cls(
       params,
       task,
       model=model,
@@ -143,6 +148,10 @@ def create_trainer(params: config_definitions.ExperimentConfig,
       train=train,
       evaluate=evaluate,
       checkpoint_exporter=checkpoint_exporter)
+  if startup_profile:
+    # The trainer builds the distributed datasets.
+    startup_profile.mark('dataset')
+  return trainer
 
 
 @dataclasses.dataclass
@@ -0,0 +1,178 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Warm starts the loops of a trainer and times the startup of a job.
+
+Tracing the train and eval loops of a large model takes a long time, and a job
+restarted on a preemptible machine pays it again, since TF cannot keep traced
+graphs across processes. `Pretracer` traces the loops in background threads
+once the checkpoint is restored, while the job goes on to run them: the first
+loop reuses its trace, and the eval loop is traced behind the training loop.
+`StartupProfile` times every phase of the startup up to the end of the first
+loop.
+"""
+
+import concurrent.futures
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from absl import logging
+import tensorflow as tf
+
+
+class StartupProfile:
+  """Times the phases of the startup of a job.
+
+  The phases are sequential: `mark(phase)` ends the current phase and records
+  the seconds since the previous mark, or since `start_time`, under `phase`.
+  Work that overlaps the phases, like the tracing threads of `Pretracer`, is
+  recorded with `add_background`.
+  """
+
+  def __init__(self, start_time: Optional[float] = None):
+    """Initializes the `StartupProfile` instance.
+
+    Args:
+      start_time: The `time.time()` the job started at, e.g. taken before the
+        imports of the main module. If `None`, the current time is used.
+    """
+    self._start_time = time.time() if start_time is None else start_time
+    self._last_time = self._start_time
+    self._phases = {}
+    self._background = {}
+    # The background work is added from the threads that ran it.
+    self._lock = threading.Lock()
+
+  @property
+  def phases(self) -> Dict[str, float]:
+    """The seconds of every phase, in the order they ended."""
+    return dict(self._phases)
+
+  @property
+  def total(self) -> float:
+    """The seconds from the start to the last mark."""
+    return self._last_time - self._start_time
+
+  def mark(self, phase: str):
+    """Ends the current phase, naming it `phase`."""
+    now = time.time()
+    self._phases[phase] = self._phases.get(phase, 0.0) + now - self._last_time
+    self._last_time = now
+
+  def add_background(self, name: str, seconds: float):
+    """Records work that ran concurrently with the phases."""
+    with self._lock:
+      self._background[name] = seconds
+
+  def report(self) -> str:
+    """Returns a table of the phases and the background work."""
+    lines = [f"{'phase':>24} | {'seconds':>8}"]
+    for phase, seconds in self._phases.items():
+      lines.append(f"{phase:>24} | {seconds:8.2f}")
+    with self._lock:
+      background = dict(self._background)
+    for name, seconds in background.items():
+      lines.append(f"{'(' + name + ')':>24} | {seconds:8.2f}")
+    lines.append(f"{'total':>24} | {self.total:8.2f}")
+    return "\n".join(lines)
+
+  def write(self, path: str):
+    """Writes the phases and the background work to `path` as json."""
+    with self._lock:
+      background = dict(self._background)
+    with tf.io.gfile.GFile(path, "w") as f:
+      json.dump({
+          "phases": self._phases,
+          "background": background,
+          "total": self.total
+      }, f, indent=2)
+
+
+class Pretracer:
+  """Traces the loops of a trainer ahead, in background threads.
+
+  `start` traces every loop that is going to run in its own thread and
+  returns. The job meanwhile creates the iterators and starts its first loop,
+  which waits for the trace of that loop and reuses it, while the trace of the
+  other loop goes on, e.g. behind the training loop. `wait` joins the threads.
+
+  Tracing the train loop creates the optimizer slot variables. Start the
+  pretracer after the checkpoint is restored, so no slot is created while its
+  deferred restoration is pending.
+  """
+
+  def __init__(self,
+               trainer,
+               train: bool = True,
+               evaluate: bool = True,
+               startup_profile: Optional[StartupProfile] = None):
+    """Initializes the `Pretracer` instance.
+
+    Args:
+      trainer: An `orbit.StandardTrainer` and `orbit.StandardEvaluator`, with a
+        `strategy`, like the `Trainer` of `official.core.base_trainer`.
+      train: Whether the training loop is going to run.
+      evaluate: Whether the evaluation loop is going to run.
+      startup_profile: An optional `StartupProfile`, the seconds of every trace
+        are added to its background work when the trace finishes.
+    """
+    self._trainer = trainer
+    self._startup_profile = startup_profile
+    self._loops = {}
+    if train:
+      self._loops["train_loop"] = trainer.trace_train_loop
+    if evaluate:
+      self._loops["eval_loop"] = trainer.trace_eval_loop
+    self._executor = None
+    self._futures = {}
+
+  def start(self):
+    """Starts tracing the loops."""
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(len(self._loops), 1), thread_name_prefix="pretrace")
+    for name, trace_fn in self._loops.items():
+      self._futures[name] = self._executor.submit(self._trace, name, trace_fn)
+
+  def wait(self) -> Dict[str, float]:
+    """Waits for the tracing threads.
+
+    A loop whose trace failed is traced again when it runs, which raises the
+    error in the caller, so the failure is only logged here.
+
+    Returns:
+      The seconds every traced loop took to trace.
+    """
+    seconds = {}
+    for name, future in self._futures.items():
+      try:
+        seconds[name] = future.result()
+      except Exception:  # pylint: disable=broad-except
+        logging.exception("Pretracing %s failed.", name)
+    self._futures = {}
+    if self._executor is not None:
+      self._executor.shutdown()
+      self._executor = None
+    return seconds
+
+  def _trace(self, name, trace_fn):
+    start = time.time()
+    # The scope of the distribution strategy is thread local.
+    with self._trainer.strategy.scope():
+      trace_fn()
+    seconds = time.time() - start
+    if self._startup_profile is not None:
+      self._startup_profile.add_background(f"trace {name}", seconds)
+    return seconds
@@ -0,0 +1,80 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.core.warm_start."""
+import json
+import os
+
+import tensorflow as tf
+
+from official.core import base_trainer as trainer_lib
+from official.core import config_definitions as cfg
+from official.core import warm_start
+from official.utils.testing import mock_task
+
+
+class WarmStartTest(tf.test.TestCase):
+
+  def create_test_trainer(self):
+    config = cfg.ExperimentConfig(
+        trainer=cfg.TrainerConfig(
+            optimizer_config=cfg.OptimizationConfig({
+                'optimizer': {
+                    'type': 'sgd'
+                },
+                'learning_rate': {
+                    'type': 'constant'
+                }
+            })))
+    task = mock_task.MockTask(config.task)
+    return trainer_lib.Trainer(
+        config,
+        task,
+        model=task.build_model(),
+        optimizer=task.create_optimizer(config.trainer.optimizer_config,
+                                        config.runtime))
+
+  def test_startup_profile(self):
+    profile = warm_start.StartupProfile(start_time=0.0)
+    profile.mark('imports')
+    profile.mark('model')
+    profile.add_background('trace train_loop', 1.5)
+    self.assertEqual(list(profile.phases), ['imports', 'model'])
+    self.assertAlmostEqual(sum(profile.phases.values()), profile.total)
+    self.assertIn('trace train_loop', profile.report())
+
+    path = os.path.join(self.get_temp_dir(), 'startup.json')
+    profile.write(path)
+    with tf.io.gfile.GFile(path) as f:
+      self.assertEqual(json.load(f)['background'], {'trace train_loop': 1.5})
+
+  def test_pretracer(self):
+    trainer = self.create_test_trainer()
+    profile = warm_start.StartupProfile()
+    pretracer = warm_start.Pretracer(trainer, startup_profile=profile)
+    pretracer.start()
+    # The loop joins the trace that is still running, instead of waiting.
+    logs = trainer.train(tf.convert_to_tensor(2, dtype=tf.int32))
+    self.assertIn('training_loss', logs)
+    self.assertCountEqual(pretracer.wait(), ['train_loop', 'eval_loop'])
+    self.assertIn('trace train_loop', profile.report())
+    self.assertIn('trace eval_loop', profile.report())
+
+  def test_pretracer_only_traces_the_loops_that_run(self):
+    pretracer = warm_start.Pretracer(self.create_test_trainer(), train=False)
+    pretracer.start()
+    self.assertCountEqual(pretracer.wait(), ['eval_loop'])
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,45 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Defers importing heavy optional libraries until they are used.
+
+```
+tfds = lazy_loader.LazyModule('tensorflow_datasets')
+
+def load(name):
+  return tfds.load(name)  # tensorflow_datasets is imported here.
+```
+"""
+
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+  """A module that is imported on its first attribute access."""
+
+  def __init__(self, name):
+    super().__init__(name)
+    self._module = None
+
+  def _load(self):
+    if self._module is None:
+      self._module = importlib.import_module(self.__name__)
+    return self._module
+
+  def __getattr__(self, item):
+    return getattr(self._load(), item)
+
+  def __dir__(self):
+    return dir(self._load())
@@ -12,8 +12,65 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ==============================================================================
-"""Vision package definition."""
-# Lint as: python3
-# pylint: disable=unused-import
-from official.vision.beta import configs
-from official.vision.beta import tasks
+"""Vision package definition.
+
+The experiments and tasks are registered lazily: their modules, and the
+libraries those import, are loaded when one of them is first looked up, or
+when `configs` or `tasks` is accessed. Every experiment and task the listed
+modules register has to be listed, see registrations_test.py.
+"""
+import importlib as _imp
+
+from official.core import exp_factory as _exp_factory
+from official.core import task_factory as _task_factory
+
+# The config module of every experiment.
+_EXPERIMENTS = {
+    'image_classification': [
+        'image_classification', 'resnet_imagenet', 'revnet_imagenet',
+        'mobilenet_imagenet'
+    ],
+    'maskrcnn': [
+        'fasterrcnn_resnetfpn_coco', 'maskrcnn_resnetfpn_coco',
+        'maskrcnn_spinenet_coco'
+    ],
+    'retinanet': [
+        'retinanet', 'retinanet_resnetfpn_coco', 'retinanet_spinenet_coco'
+    ],
+    'semantic_segmentation': [
+        'semantic_segmentation', 'seg_deeplabv3_pascal',
+        'seg_deeplabv3plus_pascal', 'seg_resnetfpn_pascal',
+        'seg_deeplabv3plus_cityscapes'
+    ],
+    'video_classification': [
+        'video_classification', 'video_classification_kinetics400',
+        'video_classification_kinetics600'
+    ],
+}
+
+# The task config class of every task module.
+_TASKS = {
+    'image_classification': 'ImageClassificationTask',
+    'maskrcnn': 'MaskRCNNTask',
+    'retinanet': 'RetinaNetTask',
+    'semantic_segmentation': 'SemanticSegmentationTask',
+    'video_classification': 'VideoClassificationTask',
+}
+
+for _module, _names in _EXPERIMENTS.items():
+  for _name in _names:
+    _exp_factory.register_config_factory_module(
+        _name, f'{__name__}.configs.{_module}')
+
+for _module, _config_cls in _TASKS.items():
+  _task_factory.register_task_cls_module(
+      f'{__name__}.configs.{_module}.{_config_cls}',
+      f'{__name__}.tasks.{_module}')
+
+_SUBPACKAGES = ('configs', 'tasks')
+
+
+def __getattr__(name):
+  if name not in _SUBPACKAGES:
+    raise AttributeError(name)
+  return _imp.import_module(f'{__name__}.{name}')
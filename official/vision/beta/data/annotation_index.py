@@ -0,0 +1,376 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""On disk per image index of COCO style annotation files.
+
+Loading instances_train2017.json with json.load keeps several GB of python
+objects alive. The index streams the file once instead, decoding one element
+of the images and annotations arrays at a time, and saves compact numpy
+arrays next to it:
+
+  images:       ids, heights, widths and the byte span of every image entry.
+  annotations:  boxes, classes, is_crowd, areas and the byte span of every
+                annotation, grouped by image, with the start of the rows of
+                every image.
+
+The arrays are memory mapped when the index is opened. The rows of an image
+are found with a dense id table, or a binary search for sparse ids, so the
+boxes of an image are a slice and a full annotation, its segmentation
+included, is one seek and json.loads of its byte span in the source file.
+Panoptic files have one annotation per image with a list of segments_info,
+every segment gets a row that points at the span of its annotation.
+"""
+import array
+import json
+import os
+import re
+
+import numpy as np
+
+META = 'meta.json'
+IMAGE_ARRAYS = ('image_ids', 'heights', 'widths', 'image_offsets',
+                'image_lengths', 'image_starts')
+ANNOTATION_ARRAYS = ('annotation_ids', 'annotation_rows', 'boxes', 'classes',
+                     'is_crowd', 'areas', 'offsets', 'lengths')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# the characters a json number can go on with
+_NUMBER_TAIL = re.compile(r'[0-9eE.+-]*')
+
+
+class _JsonStream(object):
+  """Reads the values of a json file one at a time, with their byte offsets.
+
+  The file is decoded as latin-1, one character per byte, so positions in the
+  buffer are byte offsets in the file. Multi byte utf-8 characters can only
+  be inside strings, which are decoded again from the bytes when they are
+  needed.
+  """
+
+  def __init__(self, file, chunk_size):
+    self._file = file
+    self._chunk_size = chunk_size
+    self._decoder = json.JSONDecoder()
+    self._buffer = ''
+    self._base = 0
+    self._pos = 0
+    self._eof = False
+
+  @property
+  def offset(self):
+    return self._base + self._pos
+
+  def _fill(self):
+    if self._eof:
+      return False
+    # read at least as much as is pending, so a value that spans many chunks
+    # is decoded a logarithmic number of times
+    size = max(self._chunk_size, len(self._buffer) - self._pos)
+    chunk = self._file.read(size)
+    if not chunk:
+      self._eof = True
+      return False
+    self._buffer = self._buffer[self._pos:] + chunk.decode('latin-1')
+    self._base += self._pos
+    self._pos = 0
+    return True
+
+  def peek(self):
+    """The next non whitespace character, '' at the end of the file."""
+    while True:
+      self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+      if self._pos < len(self._buffer):
+        return self._buffer[self._pos]
+      if not self._fill():
+        return ''
+
+  def skip(self, char):
+    if self.peek() != char:
+      raise ValueError(f'expected {char!r} at byte {self.offset} of '
+                       f'{self._file.name}, got {self.peek()!r}')
+    self._pos += 1
+
+  def value(self):
+    self.peek()
+    while True:
+      try:
+        value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        # a number may go on in the next chunk, also when the buffer ends
+        # right after its '.' or 'e' and it was decoded without them
+        tail = _NUMBER_TAIL.match(self._buffer, end).end()
+        if tail < len(self._buffer) or self._eof:
+          self._pos = end
+          return value
+      except json.JSONDecodeError:
+        if self._eof:
+          raise
+      self._fill()
+
+
+def iter_json_arrays(path, keys, chunk_size=1 << 20):
+  """Streams the elements of the top level arrays `keys` of a json object.
+
+  Args:
+    path: json file holding one object.
+    keys: names of the top level arrays to stream.
+    chunk_size: `int` bytes read at a time.
+
+  Yields:
+    (key, value, offset, length) for every element of the streamed arrays,
+    with its byte span in the file, and (key, value, None, None) for every
+    other top level value.
+  """
+  with open(path, 'rb') as file:
+    stream = _JsonStream(file, chunk_size)
+    stream.skip('{')
+    while stream.peek() != '}':
+      key = stream.value()
+      stream.skip(':')
+      if key in keys and stream.peek() == '[':
+        stream.skip('[')
+        while stream.peek() != ']':
+          offset = stream.offset
+          value = stream.value()
+          yield key, value, offset, stream.offset - offset
+          if stream.peek() == ',':
+            stream.skip(',')
+        stream.skip(']')
+      else:
+        yield key, stream.value(), None, None
+      if stream.peek() == ',':
+        stream.skip(',')
+
+
+def _source_stats(path):
+  stat = os.stat(path)
+  return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def build_index(json_path, index_dir, chunk_size=1 << 20):
+  """Streams a COCO style json file into the arrays of an index directory."""
+  images = {
+      name: array.array('q')
+      for name in ('image_ids', 'heights', 'widths', 'image_offsets',
+                   'image_lengths')
+  }
+  annotations = {
+      'annotation_ids': array.array('q'),
+      'annotation_image_ids': array.array('q'),
+      'boxes': array.array('f'),
+      'classes': array.array('q'),
+      'is_crowd': array.array('b'),
+      'areas': array.array('f'),
+      'offsets': array.array('q'),
+      'lengths': array.array('q'),
+  }
+  categories = []
+
+  for key, value, offset, length in iter_json_arrays(
+      json_path, ('images', 'annotations'), chunk_size=chunk_size):
+    if key == 'images':
+      images['image_ids'].append(value['id'])
+      images['heights'].append(value.get('height', 0))
+      images['widths'].append(value.get('width', 0))
+      images['image_offsets'].append(offset)
+      images['image_lengths'].append(length)
+    elif key == 'annotations':
+      for row in value.get('segments_info', [value]):
+        annotations['annotation_ids'].append(row.get('id', -1))
+        annotations['annotation_image_ids'].append(value['image_id'])
+        annotations['boxes'].extend(row.get('bbox') or [0.0] * 4)
+        annotations['classes'].append(row.get('category_id', -1))
+        annotations['is_crowd'].append(int(row.get('iscrowd', 0)))
+        annotations['areas'].append(row.get('area', 0.0))
+        annotations['offsets'].append(offset)
+        annotations['lengths'].append(length)
+    elif key == 'categories':
+      categories = value
+
+  arrays = {name: np.asarray(values) for name, values in images.items()}
+  arrays['heights'] = arrays['heights'].astype(np.int32)
+  arrays['widths'] = arrays['widths'].astype(np.int32)
+  image_ids = arrays['image_ids'].astype(np.int64)
+
+  # group the annotations by the row of their image, in file order, and drop
+  # the ones of unknown images
+  num_images = image_ids.shape[0]
+  order = np.argsort(image_ids, kind='stable')
+  sorted_ids = np.append(image_ids[order], np.iinfo(np.int64).min)
+  annotation_image_ids = np.asarray(
+      annotations.pop('annotation_image_ids'), np.int64)
+  found = np.searchsorted(sorted_ids[:-1], annotation_image_ids)
+  known = sorted_ids[found] == annotation_image_ids
+  rows = np.where(known, np.append(order, 0)[found], num_images)
+  grouped = np.argsort(rows, kind='stable')[:np.count_nonzero(known)]
+
+  for name, values in annotations.items():
+    values = np.asarray(values)
+    if name == 'boxes':
+      values = values.reshape([-1, 4])
+    arrays[name] = values[grouped]
+  arrays['is_crowd'] = arrays['is_crowd'].astype(bool)
+  arrays['classes'] = arrays['classes'].astype(np.int32)
+  arrays['annotation_rows'] = rows[grouped].astype(np.int32)
+  counts = np.bincount(arrays['annotation_rows'], minlength=num_images)
+  arrays['image_starts'] = np.concatenate([[0], np.cumsum(counts)])
+
+  os.makedirs(index_dir, exist_ok=True)
+  for name in IMAGE_ARRAYS + ANNOTATION_ARRAYS:
+    np.save(os.path.join(index_dir, name + '.npy'), arrays[name])
+  meta = {
+      'source': os.path.abspath(json_path),
+      'categories': categories,
+      'num_images': int(image_ids.shape[0]),
+      'num_annotations': int(arrays['annotation_rows'].shape[0]),
+  }
+  meta.update(_source_stats(json_path))
+  with open(os.path.join(index_dir, META), 'w') as file:
+    json.dump(meta, file)
+  return index_dir
+
+
+class AnnotationIndex(object):
+  """Per image lookups into an index built by build_index.
+
+  Pickles as its directory, so it can be handed to worker processes that
+  open their own memory maps.
+  """
+
+  def __init__(self, index_dir):
+    self._index_dir = index_dir
+    with open(os.path.join(index_dir, META), 'r') as file:
+      self._meta = json.load(file)
+    self._arrays = {
+        name: np.load(os.path.join(index_dir, name + '.npy'), mmap_mode='r')
+        for name in IMAGE_ARRAYS + ANNOTATION_ARRAYS
+    }
+    self._file = None
+
+    image_ids = np.asarray(self._arrays['image_ids'], np.int64)
+    self._order = None
+    self._table = None
+    if image_ids.shape[0] and image_ids.min() >= 0 and (
+        image_ids.max() < 16 * image_ids.shape[0] + 1024):
+      self._table = np.full([image_ids.max() + 1], -1, np.int64)
+      self._table[image_ids] = np.arange(image_ids.shape[0])
+    else:
+      self._order = np.argsort(image_ids)
+      self._sorted_ids = image_ids[self._order]
+
+  @classmethod
+  def open(cls, json_path, index_dir=None, chunk_size=1 << 20):
+    """Opens the index of a json file, building it if it is missing or
+    older than the file."""
+    index_dir = index_dir or json_path + '.index'
+    meta_path = os.path.join(index_dir, META)
+    if os.path.exists(meta_path):
+      with open(meta_path, 'r') as file:
+        meta = json.load(file)
+      if all(meta.get(key) == value
+             for key, value in _source_stats(json_path).items()):
+        return cls(index_dir)
+    build_index(json_path, index_dir, chunk_size=chunk_size)
+    return cls(index_dir)
+
+  def __getstate__(self):
+    return {'index_dir': self._index_dir}
+
+  def __setstate__(self, state):
+    self.__init__(state['index_dir'])
+
+  def __len__(self):
+    return self._meta['num_images']
+
+  def __contains__(self, image_id):
+    return self._row(image_id) >= 0
+
+  @property
+  def image_ids(self):
+    return self._arrays['image_ids']
+
+  @property
+  def categories(self):
+    return self._meta['categories']
+
+  def _row(self, image_id):
+    if self._table is not None:
+      if 0 <= image_id < self._table.shape[0]:
+        return int(self._table[image_id])
+      return -1
+    i = np.searchsorted(self._sorted_ids, image_id)
+    if i < self._sorted_ids.shape[0] and self._sorted_ids[i] == image_id:
+      return int(self._order[i])
+    return -1
+
+  def _rows(self, image_id):
+    row = self._row(image_id)
+    if row < 0:
+      raise KeyError(f'image {image_id} is not in {self._meta["source"]}')
+    starts = self._arrays['image_starts']
+    return row, slice(int(starts[row]), int(starts[row + 1]))
+
+  def _read(self, offset, length):
+    if self._file is None:
+      self._file = open(self._meta['source'], 'rb')
+    self._file.seek(int(offset))
+    return json.loads(self._file.read(int(length)))
+
+  def image(self, image_id):
+    """The image entry of the json file."""
+    row, _ = self._rows(image_id)
+    return self._read(self._arrays['image_offsets'][row],
+                      self._arrays['image_lengths'][row])
+
+  def image_size(self, image_id):
+    row, _ = self._rows(image_id)
+    return int(self._arrays['heights'][row]), int(self._arrays['widths'][row])
+
+  def boxes(self, image_id):
+    """float32 [N, 4] boxes of an image as [x, y, width, height] in pixels."""
+    return self._arrays['boxes'][self._rows(image_id)[1]]
+
+  def classes(self, image_id):
+    return self._arrays['classes'][self._rows(image_id)[1]]
+
+  def is_crowd(self, image_id):
+    return self._arrays['is_crowd'][self._rows(image_id)[1]]
+
+  def areas(self, image_id):
+    return self._arrays['areas'][self._rows(image_id)[1]]
+
+  def annotations(self, image_id):
+    """The full annotations of an image, read from the json file."""
+    rows = self._rows(image_id)[1]
+    spans = []
+    for span in zip(self._arrays['offsets'][rows],
+                    self._arrays['lengths'][rows]):
+      span = (int(span[0]), int(span[1]))
+      # the segments of a panoptic annotation follow each other and share
+      # its span
+      if not spans or spans[-1] != span:
+        spans.append(span)
+    return [self._read(offset, length) for offset, length in spans]
+
+  def normalized_sizes(self):
+    """float32 [A, 2] width and height of every box over its image size."""
+    rows = self._arrays['annotation_rows']
+    size = np.stack(
+        [self._arrays['widths'][rows], self._arrays['heights'][rows]], axis=-1)
+    return (self._arrays['boxes'][:, 2:] / np.maximum(size, 1)).astype(
+        np.float32)
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
+      self._file = None
@@ -0,0 +1,164 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for annotation_index."""
+
+import json
+import os
+import pickle
+import time
+
+from absl.testing import parameterized
+import tensorflow as tf
+
+from official.vision.beta.data import annotation_index
+
+IMAGES = [
+    {'id': 7, 'file_name': 'café.jpg', 'height': 100, 'width': 200},
+    {'id': 3, 'file_name': 'b.jpg', 'height': 50, 'width': 50},
+    {'id': 5, 'file_name': 'c.jpg', 'height': 10, 'width': 20},
+]
+ANNOTATIONS = [
+    {'id': 1, 'image_id': 3, 'bbox': [1, 2, 3, 4], 'category_id': 2,
+     'iscrowd': 0, 'area': 12.0, 'segmentation': [[1, 2, 4, 2, 4, 6]]},
+    {'id': 2, 'image_id': 7, 'bbox': [10, 20, 100, 50], 'category_id': 1,
+     'iscrowd': 1, 'area': 5000.0,
+     'segmentation': {'size': [100, 200], 'counts': [5, 10, 19985]}},
+    {'id': 3, 'image_id': 42, 'bbox': [0, 0, 1, 1], 'category_id': 1,
+     'iscrowd': 0, 'area': 1.0, 'segmentation': []},
+    {'id': 4, 'image_id': 3, 'bbox': [0.5, 0.5, 25, 25], 'category_id': 9,
+     'iscrowd': 0, 'area': 625.0, 'segmentation': [[0, 0, 25, 0, 25, 25]]},
+]
+
+
+class AnnotationIndexTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _write(self, content, indent=None):
+    path = os.path.join(self.create_tempdir().full_path, 'annotations.json')
+    with open(path, 'w', encoding='utf-8') as file:
+      json.dump(content, file, indent=indent, ensure_ascii=False)
+    return path
+
+  @parameterized.parameters((1, None), (7, 2), (1 << 20, None))
+  def test_stream(self, chunk_size, indent):
+    content = {'info': {'year': 2017}, 'images': IMAGES,
+               'annotations': ANNOTATIONS, 'categories': []}
+    path = self._write(content, indent=indent)
+    with open(path, 'rb') as file:
+      data = file.read()
+
+    streamed = {'images': [], 'annotations': []}
+    for key, value, offset, length in annotation_index.iter_json_arrays(
+        path, ('images', 'annotations'), chunk_size=chunk_size):
+      if key in streamed:
+        streamed[key].append(value)
+        self.assertEqual(json.loads(data[offset:offset + length]), value)
+      else:
+        self.assertEqual(value, content[key])
+    self.assertEqual(streamed['images'], IMAGES)
+    self.assertEqual(streamed['annotations'], ANNOTATIONS)
+
+  @parameterized.parameters(1, 2, 3, 5)
+  def test_stream_numbers(self, chunk_size):
+    # top level numbers, cut by the chunks after their '.', 'e' or sign
+    content = {'scores': [12.75, 1e5, -3.25e-2, 7, 0.5], 'total': 2017.5}
+    path = self._write(content)
+
+    streamed = {'scores': []}
+    for key, value, _, _ in annotation_index.iter_json_arrays(
+        path, ('scores',), chunk_size=chunk_size):
+      if key in streamed:
+        streamed[key].append(value)
+      else:
+        self.assertEqual(value, content[key])
+    self.assertEqual(streamed['scores'], content['scores'])
+
+  @parameterized.parameters(3, 1 << 20)
+  def test_lookup(self, chunk_size):
+    path = self._write({'images': IMAGES, 'annotations': ANNOTATIONS,
+                        'categories': [{'id': 1, 'name': 'person'}]})
+    index = annotation_index.AnnotationIndex.open(path, chunk_size=chunk_size)
+
+    self.assertLen(index, 3)
+    self.assertEqual(index.categories, [{'id': 1, 'name': 'person'}])
+    self.assertIn(7, index)
+    self.assertNotIn(42, index)
+    self.assertNotIn(100000, index)
+    self.assertEqual(index.image(7), IMAGES[0])
+    self.assertEqual(index.image_size(7), (100, 200))
+
+    self.assertAllClose(index.boxes(3), [[1, 2, 3, 4], [0.5, 0.5, 25, 25]])
+    self.assertAllEqual(index.classes(3), [2, 9])
+    self.assertAllEqual(index.is_crowd(7), [True])
+    self.assertAllClose(index.areas(7), [5000.0])
+    self.assertEqual(index.boxes(5).shape, (0, 4))
+    self.assertEqual(index.annotations(3), [ANNOTATIONS[0], ANNOTATIONS[3]])
+    self.assertEqual(index.annotations(5), [])
+    with self.assertRaises(KeyError):
+      index.boxes(42)
+
+    # the annotation of the unknown image 42 is dropped
+    self.assertAllClose(index.normalized_sizes(),
+                        [[0.5, 0.5], [3 / 50, 4 / 50], [0.5, 0.5]])
+    index.close()
+
+  def test_sparse_ids(self):
+    images = [dict(image, id=image['id'] * 10**9) for image in IMAGES]
+    annotations = [
+        dict(annotation, image_id=annotation['image_id'] * 10**9)
+        for annotation in ANNOTATIONS
+    ]
+    path = self._write({'images': images, 'annotations': annotations})
+    index = annotation_index.AnnotationIndex.open(path)
+    self.assertIsNone(index._table)
+    self.assertAllEqual(index.classes(3 * 10**9), [2, 9])
+    self.assertNotIn(4 * 10**9, index)
+
+  def test_panoptic(self):
+    panoptic = [{
+        'image_id': 3,
+        'file_name': '3.png',
+        'segments_info': [
+            {'id': 11, 'category_id': 1, 'bbox': [0, 0, 5, 5], 'iscrowd': 0,
+             'area': 25},
+            {'id': 12, 'category_id': 184, 'bbox': [5, 5, 5, 5],
+             'iscrowd': 0, 'area': 25},
+        ]
+    }]
+    path = self._write({'images': IMAGES, 'annotations': panoptic})
+    index = annotation_index.AnnotationIndex.open(path)
+    self.assertAllEqual(index.classes(3), [1, 184])
+    self.assertEqual(index.annotations(3), panoptic)
+
+  def test_rebuild_and_pickle(self):
+    path = self._write({'images': IMAGES, 'annotations': ANNOTATIONS})
+    index = annotation_index.AnnotationIndex.open(path)
+    self.assertAllEqual(index.classes(7), [1])
+
+    index = pickle.loads(pickle.dumps(index))
+    self.assertAllEqual(index.classes(7), [1])
+    index.close()
+
+    annotations = [dict(ANNOTATIONS[1], category_id=4)]
+    with open(path, 'w') as file:
+      json.dump({'images': IMAGES, 'annotations': annotations}, file)
+    # the modification time alone can be too coarse to tell the files apart
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    index = annotation_index.AnnotationIndex.open(path)
+    self.assertAllEqual(index.classes(7), [4])
+    self.assertEqual(index.boxes(3).shape, (0, 4))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -79,6 +79,18 @@ def register_backbone_builder(key: str):
   return registry.register(_REGISTERED_BACKBONE_CLS, key)
 
 
+def register_backbone_builder_module(key: str, module_name: str):
+  """Registers backbone `key` to be imported from `module_name` on lookup.
+
+  The module has to register `key` with `register_backbone_builder`.
+
+  Args:
+    key: the key to look up the builder.
+    module_name: the module that registers the builder.
+  """
+  registry.register_lazy(_REGISTERED_BACKBONE_CLS, key, module_name)
+
+
 def build_backbone(input_specs: tf.keras.layers.InputSpec,
                    model_config,
                    l2_regularizer: tf.keras.regularizers.Regularizer = None):
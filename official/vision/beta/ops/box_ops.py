@@ -50,7 +50,7 @@ def yxyx_to_xywh(boxes):
   return new_boxes
 
 
-def jitter_boxes(boxes, noise_scale=0.025):
+def jitter_boxes(boxes, noise_scale=0.025, seed=None):
   """Jitter the box coordinates by some noise distribution.
 
   Args:
@@ -59,6 +59,8 @@ def jitter_boxes(boxes, noise_scale=0.025):
     noise_scale: a python float which specifies the magnitude of noise. The rule
       of thumb is to set this between (0, 0.1]. The default value is found to
       mimic the noisy detections best empirically.
+    seed: an optional `int` op seed of the noise, or a [2] integer tensor to
+      draw it with `tf.random.stateless_normal`.
 
   Returns:
     jittered_boxes: a tensor whose shape is the same as `boxes` representing
@@ -72,7 +74,12 @@ def jitter_boxes(boxes, noise_scale=0.025):
         'boxes.shape[-1] is {:d}, but must be 4.'.format(boxes.shape[-1]))
 
   with tf.name_scope('jitter_boxes'):
-    bbox_jitters = tf.random.normal(tf.shape(boxes), stddev=noise_scale)
+    if seed is None or isinstance(seed, int):
+      bbox_jitters = tf.random.normal(
+          tf.shape(boxes), stddev=noise_scale, seed=seed)
+    else:
+      bbox_jitters = tf.random.stateless_normal(
+          tf.shape(boxes), seed=seed, stddev=noise_scale)
     ymin = boxes[..., 0:1]
     xmin = boxes[..., 1:2]
     ymax = boxes[..., 2:3]
@@ -16,9 +16,12 @@
 
 import math
 # Import libraries
-import cv2
 import numpy as np
 
+from official.utils.misc import lazy_loader
+
+cv2 = lazy_loader.LazyModule('cv2')
+
 
 def paste_instance_masks(masks,
                          detected_boxes,
@@ -0,0 +1,63 @@
+# Copyright 2021 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the lazy registrations of the vision package."""
+import importlib
+
+import tensorflow as tf
+
+from official.core import config_definitions as cfg
+from official.core import exp_factory
+from official.core import task_factory
+from official.vision import beta
+
+
+def _registered_by(collection, module_name):
+  """The entries of `collection` that `module_name` registered itself."""
+  return {
+      key: value
+      for key, value in collection.items()
+      if getattr(value, '__module__', None) == module_name
+  }
+
+
+class RegistrationsTest(tf.test.TestCase):
+
+  def test_experiments(self):
+    for module, names in beta._EXPERIMENTS.items():
+      for name in names:
+        self.assertIsInstance(
+            exp_factory.get_exp_config(name), cfg.ExperimentConfig)
+      # An experiment the module registers but the list misses would only be
+      # found after the module was imported for another one.
+      module_name = f'{beta.__name__}.configs.{module}'
+      importlib.import_module(module_name)
+      self.assertCountEqual(
+          _registered_by(exp_factory._REGISTERED_CONFIGS, module_name), names)
+
+  def test_tasks(self):
+    for module, config_cls_name in beta._TASKS.items():
+      config_module = importlib.import_module(
+          f'{beta.__name__}.configs.{module}')
+      config_cls = getattr(config_module, config_cls_name)
+      self.assertTrue(callable(task_factory.get_task_cls(config_cls)))
+
+      module_name = f'{beta.__name__}.tasks.{module}'
+      registered = _registered_by(task_factory._REGISTERED_TASK_CLS,
+                                  module_name)
+      self.assertCountEqual(registered, [config_cls])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -82,9 +82,13 @@ class Controller:
       # Train related
       steps_per_loop: Optional[int] = None,
       checkpoint_manager: Optional[tf.train.CheckpointManager] = None,
+      enable_async_checkpointing: bool = False,
+      max_in_flight_checkpoints: int = 1,
       # Summary related
       summary_interval: Optional[int] = None,
       summary_dir: Optional[str] = None,
+      enable_async_summaries: bool = False,
+      summary_flush_interval: float = 30.0,
       # Evaluation related
       eval_summary_dir: Optional[str] = None):
     """Initializes a `Controller` instance.
@@ -117,6 +121,13 @@ class Controller:
         the model will be restored from the most recent checkpoint inside this
         `__init__` method. If not provided, the `Controller` will not
         automatically save to or restore from checkpoints.
+      enable_async_checkpointing: Whether checkpoints are saved in a background
+        thread (see `orbit.utils.AsyncCheckpointSaver`). Training then only
+        pauses while the variables are copied to host memory. `train` and
+        `train_and_evaluate` wait for the pending checkpoints before returning.
+      max_in_flight_checkpoints: The number of asynchronous checkpoints that
+        may be pending before a save waits for the oldest one. Only used if
+        `enable_async_checkpointing` is `True`.
       summary_interval: Step interval for training summaries. Note that this
         argument only applies to `tf.summary` calls inside the `trainer.train`
         function. Summaries written by the `Controller` (specifically
@@ -126,6 +137,14 @@ class Controller:
       summary_dir: The directory to write summaries to. To use the same
         directory as for checkpointing, pass `checkpoint_manager.directory`. If
         `None`, no training summaries will be written.
+      enable_async_summaries: Whether the host transfer, logging and summary
+        writing of loop outputs run in a background thread (see
+        `orbit.utils.BackgroundSummaryWriter`), so the next training loop can
+        start right away. `train`, `evaluate` and `train_and_evaluate` wait for
+        the pending summaries before returning.
+      summary_flush_interval: The maximum number of seconds between summary
+        flushes while asynchronous summaries are pending. Only used if
+        `enable_async_summaries` is `True`.
       eval_summary_dir: The directory to write eval summaries to. If `None`, it
         will be set to `summary_dir`. If both `summary_dir` and
         `eval_summary_dir` are `None`, no eval summaries will be written.
@@ -165,6 +184,10 @@ class Controller:
 
     self.global_step = global_step
     self.checkpoint_manager = checkpoint_manager
+    self.async_checkpoint_saver = None
+    if checkpoint_manager is not None and enable_async_checkpointing:
+      self.async_checkpoint_saver = utils.AsyncCheckpointSaver(
+          checkpoint_manager, max_in_flight=max_in_flight_checkpoints)
 
     if self.trainer is not None:
       self.step_timer = None
@@ -183,6 +206,17 @@ class Controller:
         self.eval_summary_manager = utils.SummaryManager(
             eval_summary_dir, tf.summary.scalar, global_step=self.global_step)
 
+    self.background_summary_writer = None
+    if enable_async_summaries:
+      summary_managers = []
+      if self.trainer is not None:
+        summary_managers.append(self.summary_manager)
+      if (self.evaluator is not None and
+          self.eval_summary_manager not in summary_managers):
+        summary_managers.append(self.eval_summary_manager)
+      self.background_summary_writer = utils.BackgroundSummaryWriter(
+          summary_managers, flush_interval=summary_flush_interval)
+
     tf.summary.experimental.set_step(self.global_step)
 
     # Restores the model if needed.
@@ -218,6 +252,8 @@ class Controller:
 
     if checkpoint_at_completion:
       self._maybe_save_checkpoint(check_interval=False)
+      self._sync_checkpoints()
+      self._sync_summaries()
 
   def evaluate(self, steps: int = -1) -> Optional[runner.Output]:
     """Runs evaluation for the given number of steps.
@@ -262,8 +298,15 @@ class Controller:
          f"eval time: {elapsed: 6.1f} | "
          f"output: {_format_output(eval_output)}")
 
-    self.eval_summary_manager.write_summaries(eval_output)
-    self.eval_summary_manager.flush()
+    # The output is returned as NumPy, so only the writing is moved to the
+    # background, and it is waited for since evaluations are rare.
+    if self.background_summary_writer is not None:
+      self.background_summary_writer.submit(
+          self.eval_summary_manager.write_summaries, eval_output, current_step)
+      self._sync_summaries()
+    else:
+      self.eval_summary_manager.write_summaries(eval_output)
+      self.eval_summary_manager.flush()
 
     return eval_output
 
@@ -304,6 +347,8 @@ class Controller:
       self.evaluate(steps=eval_steps)
       current_step = self.global_step.numpy()
     self._maybe_save_checkpoint(check_interval=False)
+    self._sync_checkpoints()
+    self._sync_summaries()
 
   def evaluate_continuously(self,
                             steps: int = -1,
@@ -352,6 +397,7 @@ class Controller:
       restore occurred.
     """
     self._require("checkpoint_manager", for_method="restore_checkpoint")
+    self._sync_checkpoints()
 
     with self.strategy.scope():
       # Checkpoint restoring should be inside scope (b/139450638).
@@ -381,6 +427,24 @@ class Controller:
     """
     self._require("checkpoint_manager", for_method="save_checkpoint")
     self._maybe_save_checkpoint(check_interval=False)
+    self._sync_checkpoints()
+
+  def close(self):
+    """Waits for the background work of the controller and stops it.
+
+    Writes the pending checkpoints and summaries, and stops the threads of
+    asynchronous checkpointing and summaries. Checkpoints and summaries of
+    later calls are written synchronously.
+    """
+    try:
+      if self.async_checkpoint_saver is not None:
+        saver, self.async_checkpoint_saver = self.async_checkpoint_saver, None
+        saver.close()
+    finally:
+      if self.background_summary_writer is not None:
+        writer = self.background_summary_writer
+        self.background_summary_writer = None
+        writer.close()
 
   def _train_n_steps(self, num_steps: int):
     """Runs training for `num_steps` steps.
@@ -400,6 +464,7 @@ class Controller:
       self.step_timer = StepTimer(self.global_step)
     current_step = self.global_step.numpy()
 
+    loop_start = time.time()
     with self.summary_manager.summary_writer().as_default():
       should_record = False  # Allows static optimization in no-summary cases.
       if self.summary_interval:
@@ -408,7 +473,6 @@ class Controller:
       with tf.summary.record_if(should_record):
         num_steps_tensor = tf.convert_to_tensor(num_steps, dtype=tf.int32)
         train_output = self.trainer.train(num_steps_tensor)
-    train_output = tf.nest.map_structure(utils.get_value, train_output or {})
 
     # Verify that global_step was updated properly, then update current_step.
     expected_step = current_step + num_steps
@@ -419,16 +483,51 @@ class Controller:
           f"to be {expected_step}, but it was {self.global_step.numpy()}.")
       logging.warning(message)
       return
+    # Reading the global step waits for the loop to finish on the device.
+    loop_time = time.time() - loop_start
 
     current_step = expected_step
     steps_per_second = self.step_timer.steps_per_second()
+    if self.background_summary_writer is not None:
+      # Variables are read now, the outputs may be updated by the next loop.
+      train_output = tf.nest.map_structure(
+          lambda x: x.read_value() if isinstance(x, tf.Variable) else x,
+          train_output)
+      self.background_summary_writer.submit(self._write_train_output,
+                                            train_output, current_step,
+                                            steps_per_second, loop_time)
+    else:
+      self._write_train_output(train_output, current_step, steps_per_second,
+                               loop_time)
+      self.summary_manager.flush()
+
+  def _write_train_output(self, train_output, current_step: int,
+                          steps_per_second: float, loop_time: float):
+    """Transfers, logs and summarizes the output of a training loop.
+
+    Besides the output, the seconds of the loop and of this host side work
+    are written under `loop_time/`.
+
+    Args:
+      train_output: The output of `self.trainer.train()`.
+      current_step: The global step at the end of the loop.
+      steps_per_second: The training speed of the loop.
+      loop_time: The seconds `self.trainer.train()` ran for.
+    """
+    start = time.time()
+    train_output = tf.nest.map_structure(utils.get_value, train_output or {})
     _log(f"train | step: {current_step: 6d} | "
          f"steps/sec: {steps_per_second: 6.1f} | "
          f"output: {_format_output(train_output)}")
 
     train_output["steps_per_second"] = steps_per_second
-    self.summary_manager.write_summaries(train_output)
-    self.summary_manager.flush()
+    self.summary_manager.write_summaries(train_output, step=current_step)
+    self.summary_manager.write_summaries(
+        {
+            "loop_time/device_seconds": loop_time,
+            "loop_time/host_seconds": time.time() - start
+        },
+        step=current_step)
 
   def _maybe_save_checkpoint(self, check_interval: bool = True):
     """Conditionally saves a checkpoint.
@@ -447,6 +546,16 @@ class Controller:
       A boolean indicating whether a checkpoint was saved.
     """
     if self.checkpoint_manager and self.checkpoint_manager.checkpoint_interval:
+      if self.async_checkpoint_saver is not None:
+        ckpt_path = self.async_checkpoint_saver.save(
+            checkpoint_number=self.global_step.numpy(),
+            check_interval=check_interval)
+        if ckpt_path is not None:
+          stall = self.async_checkpoint_saver.stall_times[-1]
+          _log(f"saving checkpoint to {ckpt_path} in the background, "
+               f"training paused for {stall:.3f} s.")
+          return True
+        return False
       ckpt_path = self.checkpoint_manager.save(
           checkpoint_number=self.global_step.numpy(),
           check_interval=check_interval)
@@ -455,6 +564,16 @@ class Controller:
         return True
     return False
 
+  def _sync_summaries(self):
+    """Waits for the summaries that are being written in the background."""
+    if self.background_summary_writer is not None:
+      self.background_summary_writer.sync()
+
+  def _sync_checkpoints(self):
+    """Waits for the checkpoints that are being saved in the background."""
+    if self.async_checkpoint_saver is not None:
+      self.async_checkpoint_saver.sync()
+
   def _require(self, attribute, for_method):
     """Utility method to raise an error if the given `attribute` is not set."""
     if getattr(self, attribute, None) is None:
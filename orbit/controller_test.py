@@ -363,6 +363,53 @@ class ControllerTest(tf.test.TestCase, parameterized.TestCase):
     restored_path = test_controller.restore_checkpoint()
     self.assertEqual(restored_path, checkpoint_manager.checkpoints[-1])
 
+  def test_async_checkpointing(self):
+    test_runner = TestRunner()
+    checkpoint = tf.train.Checkpoint(
+        model=test_runner.model, optimizer=test_runner.optimizer)
+    checkpoint_manager = tf.train.CheckpointManager(
+        checkpoint,
+        self.model_dir,
+        max_to_keep=3,
+        step_counter=test_runner.global_step,
+        checkpoint_interval=4)
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        global_step=test_runner.global_step,
+        checkpoint_manager=checkpoint_manager,
+        enable_async_checkpointing=True,
+        steps_per_loop=2)
+    test_controller.train(steps=20)
+
+    # Saved at steps 2, 6, 10, 14 and 18, and at completion.
+    saver = test_controller.async_checkpoint_saver
+    self.assertLen(saver.stall_times, 6)
+    for stall in saver.stall_times:
+      logging.info("training paused for %.4f s per checkpoint", stall)
+    expected = [os.path.join(self.model_dir, f"ckpt-{step}")
+                for step in (14, 18, 20)]
+    self.assertEqual(saver.checkpoints, expected)
+    self.assertEqual(tf.train.latest_checkpoint(self.model_dir), expected[-1])
+    self.assertLen(tf.io.gfile.glob(os.path.join(self.model_dir,
+                                                 "ckpt-*.index")), 3)
+    # The wrapped manager sees the checkpoints written in the background.
+    self.assertEqual(checkpoint_manager.checkpoints, expected)
+    self.assertEqual(test_controller.restore_checkpoint(), expected[-1])
+
+    restored_runner = TestRunner()
+    restored = tf.train.Checkpoint(
+        model=restored_runner.model, optimizer=restored_runner.optimizer)
+    restored.restore(expected[-1]).assert_existing_objects_matched()
+    self.assertEqual(restored_runner.global_step, 20)
+    for variable, restored_variable in zip(test_runner.model.variables,
+                                           restored_runner.model.variables):
+      self.assertAllEqual(variable, restored_variable)
+
+    staging_dir = saver._staging_dir  # pylint: disable=protected-access
+    test_controller.close()
+    self.assertIsNone(test_controller.async_checkpoint_saver)
+    self.assertFalse(os.path.exists(staging_dir))
+
   @parameterized.named_parameters(("return_numpy", True),
                                   ("return_tensor", False))
   def test_train_and_evaluate(self, return_numpy):
@@ -579,6 +626,38 @@ class ControllerTest(tf.test.TestCase, parameterized.TestCase):
         summaries_with_matching_keyword(
             "eval_loss", os.path.join(self.model_dir, "summaries")))
 
+  def test_async_summaries(self):
+    test_runner = TestRunner()
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        evaluator=test_runner,
+        global_step=test_runner.global_step,
+        steps_per_loop=2,
+        summary_dir=os.path.join(self.model_dir, "summaries/train"),
+        eval_summary_dir=os.path.join(self.model_dir, "summaries/eval"),
+        enable_async_summaries=True,
+        summary_flush_interval=0.0)
+    test_controller.train_and_evaluate(
+        train_steps=10, eval_steps=2, eval_interval=6)
+    self.assertEqual(test_runner.global_step, 10)
+
+    # Every loop is written at the step it ended at, not the step the
+    # background thread got to it.
+    train_dir = os.path.join(self.model_dir, "summaries/train")
+    steps = {}
+    for path in tf.io.gfile.glob(os.path.join(train_dir, "events*")):
+      for event in tf.compat.v1.train.summary_iterator(path):
+        for value in event.summary.value:
+          steps.setdefault(value.tag, []).append(event.step)
+    self.assertEqual(sorted(steps["loss"]), [2, 4, 6, 8, 10])
+    self.assertEqual(sorted(steps["loop_time/device_seconds"]),
+                     [2, 4, 6, 8, 10])
+    self.assertEqual(sorted(steps["loop_time/host_seconds"]), [2, 4, 6, 8, 10])
+    self.assertNotEmpty(
+        summaries_with_matching_keyword(
+            "eval_loss", os.path.join(self.model_dir, "summaries/eval")))
+    test_controller.close()
+
   def test_early_stop_on_eval_loss(self):
     test_runner = TestRunner()
 
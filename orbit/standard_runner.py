@@ -34,6 +34,7 @@ and `AbstractEvaluator` subclasses in these cases.
 """
 
 import abc
+import threading
 
 from typing import Any, Optional
 
@@ -68,19 +69,39 @@ class StandardTrainerOptions:
   use_tpu_summary_optimization: bool = False
 
 
+_NUM_STEPS_SPEC = tf.TensorSpec([], tf.int32)
+
+
+def _create_trace_fn(function, *specs):
+  """Returns a function of the iterator that traces `function` ahead."""
+
+  def trace_fn(iterator):
+    return function.get_concrete_function(iterator, *specs)
+
+  return trace_fn
+
+
 def _create_train_loop_fn(train_step_fn, options: StandardTrainerOptions):
-  """Creates a training loop from the given step function and options."""
+  """Creates a training loop from the given step function and options.
+
+  Returns:
+    The loop function, and a function of the iterator that traces the
+    `tf.function` run by the loop, or `None` if it cannot be traced ahead.
+  """
+  trace_fn = None
   if options.use_tf_while_loop:
     loop_fn = loop_fns.create_tf_while_loop_fn(train_step_fn)
     if options.use_tpu_summary_optimization:
       loop_fn = loop_fns.LoopFnWithSummaries(loop_fn)
     else:
       loop_fn = tf.function(loop_fn)
+      trace_fn = _create_trace_fn(loop_fn, _NUM_STEPS_SPEC)
   else:
     if options.use_tf_function:
       train_step_fn = tf.function(train_step_fn)
+      trace_fn = _create_trace_fn(train_step_fn)
     loop_fn = loop_fns.create_loop_fn(train_step_fn)
-  return loop_fn
+  return loop_fn, trace_fn
 
 
 class StandardTrainer(runner.AbstractTrainer, metaclass=abc.ABCMeta):
@@ -118,6 +139,8 @@ class StandardTrainer(runner.AbstractTrainer, metaclass=abc.ABCMeta):
     self._train_dataset = train_dataset
     self._train_iter = None
     self._train_loop_fn = None
+    self._train_trace_fn = None
+    self._train_loop_lock = threading.Lock()
 
   def train(self, num_steps: tf.Tensor) -> Optional[runner.Output]:
     """Implements `num_steps` steps of training.
@@ -130,16 +153,36 @@ class StandardTrainer(runner.AbstractTrainer, metaclass=abc.ABCMeta):
       The output of `train_loop_end`.
     """
     self.train_loop_begin()
+    self._maybe_create_train_loop()
+    self._train_loop_fn(self._train_iter, num_steps)
+    return self.train_loop_end()
 
-    if self._train_loop_fn is None:
-      self._train_loop_fn = _create_train_loop_fn(
-          self.train_step, options=self._train_options)
+  def trace_train_loop(self) -> bool:
+    """Traces the training loop, so the first call to `train` does not.
 
-    if self._train_iter is None:
-      self._train_iter = tf.nest.map_structure(iter, self.train_dataset)
+    This may run in a background thread, as long as the thread enters the
+    scope of the distribution strategy. A `train` call that starts while the
+    loop is traced waits for the trace and reuses it.
 
-    self._train_loop_fn(self._train_iter, num_steps)
-    return self.train_loop_end()
+    Returns:
+      Whether anything was traced, which needs `options.use_tf_function` (and
+      no `options.use_tpu_summary_optimization`).
+    """
+    self._maybe_create_train_loop()
+    if self._train_trace_fn is None:
+      return False
+    self._train_trace_fn(self._train_iter)
+    return True
+
+  def _maybe_create_train_loop(self):
+    # A trace thread and the first `train` call may get here together.
+    with self._train_loop_lock:
+      if self._train_loop_fn is None:
+        self._train_loop_fn, self._train_trace_fn = _create_train_loop_fn(
+            self.train_step, options=self._train_options)
+
+      if self._train_iter is None:
+        self._train_iter = tf.nest.map_structure(iter, self.train_dataset)
 
   def train_loop_begin(self):
     """Called once at the beginning of the training loop.
@@ -224,7 +267,13 @@ class StandardEvaluatorOptions:
 
 def _create_eval_loop_fn(eval_step_fn, has_state: bool,
                          options: StandardEvaluatorOptions):
-  """Create evaluation loop function."""
+  """Create evaluation loop function.
+
+  Returns:
+    The loop function, and a function of the iterator that traces the
+    `tf.function` run by the loop, or `None` if it cannot be traced ahead.
+  """
+  trace_fn = None
   if options.use_tf_while_loop:
     # TODO(b/176126742): tf.while_loop doesn't support `None` as a loop input
     # even when it is not used inside the loop. To workaround this limitation,
@@ -234,11 +283,15 @@ def _create_eval_loop_fn(eval_step_fn, has_state: bool,
     else:
       loop_fn = loop_fns.create_tf_while_loop_fn(eval_step_fn)
     loop_fn = tf.function(loop_fn)
+    # The state of a stateful loop has no spec to trace it with.
+    if not has_state:
+      trace_fn = _create_trace_fn(loop_fn, _NUM_STEPS_SPEC)
   else:
     if options.use_tf_function:
       eval_step_fn = tf.function(eval_step_fn)
+      trace_fn = _create_trace_fn(eval_step_fn)
     loop_fn = loop_fns.create_loop_fn(eval_step_fn)
-  return loop_fn
+  return loop_fn, trace_fn
 
 
 class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
@@ -278,6 +331,8 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
     self._eval_options = options
     self._eval_dataset = eval_dataset
     self._eval_loop_fn = None
+    self._eval_trace_fn = None
+    self._eval_loop_lock = threading.Lock()
 
   def evaluate(self, num_steps: tf.Tensor) -> Optional[runner.Output]:
     """Implements `num_steps` steps of evaluation.
@@ -301,9 +356,7 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
     outputs = self.eval_begin()  # pylint: disable=assignment-from-no-return
 
     has_state = outputs is not None
-    if self._eval_loop_fn is None:
-      self._eval_loop_fn = _create_eval_loop_fn(
-          self.eval_step, has_state=has_state, options=self._eval_options)
+    self._maybe_create_eval_loop(has_state)
 
     eval_iter = tf.nest.map_structure(iter, self.eval_dataset)
     if self._eval_options.use_tf_while_loop and not has_state:
@@ -317,6 +370,33 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
     else:
       return self.eval_end(outputs)
 
+  def trace_eval_loop(self, has_state: bool = False) -> bool:
+    """Traces the evaluation loop, so the first call to `evaluate` does not.
+
+    This may run in a background thread, as long as the thread enters the
+    scope of the distribution strategy. An `evaluate` call that starts while
+    the loop is traced waits for the trace and reuses it.
+
+    Args:
+      has_state: Whether `eval_begin` returns a state. It selects the loop of
+        `options.use_tf_while_loop`, so it has to match the evaluations.
+
+    Returns:
+      Whether anything was traced, which needs `options.use_tf_function` (and
+      no state when `options.use_tf_while_loop` is set).
+    """
+    self._maybe_create_eval_loop(has_state)
+    if self._eval_trace_fn is None:
+      return False
+    self._eval_trace_fn(tf.nest.map_structure(iter, self.eval_dataset))
+    return True
+
+  def _maybe_create_eval_loop(self, has_state: bool):
+    with self._eval_loop_lock:
+      if self._eval_loop_fn is None:
+        self._eval_loop_fn, self._eval_trace_fn = _create_eval_loop_fn(
+            self.eval_step, has_state=has_state, options=self._eval_options)
+
   def eval_begin(self) -> Any:
     """Called once at the beginning of the evaluation.
 
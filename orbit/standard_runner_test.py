@@ -14,6 +14,8 @@
 
 """Tests for orbit.standard_runner."""
 
+import threading
+
 from absl.testing import parameterized
 
 from orbit import standard_runner
@@ -136,6 +138,62 @@ class StandardRunnerTest(parameterized.TestCase):
     evaluator = TestEvaluatorWithOutputsAggregation(options)
     self.assertEqual(evaluator.evaluate(tf.constant(10)), 45)
 
+  @parameterized.named_parameters(("use_tf_while_loop", True), ("", False))
+  def test_trace_train_loop(self, use_tf_while_loop):
+    options = standard_runner.StandardTrainerOptions(
+        use_tf_while_loop=use_tf_while_loop)
+    trainer = TestTrainer(options)
+    traces = []
+    train_step = trainer.train_step
+
+    def counted_train_step(iterator):
+      traces.append(iterator)
+      train_step(iterator)
+
+    trainer.train_step = counted_train_step
+    self.assertTrue(trainer.trace_train_loop())
+    self.assertLen(traces, 1)
+    self.assertEqual(trainer.train(tf.constant(10)), 10)
+    self.assertLen(traces, 1)
+
+  @parameterized.named_parameters(("use_tf_while_loop", True), ("", False))
+  def test_trace_eval_loop(self, use_tf_while_loop):
+    options = standard_runner.StandardEvaluatorOptions(
+        use_tf_while_loop=use_tf_while_loop)
+    evaluator = TestEvaluator(options)
+    traces = []
+    eval_step = evaluator.eval_step
+
+    def counted_eval_step(iterator):
+      traces.append(iterator)
+      eval_step(iterator)
+
+    evaluator.eval_step = counted_eval_step
+    self.assertTrue(evaluator.trace_eval_loop())
+    self.assertLen(traces, 1)
+    self.assertEqual(evaluator.evaluate(tf.constant(10)), 10)
+    self.assertLen(traces, 1)
+
+  @parameterized.named_parameters(("use_tf_while_loop", True), ("", False))
+  def test_train_while_tracing(self, use_tf_while_loop):
+    options = standard_runner.StandardTrainerOptions(
+        use_tf_while_loop=use_tf_while_loop)
+    trainer = TestTrainer(options)
+    traces = []
+    train_step = trainer.train_step
+
+    def counted_train_step(iterator):
+      traces.append(iterator)
+      train_step(iterator)
+
+    trainer.train_step = counted_train_step
+    thread = threading.Thread(target=trainer.trace_train_loop)
+    thread.start()
+    # Either call traces the loop, the other one reuses the trace.
+    self.assertEqual(trainer.train(tf.constant(10)), 10)
+    thread.join()
+    self.assertLen(traces, 1)
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -0,0 +1,233 @@
+# Copyright 2021 The Orbit Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Provides a utility class for saving checkpoints in a background thread."""
+
+import collections
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from typing import List, Optional
+
+import tensorflow as tf
+
+
+def _default_staging_root():
+  # /dev/shm is memory backed on linux, so staging never touches a disk.
+  if os.path.isdir("/dev/shm"):
+    return "/dev/shm"
+  return tempfile.gettempdir()
+
+
+class _StagedCheckpoint(tf.train.Checkpoint):
+  """A `tf.train.Checkpoint` whose writes move an already written snapshot.
+
+  `AsyncCheckpointSaver` hands it to a `tf.train.CheckpointManager`, so the
+  manager keeps doing the numbering, the retention and the checkpoint state
+  file, while the tensors come from the snapshot set with `stage`.
+  """
+
+  def __init__(self):
+    super().__init__()
+    self._staged_prefix = None
+
+  def stage(self, staged_prefix):
+    """Sets the snapshot the next write moves."""
+    self._staged_prefix = staged_prefix
+
+  def write(self, file_prefix, options=None):
+    del options  # The snapshot is already written.
+    for path in tf.io.gfile.glob(self._staged_prefix + ".*"):
+      suffix = path[len(self._staged_prefix):]
+      tf.io.gfile.copy(path, file_prefix + suffix, overwrite=True)
+      tf.io.gfile.remove(path)
+    return file_prefix
+
+  def _write(self, file_prefix, options=None, write_done_callback=None):
+    save_path = self.write(file_prefix, options=options)
+    if write_done_callback:
+      write_done_callback(save_path)
+    return save_path
+
+
+class AsyncCheckpointSaver:
+  """Saves the checkpoints of a `tf.train.CheckpointManager` asynchronously.
+
+  A save blocks the caller only while the variables are snapshotted: the
+  checkpoint is written to a staging directory in host memory (`/dev/shm`
+  when it exists). A background thread then moves the snapshot to the
+  manager's directory and updates the checkpoint state file, deleting old
+  checkpoints like `CheckpointManager.save` does. At most `max_in_flight`
+  snapshots are pending at a time; once that many are, `save` waits for the
+  oldest one, which bounds the host memory used by the snapshots.
+
+  Errors of the background thread are raised by the next `save` or `sync`.
+  After every write the `checkpoints` and `latest_checkpoint` of the wrapped
+  manager are updated too, so `restore_or_initialize` and later synchronous
+  saves of the manager see the checkpoints written in the background. Call
+  `close` when done saving, to stop the thread and remove the staging
+  directory.
+  """
+
+  def __init__(self,
+               checkpoint_manager: tf.train.CheckpointManager,
+               max_in_flight: int = 1,
+               staging_dir: Optional[str] = None):
+    """Initializes the `AsyncCheckpointSaver` instance.
+
+    Args:
+      checkpoint_manager: The `tf.train.CheckpointManager` whose checkpoint is
+        saved, and whose directory, interval and retention are used.
+      max_in_flight: The number of snapshots that may be waiting to be written
+        before `save` blocks.
+      staging_dir: The directory the snapshots are written to. If `None`, a
+        temporary directory under `/dev/shm`, or the system temporary
+        directory, is used.
+
+    Raises:
+      ValueError: If `max_in_flight` is not a positive integer.
+    """
+    if max_in_flight < 1:
+      raise ValueError(
+          f"`max_in_flight` ({max_in_flight}) must be a positive integer.")
+    self._checkpoint_manager = checkpoint_manager
+    self._checkpoint = checkpoint_manager.checkpoint
+    self._staging_dir = staging_dir or tempfile.mkdtemp(
+        prefix="orbit_checkpoint_", dir=_default_staging_root())
+    self._owns_staging_dir = staging_dir is None
+
+    # The retention settings are only exposed as private attributes.
+    manager = checkpoint_manager
+    self._checkpoint_name = os.path.basename(
+        getattr(manager, "_prefix", os.path.join(manager.directory, "ckpt")))
+    self._staged = _StagedCheckpoint()
+    self._writer = tf.train.CheckpointManager(
+        self._staged,
+        directory=manager.directory,
+        max_to_keep=getattr(manager, "_max_to_keep", None),
+        keep_checkpoint_every_n_hours=getattr(
+            manager, "_keep_checkpoint_every_n_hours", None),
+        checkpoint_name=self._checkpoint_name)
+
+    self._last_checkpoint_step = None
+    self._slots = threading.BoundedSemaphore(max_in_flight)
+    self._queue = queue.Queue()
+    self._error = None
+    self._stall_times = []
+    self._thread = threading.Thread(
+        target=self._write_loop, name="orbit_checkpoint_writer", daemon=True)
+    self._thread.start()
+
+  @property
+  def checkpoints(self) -> List[str]:
+    """The checkpoints that are written, from oldest to newest."""
+    return self._writer.checkpoints
+
+  @property
+  def latest_checkpoint(self) -> Optional[str]:
+    """The newest checkpoint that is written, or `None`."""
+    return self._writer.latest_checkpoint
+
+  @property
+  def stall_times(self) -> List[float]:
+    """The seconds every `save` blocked its caller, one per checkpoint."""
+    return list(self._stall_times)
+
+  def save(self,
+           checkpoint_number: int,
+           check_interval: bool = True) -> Optional[str]:
+    """Snapshots the checkpoint and schedules writing it.
+
+    Args:
+      checkpoint_number: The number of the checkpoint, usually the global step.
+      check_interval: Whether to skip the save if fewer than the manager's
+        `checkpoint_interval` steps elapsed since the last one.
+
+    Returns:
+      The prefix the checkpoint will be written to, or `None` if it was
+      skipped.
+    """
+    self._raise_error()
+    interval = self._checkpoint_manager.checkpoint_interval
+    if (check_interval and interval and
+        self._last_checkpoint_step is not None and
+        checkpoint_number < self._last_checkpoint_step + interval):
+      return None
+    self._last_checkpoint_step = checkpoint_number
+
+    start = time.time()
+    self._slots.acquire()
+    try:
+      staged_prefix = self._checkpoint.write(
+          os.path.join(self._staging_dir, f"ckpt-{checkpoint_number}"))
+    except BaseException:
+      self._slots.release()
+      raise
+    self._queue.put((staged_prefix, checkpoint_number))
+    self._stall_times.append(time.time() - start)
+    return os.path.join(self._writer.directory,
+                        f"{self._checkpoint_name}-{checkpoint_number}")
+
+  def sync(self):
+    """Waits until every scheduled checkpoint is written."""
+    self._queue.join()
+    self._raise_error()
+
+  def close(self):
+    """Writes the pending checkpoints and stops the background thread."""
+    try:
+      self.sync()
+    finally:
+      self._queue.put(None)
+      self._thread.join()
+      if self._owns_staging_dir:
+        shutil.rmtree(self._staging_dir, ignore_errors=True)
+
+  def _update_manager(self, checkpoint_number):
+    # The state of a manager is only exposed as private attributes, the ones
+    # of the writer are copied over.
+    # pylint: disable=protected-access
+    manager, writer = self._checkpoint_manager, self._writer
+    manager._maybe_delete = collections.OrderedDict(writer._maybe_delete)
+    manager._last_preserved_timestamp = writer._last_preserved_timestamp
+    manager._last_checkpoint_step = checkpoint_number
+    manager._latest_checkpoint = writer.latest_checkpoint
+    # pylint: enable=protected-access
+
+  def _raise_error(self):
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+
+  def _write_loop(self):
+    while True:
+      item = self._queue.get()
+      if item is None:
+        self._queue.task_done()
+        return
+      staged_prefix, checkpoint_number = item
+      try:
+        self._staged.stage(staged_prefix)
+        self._writer.save(
+            checkpoint_number=checkpoint_number, check_interval=False)
+        self._update_manager(checkpoint_number)
+      except Exception as e:  # pylint: disable=broad-except
+        self._error = e
+      finally:
+        self._slots.release()
+        self._queue.task_done()
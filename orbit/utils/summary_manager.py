@@ -15,6 +15,9 @@
 """Provides a utility class for managing summary writing."""
 
 import os
+import queue
+import threading
+import time
 
 import tensorflow as tf
 
@@ -64,7 +67,7 @@ class SummaryManager:
     if self._enabled:
       tf.nest.map_structure(tf.summary.flush, self._summary_writers)
 
-  def write_summaries(self, summary_dict):
+  def write_summaries(self, summary_dict, step=None):
     """Writes summaries for the given dictionary of values.
 
     This recursively creates subdirectories for any nested dictionaries
@@ -95,16 +98,98 @@ class SummaryManager:
         name given by the corresponding key. This is performed recursively. Leaf
         values are then summarized using the summary writer instance specific to
         the parent relative path.
+      step: The step the summaries are written at. If `None`, the current
+        value of the global step is used. Summaries written from another
+        thread than the training loop should pass the step explicitly.
     """
     if not self._enabled:
       return
-    self._write_summaries(summary_dict)
+    step = self._global_step if step is None else step
+    self._write_summaries(summary_dict, step)
 
-  def _write_summaries(self, summary_dict, relative_path=""):
+  def _write_summaries(self, summary_dict, step, relative_path=""):
     for name, value in summary_dict.items():
       if isinstance(value, dict):
         self._write_summaries(
-            value, relative_path=os.path.join(relative_path, name))
+            value, step, relative_path=os.path.join(relative_path, name))
       else:
         with self.summary_writer(relative_path).as_default():
-          self._summary_fn(name, value, step=self._global_step)
+          self._summary_fn(name, value, step=step)
+
+
+class BackgroundSummaryWriter:
+  """Runs summary writing functions in a background thread.
+
+  The outer loop hands the post-processing of every loop output, its host
+  transfer, logging and summary writing, to `submit` and carries on with the
+  next loop. The thread runs the functions in order and flushes the summary
+  managers only once the queue is drained or `flush_interval` seconds have
+  passed since the last flush, so a backlog of outputs costs one flush.
+
+  Errors of the functions are raised by the next `submit` or `sync`.
+  """
+
+  def __init__(self, summary_managers, flush_interval=30.0, max_pending=8):
+    """Initializes the `BackgroundSummaryWriter` instance.
+
+    Args:
+      summary_managers: The `SummaryManager`s the submitted functions write
+        to, which the thread flushes.
+      flush_interval: The maximum number of seconds between flushes while the
+        queue is not drained.
+      max_pending: The number of functions that may be queued before `submit`
+        blocks.
+    """
+    self._summary_managers = list(summary_managers)
+    self._flush_interval = flush_interval
+    self._queue = queue.Queue(maxsize=max_pending)
+    self._error = None
+    self._thread = threading.Thread(
+        target=self._run, name="orbit_summary_writer", daemon=True)
+    self._thread.start()
+
+  def submit(self, fn, *args):
+    """Queues `fn(*args)` to run in the background thread."""
+    self._raise_error()
+    self._queue.put((fn, args))
+
+  def sync(self):
+    """Waits for the queued functions and flushes the summary managers."""
+    self._queue.join()
+    self._raise_error()
+
+  def close(self):
+    """Runs the queued functions and stops the background thread."""
+    try:
+      self.sync()
+    finally:
+      self._queue.put(None)
+      self._thread.join()
+
+  def _raise_error(self):
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+
+  def _flush(self):
+    for summary_manager in self._summary_managers:
+      summary_manager.flush()
+
+  def _run(self):
+    last_flush = time.time()
+    while True:
+      item = self._queue.get()
+      if item is None:
+        self._queue.task_done()
+        return
+      fn, args = item
+      try:
+        fn(*args)
+        if (self._queue.empty() or
+            time.time() - last_flush >= self._flush_interval):
+          self._flush()
+          last_flush = time.time()
+      except Exception as e:  # pylint: disable=broad-except
+        self._error = e
+      finally:
+        self._queue.task_done()
@@ -0,0 +1,143 @@
+"""Speedup of the sharded panoptic record writer with the worker count.
+
+A synthetic coco panoptic split is written to a temporary directory: random
+jpegs, polygon things, RLE crowd things, compressed RLE stuff and the rgb id
+panoptic pngs. It is converted with coco_record_writer.write_tfrecord once per
+worker count into a fresh output directory, and the examples per second and
+the speedup over one worker are reported.
+
+python3 -m panoptic.benchmarks.record_writer_benchmark --images 512 \
+  --workers 1,2,4,8
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import pycocotools.mask as mask_utils
+import tensorflow as tf
+
+from panoptic.dataloaders.encoders import coco_record_writer
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_integer("images", default=512, help="synthetic images")
+flags.DEFINE_integer("height", default=480, help="image height")
+flags.DEFINE_integer("width", default=640, help="image width")
+flags.DEFINE_integer("things", default=8, help="thing annotations per image")
+flags.DEFINE_integer("stuff", default=4, help="stuff annotations per image")
+flags.DEFINE_integer("num_shards", default=32, help="number of shards")
+flags.DEFINE_list("workers", default=["1", "2", "4", "8"], help="worker counts")
+
+SPLIT = "synthetic2017"
+
+
+def _random_box(rng, height, width):
+  h = rng.integers(16, height // 2)
+  w = rng.integers(16, width // 2)
+  y = rng.integers(0, height - h)
+  x = rng.integers(0, width - w)
+  return int(x), int(y), int(w), int(h)
+
+
+def write_synthetic_split(root, rng):
+  """Writes the images, annotation files and panoptic pngs of the split."""
+  height, width = FLAGS.height, FLAGS.width
+  image_dir = os.path.join(root, SPLIT)
+  annotation_dir = os.path.join(root, "annotations")
+  panoptic_dir = os.path.join(annotation_dir, f"panoptic_{SPLIT}")
+  for directory in [image_dir, panoptic_dir]:
+    os.makedirs(directory)
+
+  images, things, stuff, panoptic = [], [], [], []
+  for image_id in range(1, FLAGS.images + 1):
+    images.append({"id": image_id, "height": height, "width": width})
+    image = rng.integers(0, 255, [height, width, 3], dtype=np.uint8)
+    tf.io.write_file(
+        coco_record_writer.get_image_from_id(image_id, image_dir + "/"),
+        tf.io.encode_jpeg(image))
+
+    ids = np.zeros([height, width], np.int32)
+    segments = []
+    for i in range(FLAGS.stuff + FLAGS.things):
+      x, y, w, h = _random_box(rng, height, width)
+      segment_id = len(things) + len(stuff) + 1
+      mask = np.zeros([height, width], np.uint8)
+      mask[y:y + h, x:x + w] = 1
+      ids[mask > 0] = segment_id
+      annotation = {
+          "id": segment_id,
+          "image_id": image_id,
+          "bbox": [x, y, w, h],
+          "iscrowd": 0
+      }
+      if i < FLAGS.stuff:
+        rle = mask_utils.encode(np.asfortranarray(mask))
+        rle["counts"] = rle["counts"].decode("ascii")
+        stuff.append(dict(annotation, category_id=92 + i, segmentation=rle))
+        segments.append({"id": segment_id, "category_id": 92 + i})
+        continue
+      segments.append({"id": segment_id, "category_id": 1 + i})
+      if i % 4 == 0:
+        # crowds come as uncompressed rle
+        flat = mask.reshape(-1, order="F")
+        changes = np.flatnonzero(np.diff(flat)) + 1
+        counts = np.diff(np.concatenate([[0], changes, [flat.size]]))
+        rle = {"size": [height, width], "counts": counts.tolist()}
+        things.append(
+            dict(annotation, category_id=1 + i, iscrowd=1, segmentation=rle))
+      else:
+        polygon = [x, y, x + w, y, x + w, y + h, x, y + h]
+        things.append(
+            dict(annotation, category_id=1 + i, segmentation=[polygon]))
+
+    rgb = np.stack([ids % 256, ids // 256 % 256, ids // 256**2], axis=-1)
+    file_name = "%012d.png" % image_id
+    tf.io.write_file(
+        os.path.join(panoptic_dir, file_name),
+        tf.io.encode_png(rgb.astype(np.uint8)))
+    panoptic.append({
+        "image_id": image_id,
+        "file_name": file_name,
+        "segments_info": segments
+    })
+
+  for name, annotations in [("instances", things), ("stuff", stuff),
+                            ("panoptic", panoptic)]:
+    with open(os.path.join(annotation_dir, f"{name}_{SPLIT}.json"), "w") as f:
+      json.dump({"images": images, "annotations": annotations}, f)
+
+
+def main(_):
+  root = tempfile.mkdtemp()
+  try:
+    write_synthetic_split(root, np.random.default_rng(0))
+    baseline = None
+    print(f"{'workers':>7} | {'seconds':>8} | {'examples / s':>12} | "
+          f"{'speedup':>7}")
+    for workers in FLAGS.workers:
+      workers = int(workers)
+      output_dir = os.path.join(root, f"records_{workers}")
+      start = time.time()
+      counts = coco_record_writer.write_tfrecord(
+          root,
+          SPLIT,
+          output_dir,
+          num_shards=FLAGS.num_shards,
+          num_workers=workers,
+          resume=False)
+      elapsed = time.time() - start
+      baseline = baseline or elapsed
+      print(f"{workers:7d} | {elapsed:8.1f} | "
+            f"{sum(counts.values()) / elapsed:12.1f} | "
+            f"{baseline / elapsed:6.2f}x")
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+  app.run(main)
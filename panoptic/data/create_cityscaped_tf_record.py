@@ -1,78 +1,70 @@
-import tensorflow as tf 
-import os
-import cv2
+"""Cityscapes panoptic encoder.
+
+Every image of leftImg8bit/<split>/<city> is paired with its gtFine (or
+gtCoarse) labelIds and instanceIds pngs. The example keeps the image and both
+label pngs as they are, and the boxes and classes of the instances are read
+from the instanceIds png, where an instance pixel is class_id * 1000 + index.
+"""
 import json
-from PIL import Image, ImageDraw
-import numpy as np
 
-dataset_folder = "/media/vbanna/DATA_SHARE/CityScapes_raw"
+import tensorflow as tf
+import numpy as np
+import pycocotools.mask as mask_utils
 
-path_images = dataset_folder + "/leftImg8bit"
-path_gt_fine = dataset_folder + "/gtFine"
-path_gt_coarse = dataset_folder + "/gtCoarse"
+from panoptic.data import sharded_writer
 
 train = "/train"
 test = "/test"
 val = "/val"
 
+
 def _get_ID(file):
   file = file.split("_")[:-1]
   ID = "_".join(file)
   return ID
 
-def get_file_lists(image_path, file):
-  image_path = image_path.replace(path_images, "")
-  ID = _get_ID(image_path +"/"+ file)
-
-  image_file = path_images + image_path + "/" + file
-  fine_labels = path_gt_fine + ID + "_gtFine_labelIds.png"
-  fine_id = path_gt_fine + ID + "_gtFine_instanceIds.png"
-  fine_polygons = path_gt_fine + ID + "_gtFine_polygons.json"
-  coarse_labels = path_gt_coarse + ID + "_gtCoarse_labelIds.png"
-  coarse_id = path_gt_fine + ID + "_gtCoarse_instanceIds.png"
-  coarse_polygons = path_gt_coarse + ID + "_gtCoarse_polygons.json"
-
-  sample = {"image": image_file, 
-            "fine_instances": fine_polygons, 
-            "coarse_instances": coarse_polygons, 
-            "fine_id": fine_id, 
-            "coarse_id": coarse_id, 
-            "fine_labels": fine_labels,
-            "coarse_labels": coarse_labels}
 
+def get_file_lists(dataset_folder, image_path, file, labels="gtFine"):
+  path_images = dataset_folder + "/leftImg8bit"
+  path_labels = dataset_folder + "/" + labels
+  image_path = image_path.replace(path_images, "")
+  ID = _get_ID(image_path + "/" + file)
+
+  sample = {
+      "key": image_path + "/" + file,
+      "image": path_images + image_path + "/" + file,
+      "instances": path_labels + ID + f"_{labels}_polygons.json",
+      "instance_ids": path_labels + ID + f"_{labels}_instanceIds.png",
+      "labels": path_labels + ID + f"_{labels}_labelIds.png"
+  }
   return sample
 
-def _get_file_generator(image_folder, split):
-  path = image_folder + split
-  files = os.walk(path, topdown = False)
 
+def _get_file_generator(dataset_folder, split, labels="gtFine"):
+  path = dataset_folder + "/leftImg8bit" + split
   samples = []
-  for i, (folder, dirs, files) in enumerate(files):
-    if i > 10:
-      break 
-    for file in files:
-      samples.append(get_file_lists(folder, file))
+  for folder, _, files in tf.io.gfile.walk(path):
+    for file in sorted(files):
+      if file.endswith(".png"):
+        samples.append(get_file_lists(dataset_folder, folder, file, labels))
   return samples
 
-import pycocotools.mask as mask_utils
-def draw_polygons():
-  # mask_utils.
-  return
 
-def read_png_image(image_file):
+def read_png_image(image_file, dtype=tf.uint8):
   with tf.io.gfile.GFile(image_file, 'rb') as fid:
     encoded_png = fid.read()
-  encoded_png = tf.io.decode_png(encoded_png)
+  encoded_png = tf.io.decode_png(encoded_png, dtype=dtype)
   return encoded_png
 
+
 def read_json_sample(image_json):
   with tf.io.gfile.GFile(image_json, 'r') as fid:
     json_file = fid.read()
   json_file = json.loads(json_file)
   return json_file
 
+
 def load_instance(polygon, width, height):
-  # ImageDraw.Draw()
   polygon = np.array(polygon)
   polygon_a = np.reshape(polygon, (-1)).tolist()
 
@@ -81,19 +73,110 @@ def load_instance(polygon, width, height):
 
   return mask
 
-def get_instance_list(json_file):
-  return 
-
-# import matplotlib.pyplot as plt
-# samples = _get_file_generator(path_images, train)
-
-# image = read_png_image(samples[0]["image"])
-# plt.imshow(image)
-# plt.show()
 
-# json_polygons = read_json_sample(samples[0]["fine_instances"])
-# for polygon in json_polygons['objects']:
-#   print(polygon["label"])
-#   instance = load_instance(polygon["polygon"], json_polygons["imgWidth"], json_polygons["imgHeight"])
-#   plt.imshow(image_)
-#   plt.show()
\ No newline at end of file
+def get_instance_list(instance_ids):
+  """Boxes and classes of the instances of an instanceIds array.
+
+  Args:
+    instance_ids: int array [H, W], class_id * 1000 + index on instances.
+
+  Returns:
+    float32 [N, 4] boxes as normalized [ymin, xmin, ymax, xmax], the int64
+    [N] class ids and the int64 [N] instance ids.
+  """
+  height, width = instance_ids.shape
+  ids, inverse = np.unique(instance_ids.reshape(-1), return_inverse=True)
+  ys, xs = np.divmod(np.arange(instance_ids.size), width)
+
+  ymin = np.full(ids.shape, height)
+  xmin = np.full(ids.shape, width)
+  ymax = np.zeros(ids.shape, np.int64)
+  xmax = np.zeros(ids.shape, np.int64)
+  np.minimum.at(ymin, inverse, ys)
+  np.minimum.at(xmin, inverse, xs)
+  np.maximum.at(ymax, inverse, ys + 1)
+  np.maximum.at(xmax, inverse, xs + 1)
+
+  # ids below 1000 are classes without instances or crowds
+  keep = ids >= 1000
+  boxes = np.stack([
+      ymin[keep] / height, xmin[keep] / width, ymax[keep] / height,
+      xmax[keep] / width
+  ], axis=-1).astype(np.float32)
+  ids = ids[keep].astype(np.int64)
+  return boxes, ids // 1000, ids
+
+
+def _read_bytes(path):
+  with tf.io.gfile.GFile(path, "rb") as file:
+    return file.read()
+
+
+def serialized_sample(sample):
+  """Serializes a sample of _get_file_generator to a tf.train.Example string.
+
+  Images without labels, like the test split, are skipped.
+  """
+  if not tf.io.gfile.exists(sample["instance_ids"]):
+    return None
+  instance_png = _read_bytes(sample["instance_ids"])
+  instance_ids = tf.io.decode_png(instance_png, dtype=tf.uint16).numpy()
+  boxes, classes, ids = get_instance_list(instance_ids[..., 0])
+  height, width = instance_ids.shape[:2]
+
+  def _bytes(values):
+    return tf.train.Feature(bytes_list=tf.train.BytesList(value=values))
+
+  def _int64(values):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=values))
+
+  def _float(values):
+    return tf.train.Feature(float_list=tf.train.FloatList(value=values))
+
+  feature = {
+      "image/encoded": _bytes([_read_bytes(sample["image"])]),
+      "image/format": _bytes([b"png"]),
+      "image/source_id": _bytes([sample["key"].encode()]),
+      "image/height": _int64([height]),
+      "image/width": _int64([width]),
+      "image/object/bbox/ymin": _float(boxes[:, 0]),
+      "image/object/bbox/xmin": _float(boxes[:, 1]),
+      "image/object/bbox/ymax": _float(boxes[:, 2]),
+      "image/object/bbox/xmax": _float(boxes[:, 3]),
+      "image/object/class/label": _int64(classes),
+      "image/object/instance_id": _int64(ids),
+      "image/segmentation/class/encoded": _bytes(
+          [_read_bytes(sample["labels"])]),
+      "image/instance/encoded": _bytes([instance_png]),
+  }
+  example = tf.train.Example(features=tf.train.Features(feature=feature))
+  return example.SerializeToString()
+
+
+def write_tfrecord(dataset_folder,
+                   split,
+                   output_dir,
+                   num_shards=32,
+                   num_workers=1,
+                   labels="gtFine",
+                   resume=True):
+  """Converts a cityscapes split to TFRecord shards.
+
+  Args:
+    dataset_folder: cityscapes directory with leftImg8bit and the labels.
+    split: `str` split to convert, train, val or test.
+    output_dir: directory of the shards.
+    num_shards: `int` number of shards.
+    num_workers: `int` number of encoding processes.
+    labels: `str` gtFine or gtCoarse.
+    resume: `bool` skip the shards finished by an earlier run.
+
+  Returns:
+    dict of the example count of every shard.
+  """
+  samples = _get_file_generator(dataset_folder, "/" + split, labels)
+  lookup = {sample["key"]: sample for sample in samples}
+  shards = sharded_writer.build_manifest(
+      list(lookup.keys()), num_shards, output_dir, split, resume=resume)
+  return sharded_writer.write_shards(
+      shards, lookup, serialized_sample, num_workers=num_workers)
@@ -0,0 +1,64 @@
+"""Converts coco panoptic or cityscapes to sharded TFRecords.
+
+The images are split into --num_shards balanced shards listed in the
+manifest.json of --output_dir and encoded by --num_workers processes. Rerun
+the same command after a crash to finish the shards that are missing.
+
+python3 -m panoptic.data.create_panoptic_tf_record --dataset coco \
+  --data_dir /media/vbanna/DATA_SHARE/COCO_raw --split val2017 \
+  --output_dir /media/vbanna/DATA_SHARE/records/coco_panoptic \
+  --num_shards 32 --num_workers 8
+"""
+import time
+
+from absl import app
+from absl import flags
+
+from panoptic.data import create_cityscaped_tf_record
+from panoptic.dataloaders.encoders import coco_record_writer
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_enum(
+    "dataset", default="coco", enum_values=["coco", "cityscapes"],
+    help="dataset layout of data_dir")
+flags.DEFINE_string("data_dir", default=None, help="raw dataset directory")
+flags.DEFINE_string("split", default="val2017", help="split to convert")
+flags.DEFINE_string("output_dir", default=None, help="shard directory")
+flags.DEFINE_integer("num_shards", default=32, help="number of shards")
+flags.DEFINE_integer("num_workers", default=1, help="encoding processes")
+flags.DEFINE_bool(
+    "resume", default=True, help="skip the shards of an earlier run")
+flags.DEFINE_string(
+    "labels", default="gtFine", help="cityscapes label set, gtFine or "
+    "gtCoarse")
+
+
+def main(_):
+  start = time.time()
+  if FLAGS.dataset == "coco":
+    counts = coco_record_writer.write_tfrecord(
+        FLAGS.data_dir,
+        FLAGS.split,
+        FLAGS.output_dir,
+        num_shards=FLAGS.num_shards,
+        num_workers=FLAGS.num_workers,
+        resume=FLAGS.resume)
+  else:
+    counts = create_cityscaped_tf_record.write_tfrecord(
+        FLAGS.data_dir,
+        FLAGS.split,
+        FLAGS.output_dir,
+        num_shards=FLAGS.num_shards,
+        num_workers=FLAGS.num_workers,
+        labels=FLAGS.labels,
+        resume=FLAGS.resume)
+  elapsed = time.time() - start
+  total = sum(counts.values())
+  print(f"{total} examples in {len(counts)} shards, {elapsed:.1f} s, "
+        f"{total / max(elapsed, 1e-9):.1f} examples / s")
+
+
+if __name__ == "__main__":
+  flags.mark_flags_as_required(["data_dir", "output_dir"])
+  app.run(main)
@@ -0,0 +1,155 @@
+"""Writes a dataset into balanced TFRecord shards with a pool of processes.
+
+The keys of the dataset, image ids or file names, are split round robin into
+num_shards shards, so the example counts of the shards differ by at most one.
+The assignment is saved as manifest.json in the output directory. Every shard
+is a task of the pool: the worker encodes the entries of its shard with
+encode_fn and writes them to a temporary file that is renamed when the shard
+is complete, next to a .done file with its example count.
+
+A rerun with the same output directory reuses the manifest and skips the
+shards that have a .done file, so a crashed conversion resumes where it
+stopped instead of starting over.
+"""
+import json
+import multiprocessing
+import os
+import time
+
+import tensorflow as tf
+
+MANIFEST = "manifest.json"
+
+
+def shard_path(output_dir, prefix, index, num_shards):
+  return os.path.join(output_dir,
+                      f"{prefix}-{index:05d}-of-{num_shards:05d}.tfrecord")
+
+
+def build_manifest(keys, num_shards, output_dir, prefix, resume=True):
+  """Assigns the keys to shards, or loads the assignment of an earlier run.
+
+  Args:
+    keys: list of json serializable keys, the image ids.
+    num_shards: `int` number of shards to write.
+    output_dir: directory of the shards and the manifest.
+    prefix: `str` file name prefix of the shards.
+    resume: `bool` reuse the manifest in output_dir if there is one.
+
+  Returns:
+    list of dicts with the index, path and keys of every shard.
+  """
+  path = os.path.join(output_dir, MANIFEST)
+  if resume and tf.io.gfile.exists(path):
+    with tf.io.gfile.GFile(path, "r") as file:
+      manifest = json.load(file)
+    if manifest["num_keys"] != len(keys):
+      raise ValueError(f"{path} was written for {manifest['num_keys']} keys, "
+                       f"got {len(keys)}, use a new output directory")
+    if len(manifest["shards"]) != num_shards:
+      raise ValueError(f"{path} was written for {len(manifest['shards'])} "
+                       f"shards, got {num_shards}, use a new output directory")
+    return manifest["shards"]
+
+  if num_shards <= 0:
+    raise ValueError(f"num_shards has to be positive, got {num_shards}")
+  keys = sorted(keys)
+  shards = [{
+      "index": i,
+      "path": shard_path(output_dir, prefix, i, num_shards),
+      "keys": keys[i::num_shards]
+  } for i in range(num_shards)]
+
+  tf.io.gfile.makedirs(output_dir)
+  with tf.io.gfile.GFile(path, "w") as file:
+    json.dump({"num_keys": len(keys), "shards": shards}, file)
+  return shards
+
+
+def is_done(shard):
+  return tf.io.gfile.exists(shard["path"] + ".done")
+
+
+def write_shard(encode_fn, shard, entries):
+  """Encodes the entries of a shard and writes them, returns the count."""
+  tmp_path = shard["path"] + ".tmp"
+  count = 0
+  with tf.io.TFRecordWriter(tmp_path) as writer:
+    for entry in entries:
+      serialized = encode_fn(entry)
+      if serialized is not None:
+        writer.write(serialized)
+        count += 1
+  tf.io.gfile.rename(tmp_path, shard["path"], overwrite=True)
+  with tf.io.gfile.GFile(shard["path"] + ".done", "w") as file:
+    json.dump({"count": count, "keys": len(entries)}, file)
+  return count
+
+
+def _write_task(task):
+  encode_fn, shard, entries = task
+  start = time.time()
+  count = write_shard(encode_fn, shard, entries)
+  return shard["index"], count, time.time() - start
+
+
+def read_counts(shards):
+  """Example count of every finished shard, by shard path."""
+  counts = {}
+  for shard in shards:
+    if is_done(shard):
+      with tf.io.gfile.GFile(shard["path"] + ".done", "r") as file:
+        counts[shard["path"]] = json.load(file)["count"]
+  return counts
+
+
+def write_shards(shards, lookup, encode_fn, num_workers=1, log=print):
+  """Writes the unfinished shards with num_workers processes.
+
+  Args:
+    shards: the manifest of build_manifest.
+    lookup: dict of key to the entry passed to encode_fn, or None to pass
+      the keys themselves, for encode_fns that look their entries up in the
+      worker.
+    encode_fn: picklable function of an entry to a serialized tf.train.Example,
+      or None to skip the entry. A module level function or a
+      functools.partial of one.
+    num_workers: `int` number of processes, 1 encodes in this process.
+    log: function the progress of every shard is printed with.
+
+  Returns:
+    dict of the example count of every shard, by shard path.
+  """
+  pending = [shard for shard in shards if not is_done(shard)]
+  if len(pending) < len(shards):
+    log(f"resuming, {len(shards) - len(pending)} of {len(shards)} shards "
+        "are done")
+  tasks = ((encode_fn, shard, shard["keys"] if lookup is None else
+            [lookup[key] for key in shard["keys"]]) for shard in pending)
+
+  if num_workers <= 1:
+    results = map(_write_task, tasks)
+    pool = None
+  else:
+    # spawned workers do not inherit the tensorflow runtime of this process
+    pool = multiprocessing.get_context("spawn").Pool(num_workers)
+    results = pool.imap_unordered(_write_task, tasks)
+
+  try:
+    for i, (index, count, seconds) in enumerate(results):
+      log(f"shard {index} done, {count} examples in {seconds:.1f} s "
+          f"({i + 1} / {len(pending)})")
+  except BaseException:
+    if pool is not None:
+      pool.terminate()
+    raise
+  if pool is not None:
+    pool.close()
+    pool.join()
+
+  counts = read_counts(shards)
+  with tf.io.gfile.GFile(
+      os.path.join(os.path.dirname(shards[0]["path"]), "counts.json"),
+      "w") as file:
+    json.dump(counts, file, indent=2)
+  return counts
@@ -0,0 +1,190 @@
+"""Tests for the sharded TFRecord writing of coco_record_writer."""
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from panoptic.data import sharded_writer
+from panoptic.dataloaders.encoders import coco_record_writer
+
+SPLIT = "val2017"
+NUM_SHARDS = 3
+IMAGE_IDS = [139, 285, 632, 724, 776, 785, 802]
+
+
+def _write_dataset(dataset_path):
+  """A coco split of tiny images with things, stuff and panoptic pngs."""
+  annotations_path = os.path.join(dataset_path, "annotations")
+  panoptic_path = os.path.join(annotations_path, f"panoptic_{SPLIT}")
+  tf.io.gfile.makedirs(os.path.join(dataset_path, SPLIT))
+  tf.io.gfile.makedirs(panoptic_path)
+
+  images, things, stuff, panoptic = [], [], [], []
+  for i, image_id in enumerate(IMAGE_IDS):
+    height, width = 12 + i, 16 - i
+    image = np.full([height, width, 3], 10 * i, np.uint8)
+    tf.io.write_file(
+        os.path.join(dataset_path, SPLIT, "%012d.jpg" % image_id),
+        tf.io.encode_jpeg(image))
+    images.append({
+        "id": image_id,
+        "height": height,
+        "width": width,
+        "file_name": "%012d.jpg" % image_id
+    })
+
+    # the last image has no annotations at all
+    if i == len(IMAGE_IDS) - 1:
+      continue
+    things.append({
+        "id": 100 * i + 1,
+        "image_id": image_id,
+        "category_id": 1 + i,
+        "iscrowd": 0,
+        "bbox": [1, 1, 6, 5],
+        "area": 30.0,
+        "segmentation": [[1, 1, 7, 1, 7, 6, 1, 6]],
+    })
+    if i % 2:
+      things.append({
+          "id": 100 * i + 2,
+          "image_id": image_id,
+          "category_id": 1,
+          "iscrowd": 1,
+          "bbox": [0, 0, 1, 4],
+          "area": 4.0,
+          "segmentation": {
+              "size": [height, width],
+              "counts": [0, 4, height * width - 4]
+          },
+      })
+    stuff.append({
+        "id": 100 * i + 3,
+        "image_id": image_id,
+        "category_id": 92 + i,
+        "iscrowd": 0,
+        "bbox": [0, 6, width, height - 6],
+        "area": float(width * (height - 6)),
+        "segmentation": [[0, 6, width, 6, width, height, 0, height]],
+    })
+
+    ids = np.zeros([height, width, 3], np.uint8)
+    ids[1:6, 1:7, 0] = 1
+    tf.io.write_file(
+        os.path.join(panoptic_path, "%012d.png" % image_id),
+        tf.io.encode_png(ids))
+    panoptic.append({
+        "image_id": image_id,
+        "file_name": "%012d.png" % image_id,
+        "segments_info": [{
+            "id": 1,
+            "category_id": 1 + i,
+            "iscrowd": 0,
+            "bbox": [1, 1, 6, 5],
+            "area": 30
+        }],
+    })
+
+  for name, annotations in [("instances", things), ("stuff", stuff),
+                            ("panoptic", panoptic)]:
+    path = os.path.join(annotations_path, f"{name}_{SPLIT}.json")
+    with open(path, "w") as file:
+      json.dump({
+          "images": images,
+          "annotations": annotations,
+          "categories": []
+      }, file)
+
+
+def _read_shards(output_dir):
+  """The parsed examples of every shard, in file order."""
+  shards = []
+  for index in range(NUM_SHARDS):
+    path = sharded_writer.shard_path(output_dir, SPLIT, index, NUM_SHARDS)
+    shards.append([
+        tf.train.Example.FromString(record.numpy())
+        for record in tf.data.TFRecordDataset(path)
+    ])
+  return shards
+
+
+def _source_id(example):
+  return int(example.features.feature["image/source_id"].bytes_list.value[0])
+
+
+class ShardedWriterTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._dataset_path = self.create_tempdir().full_path
+    _write_dataset(self._dataset_path)
+    self._output_dir = self.create_tempdir().full_path
+    self._counts = coco_record_writer.write_tfrecord(
+        self._dataset_path,
+        SPLIT,
+        self._output_dir,
+        num_shards=NUM_SHARDS,
+        num_workers=1)
+    self._shards = _read_shards(self._output_dir)
+
+  def test_counts(self):
+    self.assertLen(self._counts, NUM_SHARDS)
+    self.assertEqual(sum(self._counts.values()), len(IMAGE_IDS))
+    # the round robin assignment balances the shards to within one example
+    self.assertLessEqual(
+        max(self._counts.values()) - min(self._counts.values()), 1)
+    for index, examples in enumerate(self._shards):
+      path = sharded_writer.shard_path(self._output_dir, SPLIT, index,
+                                       NUM_SHARDS)
+      self.assertLen(examples, self._counts[path])
+
+    source_ids = [_source_id(e) for examples in self._shards for e in examples]
+    self.assertCountEqual(source_ids, IMAGE_IDS)
+    with open(os.path.join(self._output_dir, "counts.json"), "r") as file:
+      self.assertEqual(json.load(file), self._counts)
+
+  def test_resume(self):
+    output_dir = self.create_tempdir().full_path
+    kwargs = dict(num_shards=NUM_SHARDS, num_workers=1)
+    coco_record_writer.write_tfrecord(self._dataset_path, SPLIT, output_dir,
+                                      **kwargs)
+
+    # a crash after the first shard: the others are lost, one of them half
+    # written to its temporary file
+    for index in range(1, NUM_SHARDS):
+      path = sharded_writer.shard_path(output_dir, SPLIT, index, NUM_SHARDS)
+      tf.io.gfile.remove(path)
+      tf.io.gfile.remove(path + ".done")
+    partial = sharded_writer.shard_path(output_dir, SPLIT, 1, NUM_SHARDS)
+    with open(partial + ".tmp", "wb") as file:
+      file.write(b"\x00" * 7)
+    first = sharded_writer.shard_path(output_dir, SPLIT, 0, NUM_SHARDS)
+    mtime = os.stat(first).st_mtime_ns
+
+    counts = coco_record_writer.write_tfrecord(self._dataset_path, SPLIT,
+                                               output_dir, **kwargs)
+    self.assertEqual(os.stat(first).st_mtime_ns, mtime)
+    self.assertFalse(tf.io.gfile.exists(partial + ".tmp"))
+    self.assertEqual(list(counts.values()), list(self._counts.values()))
+    self.assertEqual(_read_shards(output_dir), self._shards)
+
+  def test_resume_rejects_other_shard_counts(self):
+    with self.assertRaisesRegex(ValueError, "use a new output directory"):
+      coco_record_writer.write_tfrecord(
+          self._dataset_path, SPLIT, self._output_dir, num_shards=2)
+
+  def test_workers(self):
+    output_dir = self.create_tempdir().full_path
+    counts = coco_record_writer.write_tfrecord(
+        self._dataset_path,
+        SPLIT,
+        output_dir,
+        num_shards=NUM_SHARDS,
+        num_workers=2)
+    self.assertEqual(list(counts.values()), list(self._counts.values()))
+    self.assertEqual(_read_shards(output_dir), self._shards)
+
+
+if __name__ == "__main__":
+  tf.test.main()
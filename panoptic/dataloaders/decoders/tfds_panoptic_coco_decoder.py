@@ -52,23 +52,29 @@ class MSCOCODecoder(decoder.Decoder):
     return id
 
   def _decode_masks(self, parsed_tensors):
-    """Decode a set of PNG masks to the tf.float32 tensors."""
-    id_mask = self._get_instance_id(parsed_tensors["panoptic_image"])
-    ids = parsed_tensors["panoptic_objects"]['id']  
-    classes = parsed_tensors["panoptic_objects"]['label']  
-
-    ids = tf.expand_dims(ids, axis = 0)
-    ids = tf.expand_dims(ids, axis = 0)
-    ids = tf.repeat(ids, tf.shape(id_mask)[0], axis = 0)
-    ids = tf.repeat(ids, tf.shape(id_mask)[1], axis = 1)
-
-    classes = tf.expand_dims(classes, axis = 0)
-    classes = tf.expand_dims(classes, axis = 0)
-    classes = tf.repeat(classes, tf.shape(id_mask)[0], axis = 0)
-    classes = tf.repeat(classes, tf.shape(id_mask)[1], axis = 1)
+    """Decodes the panoptic png to a semantic class mask and an id mask.
 
-    bool_mask = tf.cast(tf.math.equal(tf.expand_dims(id_mask, axis = -1), ids), tf.int64)
-    class_mask = tf.reduce_sum(bool_mask * classes, axis = -1)
+    Every pixel id is looked up in the sorted segment ids, so the masks cost
+    O(H * W * log(N)) time and O(H * W) memory instead of comparing every
+    pixel against every segment. Pixels of no segment get class 0.
+    """
+    id_mask = self._get_instance_id(parsed_tensors["panoptic_image"])
+    ids = tf.cast(parsed_tensors["panoptic_objects"]['id'], tf.int64)
+    classes = parsed_tensors["panoptic_objects"]['label']
+
+    # a sentinel above every rgb id keeps the lookup in range, also for
+    # images without segments
+    order = tf.argsort(ids)
+    sorted_ids = tf.concat([tf.gather(ids, order), [256**3]], axis=0)
+    sorted_classes = tf.concat(
+        [tf.gather(classes, order), tf.zeros([1], classes.dtype)], axis=0)
+
+    pixel_ids = tf.reshape(id_mask, [-1])
+    index = tf.searchsorted(sorted_ids, pixel_ids, side='left')
+    found = tf.equal(tf.gather(sorted_ids, index), pixel_ids)
+    class_mask = tf.where(found, tf.gather(sorted_classes, index),
+                          tf.zeros_like(pixel_ids, classes.dtype))
+    class_mask = tf.reshape(class_mask, tf.shape(id_mask))
     return class_mask, id_mask
 
   def decode(self, serialized_example):
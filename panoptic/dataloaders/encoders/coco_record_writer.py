@@ -1,222 +1,390 @@
-"""MS Coco Dataset."""
-
-import collections
-import json
+"""MS Coco panoptic encoder.
+
+Decodes the things (instances_*.json), stuff (stuff_*.json) and panoptic
+(panoptic_*.json) annotations of every image into numpy masks:
+
+  things_masks: uint8 [N, H, W] binary mask of every thing annotation.
+  semantic_mask: int32 [H, W] stuff category ids with the thing category ids
+    painted over them, 0 where nothing is labeled.
+  panoptic_ids: int32 [H, W] segment id of every pixel of the panoptic png.
+
+The annotations are grouped per image first, so the image size is read once
+per image id, from the annotation file when it has it, the polygons of all
+annotations of an image are rasterized with one pycocotools call, and the
+uncompressed RLE of crowd annotations is expanded with np.repeat over the run
+lengths.
+
+python3 -m panoptic.dataloaders.encoders.coco_record_writer \
+  --dataset_path /media/vbanna/DATA_SHARE/COCO_raw/ --split val2017
+"""
+import functools
 import os
+import json
+import time
 
-from absl import logging
+from absl import app
+from absl import flags
 import tensorflow.compat.v2 as tf
-import tensorflow_datasets as tfds
 import pycocotools.mask as mask_utils
-import json 
-import matplotlib.pyplot as plt
-import numpy as np 
-
-
-def reformat_dictionary(things_file, stuff_file, panoptic_file):
-  reformatted = dict()
-  for file in things_file["images"]:
-    reformatted[file["id"]] = {"image": file}
-  
-  for file in things_file["annotations"]:
-    if file["id"] in reformatted.keys():
-      if "annotations" not in reformatted[file["id"]].keys():
-        reformatted[file["id"]]["things"] = [file]
-      else:
-        reformatted[file["id"]]["things"].append(file)
-    
-  for file in stuff_file["annotations"]:
-    if file["id"] in reformatted.keys():
-      if "annotations" not in reformatted[file["id"]].keys():
-        reformatted[file["id"]]["stuff"] = [file]
-      else:
-        reformatted[file["id"]]["stuff"].append(file)
-
-  for file in pantopic_file["annotations"]:
-    if file["id"] in reformatted.keys():
-      if "annotations" not in reformatted[file["id"]].keys():
-        reformatted[file["id"]]["annotations"] = [file]
-      else:
-        reformatted[file["id"]]["annotations"].append(file)
-  return 
-
-def get_image_from_id(id):
-  image = "%s%012d.jpg" % (image_path, id)
-  return image
-
-def get_polygon_mask(masks, image_shape):
-  masks = mask_utils.frPyObjects(masks, image_shape[0], image_shape[1])
-  masks = mask_utils.merge(masks)
-  masks = mask_utils.decode(masks).astype(np.uint8)
-  return masks
-
-
-def get_rsi_mask(masks):
-  bin_mask = []
-  zero = True
-  for value in masks["counts"]:
-    if zero:
-      bin_mask.extend([0]*value)
-    else:
-      bin_mask.extend([1]*value)
-    zero = not zero
-  
-  bin_mask = np.array(bin_mask)
-  masks_vals = np.reshape(bin_mask, masks["size"], order = 'F').astype(np.uint8)
-
-  print(bin_mask.shape, masks["size"][0] * masks["size"][1])
-  # mask 
-  return masks_vals
-
-def decode_things_annotation(annotation):
-  image = get_image_from_id(annotation["image_id"])
-  imdata = plt.imread(image)
-  if annotation["iscrowd"] == 0:
-    # polygon format
-    annotation["segmentation"] = get_polygon_mask(annotation["segmentation"], imdata.shape)
-  else:
-    #RSI foramt
-    annotation["segmentation"] = get_rsi_mask(annotation["segmentation"])
-  annotation["image"] = imdata
-  return annotation
-
-def decode_stuff_annotation(annotation):
-  print(annotation.keys())
-  image = get_image_from_id(annotation["image_id"])
-  masks = annotation["segmentation"]
-  mask = mask_utils.decode(masks).astype(np.uint8)
-
-
-  print(annotation["bbox"])
-  plt.imshow(imdata)
-  plt.show()
-  plt.imshow(mask)
-  plt.show()
-  return annotation
-
-def generate_unified_mask():
-  return 
-
-def serialized_sample():
-  return 
-
-def convert_to_record():
-  return 
-
-def write_tfrecord():
-  return 
-  
-# traipaziodal reiman sums 
-
-dataset_path = "/media/vbanna/DATA_SHARE/COCO_raw/"
-image_path = dataset_path + "val2017/"
-instance_path = dataset_path + "annotations/instances_val2017.json"
-segment_path = dataset_path + "annotations/stuff_val2017.json"
-panoptic_path = dataset_path + "annotations/panoptic_val2017.json"
-
-segmentation = open(segment_path, 'r')
-segmentation = json.load(segmentation)
-stuff = segmentation["annotations"][2]
+import numpy as np
 
-panoptic_ = open(panoptic_path, 'r')
-panoptic_ = json.load(panoptic_)
-panoptic = panoptic_["annotations"][2]
+from panoptic.data import sharded_writer
+from official.vision.beta.data import annotation_index
 
-instances = open(instance_path, 'r')
-instances = json.load(instances)
-instance = instances["annotations"][2]
+FLAGS = flags.FLAGS
 
-print(instance)
-print(stuff)
-print(panoptic)
 
+def load_annotations(path):
+  with open(path, 'r') as file:
+    return json.load(file)
 
 
+def reformat_dictionary(things_file, stuff_file, panoptic_file=None):
+  """Groups the images and the annotations of the three files by image id.
 
-
-# def extrapolate_line(x1, x2, y1, y2):
-
-  
-
-#   #slope = xdist/ydist if ydist != 0 else 0
-
-
-#   return 
-
-
-# def get_reiman_mask(masks, image_shape):
-#   i = 0 
-#   masks.append(masks[0])
-#   masks.append(masks[1])
-
-#   mask = np.zeros(shape = image_shape)
-
-#   i = 3
-#   while (i < len(masks)):
-#     x1 = int(masks[i - 3])
-#     y1 = int(masks[i - 2])
-#     x2 = int(masks[i - 1])
-#     y2 = int(masks[i])
-
-#     xmin = min(x1, x2)
-#     xmax = max(x1, x2)
-
-#     xdist = x1 - x2 
-#     ydist = y1 - y2
-
-#     slope = ydist/xdist if xdist != 0 else 0
-#     for j in range(xmin, xmax + 1):
-#       pix = int(slope * (j - xmin))
-#       mask[y1 + pix, j] = 1
-
-#     # #temp
-#     mask[y1, x1] = 1
-    
-#     i += 2
-#     # print(x1, y1, x2, y2, "||", xmid, ymid)
-#   return mask
-
-# def get_reiman_mask(masks, image_shape):
-#   i = 0 
-#   masks.append(masks[0])
-#   masks.append(masks[1])
-
-#   mask = np.zeros(shape = image_shape)
-
-#   i = 3
-#   while (i < len(masks)):
-#     x1 = int(masks[i - 3])
-#     y1 = int(masks[i - 2])
-#     x2 = int(masks[i - 1])
-#     y2 = int(masks[i])
-
-#     xmin = min(x1, x2)
-#     xmax = max(x1, x2) + 1
-
-#     ymin = min(y1, y2)
-#     ymax = max(y1, y2) + 1
+  Returns:
+    dict of image id to a dict with the image entry, the lists of its things
+    and stuff annotations and its panoptic annotation, None if there is none.
+  """
+  reformatted = dict()
+  for image in things_file["images"]:
+    reformatted[image["id"]] = {
+        "image": image,
+        "things": [],
+        "stuff": [],
+        "panoptic": None
+    }
+
+  for key, annotations in [("things", things_file["annotations"]),
+                           ("stuff", stuff_file["annotations"])]:
+    for annotation in annotations:
+      entry = reformatted.get(annotation["image_id"])
+      if entry is not None:
+        entry[key].append(annotation)
+
+  if panoptic_file is not None:
+    for annotation in panoptic_file["annotations"]:
+      entry = reformatted.get(annotation["image_id"])
+      if entry is not None:
+        entry["panoptic"] = annotation
+  return reformatted
+
+
+class IndexedEntries(object):
+  """The entries of reformat_dictionary, read per image from the annotation
+  indexes of the three files instead of loading them."""
+
+  def __init__(self, things_file, stuff_file, panoptic_file=None):
+    self._things = annotation_index.AnnotationIndex.open(things_file)
+    self._stuff = annotation_index.AnnotationIndex.open(stuff_file)
+    self._panoptic = None
+    if panoptic_file is not None:
+      self._panoptic = annotation_index.AnnotationIndex.open(panoptic_file)
+
+  def keys(self):
+    return [int(image_id) for image_id in self._things.image_ids]
+
+  def __getitem__(self, image_id):
+    entry = {
+        "image": self._things.image(image_id),
+        "things": self._things.annotations(image_id),
+        "stuff": [],
+        "panoptic": None
+    }
+    if image_id in self._stuff:
+      entry["stuff"] = self._stuff.annotations(image_id)
+    if self._panoptic is not None and image_id in self._panoptic:
+      panoptic = self._panoptic.annotations(image_id)
+      entry["panoptic"] = panoptic[0] if panoptic else None
+    return entry
+
+
+def get_image_from_id(id, image_path):
+  image = "%s%012d.jpg" % (image_path, id)
+  return image
 
 
-#     xdir = -1 if x1 > x2 else 1
-#     xdist = (xmax - xmin) * xdir
+def get_image_shape(image_info, image_path):
+  """(height, width) of an image entry, from the jpeg header if it is not
+  in the annotation file."""
+  if "height" in image_info and "width" in image_info:
+    return image_info["height"], image_info["width"]
+  image = get_image_from_id(image_info["id"], image_path)
+  shape = tf.io.extract_jpeg_shape(tf.io.read_file(image)).numpy()
+  return int(shape[0]), int(shape[1])
+
+
+def get_polygon_masks(polygons, image_shape):
+  """Rasterizes the polygons of all annotations of an image at once.
+
+  Args:
+    polygons: list with the list of polygons of every annotation.
+    image_shape: (height, width) of the image.
+
+  Returns:
+    uint8 array [len(polygons), height, width].
+  """
+  height, width = image_shape
+  masks = np.zeros((len(polygons), height, width), dtype=np.uint8)
+  used = [i for i, polygon in enumerate(polygons) if polygon]
+  if not used:
+    return masks
+
+  rles = mask_utils.frPyObjects([p for i in used for p in polygons[i]], height,
+                                width)
+  merged = []
+  start = 0
+  for i in used:
+    merged.append(mask_utils.merge(rles[start:start + len(polygons[i])]))
+    start += len(polygons[i])
+  masks[used] = np.moveaxis(mask_utils.decode(merged), -1, 0)
+  return masks
 
-#     ydir = -1 if y1 > y2 else 1
-#     ydist = (ymax - ymin) * ydir
 
-#     slope = ydist/xdist if xdist != 0 else 0
-#     for j in range(xmin, xmax):
-#       pix = int(slope * (j - xmin)) + y1
+def get_rle_mask(rle):
+  """Decodes a COCO RLE to a uint8 [height, width] mask.
+
+  Uncompressed counts, a list of run lengths starting with a run of zeros,
+  are expanded with np.repeat. Compressed counts, a string, are decoded with
+  pycocotools.
+  """
+  height, width = rle["size"]
+  counts = rle["counts"]
+  if isinstance(counts, (str, bytes)):
+    if isinstance(counts, str):
+      counts = counts.encode("ascii")
+    mask = mask_utils.decode({"size": [height, width], "counts": counts})
+    return mask.astype(np.uint8)
+
+  counts = np.asarray(counts, dtype=np.int64)
+  values = (np.arange(counts.shape[0]) % 2).astype(np.uint8)
+  mask = np.repeat(values, counts)
+  return np.reshape(mask, (height, width), order="F")
+
+
+def decode_masks(annotations, image_shape):
+  """uint8 [N, H, W] masks of the annotations of one image."""
+  polygons = [
+      annotation["segmentation"]
+      if isinstance(annotation["segmentation"], list) else []
+      for annotation in annotations
+  ]
+  masks = get_polygon_masks(polygons, image_shape)
+  for i, annotation in enumerate(annotations):
+    if isinstance(annotation["segmentation"], dict):
+      masks[i] = get_rle_mask(annotation["segmentation"])
+  return masks
 
-#       if slope <= 0:
-#         mask[pix:ymax, j] = 1
-#       else:
-#         mask[pix:ymax, j] = 1
-        
-#     mask[ymin:ymax, xmin:xmax] = 1
 
-#     # #temp
-#     mask[y1, x1] = 1
-    
-#     i += 2
-#     # print(x1, y1, x2, y2, "||", xmid, ymid)
-#   return mask
+def get_panoptic_ids(panoptic_png):
+  """int32 [H, W] segment ids of a panoptic png, id = r + 256 g + 256^2 b."""
+  image = tf.io.decode_png(tf.io.read_file(panoptic_png), channels=3).numpy()
+  image = image.astype(np.int32)
+  return image[..., 0] + image[..., 1] * 256 + image[..., 2] * 256**2
+
+
+def generate_unified_mask(things, things_masks, stuff, stuff_masks,
+                          image_shape):
+  """Merges the stuff and things layers of an image into one class mask.
+
+  The stuff categories are painted first and the things over them, so the
+  stuff 'other' class of COCO-stuff never hides a thing.
+  """
+  semantic = np.zeros(image_shape, dtype=np.int32)
+  for annotations, masks in [(stuff, stuff_masks), (things, things_masks)]:
+    if not annotations:
+      continue
+    classes = np.array([a["category_id"] for a in annotations], np.int32)
+    covered = masks.any(axis=0)
+    # the last annotation covering a pixel wins, like painting in order
+    last = masks.shape[0] - 1 - np.argmax(masks[::-1], axis=0)
+    semantic = np.where(covered, classes[last], semantic)
+  return semantic
+
+
+def decode_image(entry, image_path, panoptic_path=None, decode_panoptic=True):
+  """Decodes and merges the things, stuff and panoptic layers of one image.
+
+  Args:
+    entry: an entry of reformat_dictionary.
+    image_path: directory of the images, with a trailing separator.
+    panoptic_path: directory of the panoptic pngs, None to skip them.
+    decode_panoptic: `bool` decode the panoptic png to ids, else only its
+      file is returned.
+
+  Returns:
+    dict with the image file, its shape, the things_masks, classes, boxes,
+    as [x, y, width, height] in pixels like the annotation file, and is_crowd
+    of the things, the semantic_mask, and the panoptic png, ids and
+    segments.
+  """
+  image_info = entry["image"]
+  image_shape = get_image_shape(image_info, image_path)
+  things = entry["things"]
+  stuff = entry["stuff"]
+
+  things_masks = decode_masks(things, image_shape)
+  stuff_masks = decode_masks(stuff, image_shape)
+  decoded = {
+      "image": get_image_from_id(image_info["id"], image_path),
+      "image_id": image_info["id"],
+      "image_shape": image_shape,
+      "things_masks": things_masks,
+      "things_classes": np.array([a["category_id"] for a in things], np.int32),
+      "things_boxes": np.reshape(
+          np.array([a["bbox"] for a in things], np.float32), [-1, 4]),
+      "things_is_crowd": np.array([a["iscrowd"] for a in things], bool),
+      "semantic_mask": generate_unified_mask(things, things_masks, stuff,
+                                             stuff_masks, image_shape),
+  }
+
+  if panoptic_path is not None and entry["panoptic"] is not None:
+    panoptic_png = os.path.join(panoptic_path, entry["panoptic"]["file_name"])
+    decoded["panoptic_png"] = panoptic_png
+    decoded["panoptic_segments"] = entry["panoptic"]["segments_info"]
+    if decode_panoptic:
+      decoded["panoptic_ids"] = get_panoptic_ids(panoptic_png)
+  return decoded
+
+
+def _bytes_feature(values):
+  return tf.train.Feature(bytes_list=tf.train.BytesList(value=values))
+
+
+def _int64_feature(values):
+  return tf.train.Feature(int64_list=tf.train.Int64List(value=values))
+
+
+def _float_feature(values):
+  return tf.train.Feature(float_list=tf.train.FloatList(value=values))
+
+
+def _read_bytes(path):
+  with tf.io.gfile.GFile(path, "rb") as file:
+    return file.read()
+
+
+def _encode_png(mask):
+  return tf.io.encode_png(mask[..., np.newaxis]).numpy()
+
+
+def serialized_sample(decoded):
+  """Serializes a decoded image to a tf.train.Example string.
+
+  The image is stored as its jpeg, the boxes normalized, the mask of every
+  thing and the semantic mask as uint8 pngs and the panoptic ids as the rgb
+  png of the annotation.
+  """
+  height, width = decoded["image_shape"]
+  x, y, w, h = np.transpose(decoded["things_boxes"])
+  masks = decoded["things_masks"]
+  feature = {
+      "image/encoded": _bytes_feature([_read_bytes(decoded["image"])]),
+      "image/format": _bytes_feature([b"jpeg"]),
+      "image/source_id": _bytes_feature([str(decoded["image_id"]).encode()]),
+      "image/height": _int64_feature([height]),
+      "image/width": _int64_feature([width]),
+      "image/object/bbox/xmin": _float_feature(x / width),
+      "image/object/bbox/xmax": _float_feature((x + w) / width),
+      "image/object/bbox/ymin": _float_feature(y / height),
+      "image/object/bbox/ymax": _float_feature((y + h) / height),
+      "image/object/class/label": _int64_feature(decoded["things_classes"]),
+      "image/object/is_crowd": _int64_feature(
+          decoded["things_is_crowd"].astype(np.int64)),
+      "image/object/area": _float_feature(masks.sum(axis=(1, 2))),
+      "image/object/mask": _bytes_feature([_encode_png(m) for m in masks]),
+      "image/segmentation/class/encoded": _bytes_feature(
+          [_encode_png(decoded["semantic_mask"].astype(np.uint8))]),
+  }
+  if "panoptic_png" in decoded:
+    feature["image/panoptic/encoded"] = _bytes_feature(
+        [_read_bytes(decoded["panoptic_png"])])
+  example = tf.train.Example(features=tf.train.Features(feature=feature))
+  return example.SerializeToString()
+
+
+def convert_to_record(entry, image_path, panoptic_path=None, entries=None):
+  """The serialized example of an entry of reformat_dictionary, or of the
+  image id of an entry of entries."""
+  if entries is not None:
+    entry = entries[entry]
+  decoded = decode_image(
+      entry, image_path, panoptic_path, decode_panoptic=False)
+  return serialized_sample(decoded)
+
+
+def write_tfrecord(dataset_path,
+                   split,
+                   output_dir,
+                   num_shards=64,
+                   num_workers=1,
+                   resume=True):
+  """Converts a coco split with its panoptic annotations to TFRecord shards.
+
+  Args:
+    dataset_path: coco directory with the images and annotations folders.
+    split: `str` split to convert, like val2017.
+    output_dir: directory of the shards.
+    num_shards: `int` number of shards.
+    num_workers: `int` number of encoding processes.
+    resume: `bool` skip the shards finished by an earlier run.
+
+  Returns:
+    dict of the example count of every shard.
+  """
+  image_path = os.path.join(dataset_path, split, "")
+  annotations = os.path.join(dataset_path, "annotations")
+  panoptic_path = os.path.join(annotations, f"panoptic_{split}")
+  # the workers read their images from the indexes, the annotation files are
+  # never loaded whole
+  entries = IndexedEntries(
+      os.path.join(annotations, f"instances_{split}.json"),
+      os.path.join(annotations, f"stuff_{split}.json"),
+      os.path.join(annotations, f"panoptic_{split}.json"))
+
+  shards = sharded_writer.build_manifest(
+      entries.keys(), num_shards, output_dir, split, resume=resume)
+  encode_fn = functools.partial(
+      convert_to_record,
+      image_path=image_path,
+      panoptic_path=panoptic_path,
+      entries=entries)
+  return sharded_writer.write_shards(
+      shards, None, encode_fn, num_workers=num_workers)
+
+
+def main(_):
+  dataset_path = FLAGS.dataset_path
+  split = FLAGS.split
+  image_path = os.path.join(dataset_path, split, "")
+  annotations = os.path.join(dataset_path, "annotations")
+  panoptic_path = os.path.join(annotations, f"panoptic_{split}")
+
+  start = time.time()
+  reformatted = IndexedEntries(
+      os.path.join(annotations, f"instances_{split}.json"),
+      os.path.join(annotations, f"stuff_{split}.json"),
+      os.path.join(annotations, f"panoptic_{split}.json"))
+  print(f"indexed {len(reformatted.keys())} images in "
+        f"{time.time() - start:.1f} s")
+
+  image_ids = list(reformatted.keys())
+  if FLAGS.num_images is not None:
+    image_ids = image_ids[:FLAGS.num_images]
+  start = time.time()
+  for image_id in image_ids:
+    decode_image(reformatted[image_id], image_path, panoptic_path)
+  elapsed = time.time() - start
+  print(f"decoded {len(image_ids)} images in {elapsed:.1f} s, "
+        f"{elapsed / max(len(image_ids), 1) * 1000:.1f} ms / image")
+
+
+if __name__ == "__main__":
+  flags.DEFINE_string(
+      "dataset_path",
+      default="/media/vbanna/DATA_SHARE/COCO_raw/",
+      help="coco directory with the images and annotations folders")
+  flags.DEFINE_string("split", default="val2017", help="split to decode")
+  flags.DEFINE_integer(
+      "num_images", default=None, help="images to decode, all if unset")
+  app.run(main)
@@ -0,0 +1,97 @@
+"""Tests for the mask decoding of coco_record_writer."""
+from absl.testing import parameterized
+import numpy as np
+import pycocotools.mask as mask_utils
+import tensorflow as tf
+
+from panoptic.dataloaders.encoders import coco_record_writer
+
+
+def _random_mask(height, width, seed):
+  return (np.random.RandomState(seed).uniform(size=(height, width)) >
+          0.5).astype(np.uint8)
+
+
+def _random_masks(num, image_shape, seed):
+  masks = np.zeros((num,) + image_shape, np.uint8)
+  for i in range(num):
+    masks[i] = _random_mask(*image_shape, seed=seed + i)
+  return masks
+
+
+def _uncompressed_rle(mask):
+  """The run lengths of the column major mask, starting with a zero run."""
+  flat = mask.flatten(order="F")
+  changes = np.flatnonzero(np.diff(flat)) + 1
+  counts = np.diff(np.concatenate([[0], changes, [flat.size]])).tolist()
+  if flat[0] == 1:
+    counts = [0] + counts
+  return {"size": list(mask.shape), "counts": counts}
+
+
+def _painted_mask(things, things_masks, stuff, stuff_masks, image_shape):
+  """Paints the masks one annotation at a time, stuff first."""
+  semantic = np.zeros(image_shape, dtype=np.int32)
+  for annotations, masks in [(stuff, stuff_masks), (things, things_masks)]:
+    for annotation, mask in zip(annotations, masks):
+      semantic[mask > 0] = annotation["category_id"]
+  return semantic
+
+
+class CocoRecordWriterTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((5, 7, 0), (7, 5, 1), (1, 9, 2), (6, 6, 3))
+  def test_rle_mask(self, height, width, seed):
+    mask = _random_mask(height, width, seed)
+    # a mask starting with a one has an empty first run of zeros
+    mask[0, 0] = seed % 2
+
+    uncompressed = _uncompressed_rle(mask)
+    expected = mask_utils.decode(
+        mask_utils.frPyObjects(uncompressed, height, width))
+    self.assertAllEqual(expected, mask)
+    decoded = coco_record_writer.get_rle_mask(uncompressed)
+    self.assertEqual(decoded.shape, (height, width))
+    self.assertEqual(decoded.dtype, np.uint8)
+    self.assertAllEqual(decoded, expected)
+
+    compressed = mask_utils.encode(np.asfortranarray(mask))
+    self.assertAllEqual(coco_record_writer.get_rle_mask(compressed), expected)
+    # the annotation files hold the compressed counts as a string
+    compressed["counts"] = compressed["counts"].decode("ascii")
+    self.assertAllEqual(coco_record_writer.get_rle_mask(compressed), expected)
+
+  def test_polygon_masks(self):
+    height, width = 12, 20
+    polygons = [
+        [[1, 1, 8, 1, 8, 6, 1, 6]],
+        [],
+        [[10, 2, 18, 2, 14, 10], [2, 8, 6, 8, 6, 11, 2, 11]],
+    ]
+    masks = coco_record_writer.get_polygon_masks(polygons, (height, width))
+    self.assertEqual(masks.shape, (3, height, width))
+    self.assertEqual(masks.dtype, np.uint8)
+    for polygon, mask in zip(polygons, masks):
+      if not polygon:
+        self.assertAllEqual(mask, np.zeros((height, width)))
+        continue
+      rles = mask_utils.frPyObjects(polygon, height, width)
+      self.assertAllEqual(mask, mask_utils.decode(mask_utils.merge(rles)))
+
+  @parameterized.parameters((3, 2), (0, 3), (4, 0))
+  def test_unified_mask(self, num_things, num_stuff):
+    image_shape = (9, 13)
+    things = [{"category_id": 1 + i} for i in range(num_things)]
+    stuff = [{"category_id": 92 + i} for i in range(num_stuff)]
+    things_masks = _random_masks(num_things, image_shape, seed=0)
+    stuff_masks = _random_masks(num_stuff, image_shape, seed=10)
+
+    semantic = coco_record_writer.generate_unified_mask(
+        things, things_masks, stuff, stuff_masks, image_shape)
+    self.assertAllEqual(
+        semantic,
+        _painted_mask(things, things_masks, stuff, stuff_masks, image_shape))
+
+
+if __name__ == "__main__":
+  tf.test.main()
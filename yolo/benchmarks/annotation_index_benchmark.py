@@ -0,0 +1,146 @@
+"""Peak memory of the annotation index against json.load.
+
+Each method runs in a fresh spawned process, so its peak resident set size is
+its own: json.load of the annotation file grouped per image the way
+coco_record_writer.reformat_dictionary does, against building the index and
+looking the boxes and the full annotations of the images up in it. The time
+and the peak RSS of both are reported, with the time of opening an index that
+is already built.
+
+python3 -m yolo.benchmarks.annotation_index_benchmark \
+  --annotation_file ~/coco/annotations/instances_train2017.json
+python3 -m yolo.benchmarks.annotation_index_benchmark --synthetic_images 100000
+"""
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from official.vision.beta.data import annotation_index
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string(
+    "annotation_file", default=None, help="COCO style annotation json")
+flags.DEFINE_integer(
+    "synthetic_images",
+    default=20000,
+    help="images of the synthetic file used without --annotation_file")
+flags.DEFINE_integer(
+    "annotations_per_image", default=8, help="synthetic annotations per image")
+flags.DEFINE_integer(
+    "lookups", default=1000, help="images looked up after loading")
+
+
+def _peak_rss_mb():
+  # ru_maxrss is in kilobytes on linux
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_synthetic_file(path, num_images, per_image, rng):
+  """Writes a COCO style file with polygon annotations of random boxes."""
+  annotations = []
+  for image_id in range(num_images):
+    for _ in range(per_image):
+      x, y = rng.uniform(0, 400, 2).round(2).tolist()
+      w, h = rng.uniform(4, 200, 2).round(2).tolist()
+      polygon = rng.uniform(0, 600, 32).round(2).tolist()
+      annotations.append({
+          "id": len(annotations),
+          "image_id": image_id,
+          "bbox": [x, y, w, h],
+          "category_id": int(rng.integers(1, 91)),
+          "iscrowd": 0,
+          "area": w * h,
+          "segmentation": [polygon]
+      })
+  images = [{
+      "id": i,
+      "file_name": "%012d.jpg" % i,
+      "height": 480,
+      "width": 640
+  } for i in range(num_images)]
+  with open(path, "w") as file:
+    json.dump({"images": images, "annotations": annotations}, file)
+
+
+def _json_load(path, image_ids):
+  with open(path, "r") as file:
+    content = json.load(file)
+  grouped = {image["id"]: [] for image in content["images"]}
+  for annotation in content["annotations"]:
+    if annotation["image_id"] in grouped:
+      grouped[annotation["image_id"]].append(annotation)
+  for image_id in image_ids:
+    boxes = np.array([a["bbox"] for a in grouped[image_id]], np.float32)
+    annotations = grouped[image_id]
+  return len(grouped)
+
+
+def _index(path, image_ids, index_dir):
+  index = annotation_index.AnnotationIndex.open(path, index_dir=index_dir)
+  for image_id in image_ids:
+    boxes = index.boxes(image_id)
+    annotations = index.annotations(image_id)
+  index.close()
+  return len(index)
+
+
+def _run(method, args, queue):
+  start = time.time()
+  images = method(*args)
+  queue.put((images, time.time() - start, _peak_rss_mb()))
+
+
+def measure(method, *args):
+  """Runs method in a fresh process, returns images, seconds and peak MB."""
+  context = multiprocessing.get_context("spawn")
+  queue = context.Queue()
+  process = context.Process(target=_run, args=(method, args, queue))
+  process.start()
+  result = queue.get()
+  process.join()
+  return result
+
+
+def main(_):
+  root = tempfile.mkdtemp()
+  try:
+    path = FLAGS.annotation_file
+    if path is None:
+      path = os.path.join(root, "synthetic.json")
+      write_synthetic_file(path, FLAGS.synthetic_images,
+                           FLAGS.annotations_per_image,
+                           np.random.default_rng(0))
+    print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MB")
+
+    index_dir = os.path.join(root, "index")
+    annotation_index.build_index(path, index_dir)
+    image_ids = annotation_index.AnnotationIndex(index_dir).image_ids
+    rng = np.random.default_rng(1)
+    image_ids = rng.choice(
+        image_ids, min(FLAGS.lookups, len(image_ids)), replace=False).tolist()
+    shutil.rmtree(index_dir)
+
+    print(f"{'method':>12} | {'images':>8} | {'seconds':>8} | "
+          f"{'peak MB':>8}")
+    for name, method, args in [
+        ("json.load", _json_load, (path, image_ids)),
+        ("build index", _index, (path, image_ids, index_dir)),
+        ("open index", _index, (path, image_ids, index_dir)),
+    ]:
+      images, seconds, peak = measure(method, *args)
+      print(f"{name:>12} | {images:8d} | {seconds:8.1f} | {peak:8.1f}")
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+  app.run(main)
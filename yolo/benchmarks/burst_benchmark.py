@@ -0,0 +1,134 @@
+"""Tail latency of the ModelServer under a synthetic burst of frames.
+
+Runs the same frame schedule through a ModelServer pinned to one resolution and
+through one that is allowed to drop resolution under load, then prints the
+latency percentiles from the moment a frame arrives to the moment its result
+is returned.
+
+python3 -m yolo.benchmarks.burst_benchmark --resolutions 608 \
+  --resolutions 416 --resolutions 320 --latency_slo 0.25
+"""
+import threading as t
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from yolo.configs import yolo as exp_cfg
+from yolo.demos.three_servers.model_server import ModelServer
+from yolo.tasks.yolo import YoloTask
+from yolo.utils.run_utils import prep_gpu
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string("base", default="v4tiny", help="yolo model to serve")
+flags.DEFINE_multi_integer(
+    "resolutions", default=[608, 416, 320], help="resolutions to switch between")
+flags.DEFINE_float(
+    "latency_slo", default=0.25, help="target frame latency in seconds")
+flags.DEFINE_integer("max_batch", default=5, help="max frames per batch")
+flags.DEFINE_integer("que_size", default=30, help="size of the input queue")
+flags.DEFINE_float("base_fps", default=10, help="steady state arrival rate")
+flags.DEFINE_integer("burst_frames", default=60, help="frames in each burst")
+flags.DEFINE_float("burst_every", default=5, help="seconds between bursts")
+flags.DEFINE_float("duration", default=20, help="seconds of traffic to send")
+
+
+def burst_schedule(base_fps, burst_frames, burst_every, duration):
+  """Returns sorted arrival times of a steady stream with periodic bursts."""
+  steady = np.arange(0, duration, 1 / base_fps)
+  bursts = [
+      np.full([burst_frames], start)
+      for start in np.arange(burst_every, duration, burst_every)
+  ]
+  return np.sort(np.concatenate([steady] + bursts))
+
+
+def _preprocess(raw_frame, pdim):
+  _, frame = raw_frame
+  return tf.image.resize(frame, (pdim, pdim))
+
+
+def _postprocess(raw_frames, results):
+  return {
+      "arrival": [arrival for arrival, _ in raw_frames],
+      "resolution": results["resolution"]
+  }
+
+
+def run_schedule(model, schedule, resolutions, latency_slo):
+  """Feeds `schedule` through a ModelServer and returns per frame stats."""
+  server = ModelServer(
+      model=model,
+      preprocess_fn=_preprocess,
+      postprocess_fn=_postprocess,
+      process_dims=resolutions,
+      max_batch=FLAGS.max_batch,
+      wait_time=0.0001,
+      latency_slo=latency_slo,
+      load_que_size=FLAGS.que_size)
+  frame = tf.random.uniform([720, 1280, 3])
+  latencies = []
+  used = []
+
+  def collect():
+    while len(latencies) < len(schedule):
+      out = server.get()
+      if out is None:
+        time.sleep(0.0005)
+        continue
+      _, ret = out
+      now = time.time()
+      for arrival in ret["arrival"]:
+        latencies.append(now - arrival)
+        used.append(ret["resolution"])
+
+  server.start()
+  collector = t.Thread(target=collect, args=())
+  collector.start()
+
+  start = time.time()
+  for offset in schedule:
+    arrival = start + offset
+    delay = arrival - time.time()
+    if delay > 0:
+      time.sleep(delay)
+    while not server.put((arrival, frame)):
+      time.sleep(0.0005)
+
+  collector.join()
+  server.close()
+  return np.array(latencies), np.array(used)
+
+
+def report(name, latencies, used):
+  p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+  res, counts = np.unique(used, return_counts=True)
+  mix = ", ".join(f"{r}: {c}" for r, c in zip(res, counts))
+  print(f"{name:>10} | p50 {p50:8.1f} ms | p90 {p90:8.1f} ms | "
+        f"p99 {p99:8.1f} ms | max {np.max(latencies) * 1000:8.1f} ms | {mix}")
+
+
+def main(_):
+  prep_gpu()
+  config = exp_cfg.YoloTask(
+      model=exp_cfg.Yolo(base=FLAGS.base, min_level=4),
+      load_darknet_weights=False)
+  task = YoloTask(config)
+  model = task.build_model()
+
+  schedule = burst_schedule(FLAGS.base_fps, FLAGS.burst_frames,
+                            FLAGS.burst_every, FLAGS.duration)
+  print(f"{len(schedule)} frames over {FLAGS.duration} s, bursts of "
+        f"{FLAGS.burst_frames} every {FLAGS.burst_every} s")
+
+  fixed = [max(FLAGS.resolutions)]
+  report("fixed", *run_schedule(model, schedule, fixed, None))
+  report("adaptive",
+         *run_schedule(model, schedule, FLAGS.resolutions, FLAGS.latency_slo))
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -0,0 +1,48 @@
+"""Time to build a Keras model from a DarkNet cfg, by stage.
+
+The cfg (and optionally its weights) is parsed into Config objects, compiled
+into the checked layer graph, and emitted as a Keras model. The seconds of
+every stage are printed after the FLOPs and parameter report of the graph, so
+the share of the startup that is TensorFlow layer creation is visible.
+
+python3 -m yolo.benchmarks.darknet_compile_benchmark --cfg yolov4.cfg
+python3 -m yolo.benchmarks.darknet_compile_benchmark --cfg yolov3.cfg \
+  --weights yolov3.weights --report=false
+"""
+import time
+
+from absl import app
+from absl import flags
+
+from yolo.utils import DarkNetConverter
+from yolo.utils.downloads.file_manager import download
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string("cfg", default=None, help="darknet cfg, yolov3 if unset")
+flags.DEFINE_string("weights", default=None, help="optional darknet weights")
+flags.DEFINE_boolean("report", default=True, help="print the layer table")
+
+
+def main(_):
+  cfg = FLAGS.cfg or download("yolov3.cfg")
+
+  start = time.time()
+  net = DarkNetConverter.read(cfg, FLAGS.weights)
+  parsed = time.time()
+  compiled = net.compile()
+  checked = time.time()
+  compiled.to_tf(load_weights=FLAGS.weights is not None)
+  emitted = time.time()
+
+  if FLAGS.report:
+    print(compiled.report())
+  print(f"{'stage':>8} | {'seconds':>8}")
+  for stage, seconds in [("parse", parsed - start),
+                         ("compile", checked - parsed),
+                         ("emit", emitted - checked)]:
+    print(f"{stage:>8} | {seconds:8.3f}")
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -0,0 +1,92 @@
+"""Startup time of the yolo binaries and the libraries they import.
+
+Each command runs in a fresh interpreter with `-X importtime`: the help of
+yolo.run, which should return without importing TensorFlow, and the imports
+of a training launch up to resolving the experiment and its task. The wall
+time of every run is reported, with the time spent importing each of the heavy
+libraries, or "-" for the libraries the command never imported.
+
+python3 -m yolo.benchmarks.import_time_benchmark
+python3 -m yolo.benchmarks.import_time_benchmark \
+  --experiment=darknet_classification
+"""
+import subprocess
+import sys
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string(
+    "experiment", default="yolo_custom", help="experiment of the launch")
+flags.DEFINE_integer("runs", default=5, help="runs of every command")
+
+HEAVY_LIBRARIES = ("tensorflow", "tensorflow_datasets", "tensorflow_addons",
+                   "cv2", "pycocotools")
+
+_LAUNCH = """
+from official.core import exp_factory
+from official.core import task_factory
+from yolo.common import registry_imports
+params = exp_factory.get_exp_config({experiment!r})
+task_factory.get_task_cls(params.task.__class__)
+"""
+
+
+def parse_import_times(stderr):
+  """Returns the cumulative import seconds of every module, from -X importtime.
+
+  A module is imported once, so its line is the import that loaded it, and its
+  cumulative time includes everything it imported in turn.
+  """
+  times = {}
+  for line in stderr.splitlines():
+    if not line.startswith("import time:"):
+      continue
+    fields = line[len("import time:"):].split("|")
+    if len(fields) != 3 or not fields[1].strip().isdigit():
+      continue
+    times[fields[2].strip()] = int(fields[1]) / 1e6
+  return times
+
+
+def measure(command):
+  """Runs command with -X importtime, returns its seconds and import times."""
+  start = time.time()
+  result = subprocess.run([sys.executable, "-X", "importtime"] + command,
+                          capture_output=True,
+                          text=True)
+  seconds = time.time() - start
+  if result.returncode != 0:
+    raise RuntimeError(f"{' '.join(command)} failed:\n{result.stderr[-2000:]}")
+  return seconds, parse_import_times(result.stderr)
+
+
+def main(_):
+  commands = [
+      ("run --help", ["-m", "yolo.run", "--help"]),
+      ("train launch", ["-c", _LAUNCH.format(experiment=FLAGS.experiment)]),
+  ]
+  header = f"{'command':>14} | {'seconds':>8} | " + " | ".join(
+      f"{name:>19}" for name in HEAVY_LIBRARIES)
+  print(header)
+  for name, command in commands:
+    seconds, imports = [], {library: [] for library in HEAVY_LIBRARIES}
+    for _ in range(FLAGS.runs):
+      run_seconds, import_times = measure(command)
+      seconds.append(run_seconds)
+      for library in HEAVY_LIBRARIES:
+        if library in import_times:
+          imports[library].append(import_times[library])
+    row = [f"{np.median(seconds):8.2f}"]
+    for library in HEAVY_LIBRARIES:
+      times = imports[library]
+      row.append(f"{np.median(times):19.2f}" if times else f"{'-':>19}")
+    print(f"{name:>14} | " + " | ".join(row))
+
+
+if __name__ == "__main__":
+  app.run(main)
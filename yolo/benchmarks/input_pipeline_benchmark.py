@@ -0,0 +1,258 @@
+"""Stage by stage throughput of the YoloTask input pipeline on CPU.
+
+The pipeline of a config is rebuilt one stage at a time, every measurement
+runs the pipeline up to and including that stage on the same examples:
+
+  read         the raw records, from disk
+  decode       + MSCOCODecoder.decode, the raw records are cached in memory
+               from here on so disk reads do not count
+  parse        + Parser.parse_fn
+  batch        + batching
+  postprocess  + Parser.postprocess_fn, if the config has one
+
+The cost of a stage is the time per example it adds to the stage before. The
+label assignment is timed on its own as well (get_best_anchor and the grids
+of build_grided_gt). At the end the train parse and postprocess are timed
+with all augmentations off, each augmentation on by itself and all of them on,
+so a regression in preprocessing_ops shows up next to the op that caused it.
+
+python3 -m yolo.benchmarks.input_pipeline_benchmark --experiment=yolo_custom \
+  --config_file=yolo/configs/experiments/yolov4.yaml --examples 256
+
+Add --params_override=task.train_data.synthetic.enable=true to run it on
+synthetic data, without the dataset on disk.
+"""
+import time
+
+from absl import app
+from absl import flags
+import tensorflow as tf
+import tensorflow_datasets as tfds
+
+from official.core import task_factory
+from official.core import train_utils
+# pylint: disable=unused-import
+from yolo.common import registry_imports
+# pylint: enable=unused-import
+from yolo.dataloaders import synthetic_coco
+from yolo.dataloaders.decoders import tfds_coco_decoder
+from yolo.ops import box_ops
+from yolo.ops import preprocessing_ops
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('experiment', default='yolo_custom', help='experiment')
+flags.DEFINE_multi_string('config_file', default=[], help='config overrides')
+flags.DEFINE_string(
+    'params_override', default='', help='overrides on top of config_file')
+flags.DEFINE_enum(
+    'split',
+    default='train',
+    enum_values=['train', 'validation'],
+    help='which data config of the task to benchmark')
+flags.DEFINE_integer('examples', default=256, help='examples per measurement')
+flags.DEFINE_integer(
+    'batch_size', default=0, help='overrides the batch size if positive')
+flags.DEFINE_integer(
+    'parallel_calls',
+    default=-1,
+    help='num_parallel_calls of every map, -1 for autotune')
+flags.DEFINE_bool(
+    'augmentations', default=True, help='time every augmentation flag')
+
+# every augmentation flag of the parser config, by the name it is reported as
+AUGMENTATIONS = {
+    'blur': {
+        'aug_rand_blur': True
+    },
+    'hsv': {
+        'aug_rand_hue': True,
+        'aug_rand_saturation': True,
+        'aug_rand_brightness': True
+    },
+    'flip': {
+        'random_flip': True
+    },
+    'jitter': {
+        'jitter_im': 0.3,
+        'jitter_boxes': 0.005
+    },
+    'zoom': {
+        'aug_rand_zoom': True
+    },
+    'cutmix': {
+        'cutmix': True
+    },
+    'mosaic': {
+        'mosaic': True
+    },
+}
+NO_AUGMENTATION = {
+    'aug_rand_blur': False,
+    'aug_rand_hue': False,
+    'aug_rand_saturation': False,
+    'aug_rand_brightness': False,
+    'random_flip': False,
+    'jitter_im': 0.0,
+    'jitter_boxes': 0.0,
+    'aug_rand_zoom': False,
+    'cutmix': False,
+    'mosaic': False,
+}
+
+
+def _parallel_calls():
+  if FLAGS.parallel_calls < 0:
+    return tf.data.experimental.AUTOTUNE
+  return FLAGS.parallel_calls
+
+
+def throughput(dataset, examples, batch_size=1):
+  """Examples per second of one pass over dataset, after a warm up batch."""
+  iterator = iter(dataset)
+  next(iterator)
+  count = 0
+  start = time.time()
+  for _ in iterator:
+    count += batch_size
+  elapsed = time.time() - start
+  if count == 0:
+    return float('nan')
+  return count / elapsed
+
+
+def read_raw(task, params):
+  """The raw records of a data config, in file order."""
+  if params.synthetic.enable:
+    return synthetic_coco.SyntheticCOCO.from_config(
+        params.synthetic,
+        num_classes=task.task_config.model.num_classes).dataset()
+  if params.tfds_name:
+    builder = tfds.builder(params.tfds_name, data_dir=params.tfds_data_dir)
+    return builder.as_dataset(split=params.tfds_split, shuffle_files=False)
+  files = tf.io.gfile.glob(params.input_path)
+  return tf.data.TFRecordDataset(files)
+
+
+def stage_datasets(params, raw, parser, decoder, is_training):
+  """The pipeline cut after every stage, in order."""
+  batch_size = params.global_batch_size
+  calls = _parallel_calls()
+  stages = []
+  decoded = raw.map(decoder.decode, num_parallel_calls=calls)
+  stages.append(('decode', decoded, 1))
+  parsed = decoded.map(parser.parse_fn(is_training), num_parallel_calls=calls)
+  stages.append(('parse', parsed, 1))
+  batched = parsed.batch(batch_size, drop_remainder=True)
+  stages.append(('batch', batched, batch_size))
+  postprocess_fn = parser.postprocess_fn(is_training)
+  if postprocess_fn is not None:
+    post = batched.map(postprocess_fn, num_parallel_calls=calls)
+    stages.append(('postprocess', post, batch_size))
+  return stages
+
+
+def assignment_datasets(parser, decoded):
+  """get_best_anchor and the grids of build_grided_gt on decoded examples."""
+  # pylint: disable=protected-access
+  calls = _parallel_calls()
+  image_w = parser._image_w
+  image_h = parser._image_h
+
+  def _boxes(data):
+    return {
+        'bbox': box_ops.yxyx_to_xcycwh(data['groundtruth_boxes']),
+        'classes': tf.cast(data['groundtruth_classes'], tf.float32)
+    }
+
+  def _anchors(label):
+    label['best_anchors'] = preprocessing_ops.get_best_anchor(
+        label['bbox'], parser._anchors, width=image_w, height=image_h)
+    return label
+
+  def _grids(label):
+    return parser._build_grid(
+        label, image_w, use_tie_breaker=parser._use_tie_breaker)
+
+  boxes = decoded.map(_boxes, num_parallel_calls=calls).cache()
+  anchors = boxes.map(_anchors, num_parallel_calls=calls)
+  grids = anchors.cache().map(_grids, num_parallel_calls=calls)
+  return boxes, [('get_best_anchor', anchors), ('build_grided_gt', grids)]
+
+
+def report(name, rate, previous=None):
+  line = f'{name:>18} | {rate:9.1f} examples / s | {1000 / rate:8.2f} ms'
+  if previous is not None:
+    line += f' | stage {1000 / rate - 1000 / previous:8.2f} ms / example'
+  print(line)
+
+
+def main(_):
+  tf.config.set_visible_devices([], 'GPU')
+  config = train_utils.ParseConfigOptions(
+      experiment=FLAGS.experiment,
+      config_file=FLAGS.config_file,
+      params_override=FLAGS.params_override)
+  params = train_utils.parse_configuration(config)
+  task = task_factory.get_task(params.task)
+  is_training = FLAGS.split == 'train'
+  data_params = (
+      params.task.train_data if is_training else params.task.validation_data)
+  if FLAGS.batch_size > 0:
+    data_params = data_params.replace(global_batch_size=FLAGS.batch_size)
+  data_params = data_params.replace(dtype='float32')
+
+  decoder = tfds_coco_decoder.MSCOCODecoder()
+  raw = read_raw(task, data_params).take(FLAGS.examples + 1)
+  report('read', throughput(raw, FLAGS.examples))
+
+  # keep the records in memory, so the stages after read do not pay for io
+  raw = raw.cache()
+  for _ in raw:
+    pass
+
+  parser = task.build_parser(data_params)
+  previous = None
+  for name, dataset, batch_size in stage_datasets(data_params, raw, parser,
+                                                  decoder, is_training):
+    rate = throughput(dataset, FLAGS.examples, batch_size)
+    report(name, rate, previous)
+    previous = rate
+
+  print('\nlabel assignment, on decoded examples')
+  decoded = raw.map(decoder.decode).cache()
+  boxes, stages = assignment_datasets(parser, decoded)
+  for _ in boxes:
+    pass
+  previous = throughput(boxes, FLAGS.examples)
+  for name, dataset in stages:
+    rate = throughput(dataset, FLAGS.examples)
+    report(name, rate, previous)
+    previous = rate
+
+  if not (FLAGS.augmentations and is_training):
+    return
+
+  print('\ntrain parse and postprocess per augmentation')
+  settings = [('none', {})] + list(AUGMENTATIONS.items())
+  settings.append(('all', {
+      key: value for flags_on in AUGMENTATIONS.values()
+      for key, value in flags_on.items() if key != 'mosaic'
+  }))
+  baseline = None
+  for name, flags_on in settings:
+    overrides = dict(NO_AUGMENTATION)
+    overrides.update(flags_on)
+    aug_params = data_params.replace(
+        parser=data_params.parser.replace(**overrides))
+    aug_parser = task.build_parser(aug_params)
+    stages = stage_datasets(aug_params, raw, aug_parser, decoder, True)
+    _, dataset, batch_size = stages[-1]
+    rate = throughput(dataset, FLAGS.examples, batch_size)
+    report(name, rate, baseline)
+    if baseline is None:
+      baseline = rate
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,75 @@
+"""Throughput of the batched mosaic op against the cutmix path.
+
+Both ops are run as a tf.data map over batches of random images and boxes, the
+way Parser._postprocess_fn applies them.
+
+python3 -m yolo.benchmarks.mosaic_benchmark --size 416 --batch_size 16 \
+  --num_boxes 50 --batches 50
+"""
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from yolo.ops import preprocessing_ops
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_integer("size", default=416, help="square input resolution")
+flags.DEFINE_integer("batch_size", default=16, help="images per batch")
+flags.DEFINE_integer("num_boxes", default=50, help="padded boxes per image")
+flags.DEFINE_integer("batches", default=50, help="timed batches per op")
+flags.DEFINE_integer("warmup", default=5, help="untimed batches per op")
+
+
+def synthetic_dataset(batch_size, size, num_boxes):
+  """Random batches of images with half of the boxes used."""
+  image = tf.random.uniform([batch_size, size, size, 3])
+  yx = tf.random.uniform([batch_size, num_boxes, 2], maxval=0.7)
+  hw = tf.random.uniform([batch_size, num_boxes, 2], 0.05, 0.3)
+  used = tf.range(num_boxes)[tf.newaxis, :, tf.newaxis] < num_boxes // 2
+  boxes = tf.where(used, tf.concat([yx, yx + hw], axis=-1), 0.0)
+  classes = tf.where(used[..., 0], 1.0, -1.0)
+  classes = tf.broadcast_to(classes, [batch_size, num_boxes])
+  return tf.data.Dataset.from_tensors((image, boxes, classes)).repeat()
+
+
+def cutmix(image, boxes, classes):
+  return preprocessing_ops.randomized_cutmix_batch(image, boxes, classes)
+
+
+def mosaic(image, boxes, classes):
+  return preprocessing_ops.mosaic_batch(
+      image, boxes, classes, max_num_instances=FLAGS.num_boxes)
+
+
+def time_op(op_fn):
+  dataset = synthetic_dataset(FLAGS.batch_size, FLAGS.size, FLAGS.num_boxes)
+  dataset = dataset.map(op_fn).take(FLAGS.warmup + FLAGS.batches)
+  times = []
+  start = time.time()
+  for i, outputs in enumerate(dataset):
+    tf.nest.map_structure(lambda x: x.numpy(), outputs)
+    now = time.time()
+    if i >= FLAGS.warmup:
+      times.append(now - start)
+    start = now
+  return np.array(times)
+
+
+def report(name, times):
+  images = FLAGS.batch_size / times
+  print(f"{name:>8} | {np.mean(times) * 1000:8.1f} ms / batch | "
+        f"{np.mean(images):8.1f} images / s | "
+        f"p90 {np.percentile(times, 90) * 1000:8.1f} ms")
+
+
+def main(_):
+  for name, op_fn in [("cutmix", cutmix), ("mosaic", mosaic)]:
+    report(name, time_op(op_fn))
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -0,0 +1,102 @@
+"""Throughput of sliced inference on high resolution frames.
+
+Random frames of --frame_size are run through the model letterboxed to one
+tile, sliced into tiles and sliced with the full image pass, for every batch
+size. The frames per second are reported next to the model inputs per frame
+and per second, so the cost of the tiles can be weighed against the resolution
+they keep.
+
+python3 -m yolo.benchmarks.sliced_inference_benchmark --experiment=yolo_custom \
+  --config_file=yolo/configs/experiments/yolov4-eval.yaml \
+  --frame_size 2160,3840 --tile_size 608 --batch_sizes 1,2,4
+"""
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from official.core import task_factory
+from official.core import train_utils
+# pylint: disable=unused-import
+from yolo.common import registry_imports
+# pylint: enable=unused-import
+from yolo.modeling import sliced_inference
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('experiment', default='yolo_custom', help='experiment')
+flags.DEFINE_multi_string('config_file', default=[], help='config overrides')
+flags.DEFINE_string(
+    'params_override', default='', help='overrides on top of config_file')
+flags.DEFINE_list(
+    'frame_size', default=['2160', '3840'], help='height,width of the frames')
+flags.DEFINE_integer('tile_size', default=608, help='model resolution')
+flags.DEFINE_float(
+    'tile_overlap', default=0.2, help='fraction of a tile shared with its '
+    'neighbours')
+flags.DEFINE_list('batch_sizes', default=['1', '2', '4'], help='frames per '
+                  'call')
+flags.DEFINE_integer('batches', default=20, help='timed batches per setting')
+flags.DEFINE_integer('warmup', default=3, help='untimed batches per setting')
+
+
+def settings(model, max_boxes):
+  """(name, model inputs per frame, predict fn) of every setting."""
+  frame_size = [int(size) for size in FLAGS.frame_size]
+  tile = FLAGS.tile_size
+
+  def letterbox(images):
+    return model(tf.image.resize(images, (tile, tile)), training=False)
+
+  rows = [('letterbox', 1, letterbox)]
+  for full_pass in (False, True):
+    sliced = sliced_inference.YoloSliced(
+        model,
+        tile_size=tile,
+        overlap=FLAGS.tile_overlap,
+        full_pass=full_pass,
+        max_boxes=max_boxes)
+    name = 'sliced + full' if full_pass else 'sliced'
+    rows.append((name, sliced.num_tiles(frame_size), sliced))
+  return rows
+
+
+def time_fn(predict_fn, batch_size):
+  frame_size = [int(size) for size in FLAGS.frame_size]
+  images = tf.random.uniform([batch_size] + frame_size + [3])
+  step = tf.function(predict_fn)
+  times = []
+  for i in range(FLAGS.warmup + FLAGS.batches):
+    start = time.time()
+    tf.nest.map_structure(lambda x: x.numpy(), step(images))
+    if i >= FLAGS.warmup:
+      times.append(time.time() - start)
+  return np.array(times)
+
+
+def main(_):
+  config = train_utils.ParseConfigOptions(
+      experiment=FLAGS.experiment,
+      config_file=FLAGS.config_file,
+      params_override=FLAGS.params_override)
+  params = train_utils.parse_configuration(config)
+  task = task_factory.get_task(params.task)
+  model = task.build_model()
+  max_boxes = params.task.model.filter.max_boxes
+
+  print(f"{'setting':>14} | {'batch':>5} | {'inputs':>6} | "
+        f"{'ms / batch':>10} | {'frames / s':>10} | {'inputs / s':>10}")
+  for name, inputs, predict_fn in settings(model, max_boxes):
+    for batch_size in FLAGS.batch_sizes:
+      batch_size = int(batch_size)
+      times = time_fn(predict_fn, batch_size)
+      frames = batch_size / np.mean(times)
+      print(f'{name:>14} | {batch_size:5d} | {inputs:6d} | '
+            f'{np.mean(times) * 1000:10.1f} | {frames:10.1f} | '
+            f'{frames * inputs:10.1f}')
+
+
+if __name__ == '__main__':
+  app.run(main)
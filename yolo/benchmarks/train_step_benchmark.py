@@ -0,0 +1,116 @@
+"""CPU step time of YoloTask.train_step and validation_step, XLA on and off.
+
+With --ema_update_every set, the train step is also timed with a moving
+average of the weights, to show the overhead of the ema update.
+
+python3 -m yolo.benchmarks.train_step_benchmark --base v4tiny --size 416 \
+  --batch_size 4 --steps 20 --ema_update_every 1
+"""
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from yolo.configs import yolo as exp_cfg
+from yolo.tasks.yolo import YoloTask
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string("base", default="v4tiny", help="yolo model to benchmark")
+flags.DEFINE_integer("size", default=416, help="square input resolution")
+flags.DEFINE_integer("batch_size", default=4, help="images per step")
+flags.DEFINE_integer("steps", default=20, help="timed steps per setting")
+flags.DEFINE_integer("warmup", default=3, help="untimed steps per setting")
+flags.DEFINE_integer(
+    "ema_update_every",
+    default=0,
+    help="also time the train step with an ema updated this often, 0 is off")
+
+
+def synthetic_batch(task, batch_size, size, num_classes=80, fill=0.01):
+  """Random images with a sparse grid label for every output level."""
+  image = tf.random.uniform([batch_size, size, size, 3])
+  grid = {}
+  for key, mask in task._masks.items():
+    width = size // 2**int(key)
+    shape = [batch_size, width, width, len(mask)]
+    conf = tf.cast(tf.random.uniform(shape + [1]) < fill, tf.float32)
+    box = tf.random.uniform(shape + [4], 0.05, 0.95)
+    cls = tf.cast(
+        tf.random.uniform(shape + [1], maxval=num_classes, dtype=tf.int32),
+        tf.float32)
+    grid[key] = tf.concat([box * conf, conf, cls * conf], axis=-1)
+
+  label = {
+      "grid_form": grid,
+      "bbox": tf.random.uniform([batch_size, 1, 4]),
+      "source_id": tf.zeros([batch_size], tf.int64)
+  }
+  return image, label
+
+
+def time_step(step_fn, inputs, steps, warmup):
+  for _ in range(warmup):
+    tf.nest.map_structure(lambda x: x.numpy(), step_fn(inputs))
+  times = []
+  for _ in range(steps):
+    start = time.time()
+    tf.nest.map_structure(lambda x: x.numpy(), step_fn(inputs))
+    times.append(time.time() - start)
+  return np.array(times) * 1000
+
+
+def run(jit_compile, ema_update_every=0):
+  config = exp_cfg.YoloTask(
+      model=exp_cfg.Yolo(base=FLAGS.base, min_level=4),
+      load_darknet_weights=False,
+      jit_compile=jit_compile,
+      ema=exp_cfg.ModelEMA(
+          enable=ema_update_every > 0, update_every=max(ema_update_every, 1)))
+  task = YoloTask(config)
+  model = task.build_model()
+  metrics = task.build_metrics(training=True)
+  optimizer = tf.keras.optimizers.SGD(1e-4, momentum=0.9)
+  inputs = synthetic_batch(task, FLAGS.batch_size, FLAGS.size)
+
+  @tf.function
+  def train_fn(inputs):
+    return task.train_step(inputs, model, optimizer, metrics=metrics)
+
+  @tf.function
+  def eval_fn(inputs):
+    image, label = inputs
+    grid = {"grid_form": label["grid_form"]}
+    raw, loss, _ = task._jit(task._compute_raw_outputs)(image, grid, model)
+    return model.filter(raw), loss
+
+  train = time_step(train_fn, inputs, FLAGS.steps, FLAGS.warmup)
+  evaluate = time_step(eval_fn, inputs, FLAGS.steps, FLAGS.warmup)
+  return train, evaluate
+
+
+def report(name, times):
+  print(f"{name:>12} | mean {np.mean(times):8.1f} ms | "
+        f"p50 {np.percentile(times, 50):8.1f} ms | "
+        f"p90 {np.percentile(times, 90):8.1f} ms")
+
+
+def main(_):
+  tf.config.set_visible_devices([], "GPU")
+  for jit_compile in [False, True]:
+    train, evaluate = run(jit_compile)
+    tag = "xla" if jit_compile else "no xla"
+    report(f"train {tag}", train)
+    report(f"eval {tag}", evaluate)
+
+    if FLAGS.ema_update_every > 0:
+      ema_train, _ = run(jit_compile, FLAGS.ema_update_every)
+      report(f"train {tag} ema", ema_train)
+      overhead = np.mean(ema_train) / np.mean(train) - 1
+      print(f"{'ema overhead':>12} | {overhead * 100:8.1f} % of the train step")
+
+
+if __name__ == "__main__":
+  app.run(main)
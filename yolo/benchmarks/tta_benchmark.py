@@ -0,0 +1,108 @@
+"""Latency and mAP of test time augmentation on the validation data.
+
+The validation data of a config is evaluated with the plain model and with
+every TTA setting, the step time (forward pass, box restoring and fusion) is
+reported next to the AP, so the cost of each setting can be weighed against
+its gain. The APs come from the StreamingCOCOEvaluator on the dataloader
+ground truth.
+
+python3 -m yolo.benchmarks.tta_benchmark --experiment=yolo_custom \
+  --config_file=yolo/configs/experiments/yolov4-eval.yaml \
+  --checkpoint=/models/yolov4/ckpt-1000 --steps 100 --scales 0.83,1.0,1.17
+"""
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from official.core import task_factory
+from official.core import train_utils
+# pylint: disable=unused-import
+from yolo.common import registry_imports
+# pylint: enable=unused-import
+from yolo.evaluation import streaming_coco_evaluator
+from yolo.modeling import test_time_augmentation
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('experiment', default='yolo_custom', help='experiment')
+flags.DEFINE_multi_string('config_file', default=[], help='config overrides')
+flags.DEFINE_string(
+    'params_override', default='', help='overrides on top of config_file')
+flags.DEFINE_string(
+    'checkpoint', default=None, help='weights to evaluate, random if unset')
+flags.DEFINE_integer('steps', default=50, help='validation batches to run')
+flags.DEFINE_list(
+    'scales', default=['0.83', '1.0', '1.17'], help='scales of the multi scale'
+    ' settings')
+flags.DEFINE_float(
+    'iou_thresh', default=0.55, help='iou at which boxes are merged')
+
+
+def settings():
+  """(name, tta kwargs) of every setting, None is the plain model."""
+  scales = [float(scale) for scale in FLAGS.scales]
+  return [
+      ('no tta', None),
+      ('flip nms', dict(scales=[1.0], flip=True, fusion='nms')),
+      ('flip wbf', dict(scales=[1.0], flip=True, fusion='wbf')),
+      ('scales wbf', dict(scales=scales, flip=False, fusion='wbf')),
+      ('scales flip wbf', dict(scales=scales, flip=True, fusion='wbf')),
+  ]
+
+
+def evaluate(task, dataset, predict_fn):
+  """Mean step time in ms, after the first step, and the metrics."""
+  evaluator = streaming_coco_evaluator.StreamingCOCOEvaluator(
+      num_classes=task.task_config.model.num_classes)
+
+  @tf.function
+  def step(image, label):
+    y_pred = predict_fn(image)
+    return task._coco_outputs(image, label, y_pred)  # pylint: disable=protected-access
+
+  times = []
+  for i, (image, label) in enumerate(dataset.take(FLAGS.steps + 1)):
+    start = time.time()
+    groundtruths, predictions = tf.nest.map_structure(lambda x: x.numpy(),
+                                                      step(image, label))
+    if i > 0:
+      times.append((time.time() - start) * 1000)
+    evaluator.update_state(groundtruths, predictions)
+  return np.mean(times), evaluator.result()
+
+
+def main(_):
+  config = train_utils.ParseConfigOptions(
+      experiment=FLAGS.experiment,
+      config_file=FLAGS.config_file,
+      params_override=FLAGS.params_override)
+  params = train_utils.parse_configuration(config)
+  task = task_factory.get_task(params.task)
+  model = task.build_model()
+  if FLAGS.checkpoint:
+    tf.train.Checkpoint(model=model).restore(FLAGS.checkpoint).expect_partial()
+  dataset = task.build_inputs(params.task.validation_data)
+  max_boxes = params.task.model.filter.max_boxes
+
+  baseline = None
+  print(f"{'setting':>16} | {'ms / batch':>10} | {'AP':>6} | {'AP50':>6} | "
+        f"{'d AP':>6} | {'slowdown':>8}")
+  for name, kwargs in settings():
+    if kwargs is None:
+      predict_fn = lambda image: model(image, training=False)
+    else:
+      predict_fn = test_time_augmentation.YoloTTA(
+          model, iou_thresh=FLAGS.iou_thresh, max_boxes=max_boxes, **kwargs)
+    latency, metrics = evaluate(task, dataset, predict_fn)
+    if baseline is None:
+      baseline = (latency, metrics['AP'])
+    print(f'{name:>16} | {latency:10.1f} | {metrics["AP"]:6.3f} | '
+          f'{metrics["AP50"]:6.3f} | {metrics["AP"] - baseline[1]:+6.3f} | '
+          f'{latency / baseline[0]:7.2f}x')
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -12,20 +12,51 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ==============================================================================
-"""All necessary imports for registration."""
+"""All necessary imports for registration.
+
+The experiments, tasks and backbones of the project are registered by the
+modules that define them. Importing this module only records which module
+registers each of them; a module is imported the first time one of its
+entries is looked up, so a binary does not pay for the models it never builds.
+Every entry a listed module registers has to be listed, see
+registry_imports_test.py.
+
+The nlp and mock experiments of official.common.registry_imports are not
+registered here. The yolo, centernet, fixefficientnet and panoptic train
+binaries only run the experiments above; a binary that needs the others
+imports official.common.registry_imports.
+"""
 
 # pylint: disable=unused-import
-from official.common import registry_imports
-
-import yolo
-from yolo.modeling.backbones import darknet
-from yolo.configs import darknet_classification
-from yolo.configs import yolo
-from yolo.configs.yolo import yolo_custom
-from yolo.configs.darknet_classification import image_classification
-from yolo.configs.darknet_classification import ImageClassificationTask
-from yolo.configs.yolo import YoloTask
-
-from yolo.tasks.image_classification import ImageClassificationTask
-from yolo.tasks.yolo import YoloTask
-from yolo.tasks.yolo_subdiv import YoloSubDivTask
+from official.core import exp_factory
+from official.core import task_factory
+from official.vision import beta
+from official.vision.beta.modeling.backbones import factory as backbone_factory
+
+EXPERIMENTS = {
+    'darknet_classification': 'yolo.configs.darknet_classification',
+    'yolo_custom': 'yolo.configs.yolo',
+    'yolo_subdiv_custom': 'yolo.configs.yolo',
+}
+
+TASKS = {
+    'yolo.configs.darknet_classification.ImageClassificationTask':
+        'yolo.tasks.image_classification',
+    'yolo.configs.yolo.YoloTask':
+        'yolo.tasks.yolo',
+    'yolo.configs.yolo.YoloSubDivTask':
+        'yolo.tasks.yolo_subdiv',
+}
+
+BACKBONES = {
+    'darknet': 'yolo.modeling.backbones.darknet',
+}
+
+for name, module_name in EXPERIMENTS.items():
+  exp_factory.register_config_factory_module(name, module_name)
+
+for config_cls_path, module_name in TASKS.items():
+  task_factory.register_task_cls_module(config_cls_path, module_name)
+
+for key, module_name in BACKBONES.items():
+  backbone_factory.register_backbone_builder_module(key, module_name)
@@ -0,0 +1,70 @@
+"""Tests for the lazy registrations of yolo.common.registry_imports."""
+import collections
+import importlib
+
+import tensorflow as tf
+
+from official.core import config_definitions as cfg
+from official.core import exp_factory
+from official.core import registry
+from official.core import task_factory
+from official.vision.beta.modeling.backbones import factory as backbone_factory
+from yolo.common import registry_imports
+
+
+def _registered_by(collection, module_name):
+  """The entries of `collection` that `module_name` registered itself."""
+  return {
+      key: value
+      for key, value in collection.items()
+      if getattr(value, '__module__', None) == module_name
+  }
+
+
+def _by_module(entries):
+  keys = collections.defaultdict(list)
+  for key, module_name in entries.items():
+    keys[module_name].append(key)
+  return keys
+
+
+class RegistryImportsTest(tf.test.TestCase):
+
+  def test_experiments(self):
+    for name in registry_imports.EXPERIMENTS:
+      self.assertIsInstance(
+          exp_factory.get_exp_config(name), cfg.ExperimentConfig)
+    # An experiment a module registers but the list misses would only be
+    # found after the module was imported for another one.
+    for module_name, names in _by_module(registry_imports.EXPERIMENTS).items():
+      importlib.import_module(module_name)
+      self.assertCountEqual(
+          _registered_by(exp_factory._REGISTERED_CONFIGS, module_name), names)
+
+  def test_tasks(self):
+    for config_cls_path in registry_imports.TASKS:
+      config_module, config_cls_name = config_cls_path.rsplit('.', 1)
+      config_cls = getattr(
+          importlib.import_module(config_module), config_cls_name)
+      self.assertTrue(callable(task_factory.get_task_cls(config_cls)))
+
+    for module_name, paths in _by_module(registry_imports.TASKS).items():
+      importlib.import_module(module_name)
+      registered = _registered_by(task_factory._REGISTERED_TASK_CLS,
+                                  module_name)
+      self.assertCountEqual(
+          [task_factory._class_path(config_cls) for config_cls in registered],
+          paths)
+
+  def test_backbones(self):
+    collection = backbone_factory._REGISTERED_BACKBONE_CLS
+    for key in registry_imports.BACKBONES:
+      self.assertTrue(callable(registry.lookup(collection, key)))
+
+    for module_name, keys in _by_module(registry_imports.BACKBONES).items():
+      importlib.import_module(module_name)
+      self.assertCountEqual(_registered_by(collection, module_name), keys)
+
+
+if __name__ == '__main__':
+  tf.test.main()
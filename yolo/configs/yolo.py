@@ -155,12 +155,40 @@ class Parser(hyperparams.Config):
   pct_rand: float = 0.5
   letter_box: bool = True
   cutmix: bool = False
+  mosaic: bool = False
   aug_rand_saturation: bool = True
   aug_rand_brightness: bool = True
   aug_rand_zoom: bool = True
   aug_rand_hue: bool = True
+  aug_rand_blur: bool = True
   seed: int = 10
   use_tie_breaker: bool = True
+  # fixed resolution buckets for multi scale training, held for
+  # multi_scale_interval batches each, replaces the random rescale if set
+  multi_scale_resolutions: Optional[List[int]] = None
+  multi_scale_interval: int = 10
+  # the records were written by yolo/utils/precompute_targets.py
+  precomputed_targets: bool = False
+
+
+@dataclasses.dataclass
+class SyntheticData(hyperparams.Config):
+  # random coco shaped examples in place of input_path and tfds_name, see
+  # yolo/dataloaders/synthetic_coco.py
+  enable: bool = False
+  num_examples: int = 1024
+  # the classes of the model if None
+  num_classes: Optional[int] = None
+  min_image_size: int = 320
+  max_image_size: int = 640
+  # boxes per image, 'poisson', 'uniform' or 'fixed' around mean_boxes
+  box_count: str = 'poisson'
+  mean_boxes: float = 7.0
+  max_boxes: int = 50
+  # box height and width, relative to the image
+  min_box_size: float = 0.02
+  max_box_size: float = 0.5
+  seed: int = 1
 
 
 @dataclasses.dataclass
@@ -176,6 +204,7 @@ class DataConfig(cfg.DataConfig):
   parser: Parser = Parser()
   shuffle_buffer_size: int = 10000
   tfds_download: bool = True
+  synthetic: SyntheticData = SyntheticData()
 
 
 @dataclasses.dataclass
@@ -236,6 +265,26 @@ class Yolo(ModelConfig):
   ])
 
 
+@dataclasses.dataclass
+class ModelEMA(hyperparams.Config):
+  enable: bool = False
+  decay: float = 0.9999
+  # steps between two updates of the average
+  update_every: int = 1
+  warmup_steps: int = 2000
+
+
+@dataclasses.dataclass
+class TestTimeAugmentation(hyperparams.Config):
+  enable: bool = False
+  # resize factors of the image, [1.0] if None
+  scales: Optional[List[float]] = None
+  flip: bool = True
+  # 'wbf' or 'nms'
+  fusion: str = 'wbf'
+  iou_thresh: float = 0.55
+
+
 # model task
 @dataclasses.dataclass
 class YoloTask(cfg.TaskConfig):
@@ -246,6 +295,17 @@ class YoloTask(cfg.TaskConfig):
   annotation_file: Optional[str] = None
   gradient_clip_norm: float = 0.0
   per_category_metrics: bool = False
+  # match detections per batch and keep score histograms instead of running
+  # pycocotools at the end, uses the dataloader ground truth, not
+  # annotation_file
+  streaming_eval: bool = False
+  # compile the forward, loss and gradient computation with XLA
+  jit_compile: bool = False
+  # moving average of the weights, used for validation, export and saved with
+  # the checkpoints
+  ema: ModelEMA = ModelEMA()
+  # predict the validation detections with flips and scales in one batch
+  tta: TestTimeAugmentation = TestTimeAugmentation()
 
   load_darknet_weights: bool = True
   darknet_load_decoder: bool = True
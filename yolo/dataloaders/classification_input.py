@@ -2,13 +2,14 @@
 
 # Import libraries
 import tensorflow as tf
-import tensorflow_datasets as tfds
-import tensorflow_addons as tfa
 
+from official.utils.misc import lazy_loader
 from official.vision.beta.dataloaders import parser
 from official.vision.beta.ops import preprocess_ops
 from yolo.ops import preprocessing_ops
 
+tfa = lazy_loader.LazyModule('tensorflow_addons')
+
 # def rand_uniform_strong(minval, maxval, dtype = tf.float32):
 #   if minval > maxval:
 #     minval, maxval = maxval, minval
@@ -0,0 +1,81 @@
+"""Decoder for records that carry precomputed Yolo grid targets.
+
+The records are written by yolo/utils/precompute_targets.py. Next to the image
+and the ground truth of the example, they hold the sparse grid targets of
+every output level:
+
+  yolo/targets/{level}/index: int64 list, the [y, x, anchor] cell per target.
+  yolo/targets/{level}/value: float list, the [x, y, w, h, 1, class] per
+    target.
+
+The decoded tensors follow MSCOCODecoder, with the int64 image id as the
+source_id, plus a `groundtruth_targets` dict of
+{level: {'index': [n, 3], 'value': [n, 6]}} for Parser to scatter into grids.
+"""
+import tensorflow as tf
+
+from official.vision.beta.dataloaders import decoder
+
+
+def target_keys(level):
+  return f'yolo/targets/{level}/index', f'yolo/targets/{level}/value'
+
+
+class PrecomputedDecoder(decoder.Decoder):
+  """Tensorflow Example proto decoder for precomputed targets."""
+
+  def __init__(self, levels):
+    self._levels = [str(level) for level in levels]
+    self._keys_to_features = {
+        'image/encoded': tf.io.FixedLenFeature((), tf.string),
+        'image/source_id': tf.io.FixedLenFeature((), tf.int64),
+        'image/object/bbox': tf.io.VarLenFeature(tf.float32),
+        'image/object/class/label': tf.io.VarLenFeature(tf.int64),
+        'image/object/area': tf.io.VarLenFeature(tf.float32),
+        'image/object/is_crowd': tf.io.VarLenFeature(tf.int64),
+    }
+    for level in self._levels:
+      index_key, value_key = target_keys(level)
+      self._keys_to_features[index_key] = tf.io.VarLenFeature(tf.int64)
+      self._keys_to_features[value_key] = tf.io.VarLenFeature(tf.float32)
+
+  def decode(self, serialized_example):
+    """Decode the serialized example.
+    Args:
+      serialized_example: a single serialized tf.Example string.
+    Returns:
+      decoded_tensors: a dictionary of tensors with the fields of
+        MSCOCODecoder and groundtruth_targets.
+    """
+    parsed_tensors = tf.io.parse_single_example(
+        serialized=serialized_example, features=self._keys_to_features)
+    for k in parsed_tensors:
+      if isinstance(parsed_tensors[k], tf.SparseTensor):
+        parsed_tensors[k] = tf.sparse.to_dense(parsed_tensors[k])
+
+    image = tf.io.decode_image(
+        parsed_tensors['image/encoded'], channels=3, expand_animations=False)
+    image.set_shape([None, None, 3])
+
+    targets = {}
+    for level in self._levels:
+      index_key, value_key = target_keys(level)
+      targets[level] = {
+          'index': tf.reshape(parsed_tensors[index_key], [-1, 3]),
+          'value': tf.reshape(parsed_tensors[value_key], [-1, 6])
+      }
+
+    decoded_tensors = {
+        'source_id': parsed_tensors['image/source_id'],
+        'image': image,
+        'width': tf.shape(image)[1],
+        'height': tf.shape(image)[0],
+        'groundtruth_classes': parsed_tensors['image/object/class/label'],
+        'groundtruth_is_crowd': tf.cast(
+            parsed_tensors['image/object/is_crowd'], tf.bool),
+        'groundtruth_area': parsed_tensors['image/object/area'],
+        'groundtruth_boxes': tf.reshape(
+            parsed_tensors['image/object/bbox'], [-1, 4]),
+        'groundtruth_targets': targets,
+    }
+    return decoded_tensors
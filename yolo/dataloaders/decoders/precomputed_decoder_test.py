@@ -0,0 +1,57 @@
+from yolo.dataloaders.decoders import precomputed_decoder
+from yolo.utils import precompute_targets
+
+import numpy as np
+import tensorflow as tf
+
+
+class PrecomputedDecoderTest(tf.test.TestCase):
+
+  def test_round_trip(self):
+    image = np.zeros([8, 12, 3], np.uint8)
+    encoded = tf.io.encode_jpeg(image, quality=100).numpy()
+    data = {
+        'source_id': np.int64(397133),
+        'groundtruth_boxes': np.array([[0.1, 0.2, 0.5, 0.6]], np.float32),
+        'groundtruth_classes': np.array([3], np.int64),
+        'groundtruth_area': np.array([12.0], np.float32),
+        'groundtruth_is_crowd': np.array([False]),
+    }
+    targets = {
+        '3': {
+            'index': np.array([[1, 2, 0]], np.int64),
+            'value': np.array([[0.4, 0.3, 0.4, 0.4, 1.0, 3.0]], np.float32)
+        }
+    }
+    example = precompute_targets.to_example(encoded, data, targets)
+
+    decoder = precomputed_decoder.PrecomputedDecoder([3])
+    decoded = decoder.decode(example.SerializeToString())
+    # the source id matches the int64 image/id of MSCOCODecoder
+    self.assertEqual(decoded['source_id'].dtype, tf.int64)
+    self.assertEqual(int(decoded['source_id']), 397133)
+    self.assertAllEqual(decoded['image'].shape, [8, 12, 3])
+    self.assertAllClose(decoded['groundtruth_boxes'],
+                        data['groundtruth_boxes'])
+    self.assertAllEqual(decoded['groundtruth_classes'], [3])
+    self.assertAllEqual(decoded['groundtruth_targets']['3']['index'],
+                        targets['3']['index'])
+    self.assertAllClose(decoded['groundtruth_targets']['3']['value'],
+                        targets['3']['value'])
+
+  def test_generated_source_id(self):
+    # examples without image/id carry the hash of the image as a string
+    data = {
+        'source_id': b'1234567',
+        'groundtruth_boxes': np.zeros([0, 4], np.float32),
+        'groundtruth_classes': np.zeros([0], np.int64),
+        'groundtruth_area': np.zeros([0], np.float32),
+        'groundtruth_is_crowd': np.zeros([0], bool),
+    }
+    example = precompute_targets.to_example(b'', data, {})
+    source_id = example.features.feature['image/source_id']
+    self.assertEqual(list(source_id.int64_list.value), [1234567])
+
+
+if __name__ == '__main__':
+  tf.test.main()
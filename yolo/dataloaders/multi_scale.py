@@ -0,0 +1,125 @@
+"""Bucketed multi scale training.
+
+Instead of drawing a new input size for every batch, the size is picked from a
+fixed set of resolution buckets and held for `interval` batches. The bucket of
+a batch only depends on its index and the seed, so every input pipeline of a
+distributed job agrees on it, and the step functions only ever see as many
+input shapes as there are buckets.
+"""
+import functools
+import time
+
+import tensorflow as tf
+
+
+class MultiScaleScheduler(object):
+  """Picks the input resolution of each batch from a fixed set of buckets.
+
+  Args:
+    resolutions: list of ints, the square input sizes to train on.
+    interval: int, number of batches to keep a resolution for.
+    seed: int, seed of the bucket sequence.
+    down_scale: int, every resolution is rounded down to a multiple of this.
+  """
+
+  def __init__(self, resolutions, interval=10, seed=10, down_scale=32):
+    if not resolutions:
+      raise ValueError('at least one multi scale resolution is needed')
+    if interval <= 0:
+      raise ValueError(f'multi scale interval has to be positive, got {interval}')
+    resolutions = sorted({(r // down_scale) * down_scale for r in resolutions})
+    if resolutions[0] <= 0:
+      raise ValueError(f'resolutions have to be at least {down_scale}')
+
+    self._resolutions = resolutions
+    self._interval = interval
+    self._seed = seed
+    return
+
+  @property
+  def resolutions(self):
+    return self._resolutions
+
+  @property
+  def interval(self):
+    return self._interval
+
+  def resolution(self, step):
+    """Resolution for the batch at `step`, usable in and out of tf.data."""
+    step = tf.cast(step, tf.int64)
+    block = step // self._interval
+    seed = tf.stack([tf.constant(self._seed, tf.int64), block])
+    index = tf.random.stateless_uniform([],
+                                        seed=seed,
+                                        minval=0,
+                                        maxval=len(self._resolutions),
+                                        dtype=tf.int32)
+    return tf.gather(tf.constant(self._resolutions, tf.int32), index)
+
+  def apply(self, dataset, postprocess_fn):
+    """Maps a batched dataset through postprocess_fn at the scheduled sizes.
+
+    Args:
+      dataset: a batched tf.data.Dataset of (image, label).
+      postprocess_fn: callable (image, label, width) -> (image, label).
+
+    Returns:
+      the mapped tf.data.Dataset.
+    """
+
+    def _map(step, batch):
+      image, label = batch
+      return postprocess_fn(image, label, width=self.resolution(step))
+
+    return dataset.enumerate().map(
+        _map, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+
+class TraceStats(object):
+  """Counts the traces of the functions it wraps and the time spent in them.
+
+  The counters are variables, the python side effects only run while a
+  function is being traced, so they are bumped eagerly from the init scope and
+  can then be read as tensors from inside the traced step, for example to be
+  written as summaries.
+  """
+
+  def __init__(self, name='trace'):
+    self._name = name
+    self._count = tf.Variable(
+        0,
+        dtype=tf.int64,
+        trainable=False,
+        aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA,
+        name=f'{name}_count')
+    self._seconds = tf.Variable(
+        0.0,
+        dtype=tf.float32,
+        trainable=False,
+        aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA,
+        name=f'{name}_seconds')
+    return
+
+  def wrap(self, fn):
+
+    @functools.wraps(fn)
+    def traced(*args, **kwargs):
+      start = time.time()
+      outputs = fn(*args, **kwargs)
+      if not tf.executing_eagerly():
+        with tf.init_scope():
+          self._count.assign_add(1)
+          self._seconds.assign_add(time.time() - start)
+      return outputs
+
+    return traced
+
+  def write_summaries(self):
+    tf.summary.scalar(f'{self._name}_count', self._count)
+    tf.summary.scalar(f'{self._name}_seconds', self._seconds)
+
+  def result(self):
+    return {
+        f'{self._name}_count': int(self._count.numpy()),
+        f'{self._name}_seconds': float(self._seconds.numpy())
+    }
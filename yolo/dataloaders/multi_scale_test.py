@@ -0,0 +1,61 @@
+from yolo.dataloaders import multi_scale
+
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+class MultiScaleTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_resolutions_are_rounded(self):
+    scheduler = multi_scale.MultiScaleScheduler([608, 416, 420, 320])
+    self.assertAllEqual(scheduler.resolutions, [320, 416, 608])
+
+  @parameterized.parameters((1,), (10,))
+  def test_bucket_is_held_for_interval(self, interval):
+    scheduler = multi_scale.MultiScaleScheduler([320, 416, 512, 608],
+                                                interval=interval)
+    sizes = [int(scheduler.resolution(step)) for step in range(8 * interval)]
+    for block in range(8):
+      held = sizes[block * interval:(block + 1) * interval]
+      self.assertLen(set(held), 1)
+    self.assertContainsSubset(set(sizes), set(scheduler.resolutions))
+
+    # the sequence only depends on the step and the seed
+    again = multi_scale.MultiScaleScheduler([320, 416, 512, 608],
+                                            interval=interval)
+    self.assertAllEqual(sizes, [
+        int(again.resolution(step)) for step in range(8 * interval)])
+
+  def test_apply(self):
+    scheduler = multi_scale.MultiScaleScheduler([64, 96, 128], interval=2)
+
+    def postprocess_fn(image, label, width=None):
+      image = tf.image.resize(image, (width, width))
+      return image, label
+
+    dataset = tf.data.Dataset.from_tensor_slices(
+        (tf.zeros([12, 32, 32, 3]), tf.range(12))).batch(2)
+    dataset = scheduler.apply(dataset, postprocess_fn)
+    for step, (image, _) in enumerate(dataset):
+      width = int(scheduler.resolution(step))
+      self.assertAllEqual(image.shape, [2, width, width, 3])
+
+  def test_trace_stats_count_traces(self):
+    stats = multi_scale.TraceStats()
+    fn = tf.function(stats.wrap(lambda x: x * 2))
+    for size in [4, 4, 8, 4, 16]:
+      fn(tf.zeros([size]))
+    self.assertEqual(stats.result()['trace_count'], 3)
+    self.assertGreaterEqual(stats.result()['trace_seconds'], 0.0)
+
+  def test_invalid_arguments(self):
+    with self.assertRaises(ValueError):
+      multi_scale.MultiScaleScheduler([])
+    with self.assertRaises(ValueError):
+      multi_scale.MultiScaleScheduler([416], interval=0)
+    with self.assertRaises(ValueError):
+      multi_scale.MultiScaleScheduler([16])
+
+
+if __name__ == '__main__':
+  tf.test.main()
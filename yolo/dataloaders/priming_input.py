@@ -2,8 +2,6 @@
 
 # Import libraries
 import tensorflow as tf
-import tensorflow_datasets as tfds
-import tensorflow_addons as tfa
 
 from official.vision.beta.dataloaders import parser
 
@@ -0,0 +1,207 @@
+"""Random COCO shaped examples, to run the input pipeline and training offline.
+
+The examples have the structure of the tfds coco dataset, so they go through
+MSCOCODecoder and the Parser like the real data:
+
+  image: uint8 [height, width, 3] of random pixels.
+  image/id: int64, the index of the example.
+  objects/bbox: float32 [n, 4] normalized [ymin, xmin, ymax, xmax].
+  objects/label: int64 [n].
+  objects/area: int64 [n], in pixels.
+  objects/is_crowd: bool [n], always False.
+  objects/id: int64 [n].
+
+Every example is generated from its index with stateless random ops, so a
+source always yields the same examples in the same order, and can be sharded,
+repeated and mapped in parallel like a file based dataset. The data configs
+turn it on with `synthetic.enable`:
+
+  train_data:
+    synthetic:
+      enable: true
+      num_examples: 10000
+      mean_boxes: 7
+"""
+import tensorflow as tf
+
+# the input_path the InputReader is handed for a synthetic source, it is never
+# opened, SyntheticCOCO.dataset_fn ignores it
+SYNTHETIC_INPUT_PATH = 'synthetic'
+
+BOX_COUNTS = ('poisson', 'uniform', 'fixed')
+
+
+class SyntheticCOCO(object):
+  """A source of random tfds coco shaped examples.
+
+  Args:
+    num_examples: `int` number of examples of one pass.
+    num_classes: `int` labels are drawn uniformly from [0, num_classes).
+    min_image_size: `int` smallest height and width of an image.
+    max_image_size: `int` largest height and width of an image, the two are
+      drawn independently, equal sizes give a fixed image size.
+    box_count: `str` distribution of the number of boxes per image, one of
+      'poisson' with mean `mean_boxes`, 'uniform' over [0, 2 * mean_boxes] or
+      'fixed' to always use `mean_boxes`.
+    mean_boxes: `float` mean number of boxes per image.
+    max_boxes: `int` the number of boxes is clipped to this.
+    min_box_size: `float` smallest height and width of a box, relative to the
+      image.
+    max_box_size: `float` largest height and width of a box, relative to the
+      image.
+    seed: `int` seed of the examples.
+  """
+
+  def __init__(self,
+               num_examples=1024,
+               num_classes=80,
+               min_image_size=320,
+               max_image_size=640,
+               box_count='poisson',
+               mean_boxes=7.0,
+               max_boxes=50,
+               min_box_size=0.02,
+               max_box_size=0.5,
+               seed=1):
+    if num_examples <= 0:
+      raise ValueError(f'num_examples has to be positive, got {num_examples}')
+    if num_classes <= 0:
+      raise ValueError(f'num_classes has to be positive, got {num_classes}')
+    if not 0 < min_image_size <= max_image_size:
+      raise ValueError('image sizes have to satisfy 0 < min <= max, got '
+                       f'{min_image_size} and {max_image_size}')
+    if box_count not in BOX_COUNTS:
+      raise ValueError(f'box_count has to be one of {BOX_COUNTS}, got '
+                       f'{box_count}')
+    if mean_boxes < 0 or max_boxes < 0:
+      raise ValueError('the number of boxes can not be negative')
+    if not 0.0 < min_box_size <= max_box_size <= 1.0:
+      raise ValueError('box sizes have to satisfy 0 < min <= max <= 1, got '
+                       f'{min_box_size} and {max_box_size}')
+
+    self._num_examples = num_examples
+    self._num_classes = num_classes
+    self._min_image_size = min_image_size
+    self._max_image_size = max_image_size
+    self._box_count = box_count
+    self._mean_boxes = float(mean_boxes)
+    self._max_boxes = max_boxes
+    self._min_box_size = min_box_size
+    self._max_box_size = max_box_size
+    self._seed = seed
+    return
+
+  @classmethod
+  def from_config(cls, params, num_classes):
+    """Builds the source of a SyntheticData config.
+
+    Args:
+      params: a `SyntheticData` config.
+      num_classes: `int` classes of the model, used unless the config sets its
+        own.
+    """
+    return cls(
+        num_examples=params.num_examples,
+        num_classes=params.num_classes or num_classes,
+        min_image_size=params.min_image_size,
+        max_image_size=params.max_image_size,
+        box_count=params.box_count,
+        mean_boxes=params.mean_boxes,
+        max_boxes=params.max_boxes,
+        min_box_size=params.min_box_size,
+        max_box_size=params.max_box_size,
+        seed=params.seed)
+
+  @property
+  def num_examples(self):
+    return self._num_examples
+
+  def _seed_for(self, index, component):
+    # one independent stream of random values per part of an example
+    return tf.stack(
+        [tf.constant(self._seed * 8 + component, tf.int64),
+         tf.cast(index, tf.int64)])
+
+  def _num_boxes(self, index):
+    seed = self._seed_for(index, 0)
+    if self._box_count == 'poisson':
+      count = tf.random.stateless_poisson([],
+                                          seed=seed,
+                                          lam=self._mean_boxes,
+                                          dtype=tf.int32)
+    elif self._box_count == 'uniform':
+      count = tf.random.stateless_uniform([],
+                                          seed=seed,
+                                          minval=0,
+                                          maxval=int(2 * self._mean_boxes) + 1,
+                                          dtype=tf.int32)
+    else:
+      count = tf.constant(int(round(self._mean_boxes)), tf.int32)
+    return tf.clip_by_value(count, 0, self._max_boxes)
+
+  def example(self, index):
+    """The example at index, as a tfds coco feature dict."""
+    index = tf.cast(index, tf.int64)
+    size = tf.random.stateless_uniform([2],
+                                       seed=self._seed_for(index, 1),
+                                       minval=self._min_image_size,
+                                       maxval=self._max_image_size + 1,
+                                       dtype=tf.int32)
+    image = tf.random.stateless_uniform(
+        tf.concat([size, [3]], axis=0),
+        seed=self._seed_for(index, 2),
+        minval=0,
+        maxval=256,
+        dtype=tf.int32)
+    image = tf.cast(image, tf.uint8)
+
+    num_boxes = self._num_boxes(index)
+    hw = tf.random.stateless_uniform([num_boxes, 2],
+                                     seed=self._seed_for(index, 3),
+                                     minval=self._min_box_size,
+                                     maxval=self._max_box_size)
+    # place the top left corner so the box stays inside of the image
+    corner = tf.random.stateless_uniform([num_boxes, 2],
+                                         seed=self._seed_for(index, 4))
+    corner = corner * (1.0 - hw)
+    bbox = tf.concat([corner, corner + hw], axis=-1)
+    labels = tf.random.stateless_uniform([num_boxes],
+                                         seed=self._seed_for(index, 5),
+                                         minval=0,
+                                         maxval=self._num_classes,
+                                         dtype=tf.int64)
+    pixels = tf.cast(size[0] * size[1], tf.float32)
+    area = tf.cast(tf.round(hw[:, 0] * hw[:, 1] * pixels), tf.int64)
+    box_ids = index * self._max_boxes + tf.range(
+        tf.cast(num_boxes, tf.int64), dtype=tf.int64)
+
+    return {
+        'image': image,
+        'image/id': index,
+        'objects': {
+            'bbox': bbox,
+            'label': labels,
+            'area': area,
+            'is_crowd': tf.zeros([num_boxes], tf.bool),
+            'id': box_ids,
+        }
+    }
+
+  def dataset(self):
+    """One pass over the examples, in index order."""
+    return tf.data.Dataset.range(self._num_examples).map(
+        self.example, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+  def dataset_fn(self, filenames):
+    """Stands in for the dataset_fn of an InputReader, filenames are unused."""
+    del filenames
+    return self.dataset()
+
+  def data_config(self, params):
+    """The data config to hand an InputReader that reads from this source.
+
+    The reader is pointed at a placeholder input_path, together with
+    dataset_fn it then shards, repeats and shuffles the synthetic examples
+    the same way as records read from a single file.
+    """
+    return params.replace(input_path=SYNTHETIC_INPUT_PATH, tfds_name='')
@@ -0,0 +1,192 @@
+from yolo.configs import yolo as exp_cfg
+from yolo.dataloaders import synthetic_coco
+from yolo.dataloaders import yolo_input
+from yolo.dataloaders.decoders import tfds_coco_decoder
+from official.core import input_reader
+
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+class SyntheticCOCOTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_example(self):
+    source = synthetic_coco.SyntheticCOCO(
+        num_examples=8,
+        num_classes=5,
+        min_image_size=64,
+        max_image_size=96,
+        max_boxes=12)
+    for index, example in enumerate(source.dataset()):
+      height, width, channels = example['image'].shape
+      self.assertBetween(height, 64, 96)
+      self.assertBetween(width, 64, 96)
+      self.assertEqual(channels, 3)
+      self.assertEqual(example['image'].dtype, tf.uint8)
+      self.assertEqual(int(example['image/id']), index)
+
+      objects = example['objects']
+      bbox = objects['bbox'].numpy()
+      self.assertLessEqual(bbox.shape[0], 12)
+      self.assertAllInRange(bbox, 0.0, 1.0)
+      self.assertAllGreaterEqual(bbox[:, 2:] - bbox[:, :2], 0.02)
+      self.assertAllInRange(objects['label'], 0, 4)
+      self.assertLen(objects['is_crowd'], bbox.shape[0])
+      self.assertLen(objects['area'], bbox.shape[0])
+
+  def test_deterministic(self):
+    first = synthetic_coco.SyntheticCOCO(num_examples=4, max_image_size=320)
+    second = synthetic_coco.SyntheticCOCO(num_examples=4, max_image_size=320)
+    for a, b in zip(first.dataset(), second.dataset()):
+      self.assertAllEqual(a['image'], b['image'])
+      self.assertAllEqual(a['objects']['bbox'], b['objects']['bbox'])
+      self.assertAllEqual(a['objects']['label'], b['objects']['label'])
+
+  @parameterized.parameters(('fixed', 3.0, 3, 3), ('uniform', 2.0, 0, 4),
+                            ('poisson', 40.0, 0, 10))
+  def test_box_count(self, box_count, mean_boxes, low, high):
+    source = synthetic_coco.SyntheticCOCO(
+        num_examples=16,
+        min_image_size=32,
+        max_image_size=32,
+        box_count=box_count,
+        mean_boxes=mean_boxes,
+        max_boxes=10)
+    for example in source.dataset():
+      self.assertBetween(int(tf.shape(example['objects']['bbox'])[0]), low,
+                         high)
+
+  def test_decoder(self):
+    source = synthetic_coco.SyntheticCOCO(
+        num_examples=2, min_image_size=32, max_image_size=48)
+    decoder = tfds_coco_decoder.MSCOCODecoder()
+    for data in source.dataset().map(decoder.decode):
+      num_boxes = tf.shape(data['groundtruth_boxes'])[0]
+      self.assertEqual(data['groundtruth_classes'].shape[0], num_boxes)
+      self.assertEqual(data['groundtruth_is_crowd'].shape[0], num_boxes)
+
+  def test_input_reader(self):
+    params = exp_cfg.DataConfig(
+        is_training=False,
+        global_batch_size=2,
+        synthetic=exp_cfg.SyntheticData(
+            enable=True,
+            num_examples=6,
+            min_image_size=32,
+            max_image_size=32,
+            box_count='fixed',
+            mean_boxes=3))
+    source = synthetic_coco.SyntheticCOCO.from_config(
+        params.synthetic, num_classes=80)
+    reader = input_reader.InputReader(
+        source.data_config(params), dataset_fn=source.dataset_fn)
+    batches = list(reader.read())
+    self.assertLen(batches, 3)
+    self.assertEqual(batches[0]['image'].shape, [2, 32, 32, 3])
+
+  def test_reproducible_parsing(self):
+    # the augmentation is drawn from the example seeds, so two runs with the
+    # same data seed give the same batches
+    params = exp_cfg.DataConfig(
+        is_training=True,
+        global_batch_size=2,
+        shuffle_buffer_size=4,
+        seed=3,
+        synthetic=exp_cfg.SyntheticData(
+            enable=True,
+            num_examples=6,
+            min_image_size=64,
+            max_image_size=96,
+            box_count='fixed',
+            mean_boxes=3))
+    source = synthetic_coco.SyntheticCOCO.from_config(
+        params.synthetic, num_classes=80)
+    masks = {'3': [0, 1, 2], '4': [3, 4, 5], '5': [6, 7, 8]}
+    anchors = [[12, 16], [19, 36], [40, 28], [36, 75], [76, 55], [72, 146],
+               [142, 110], [192, 243], [459, 401]]
+
+    def read():
+      parser = yolo_input.Parser(
+          image_w=64,
+          image_h=64,
+          fixed_size=True,
+          cutmix=False,
+          mosaic=True,
+          aug_rand_blur=False,
+          masks=masks,
+          anchors=anchors)
+      reader = input_reader.InputReader(
+          source.data_config(params),
+          dataset_fn=source.dataset_fn,
+          decoder_fn=tfds_coco_decoder.MSCOCODecoder().decode,
+          parser_fn=parser.parse_fn(True),
+          postprocess_fn=parser.postprocess_fn(True),
+          example_seed_key=yolo_input.EXAMPLE_SEED_KEY)
+      return list(reader.read().take(3))
+
+    for (image_a, label_a), (image_b, label_b) in zip(read(), read()):
+      self.assertAllEqual(image_a, image_b)
+      self.assertAllEqual(label_a['bbox'], label_b['bbox'])
+      self.assertAllEqual(label_a['classes'], label_b['classes'])
+      self.assertNotIn(yolo_input.EXAMPLE_SEED_KEY, label_a)
+
+  def test_fixed_size_multi_scale(self):
+    # with multi scale buckets the fixed size examples are batched before the
+    # grid is built, the targets must match the single resolution ones
+    params = exp_cfg.DataConfig(
+        is_training=True,
+        global_batch_size=2,
+        synthetic=exp_cfg.SyntheticData(
+            enable=True,
+            num_examples=4,
+            min_image_size=64,
+            max_image_size=96,
+            box_count='fixed',
+            mean_boxes=3))
+    source = synthetic_coco.SyntheticCOCO.from_config(
+        params.synthetic, num_classes=80)
+    masks = {'3': [0, 1, 2], '4': [3, 4, 5], '5': [6, 7, 8]}
+    anchors = [[12, 16], [19, 36], [40, 28], [36, 75], [76, 55], [72, 146],
+               [142, 110], [192, 243], [459, 401]]
+
+    def read(multi_scale_resolutions):
+      parser = yolo_input.Parser(
+          image_w=64,
+          image_h=64,
+          fixed_size=True,
+          cutmix=False,
+          mosaic=False,
+          random_flip=False,
+          jitter_im=0.0,
+          jitter_boxes=0.0,
+          pct_rand=0.0,
+          aug_rand_saturation=False,
+          aug_rand_brightness=False,
+          aug_rand_zoom=False,
+          aug_rand_hue=False,
+          aug_rand_blur=False,
+          masks=masks,
+          anchors=anchors,
+          multi_scale_resolutions=multi_scale_resolutions,
+          multi_scale_interval=1)
+      dataset = source.dataset().map(tfds_coco_decoder.MSCOCODecoder().decode)
+      dataset = dataset.map(parser.parse_fn(True))
+      batch_fn = parser.multi_scale_batch_fn(2)
+      if batch_fn is None:
+        return list(dataset.batch(2))
+      return list(batch_fn(dataset))
+
+    for (_, fixed), (image, scaled) in zip(read(None), read([64, 96])):
+      self.assertIn(image.shape[1], [64, 96])
+      self.assertAllClose(scaled['bbox'], fixed['bbox'])
+      self.assertAllEqual(scaled['best_anchors'], fixed['best_anchors'])
+
+  def test_invalid(self):
+    with self.assertRaises(ValueError):
+      synthetic_coco.SyntheticCOCO(box_count='normal')
+    with self.assertRaises(ValueError):
+      synthetic_coco.SyntheticCOCO(min_image_size=64, max_image_size=32)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -5,14 +5,24 @@ into (image, labels) tuple for RetinaNet.
 
 # Import libraries
 import tensorflow as tf
-import tensorflow_addons as tfa
 
+from official.utils.misc import lazy_loader
+from yolo.dataloaders import multi_scale
 from yolo.ops import preprocessing_ops
 from yolo.ops import box_ops as box_utils
 from official.vision.beta.ops import box_ops, preprocess_ops
 from official.vision.beta.dataloaders import parser
 from yolo.ops import loss_utils as loss_ops
 
+tfa = lazy_loader.LazyModule('tensorflow_addons')
+
+# The key of the stateless seed of an example, to hand the InputReader as
+# example_seed_key. The training augmentation of an example is drawn from its
+# seed, and that of a batch from the seed of its first example, so the same
+# data seed reproduces it exactly, whatever the order of the parallel maps.
+# Without the key the parser falls back to the stateful tf.random ops.
+EXAMPLE_SEED_KEY = 'example_seed'
+
 
 def pad_max_instances(value, instances, pad_value=0, pad_axis=0):
   shape = tf.shape(value)
@@ -45,6 +55,7 @@ class Parser(parser.Parser):
                max_level=5,
                masks=None,
                cutmix=True,
+               mosaic=False,
                max_process_size=608,
                min_process_size=320,
                max_num_instances=200,
@@ -54,8 +65,12 @@ class Parser(parser.Parser):
                aug_rand_brightness=True,
                aug_rand_zoom=True,
                aug_rand_hue=True,
+               aug_rand_blur=True,
                anchors=None,
                seed=10,
+               multi_scale_resolutions=None,
+               multi_scale_interval=10,
+               precomputed_targets=False,
                dtype='float32'):
     """Initializes parameters for parsing annotations in the dataset.
     Args:
@@ -83,8 +98,21 @@ class Parser(parser.Parser):
         zoom.
       aug_rand_hue: `bool`, if True, augment training with random
         hue.
+      aug_rand_blur: `bool`, if True, augment training with random
+        gaussian blur.
       anchors: a `Tensor`, `List` or `numpy.ndarrray` for bounding box priors.
-      seed: an `int` for the seed used by tf.random
+      mosaic: a `bool`, if True training batches are mixed into 4 image
+        mosaics, takes the place of cutmix.
+      seed: an `int` for the seed used by tf.random, if the examples have
+        no EXAMPLE_SEED_KEY, and of the multi scale buckets.
+      multi_scale_resolutions: an optional `List` of `int` resolution buckets,
+        if set the training batches are resized to one of these instead of a
+        random multiple of the down scale.
+      multi_scale_interval: an `int` number of batches to keep a bucket for.
+      precomputed_targets: a `bool`, if True the records hold the grid targets
+        from yolo/utils/precompute_targets.py, only usable for fixed size
+        training without geometric or batch augmentation and with pct_rand
+        0. The colour augmentations are still applied.
     """
     self._net_down_scale = 2**max_level
 
@@ -113,11 +141,31 @@ class Parser(parser.Parser):
     self._aug_rand_brightness = aug_rand_brightness
     self._aug_rand_zoom = aug_rand_zoom
     self._aug_rand_hue = aug_rand_hue
+    self._aug_rand_blur = aug_rand_blur
 
     self._seed = seed
     self._cutmix = cutmix
+    self._mosaic = mosaic
     self._fixed_size = fixed_size
 
+    if multi_scale_resolutions:
+      self._multi_scale = multi_scale.MultiScaleScheduler(
+          multi_scale_resolutions,
+          interval=multi_scale_interval,
+          seed=seed,
+          down_scale=self._net_down_scale)
+    else:
+      self._multi_scale = None
+
+    self._precomputed_targets = precomputed_targets
+    if precomputed_targets and (not fixed_size or cutmix or mosaic or
+                                self._multi_scale is not None or random_flip or
+                                self._jitter_boxes or self._jitter_im or
+                                aug_rand_zoom or pct_rand):
+      raise ValueError('precomputed targets need fixed_size and no cutmix, '
+                       'mosaic, multi scale, flip, jitter, zoom or random '
+                       'scale (pct_rand) training')
+
     if dtype == 'float16':
       self._dtype = tf.float16
     elif dtype == 'bfloat16':
@@ -129,100 +177,122 @@ class Parser(parser.Parser):
           'Unsupported datatype used in parser only {float16, bfloat16, or float32}'
       )
 
-  def _build_grid(self, raw_true, width, batch=False, use_tie_breaker=False):
-    mask = self._masks
-    for key in self._masks.keys():
+  def _build_grid(self,
+                  raw_true,
+                  width,
+                  batch=False,
+                  use_tie_breaker=False,
+                  seed=None):
+    mask = {}
+    seeds = preprocessing_ops.split_seed(seed, len(self._masks))
+    for key, level_seed in zip(self._masks.keys(), seeds):
       if not batch:
         mask[key] = preprocessing_ops.build_grided_gt(
             raw_true, self._masks[key], width // 2**int(key), self._num_classes,
-            raw_true['bbox'].dtype, use_tie_breaker)
+            raw_true['bbox'].dtype, use_tie_breaker, level_seed)
       else:
         mask[key] = preprocessing_ops.build_batch_grided_gt(
             raw_true, self._masks[key], width // 2**int(key), self._num_classes,
-            raw_true['bbox'].dtype, use_tie_breaker)
+            raw_true['bbox'].dtype, use_tie_breaker, level_seed)
 
       mask[key] = tf.cast(mask[key], self._dtype)
     return mask
 
-  def _parse_train_data(self, data):
-    """Generates images and labels that are usable for model training.
-        Args:
-          data: a dict of Tensors produced by the decoder.
-        Returns:
-          images: the image tensor.
-          labels: a dict of Tensors that contains labels.
-        """
-
-    image = data['image'] / 255
-
-    # / 255
-    boxes = data['groundtruth_boxes']
-    classes = data['groundtruth_classes']
-
-    do_blur = tf.random.uniform([],
-                                minval=0,
-                                maxval=1,
-                                seed=self._seed,
-                                dtype=tf.float32)
-    if do_blur > 0.9:
-      image = tfa.image.gaussian_filter2d(image, filter_shape=7, sigma=15)
-    elif do_blur > 0.7:
-      image = tfa.image.gaussian_filter2d(image, filter_shape=5, sigma=6)
-    elif do_blur > 0.4:
-      image = tfa.image.gaussian_filter2d(image, filter_shape=5, sigma=3)
+  def _augment_colors(self, image, blur_seed, hue_seed, saturation_seed,
+                      brightness_seed, noise_seed):
+    """Applies the random blur, colour and noise augmentation of an image."""
+    if self._aug_rand_blur:
+      do_blur = preprocessing_ops.random_uniform([],
+                                                 minval=0,
+                                                 maxval=1,
+                                                 seed=blur_seed,
+                                                 dtype=tf.float32)
+      if do_blur > 0.9:
+        image = tfa.image.gaussian_filter2d(image, filter_shape=7, sigma=15)
+      elif do_blur > 0.7:
+        image = tfa.image.gaussian_filter2d(image, filter_shape=5, sigma=6)
+      elif do_blur > 0.4:
+        image = tfa.image.gaussian_filter2d(image, filter_shape=5, sigma=3)
 
     image = tf.image.rgb_to_hsv(image)
     i_h, i_s, i_v = tf.split(image, 3, axis=-1)
     if self._aug_rand_hue:
       delta = preprocessing_ops.rand_uniform_strong(
-          -0.1, 0.1
+          -0.1, 0.1, seed=hue_seed
       )  # tf.random.uniform([], minval= -0.1,maxval=0.1, seed=self._seed, dtype=tf.float32)
       i_h = i_h + delta  # Hue
       i_h = tf.clip_by_value(i_h, 0.0, 1.0)
     if self._aug_rand_saturation:
       delta = preprocessing_ops.rand_scale(
-          0.75
+          0.75, seed=saturation_seed
       )  # tf.random.uniform([], minval= 0.5,maxval=1.1, seed=self._seed, dtype=tf.float32)
       i_s = i_s * delta
     if self._aug_rand_brightness:
       delta = preprocessing_ops.rand_scale(
-          0.75
+          0.75, seed=brightness_seed
       )  # tf.random.uniform([], minval= -0.15,maxval=0.15, seed=self._seed, dtype=tf.float32)
       i_v = i_v * delta
     image = tf.concat([i_h, i_s, i_v], axis=-1)
     image = tf.image.hsv_to_rgb(image)
 
-    stddev = tf.random.uniform([],
-                               minval=0,
-                               maxval=40 / 255,
-                               seed=self._seed,
-                               dtype=tf.float32)
-    noise = tf.random.normal(
-        shape=tf.shape(image), mean=0.0, stddev=stddev, seed=self._seed)
+    stddev_seed, noise_seed = preprocessing_ops.split_seed(noise_seed, 2)
+    stddev = preprocessing_ops.random_uniform([],
+                                              minval=0,
+                                              maxval=40 / 255,
+                                              seed=stddev_seed,
+                                              dtype=tf.float32)
+    noise = preprocessing_ops.random_normal(
+        shape=tf.shape(image), mean=0.0, stddev=stddev, seed=noise_seed)
     noise = tf.math.minimum(noise, 0.5)
     noise = tf.math.maximum(noise, 0)
     image += noise
     image = tf.clip_by_value(image, 0.0, 1.0)
+    return image
+
+  def _parse_train_data(self, data):
+    """Generates images and labels that are usable for model training.
+        Args:
+          data: a dict of Tensors produced by the decoder.
+        Returns:
+          images: the image tensor.
+          labels: a dict of Tensors that contains labels.
+        """
+    if 'groundtruth_targets' in data:
+      return self._parse_precomputed_data(data, is_training=True)
+
+    image = data['image'] / 255
+
+    # / 255
+    boxes = data['groundtruth_boxes']
+    classes = data['groundtruth_classes']
+
+    (blur_seed, hue_seed, saturation_seed, brightness_seed, noise_seed,
+     flip_seed, box_seed, jitter_seed, zoom_seed, scale_seed, grid_seed,
+     batch_seed) = preprocessing_ops.split_seed(
+         data.get(EXAMPLE_SEED_KEY, self._seed), 12)
+
+    image = self._augment_colors(image, blur_seed, hue_seed, saturation_seed,
+                                 brightness_seed, noise_seed)
 
     image_shape = tf.shape(image)[:2]
 
     if self._random_flip:
-      image, boxes, _ = preprocess_ops.random_horizontal_flip(
-          image, boxes, seed=self._seed)
+      image, boxes = preprocessing_ops.random_horizontal_flip(
+          image, boxes, seed=flip_seed)
 
     if self._jitter_boxes != 0.0:
       boxes = box_ops.denormalize_boxes(boxes, image_shape)
-      boxes = box_ops.jitter_boxes(boxes, 0.025)
+      boxes = box_ops.jitter_boxes(boxes, 0.025, seed=box_seed)
       boxes = box_ops.normalize_boxes(boxes, image_shape)
 
     if self._jitter_im != 0.0:
       image, boxes, classes = preprocessing_ops.random_jitter(
-          image, boxes, classes, self._jitter_im, seed=self._seed)
+          image, boxes, classes, self._jitter_im, seed=jitter_seed)
       # image, boxes, classes = preprocessing_ops.random_translate(image, boxes, classes, 0.2, seed=self._seed)
 
     if self._aug_rand_zoom:
       image, boxes, classes = preprocessing_ops.random_zoom_crop(
-          image, boxes, classes, self._jitter_im)
+          image, boxes, classes, self._jitter_im, seed=zoom_seed)
 
     shape = tf.shape(image)
     width = shape[1]
@@ -230,15 +300,19 @@ class Parser(parser.Parser):
     randscale = self._image_w // self._net_down_scale
 
     if self._fixed_size:
+      do_scale_seed, scale_seed = preprocessing_ops.split_seed(scale_seed, 2)
       do_scale = tf.greater(
-          tf.random.uniform([], minval=0, maxval=1, seed=self._seed),
+          preprocessing_ops.random_uniform([],
+                                           minval=0,
+                                           maxval=1,
+                                           seed=do_scale_seed),
           1 - self._pct_rand)
       if do_scale:
-        randscale = tf.random.uniform([],
-                                      minval=10,
-                                      maxval=15,
-                                      seed=self._seed,
-                                      dtype=tf.int32)
+        randscale = preprocessing_ops.random_uniform([],
+                                                     minval=10,
+                                                     maxval=15,
+                                                     seed=scale_seed,
+                                                     dtype=tf.int32)
 
     if self._letter_box:
       image, boxes = preprocessing_ops.fit_preserve_aspect_ratio(
@@ -272,7 +346,8 @@ class Parser(parser.Parser):
                                                        self._max_num_instances,
                                                        -1)
 
-    if self._fixed_size and not self._cutmix:
+    # the batch postprocess builds the grid from the xcycwh boxes itself
+    if not self._uses_postprocess:
       best_anchors = preprocessing_ops.get_best_anchor(
           boxes, self._anchors, width=self._image_w, height=self._image_h)
       best_anchors = preprocess_ops.clip_or_pad_to_fixed_size(
@@ -290,7 +365,10 @@ class Parser(parser.Parser):
           'num_detections': num_dets
       }
       grid = self._build_grid(
-          labels, self._image_w, use_tie_breaker=self._use_tie_breaker)
+          labels,
+          self._image_w,
+          use_tie_breaker=self._use_tie_breaker,
+          seed=grid_seed)
       labels.update({'grid_form': grid})
       labels['bbox'] = box_utils.xcycwh_to_yxyx(labels['bbox'])
     else:
@@ -305,6 +383,9 @@ class Parser(parser.Parser):
           'height': height,
           'num_detections': num_dets
       }
+    if self._uses_postprocess and EXAMPLE_SEED_KEY in data:
+      # taken out again by _postprocess_fn
+      labels[EXAMPLE_SEED_KEY] = batch_seed
     return image, labels
 
   # broken for some reason in task, i think dictionary to coco evaluator has
@@ -317,6 +398,8 @@ class Parser(parser.Parser):
           images: the image tensor.
           labels: a dict of Tensors that contains labels.
         """
+    if 'groundtruth_targets' in data:
+      return self._parse_precomputed_data(data, is_training=False)
 
     shape = tf.shape(data['image'])
     image = data['image'] / 255
@@ -362,33 +445,174 @@ class Parser(parser.Parser):
     labels['bbox'] = box_utils.xcycwh_to_yxyx(labels['bbox'])
     return image, labels
 
-  def _postprocess_fn(self, image, label):
+  def _fixed_geometry(self, image, boxes, classes, is_training):
+    """The resize of the parser with every random augmentation turned off."""
+    shape = tf.shape(image)
+    width = shape[1]
+    height = shape[0]
+    if self._letter_box or not is_training:
+      image, boxes = preprocessing_ops.fit_preserve_aspect_ratio(
+          image, boxes, width=width, height=height, target_dim=self._image_w)
+      width = self._image_w
+      height = self._image_w
+
+    image, boxes, classes = preprocessing_ops.resize_crop_filter(
+        image,
+        boxes,
+        classes,
+        default_width=width,
+        default_height=height,
+        target_width=self._image_w,
+        target_height=self._image_h,
+        randomize=False)
+    return image, boxes, classes
+
+  def sparse_targets(self, data, is_training):
+    """Precomputes the grid targets of a decoded example.
 
-    if self._cutmix:
+    Only valid if the example is later parsed without random geometric
+    augmentation, see _parse_precomputed_data.
+
+    Args:
+      data: a dict of Tensors produced by the decoder.
+      is_training: a `bool`, the split the targets are computed for.
+
+    Returns:
+      a dict of {level: {'index': [n, 3] int32, 'value': [n, 6] float32}}.
+    """
+    _, boxes, classes = self._fixed_geometry(data['image'],
+                                             data['groundtruth_boxes'],
+                                             data['groundtruth_classes'],
+                                             is_training)
+    boxes = box_utils.yxyx_to_xcycwh(boxes)[:self._max_num_instances]
+    classes = classes[:self._max_num_instances]
+    best_anchors = preprocessing_ops.get_best_anchor(
+        boxes, self._anchors, width=self._image_w, height=self._image_h)
+
+    labels = {
+        'bbox': tf.cast(boxes, tf.float32),
+        'classes': tf.cast(classes, tf.float32),
+        'best_anchors': best_anchors
+    }
+    targets = {}
+    for key in self._masks.keys():
+      index, value = preprocessing_ops.build_sparse_grided_gt(
+          labels, self._masks[key], self._image_w // 2**int(key), tf.float32,
+          self._use_tie_breaker)
+      targets[key] = {'index': index, 'value': value}
+    return targets
+
+  def _parse_precomputed_data(self, data, is_training):
+    """Parses an example with precomputed grid targets.
+
+    The anchor assignment and the grids were built offline, so the image only
+    gets the deterministic resize they were built for, and in training the
+    colour augmentation, which leaves the boxes as they are. The grids are
+    expanded from the sparse targets with one scatter per level.
+    """
+    shape = tf.shape(data['image'])
+    image = data['image'] / 255
+    if is_training:
+      image = self._augment_colors(
+          image, *preprocessing_ops.split_seed(
+              data.get(EXAMPLE_SEED_KEY, self._seed), 5))
+    image, boxes, classes = self._fixed_geometry(image,
+                                                 data['groundtruth_boxes'],
+                                                 data['groundtruth_classes'],
+                                                 is_training)
+    image = tf.clip_by_value(image, 0.0, 1.0)
+    boxes = box_utils.yxyx_to_xcycwh(boxes)
+    num_dets = tf.shape(classes)[0]
+
+    labels = {
+        'source_id': data['source_id'],
+        'bbox': tf.cast(pad_max_instances(boxes, self._max_num_instances, 0),
+                        self._dtype),
+        'classes': tf.cast(
+            pad_max_instances(classes, self._max_num_instances, -1),
+            self._dtype),
+        'width': shape[1],
+        'height': shape[0],
+        'num_detections': num_dets
+    }
+    if not is_training:
+      area = pad_max_instances(data['groundtruth_area'],
+                               self._max_num_instances, 0)
+      is_crowd = pad_max_instances(
+          tf.cast(data['groundtruth_is_crowd'], tf.int32),
+          self._max_num_instances, 0)
+      labels['area'] = tf.cast(area, self._dtype)
+      labels['is_crowd'] = is_crowd
+
+    grid = {}
+    for key, mask in self._masks.items():
+      targets = data['groundtruth_targets'][str(key)]
+      grid[key] = tf.cast(
+          preprocessing_ops.scatter_grided_gt(targets['index'],
+                                              targets['value'],
+                                              self._image_w // 2**int(key),
+                                              tf.shape(mask)[0],
+                                              labels['bbox'].dtype),
+          self._dtype)
+    labels['grid_form'] = grid
+    labels['bbox'] = box_utils.xcycwh_to_yxyx(labels['bbox'])
+    return image, labels
+
+  @property
+  def _uses_postprocess(self):
+    """Whether the training batches go through _postprocess_fn."""
+    return (self._multi_scale is not None or not self._fixed_size or
+            self._cutmix or self._mosaic)
+
+  def _postprocess_fn(self, image, label, width=None):
+    # the batch is augmented with the seed of its first example
+    seed = label.pop(EXAMPLE_SEED_KEY, None)
+    seed = self._seed if seed is None else seed[0]
+    mix_seed, scale_seed, grid_seed = preprocessing_ops.split_seed(seed, 3)
+
+    if self._mosaic:
+      boxes = box_utils.xcycwh_to_yxyx(label['bbox'])
+      image, boxes, classes, num_detections = preprocessing_ops.mosaic_batch(
+          image,
+          boxes,
+          label['classes'],
+          max_num_instances=self._max_num_instances,
+          seed=mix_seed)
+      boxes = box_utils.yxyx_to_xcycwh(boxes)
+      label['bbox'] = pad_max_instances(
+          boxes, self._max_num_instances, pad_axis=-2, pad_value=0)
+      label['classes'] = pad_max_instances(
+          classes, self._max_num_instances, pad_axis=-1, pad_value=-1)
+    elif self._cutmix:
       batch_size = tf.shape(image)[0]
       if batch_size >= 1:
         boxes = box_utils.xcycwh_to_yxyx(label['bbox'])
         classes = label['classes']
         image, boxes, classes, num_detections = preprocessing_ops.randomized_cutmix_batch(
-            image, boxes, classes)
+            image, boxes, classes, seed=mix_seed)
         boxes = box_utils.yxyx_to_xcycwh(boxes)
         label['bbox'] = pad_max_instances(
             boxes, self._max_num_instances, pad_axis=-2, pad_value=0)
         label['classes'] = pad_max_instances(
             classes, self._max_num_instances, pad_axis=-1, pad_value=-1)
 
-    randscale = self._image_w // self._net_down_scale
-    if not self._fixed_size:
-      do_scale = tf.greater(
-          tf.random.uniform([], minval=0, maxval=1, seed=self._seed),
-          1 - self._pct_rand)
-      if do_scale:
-        randscale = tf.random.uniform([],
-                                      minval=10,
-                                      maxval=21,
-                                      seed=self._seed,
-                                      dtype=tf.int32)
-    width = randscale * self._net_down_scale
+    if width is None:
+      randscale = self._image_w // self._net_down_scale
+      if not self._fixed_size:
+        do_scale_seed, scale_seed = preprocessing_ops.split_seed(scale_seed, 2)
+        do_scale = tf.greater(
+            preprocessing_ops.random_uniform([],
+                                             minval=0,
+                                             maxval=1,
+                                             seed=do_scale_seed),
+            1 - self._pct_rand)
+        if do_scale:
+          randscale = preprocessing_ops.random_uniform([],
+                                                       minval=10,
+                                                       maxval=21,
+                                                       seed=scale_seed,
+                                                       dtype=tf.int32)
+      width = randscale * self._net_down_scale
     image = tf.image.resize(image, (width, width))
 
     best_anchors = preprocessing_ops.get_best_anchor_batch(
@@ -397,17 +621,45 @@ class Parser(parser.Parser):
         best_anchors, self._max_num_instances, pad_axis=-2, pad_value=0)
 
     grid = self._build_grid(
-        label, width, batch=True, use_tie_breaker=self._use_tie_breaker)
+        label,
+        width,
+        batch=True,
+        use_tie_breaker=self._use_tie_breaker,
+        seed=grid_seed)
     label.update({'grid_form': grid})
     label['bbox'] = box_utils.xcycwh_to_yxyx(label['bbox'])
     return image, label
 
   def postprocess_fn(self, is_training):
+    if is_training and self._multi_scale is not None:
+      # the buckets are applied by multi_scale_batch_fn
+      return None
     if is_training:
-      return self._postprocess_fn if not self._fixed_size or self._cutmix else None
+      return self._postprocess_fn if self._uses_postprocess else None
     else:
       return None
 
+  @property
+  def multi_scale(self):
+    return self._multi_scale
+
+  def multi_scale_batch_fn(self, global_batch_size, drop_remainder=True):
+    """Returns a transform_and_batch_fn for the InputReader.
+
+    Batches the dataset and resizes every batch to the resolution bucket the
+    scheduler picks for its index, or None if no buckets were given.
+    """
+    if self._multi_scale is None:
+      return None
+
+    def batch_fn(dataset, input_context=None):
+      batch_size = input_context.get_per_replica_batch_size(
+          global_batch_size) if input_context else global_batch_size
+      dataset = dataset.batch(batch_size, drop_remainder=drop_remainder)
+      return self._multi_scale.apply(dataset, self._postprocess_fn)
+
+    return batch_fn
+
   # def parse_fn(self, is_training):
   #   """Returns a parse fn that reads and parses raw tensors from the decoder.
 
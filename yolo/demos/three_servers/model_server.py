@@ -17,6 +17,7 @@ from yolo.utils.run_utils import support_windows
 from yolo.utils.run_utils import prep_gpu
 from yolo.utils.demos import utils
 from yolo.utils.demos import coco
+from yolo.modeling import sliced_inference
 import traceback
 
 
@@ -29,7 +30,29 @@ class ModelServer(object):
                process_dims=416,
                run_strat="/GPU:0",
                max_batch=5,
-               wait_time=0.000001):
+               wait_time=0.000001,
+               latency_slo=None,
+               load_que_size=None,
+               dtype=tf.float32,
+               tile_size=None,
+               tile_overlap=0.2,
+               tile_full_pass=True):
+    """
+    Args:
+      process_dims: an `int` input size, or a list of `int` sizes to switch
+        between under load. A concrete function is traced for every size up
+        front so switching never retraces the model.
+      latency_slo: `float` target queueing plus processing latency in seconds
+        used to pick the resolution of each batch. If None the resolution
+        steps down as the input queue fills.
+      load_que_size: `int` capacity of the input queue, max_batch by default.
+      dtype: the input `tf.DType` used to trace the model.
+      tile_size: `int` model resolution to run sliced inference at. If set
+        the frames are kept at their own size, cut into overlapping tiles and
+        all tiles of a batch are run at once, process_dims is not used.
+      tile_overlap: `float` fraction of a tile shared with its neighbours.
+      tile_full_pass: `bool` also run every frame resized to one tile.
+    """
     # support for ANSI cahracters in windows
     support_windows()
     self._model = model
@@ -37,13 +60,33 @@ class ModelServer(object):
 
     self._device = utils.get_device(run_strat)
 
+    load_que_size = max_batch if load_que_size is None else load_que_size
+    self._scheduler = utils.ResolutionScheduler(
+        process_dims, latency_slo=latency_slo, que_size=load_que_size)
+
     # steps to take before loading into model
     self._preprocess_fn = preprocess_fn if preprocess_fn is not None else self._pre
-    self._process_fn = utils.get_run_fn(model)
+    self._tiled = tile_size is not None
+    if model is not None and self._tiled:
+      # the tiles are laid out per frame size, traced on the first batch
+      model = sliced_inference.YoloSliced(
+          model,
+          tile_size=tile_size,
+          overlap=tile_overlap,
+          full_pass=tile_full_pass)
+      self._model = model
+      run_fn = tf.function(model)
+      self._process_fns = {res: run_fn for res in self._scheduler.resolutions}
+    elif model is not None:
+      self._process_fns = utils.get_resolution_fns(
+          model, self._scheduler.resolutions, dtype=dtype)
+    else:
+      self._process_fns = {}
     # what you want me to send back
     self._postprocess_fn = postprocess_fn if postprocess_fn is not None else self._post
 
-    self._pdims = process_dims
+    # frames are preprocessed at the largest size and resized per batch
+    self._pdims = self._scheduler.max_resolution
     self._max_batch = max_batch
     self._dynamic_wt = (wait_time == "dynamic" or wait_time is None)
     if not self._dynamic_wt:
@@ -51,7 +94,7 @@ class ModelServer(object):
     else:
       self._wait_time = 0.001
 
-    self._load_buffer = Queue(maxsize=max_batch)
+    self._load_buffer = Queue(maxsize=load_que_size)
     self._batched_que = Queue(maxsize=max_batch)
     self._processed_que = Queue(maxsize=max_batch)
     self._return_buffer = Queue(maxsize=max_batch)
@@ -104,6 +147,7 @@ class ModelServer(object):
           continue
 
         start_t = time.time()
+        res = self._scheduler.select(self._load_buffer.qsize())
         frames = []
         raw = []
         i = 0
@@ -115,7 +159,12 @@ class ModelServer(object):
         rframes = len(raw)
         with tf.device("/GPU:0"):
           frame = tf.convert_to_tensor(frames)
-          result = self._process_fn(frame)
+          if res != self._pdims and not self._tiled:
+            frame = tf.image.resize(frame, (res, res))
+          result = self._process_fns[res](frame)
+        if isinstance(result, dict):
+          result["resolution"] = res
+        self._scheduler.update(res, time.time() - start_t, rframes)
         self._processed_que.put((raw, result))
         time.sleep(self._wait_time)
         end_t = time.time()
@@ -202,6 +251,10 @@ class ModelServer(object):
   def latency(self):
     return self._latency
 
+  @property
+  def resolution(self):
+    return self._scheduler.resolution
+
   @property
   def wait_time(self):
     return self._wait_time
@@ -228,7 +281,9 @@ class ModelServer(object):
     red = self._preprocess_fn(frame, self._pdims)
     if len(red.shape) == 3:
       red = tf.expand_dims(red, axis=0)
-    results = self._process_fn(red)
+    results = self._process_fns[self._pdims](red)
+    if isinstance(results, dict):
+      results["resolution"] = self._pdims
     return self._postprocess_fn(frame, results)
 
 
@@ -238,6 +293,12 @@ def preprocess_fn(raw_frame, pdim):
   return image
 
 
+def tiled_preprocess_fn(raw_frame, pdim):
+  with tf.device("/GPU:0"):
+    image = tf.cast(raw_frame, tf.float32)
+  return image
+
+
 def func(inputs):
   boxes = inputs["bbox"]
   classifs = inputs["confidence"]
@@ -250,9 +311,19 @@ def func(inputs):
   }
 
 
-def run(model, video, disp_h, wait_time, max_batch, que_size):
+def run(model,
+        video,
+        disp_h,
+        wait_time,
+        max_batch,
+        que_size,
+        process_dims=416,
+        latency_slo=None,
+        tile_size=None,
+        tile_overlap=0.2,
+        tile_full_pass=True):
   max_batch = 5 if max_batch is None else max_batch
-  pfn = preprocess_fn
+  pfn = preprocess_fn if tile_size is None else tiled_preprocess_fn
   pofn = utils.DrawBoxes(
       classes=80, labels=coco.get_coco_names(), display_names=True, thickness=2)
 
@@ -260,8 +331,13 @@ def run(model, video, disp_h, wait_time, max_batch, que_size):
       model=model,
       preprocess_fn=pfn,
       postprocess_fn=pofn,
+      process_dims=process_dims,
       wait_time=wait_time,
-      max_batch=max_batch)
+      max_batch=max_batch,
+      latency_slo=latency_slo,
+      tile_size=tile_size,
+      tile_overlap=tile_overlap,
+      tile_full_pass=tile_full_pass)
   video = video_t.VideoServer(
       video, wait_time=0.00000001, que=que_size, disp_h=disp_h)
   display = video_t.DisplayThread(
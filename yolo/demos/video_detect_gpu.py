@@ -18,6 +18,7 @@ from yolo.utils.demos.coco import gen_colors
 from yolo.utils.demos.coco import get_coco_names
 from yolo.utils.demos.coco import int_scale_boxes
 from yolo.utils.demos import utils
+from yolo.modeling import sliced_inference
 # from utils.demos import utils
 from yolo.utils.run_utils import prep_gpu
 from yolo.configs import yolo as exp_cfg
@@ -57,6 +58,15 @@ class FastVideo(object):
         gpu_device: string for the device you would like to use to run the model, if the model you pass in is not standard make sure you prep
           the model on the same device that you pass in, by default /GPU:0
         preprocess_gpu: the gpu device you would like to use to preprocess the image if you have multiple. by default use the first /GPU:0
+        process_sizes: a List[int] of square resolutions to switch between under load. a concrete function is traced for each one
+          before the video starts, and each batch is run at the largest size whose estimated latency fits latency_slo. if None
+          process_width and process_height are always used
+        latency_slo: float target latency in seconds for a frame waiting in the load que, used with process_sizes. if None the
+          resolution steps down as the load que fills
+        tile_size: int model resolution for sliced inference. if set every frame is cut into overlapping tiles at its own
+          size instead of being resized, and all tiles of a batch are run in one call. process sizes are not used
+        tile_overlap: float fraction of a tile shared with its neighbours
+        tile_full_pass: boolean for wether to also run every frame resized to one tile, for objects too large for the tiles
 
     Raises:
         IOError: the video file you would like to use is not found
@@ -79,7 +89,12 @@ class FastVideo(object):
                preprocess_with_gpu=False,
                scale_que=1,
                gpu_device='/GPU:0',
-               preprocess_gpu='/GPU:0'):
+               preprocess_gpu='/GPU:0',
+               process_sizes=None,
+               latency_slo=None,
+               tile_size=None,
+               tile_overlap=0.2,
+               tile_full_pass=True):
 
     file_name = 0 if file_name is None else file_name
     try:
@@ -135,6 +150,22 @@ class FastVideo(object):
     else:
       self._batch_size = max_batch
 
+    self._sliced = None
+    if tile_size is not None:
+      self._sliced = sliced_inference.YoloSliced(
+          model,
+          tile_size=tile_size,
+          overlap=tile_overlap,
+          full_pass=tile_full_pass)
+
+    self._scheduler = None
+    if process_sizes is not None and self._sliced is None:
+      self._scheduler = utils.ResolutionScheduler(
+          process_sizes,
+          latency_slo=latency_slo,
+          que_size=self._batch_size * scale_que)
+    self._resolution = process_width
+
     self._colors = gen_colors(self._classes)
 
     if labels is None:
@@ -317,7 +348,14 @@ class FastVideo(object):
       with tf.device(self._gpu_device):
         pimage = tf.image.resize(image, (self._p_width, self._p_height))
         pimage = tf.expand_dims(pimage, axis=0)
-        if hasattr(model, 'predict'):
+        if self._sliced is not None:
+          predfunc = tf.function(self._sliced)
+          print(f'tiles per frame: {self._sliced.num_tiles(image.shape[:2])}')
+        elif self._scheduler is not None:
+          predfuncs = utils.get_resolution_fns(model,
+                                               self._scheduler.resolutions)
+          print(f'traced resolutions: {self._scheduler.resolutions}')
+        elif hasattr(model, 'predict'):
           predfunc = model.predict
           print('using pred function')
         else:
@@ -358,11 +396,25 @@ class FastVideo(object):
         a = datetime.datetime.now()
         with tf.device(self._gpu_device):
           image = tf.convert_to_tensor(proc)
-          pimage = tf.image.resize(image, (self._p_width, self._p_height))
-          pred = predfunc(pimage)
+          if self._sliced is not None:
+            pred = predfunc(image)
+          elif self._scheduler is not None:
+            # pick the resolution from the frames still waiting to be run
+            res = self._scheduler.select(self._load_que.qsize() + len(proc))
+            pimage = tf.image.resize(image, (res, res))
+            pred = predfuncs[res](pimage)
+            if isinstance(pred, dict):
+              pred['resolution'] = res
+            self._resolution = res
+          else:
+            pimage = tf.image.resize(image, (self._p_width, self._p_height))
+            pred = predfunc(pimage)
           if image.shape[1] != self._height:
             image = tf.image.resize(image, (self._height, self._width))
         b = datetime.datetime.now()
+        if self._scheduler is not None:
+          self._scheduler.update(self._resolution, (b - a).total_seconds(),
+                                 len(proc))
 
         # computation latency to see how much delay between input and output
         if self._frames >= 1000:
@@ -461,7 +513,11 @@ class FastVideo(object):
         '                                 \rfps avg: \033[1;37;40m%0.5f\033[0m'
         % (self._prev_display_fps),
         end='\n')
-    print('\033[F\033[F\033[F\033[F\033[F\033[F\033[F', end='\n')
+    print(
+        '                                 \rresolution: \033[1;37;40m%d\033[0m'
+        % (self._resolution),
+        end='\n')
+    print('\033[F\033[F\033[F\033[F\033[F\033[F\033[F\033[F', end='\n')
     return
 
 
@@ -0,0 +1,95 @@
+"""Packs padded detections and ground truth before they leave the device.
+
+The eval step outputs detections padded to max_boxes and ground truth padded
+to max_num_instances, most of it empty. Packed, only the valid rows of every
+image are kept, concatenated over the batch, together with the number of rows
+of each image:
+
+  padded:  boxes [batch, K, 4], classes [batch, K]
+  packed:  boxes [num_valid, 4], classes [num_valid], num_detections [batch]
+
+Per replica outputs of a distributed step stay consistent when they are
+concatenated, since the rows and the counts are concatenated in the same
+replica order. On the host `unpack` pads them back to a fixed number of rows,
+the same for every batch, since the COCO conversion reads the row count of the
+first batch only.
+"""
+import numpy as np
+import tensorflow as tf
+
+PREDICTION_KEYS = ('detection_boxes', 'detection_scores', 'detection_classes')
+GROUNDTRUTH_KEYS = ('boxes', 'classes', 'is_crowd')
+
+
+def pack(values, valid):
+  """Keeps the valid rows of [batch, K, ...] tensors, in the device graph.
+
+  Args:
+    values: dict of `Tensor`s of shape [batch, K, ...].
+    valid: bool `Tensor` [batch, K].
+
+  Returns:
+    dict with the same keys of [num_valid, ...] tensors, and num_detections,
+    the int32 [batch] number of valid rows per image.
+  """
+  packed = {key: tf.boolean_mask(value, valid) for key, value in values.items()}
+  packed['num_detections'] = tf.reduce_sum(tf.cast(valid, tf.int32), axis=-1)
+  return packed
+
+
+def to_numpy(values):
+  """Converts tensors, or tuples of per replica tensors, to numpy."""
+  numpy_values = {}
+  for key, val in values.items():
+    if isinstance(val, (tuple, list)):
+      val = np.concatenate([np.asarray(v) for v in val])
+    numpy_values[key] = np.asarray(val)
+  return numpy_values
+
+
+def is_packed(values, key):
+  return np.ndim(values[key]) == 1
+
+
+def unpack(values, keys, pad_values=None, num_rows=None):
+  """Pads the packed rows back to [batch, num_rows, ...] numpy arrays.
+
+  Args:
+    values: dict of numpy arrays from `pack`.
+    keys: the packed keys, the other values are passed through.
+    pad_values: optional dict of the value to pad each key with, default 0.
+    num_rows: the rows of every image after padding, the K of the padded
+      tensors. If None the batch is padded to its longest image.
+
+  Returns:
+    dict of numpy arrays, num_detections is left as the rows per image.
+
+  Raises:
+    ValueError: if an image has more than num_rows rows.
+  """
+  pad_values = pad_values or {}
+  lengths = values['num_detections'].astype(np.int64)
+  batch = lengths.shape[0]
+  longest = int(lengths.max()) if batch else 0
+  if num_rows is None:
+    max_rows = max(longest, 1)
+  elif longest > num_rows:
+    raise ValueError('An image has {} rows, more than num_rows {}.'.format(
+        longest, num_rows))
+  else:
+    max_rows = num_rows
+  starts = np.cumsum(lengths) - lengths
+  rows = np.repeat(np.arange(batch), lengths)
+  cols = np.arange(rows.shape[0]) - np.repeat(starts, lengths)
+
+  padded = dict(values)
+  for key in keys:
+    if key not in values:
+      continue
+    value = values[key]
+    out = np.full((batch, max_rows) + value.shape[1:],
+                  pad_values.get(key, 0),
+                  dtype=value.dtype)
+    out[rows, cols] = value
+    padded[key] = out
+  return padded
@@ -0,0 +1,131 @@
+from yolo.evaluation import packing
+from yolo.evaluation import streaming_coco_evaluator
+from official.vision.beta.evaluation import coco_evaluator
+
+import numpy as np
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+class PackingTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_round_trip(self):
+    boxes = tf.reshape(tf.range(3 * 4 * 4, dtype=tf.float32), [3, 4, 4])
+    classes = tf.constant([[1, 2, -1, -1], [-1, -1, -1, -1], [3, 4, 5, -1]])
+    packed = packing.pack({'boxes': boxes, 'classes': classes}, classes >= 0)
+    self.assertAllEqual(packed['num_detections'], [2, 0, 3])
+    self.assertAllEqual(packed['classes'], [1, 2, 3, 4, 5])
+
+    padded = packing.unpack(
+        packing.to_numpy(packed), ('boxes', 'classes'), {'classes': -1})
+    self.assertAllEqual(padded['classes'], classes[:, :3])
+    self.assertAllEqual(padded['boxes'][0, :2], boxes[0, :2])
+    self.assertAllEqual(padded['boxes'][2], boxes[2, :3])
+
+  def test_replicas_concatenate(self):
+    first = packing.pack({'classes': tf.constant([[1, -1], [2, 3]])},
+                         tf.constant([[True, False], [True, True]]))
+    second = packing.pack({'classes': tf.constant([[4, 5]])},
+                          tf.constant([[True, True]]))
+    values = {key: (first[key], second[key]) for key in first}
+    padded = packing.unpack(
+        packing.to_numpy(values), ('classes',), {'classes': -1})
+    self.assertAllEqual(padded['classes'], [[1, -1], [2, 3], [4, 5]])
+
+  def test_streaming_evaluator_reads_packed(self):
+    gt_boxes = tf.constant([[[0, 0, 10, 10], [0, 0, 0, 0]],
+                            [[5, 5, 20, 20], [30, 30, 50, 40]]], tf.float32)
+    gt_classes = tf.constant([[0, -1], [1, 0]])
+    boxes = tf.constant([[[0, 0, 9, 10], [40, 40, 50, 50], [0, 0, 0, 0]],
+                         [[5, 5, 20, 19], [30, 30, 50, 40], [0, 0, 1, 1]]],
+                        tf.float32)
+    scores = tf.constant([[0.9, 0.3, 0.0], [0.8, 0.6, 0.2]])
+    classes = tf.constant([[0, 0, 0], [1, 0, 1]])
+
+    groundtruths = {'boxes': gt_boxes, 'classes': gt_classes}
+    predictions = {
+        'detection_boxes': boxes,
+        'detection_scores': scores,
+        'detection_classes': classes
+    }
+    padded = streaming_coco_evaluator.StreamingCOCOEvaluator(num_classes=2)
+    padded.update_state(groundtruths, predictions)
+
+    packed = streaming_coco_evaluator.StreamingCOCOEvaluator(num_classes=2)
+    packed.update_state(
+        packing.pack(groundtruths, gt_classes >= 0),
+        packing.pack(predictions, scores > 0))
+
+    expected = padded.result()
+    metrics = packed.result()
+    for name in expected:
+      self.assertAllClose(metrics[name], expected[name])
+    self.assertTrue(np.isfinite(metrics['AP']))
+
+  def test_fixed_rows(self):
+    packed = packing.pack({'classes': tf.constant([[1, -1, -1]])},
+                          tf.constant([[True, False, False]]))
+    padded = packing.unpack(
+        packing.to_numpy(packed), ('classes',), {'classes': -1}, num_rows=3)
+    self.assertAllEqual(padded['classes'], [[1, -1, -1]])
+    with self.assertRaises(ValueError):
+      packing.unpack(packing.to_numpy(packed), ('classes',), num_rows=0)
+
+  def test_coco_evaluator_reads_unpacked_batches(self):
+    # the second batch has more detections than the first, and the third
+    # fewer, the COCO conversion reads K from the first batch only
+    batches = [
+        (tf.constant([[[0, 0, 10, 10], [0, 0, 0, 0], [0, 0, 0, 0]]],
+                     tf.float32), tf.constant([[0.9, 0.0, 0.0]])),
+        (tf.constant([[[5, 5, 20, 20], [30, 30, 50, 40], [0, 0, 9, 9]]],
+                     tf.float32), tf.constant([[0.8, 0.7, 0.2]])),
+        (tf.constant([[[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]],
+                     tf.float32), tf.constant([[0.0, 0.0, 0.0]])),
+    ]
+    gt_boxes = [[[0, 0, 10, 10], [0, 0, 0, 0]],
+                [[5, 5, 20, 20], [30, 30, 50, 40]],
+                [[10, 10, 30, 30], [0, 0, 0, 0]]]
+    gt_classes = [[1, -1], [1, 1], [1, -1]]
+
+    evaluator = coco_evaluator.COCOEvaluator(
+        annotation_file=None, include_mask=False, need_rescale_bboxes=False)
+    for i, (boxes, scores) in enumerate(batches):
+      classes = tf.ones_like(scores, tf.int32)
+      groundtruths = packing.pack(
+          {
+              'boxes': tf.constant([gt_boxes[i]], tf.float32),
+              'classes': tf.constant([gt_classes[i]]),
+              'is_crowd': tf.zeros([1, 2], tf.int32),
+          }, tf.constant([gt_classes[i]]) >= 0)
+      groundtruths.update({
+          'source_id': tf.constant([i + 1], tf.int64),
+          'height': tf.constant([64]),
+          'width': tf.constant([64]),
+      })
+      predictions = packing.pack(
+          {
+              'detection_boxes': boxes,
+              'detection_scores': scores,
+              'detection_classes': classes,
+          }, scores > 0)
+      predictions['source_id'] = tf.constant([i + 1], tf.int64)
+
+      groundtruths = packing.unpack(
+          packing.to_numpy(groundtruths),
+          packing.GROUNDTRUTH_KEYS, {'classes': -1},
+          num_rows=2)
+      predictions = packing.unpack(
+          packing.to_numpy(predictions), packing.PREDICTION_KEYS, num_rows=3)
+      self.assertEqual(predictions['detection_classes'].shape, (1, 3))
+      evaluator.update_state(
+          *tf.nest.map_structure(tf.convert_to_tensor,
+                                 (groundtruths, predictions)))
+
+    metrics = evaluator.result()
+    # every detection of the second batch is kept, a missing one would leave
+    # the ground truth box [30, 30, 50, 40] unmatched
+    self.assertAllClose(metrics['AP50'], 0.75, atol=0.01)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,275 @@
+"""COCO box mAP computed batch by batch, without pycocotools.
+
+COCOEvaluator keeps every detection and ground truth of the eval set and runs
+COCOeval over all of them at the end. This evaluator follows the matching of
+COCOeval for the 'all' area range, but does it in update_state on each batch,
+vectorized over the images of the batch and the IoU thresholds, and only keeps
+per class histograms of the detection scores:
+
+  true_positives[class, threshold, bin]
+  false_positives[class, threshold, bin]
+  num_groundtruths[class]
+
+The precision / recall curves are built from the histograms in result(), the
+scores are quantized to `num_score_bins` bins, detections that fall into the
+same bin are treated as tied. With the default 1000 bins the APs stay within a
+few 1e-3 of pycocotools.
+
+It uses the ground truth of the dataloader, boxes and detections have to be in
+the same coordinates.
+"""
+from absl import logging
+import numpy as np
+
+from yolo.evaluation import packing
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+RECALL_THRESHOLDS = np.linspace(0.0, 1.0, 101)
+
+
+def box_iou(boxes, gt_boxes, gt_is_crowd):
+  """IoU of every detection with every ground truth box of an image.
+
+  Args:
+    boxes: float [batch, num_boxes, 4] detections as [ymin, xmin, ymax, xmax].
+    gt_boxes: float [batch, num_gt, 4] ground truth in the same format.
+    gt_is_crowd: bool [batch, num_gt], for crowd boxes the intersection is
+      divided by the detection area, as in COCOeval.
+
+  Returns:
+    float64 [batch, num_boxes, num_gt].
+  """
+  boxes = boxes.astype(np.float64)[:, :, None, :]
+  gt_boxes = gt_boxes.astype(np.float64)[:, None, :, :]
+  height = (np.minimum(boxes[..., 2], gt_boxes[..., 2]) -
+            np.maximum(boxes[..., 0], gt_boxes[..., 0]))
+  width = (np.minimum(boxes[..., 3], gt_boxes[..., 3]) -
+           np.maximum(boxes[..., 1], gt_boxes[..., 1]))
+  intersection = np.maximum(height, 0) * np.maximum(width, 0)
+  area = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+  gt_area = ((gt_boxes[..., 2] - gt_boxes[..., 0]) *
+             (gt_boxes[..., 3] - gt_boxes[..., 1]))
+  union = np.where(gt_is_crowd[:, None, :], area, area + gt_area - intersection)
+  return np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+
+def _best_match(ious, candidates):
+  """Index and presence of the highest IoU candidate along the last axis."""
+  scores = np.where(candidates, ious, -1.0)
+  return np.argmax(scores, axis=-1), np.any(candidates, axis=-1)
+
+
+def match_detections(boxes, classes, valid, gt_boxes, gt_classes, gt_valid,
+                     gt_is_crowd, iou_thresholds=IOU_THRESHOLDS):
+  """Greedily matches detections to ground truth, like COCOeval.evaluateImg.
+
+  The detections of every image have to be sorted by descending score. Each
+  one, in order, takes the unmatched non crowd ground truth box of its class
+  with the highest IoU above the threshold, and is a true positive. If there
+  is none it may match a crowd box instead, which can be matched any number
+  of times, and is then ignored. Else it is a false positive.
+
+  Returns:
+    true_positive: bool [batch, thresholds, num_boxes].
+    ignored: bool [batch, thresholds, num_boxes].
+  """
+  batch, num_boxes = classes.shape
+  num_thresholds = len(iou_thresholds)
+  ious = box_iou(boxes, gt_boxes, gt_is_crowd)
+  same_class = classes[:, :, None] == gt_classes[:, None, :]
+  same_class &= gt_valid[:, None, :]
+  ious = np.where(same_class & valid[:, :, None], ious, -1.0)
+
+  thresholds = np.minimum(iou_thresholds, 1 - 1e-10)[None, :, None]
+  crowd = gt_is_crowd[:, None, :]
+  matched = np.zeros([batch, num_thresholds, gt_classes.shape[1]], bool)
+  true_positive = np.zeros([batch, num_thresholds, num_boxes], bool)
+  ignored = np.zeros([batch, num_thresholds, num_boxes], bool)
+  rows = np.arange(batch)[:, None]
+  cols = np.arange(num_thresholds)[None, :]
+
+  for i in range(num_boxes):
+    iou = np.broadcast_to(ious[:, None, i, :], matched.shape)
+    above = iou >= thresholds
+    index, found = _best_match(iou, above & ~crowd & ~matched)
+    _, crowd_found = _best_match(iou, above & crowd)
+    true_positive[:, :, i] = found
+    ignored[:, :, i] = ~found & crowd_found
+    matched[rows, cols, index] |= found
+  return true_positive, ignored
+
+
+class StreamingCOCOEvaluator(object):
+  """COCO AP, AP50, AP75 and AR@100 from per class score histograms.
+
+  Args:
+    num_classes: `int` number of classes, class ids are in [0, num_classes).
+    max_detections: `int` detections kept per image and class, by score.
+    num_score_bins: `int` resolution of the score histograms.
+    per_category_metrics: `bool` also report the APs of every class.
+  """
+
+  def __init__(self,
+               num_classes,
+               max_detections=100,
+               num_score_bins=1000,
+               per_category_metrics=False):
+    self._num_classes = num_classes
+    self._max_detections = max_detections
+    self._num_score_bins = num_score_bins
+    self._per_category_metrics = per_category_metrics
+    self._metric_names = ['AP', 'AP50', 'AP75', 'ARmax100']
+    self.reset_states()
+
+  @property
+  def name(self):
+    return 'coco_metric'
+
+  def reset_states(self):
+    """Resets internal states for a fresh run."""
+    shape = [self._num_classes, len(IOU_THRESHOLDS), self._num_score_bins]
+    self._true_positives = np.zeros(shape, np.int64)
+    self._false_positives = np.zeros(shape, np.int64)
+    self._num_groundtruths = np.zeros([self._num_classes], np.int64)
+    self._num_images = 0
+
+  def _valid(self, classes, count=None, scores=None):
+    valid = (classes >= 0) & (classes < self._num_classes)
+    if count is not None and np.ndim(count) == 1:
+      valid &= np.arange(classes.shape[1])[None, :] < count[:, None]
+    if scores is not None:
+      valid &= scores > 0
+    return valid
+
+  def update_state(self, groundtruths, predictions):
+    """Matches the detections of a batch and adds them to the histograms.
+
+    Both can also be in the packed form of packing.pack.
+
+    Args:
+      groundtruths: a dictionary of Tensors including the fields below.
+        - boxes: float [batch_size, K, 4] as [ymin, xmin, ymax, xmax].
+        - classes: int [batch_size, K], padding is -1.
+        Optional fields:
+          - num_detections: int [batch_size], boxes after these are padding.
+          - is_crowd: bool [batch_size, K].
+      predictions: a dictionary of Tensors including the fields below.
+        - detection_boxes: float [batch_size, N, 4] in the coordinates of the
+          ground truth boxes.
+        - detection_scores: float [batch_size, N] in [0, 1].
+        - detection_classes: int [batch_size, N].
+        Optional fields:
+          - num_detections: int [batch_size], detections after these are
+            padding. Detections with a score of 0 are padding either way.
+    """
+    groundtruths = packing.to_numpy(groundtruths)
+    predictions = packing.to_numpy(predictions)
+    if packing.is_packed(groundtruths, 'classes'):
+      groundtruths = packing.unpack(groundtruths, packing.GROUNDTRUTH_KEYS,
+                                    {'classes': -1})
+    if packing.is_packed(predictions, 'detection_scores'):
+      predictions = packing.unpack(predictions, packing.PREDICTION_KEYS)
+
+    gt_classes = np.round(groundtruths['classes']).astype(np.int64)
+    gt_valid = self._valid(gt_classes, groundtruths.get('num_detections'))
+    if 'is_crowd' in groundtruths:
+      gt_is_crowd = groundtruths['is_crowd'].astype(bool) & gt_valid
+    else:
+      gt_is_crowd = np.zeros_like(gt_valid)
+
+    scores = predictions['detection_scores'].astype(np.float64)
+    classes = np.round(predictions['detection_classes']).astype(np.int64)
+    valid = self._valid(classes, predictions.get('num_detections'), scores)
+
+    # sort by score, the stable sort keeps the order COCOeval uses for ties
+    order = np.argsort(
+        np.where(valid, -scores, np.inf), axis=1, kind='mergesort')
+    scores = np.take_along_axis(scores, order, axis=1)
+    classes = np.take_along_axis(classes, order, axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    boxes = np.take_along_axis(
+        predictions['detection_boxes'], order[..., None], axis=1)
+
+    # only the top max_detections of every class and image are evaluated
+    same_class = classes[:, :, None] == classes[:, None, :]
+    same_class &= valid[:, None, :]
+    rank = np.sum(np.tril(same_class, k=-1), axis=-1)
+    valid &= rank < self._max_detections
+
+    true_positive, ignored = match_detections(boxes, classes, valid,
+                                              groundtruths['boxes'],
+                                              gt_classes, gt_valid,
+                                              gt_is_crowd)
+
+    bins = np.clip((scores * self._num_score_bins).astype(np.int64), 0,
+                   self._num_score_bins - 1)
+    num_thresholds = len(IOU_THRESHOLDS)
+    counted = valid[:, None, :] & ~ignored
+    index = ((classes[:, None, :] * num_thresholds +
+              np.arange(num_thresholds)[None, :, None]) * self._num_score_bins +
+             bins[:, None, :])
+    np.add.at(self._true_positives.reshape(-1),
+              index[counted & true_positive], 1)
+    np.add.at(self._false_positives.reshape(-1),
+              index[counted & ~true_positive], 1)
+    np.add.at(self._num_groundtruths, gt_classes[gt_valid & ~gt_is_crowd], 1)
+    self._num_images += gt_classes.shape[0]
+
+  def evaluate(self):
+    """Computes the metrics from the histograms.
+
+    Returns:
+      a dict of metric name to float32 value, -1 if there was no ground truth.
+    """
+    # from the highest scores down, as COCOeval.accumulate
+    true_positives = np.cumsum(self._true_positives[..., ::-1], axis=-1)
+    false_positives = np.cumsum(self._false_positives[..., ::-1], axis=-1)
+    num_gt = self._num_groundtruths[:, None, None]
+    has_gt = self._num_groundtruths > 0
+
+    detections = true_positives + false_positives
+    recall = true_positives / np.maximum(num_gt, 1)
+    precision = np.where(detections > 0,
+                         true_positives / np.maximum(detections, 1), 0.0)
+    # the precision envelope, the max precision at any higher recall
+    precision = np.maximum.accumulate(precision[..., ::-1], axis=-1)[..., ::-1]
+
+    num_classes, num_thresholds, num_bins = recall.shape
+    flat_recall = recall.reshape(-1, num_bins)
+    flat_precision = precision.reshape(-1, num_bins)
+    interpolated = np.zeros([flat_recall.shape[0], len(RECALL_THRESHOLDS)])
+    for i in range(flat_recall.shape[0]):
+      index = np.searchsorted(flat_recall[i], RECALL_THRESHOLDS, side='left')
+      found = index < num_bins
+      interpolated[i, found] = flat_precision[i, index[found]]
+    average_precision = interpolated.mean(axis=-1).reshape(
+        num_classes, num_thresholds)
+    average_recall = recall[..., -1]
+
+    def _mean(values):
+      values = values[has_gt]
+      return np.float32(values.mean()) if values.size else np.float32(-1)
+
+    metrics_dict = {
+        'AP': _mean(average_precision.mean(axis=-1)),
+        'AP50': _mean(average_precision[:, 0]),
+        'AP75': _mean(average_precision[:, 5]),
+        'ARmax100': _mean(average_recall.mean(axis=-1)),
+    }
+    if self._per_category_metrics:
+      for category in np.nonzero(has_gt)[0]:
+        metrics_dict[f'Precision mAP ByCategory/{category}'] = np.float32(
+            average_precision[category].mean())
+        metrics_dict[f'Precision mAP ByCategory@50IoU/{category}'] = (
+            np.float32(average_precision[category, 0]))
+        metrics_dict[f'Precision mAP ByCategory@75IoU/{category}'] = (
+            np.float32(average_precision[category, 5]))
+    logging.info('evaluated %d images: %s', self._num_images,
+                 {name: metrics_dict[name] for name in self._metric_names})
+    return metrics_dict
+
+  def result(self):
+    """Evaluates detection results, and reset_states."""
+    metric_dict = self.evaluate()
+    self.reset_states()
+    return metric_dict
@@ -0,0 +1,123 @@
+from yolo.evaluation import streaming_coco_evaluator
+from official.vision.beta.evaluation import coco_evaluator
+
+import numpy as np
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+def _groundtruths(boxes, classes, is_crowd=None):
+  groundtruths = {
+      'boxes': tf.constant(boxes, tf.float32),
+      'classes': tf.constant(classes, tf.float32),
+      'num_detections': tf.reduce_sum(
+          tf.cast(tf.constant(classes) >= 0, tf.int32), axis=-1),
+  }
+  if is_crowd is not None:
+    groundtruths['is_crowd'] = tf.constant(is_crowd)
+  return groundtruths
+
+
+def _predictions(boxes, scores, classes):
+  return {
+      'detection_boxes': tf.constant(boxes, tf.float32),
+      'detection_scores': tf.constant(scores, tf.float32),
+      'detection_classes': tf.constant(classes, tf.int32),
+  }
+
+
+class StreamingCOCOEvaluatorTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_perfect_detections(self):
+    boxes = [[[0, 0, 10, 10], [20, 20, 40, 30], [0, 0, 0, 0]]]
+    evaluator = streaming_coco_evaluator.StreamingCOCOEvaluator(num_classes=3)
+    evaluator.update_state(
+        _groundtruths(boxes, [[0, 2, -1]]),
+        _predictions(boxes, [[0.9, 0.8, 0.0]], [[0, 2, 0]]))
+    metrics = evaluator.result()
+    for name in ['AP', 'AP50', 'AP75', 'ARmax100']:
+      self.assertAllClose(metrics[name], 1.0)
+
+  def test_false_positive_first(self):
+    evaluator = streaming_coco_evaluator.StreamingCOCOEvaluator(num_classes=1)
+    evaluator.update_state(
+        _groundtruths([[[0, 0, 10, 10]]], [[0]]),
+        _predictions([[[50, 50, 60, 60], [0, 0, 10, 10]]], [[0.9, 0.5]],
+                     [[0, 0]]))
+    metrics = evaluator.result()
+    # recall 1 is only reached at precision 0.5
+    self.assertAllClose(metrics['AP50'], 0.5)
+    self.assertAllClose(metrics['ARmax100'], 1.0)
+
+  def test_crowd_matches_are_ignored(self):
+    evaluator = streaming_coco_evaluator.StreamingCOCOEvaluator(num_classes=1)
+    evaluator.update_state(
+        _groundtruths([[[0, 0, 10, 10], [20, 20, 60, 60]]], [[0, 0]],
+                      is_crowd=[[False, True]]),
+        _predictions([[[30, 30, 40, 40], [0, 0, 10, 10]]], [[0.9, 0.5]],
+                     [[0, 0]]))
+    self.assertAllClose(evaluator.result()['AP'], 1.0)
+
+  def test_no_groundtruth(self):
+    evaluator = streaming_coco_evaluator.StreamingCOCOEvaluator(num_classes=2)
+    evaluator.update_state(
+        _groundtruths([[[0, 0, 0, 0]]], [[-1]]),
+        _predictions([[[0, 0, 10, 10]]], [[0.9]], [[1]]))
+    self.assertEqual(evaluator.result()['AP'], -1)
+
+  @parameterized.parameters((1,), (3,))
+  def test_matches_pycocotools(self, num_batches):
+    rng = np.random.RandomState(7)
+    batch_size, num_gt, num_dets, num_classes = 4, 6, 20, 4
+    streaming = streaming_coco_evaluator.StreamingCOCOEvaluator(
+        num_classes=num_classes + 1)
+    reference = coco_evaluator.COCOEvaluator(
+        annotation_file=None, include_mask=False, need_rescale_bboxes=False)
+    # every detection falls into its own score bin, so the histograms are
+    # exact and the results have to agree up to rounding
+    scores = (rng.permutation(1000)[:num_batches * batch_size * num_dets] +
+              0.5) / 1000
+    scores = scores.reshape([num_batches, batch_size, num_dets])
+
+    for i in range(num_batches):
+      corner = rng.uniform(0, 200, [batch_size, num_gt, 2])
+      size = rng.uniform(10, 100, [batch_size, num_gt, 2])
+      gt_boxes = np.concatenate([corner, corner + size], axis=-1)
+      gt_classes = rng.randint(1, num_classes + 1, [batch_size, num_gt])
+
+      # detections are jittered copies of the ground truth plus clutter
+      source = rng.randint(0, num_gt, [batch_size, num_dets])
+      boxes = np.take_along_axis(gt_boxes, source[..., None], axis=1)
+      boxes += rng.normal(0, 6, boxes.shape)
+      boxes[..., 2:] = np.maximum(boxes[..., 2:], boxes[..., :2] + 1)
+      classes = np.take_along_axis(gt_classes, source, axis=1)
+      flip = rng.uniform(size=classes.shape) < 0.2
+      classes[flip] = rng.randint(1, num_classes + 1, np.sum(flip))
+
+      source_id = np.arange(batch_size) + i * batch_size + 1
+      groundtruths = {
+          'source_id': tf.constant(source_id),
+          'height': tf.fill([batch_size], 400),
+          'width': tf.fill([batch_size], 400),
+          'num_detections': tf.fill([batch_size], num_gt),
+          'boxes': tf.constant(gt_boxes, tf.float32),
+          'classes': tf.constant(gt_classes, tf.int32),
+      }
+      predictions = {
+          'source_id': tf.constant(source_id),
+          'num_detections': tf.fill([batch_size], num_dets),
+          'detection_boxes': tf.constant(boxes, tf.float32),
+          'detection_scores': tf.constant(scores[i], tf.float32),
+          'detection_classes': tf.constant(classes, tf.int32),
+      }
+      streaming.update_state(groundtruths, predictions)
+      reference.update_state(groundtruths, predictions)
+
+    expected = reference.result()
+    metrics = streaming.result()
+    for name in ['AP', 'AP50', 'AP75', 'ARmax100']:
+      self.assertAllClose(metrics[name], expected[name], atol=1e-4)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -69,7 +69,9 @@ class Yolo_Loss(object):
     # self._iou_thresh = 0.213 # recomended use = 0.213 in [yolo]
     self._use_tie_breaker = tf.cast(use_tie_breaker, tf.bool)
 
-    self._loss_type = tf.cast(loss_type, tf.string)
+    # kept as a python string so the branch is picked while tracing, a string
+    # comparison in the graph can not be compiled with XLA
+    self._loss_type = loss_type
     self._iou_normalizer = iou_normalizer
     self._cls_normalizer = cls_normalizer
     self._obj_normalizer = obj_normalizer
@@ -89,11 +91,6 @@ class Yolo_Loss(object):
     self._path_key = path_key
     return
 
-  @tf.function(experimental_relax_shapes=True)
-  def print_error(self, pred_conf):
-    if tf.stop_gradient(tf.reduce_any(tf.math.is_nan(pred_conf))):
-      tf.print("\nerror: stop training")
-
   @tf.function(experimental_relax_shapes=True)
   def _get_label_attributes(self, width, height, batch_size, y_true, y_pred,
                             dtype):
@@ -158,7 +155,6 @@ class Yolo_Loss(object):
     pred_conf = tf.expand_dims(tf.math.sigmoid(y_pred[..., 4]), axis=-1)
     pred_conf = self.rm_nan_inf(pred_conf)
     pred_class = tf.math.sigmoid(y_pred[..., 5:])
-    self.print_error(pred_box)
 
     # 3. split up ground_truth into components, xy, wh, confidence, class -> apply calculations to acchive safe format as predictions
     true_box, true_conf, true_class = tf.split(y_true, [4, 1, -1], axis=-1)
@@ -26,6 +26,7 @@ class Yolo(ks.Model):
     self._decoder = decoder
     self._head = head
     self._filter = filter
+    self._ema = None
     return
 
   def build(self, input_shape):
@@ -62,6 +63,22 @@ class Yolo(ks.Model):
   def filter(self):
     return self._filter
 
+  @property
+  def ema(self):
+    return self._ema
+
+  def attach_ema(self, ema):
+    """Keeps a yolo.utils.training.ema.ModelEMA of this model with it."""
+    self._ema = ema
+
+  @property
+  def checkpoint_items(self):
+    """Returns a dictionary of items to be additionally checkpointed."""
+    items = dict(backbone=self.backbone, decoder=self.decoder, head=self.head)
+    if self._ema is not None:
+      items['ema'] = self._ema.checkpoint_item
+    return items
+
 
 def build_yolo_decoder(input_specs, model_config: yolo.Yolo, l2_regularization):
   activation = model_config.decoder_activation if model_config.decoder_activation != "same" else model_config.norm_activation.activation
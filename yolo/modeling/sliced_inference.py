@@ -0,0 +1,185 @@
+"""Sliced inference for Yolo on images much larger than the model input.
+
+Letterboxing a 4K frame down to the model resolution shrinks small objects
+below what the model can find. Sliced, every image is cut into overlapping
+tiles of the model resolution. The tiles of all images of the batch, and
+optionally a resized copy of every full image, are concatenated into a single
+batch of num_tiles * batch images and the model runs once on it. The boxes of
+every tile are moved to the coordinates of the full image on the device and
+the detections of all tiles are merged with class aware nms, so objects on the
+seams between tiles are kept once.
+
+The tiles are laid out from the static image size, so the images of a call
+need a known height and width, one trace per frame size.
+"""
+import tensorflow as tf
+import tensorflow.keras as ks
+
+from yolo.ops import nms_ops
+
+
+def tile_offsets(length, tile, overlap):
+  """Start of every tile along an axis of length pixels.
+
+  The tiles step by tile * (1 - overlap) and the last tile is moved back to
+  end on the border, so the axis is covered with at least the requested
+  overlap. An axis shorter than a tile gets one tile, padded.
+  """
+  if length <= tile:
+    return [0]
+  stride = max(int(tile * (1 - overlap)), 1)
+  offsets = list(range(0, length - tile, stride))
+  offsets.append(length - tile)
+  return offsets
+
+
+class YoloSliced(ks.Model):
+  """Wraps a built Yolo model to predict on overlapping tiles of the images.
+
+  Args:
+    model: the `Yolo` model, called with training=False.
+    tile_size: `int` or (height, width) of the tiles, the model resolution.
+    overlap: `float` fraction of a tile shared with its neighbours.
+    full_pass: `bool` also run every image resized to one tile, for the
+      objects that are too large for the tiles.
+    iou_thresh: `float` iou at which boxes of the same class are merged.
+    max_boxes: `int` number of detections returned per image.
+    pre_nms_boxes: `int` highest scored boxes of an image kept for the merge,
+      the iou matrix of the merge grows with its square. 4 * max_boxes by
+      default.
+    pad_value: `float` value of the canvas around images smaller than a tile.
+  """
+
+  def __init__(self,
+               model,
+               tile_size=608,
+               overlap=0.2,
+               full_pass=True,
+               iou_thresh=0.5,
+               max_boxes=200,
+               pre_nms_boxes=None,
+               pad_value=0.5,
+               **kwargs):
+    super().__init__(**kwargs)
+    if isinstance(tile_size, int):
+      tile_size = (tile_size, tile_size)
+    if len(tile_size) != 2 or min(tile_size) <= 0:
+      raise ValueError(f'tile size has to be positive, got {tile_size}')
+    if not 0 <= overlap < 1:
+      raise ValueError(f'tile overlap has to be in [0, 1), got {overlap}')
+
+    self._model = model
+    self._tile_size = tuple(int(size) for size in tile_size)
+    self._overlap = overlap
+    self._full_pass = full_pass
+    self._iou_thresh = iou_thresh
+    self._max_boxes = max_boxes
+    self._pre_nms_boxes = pre_nms_boxes or 4 * max_boxes
+    self._pad_value = pad_value
+    return
+
+  @property
+  def tile_size(self):
+    return self._tile_size
+
+  def tiles(self, image_size):
+    """(y, x) pixel offsets of the tiles of an image of image_size."""
+    height, width = image_size
+    return [(y, x)
+            for y in tile_offsets(height, self._tile_size[0], self._overlap)
+            for x in tile_offsets(width, self._tile_size[1], self._overlap)]
+
+  def num_tiles(self, image_size):
+    """Model inputs per image, the tiles and the full pass."""
+    return len(self.tiles(image_size)) + int(self._full_pass)
+
+  def _image_size(self, images):
+    image_size = images.shape[1:3]
+    if None in image_size:
+      raise ValueError('sliced inference needs a static image size, got '
+                       f'{images.shape}')
+    return tuple(image_size)
+
+  def slice(self, images):
+    """The batch of all tiles and the window of each in the image.
+
+    Returns:
+      images [num_tiles * batch, tile_height, tile_width, channels], tile
+      major, and a list of the [ymin, xmin, ymax, xmax] windows, normalized to
+      the image, that the canvas of each tile covers.
+    """
+    height, width = self._image_size(images)
+    tile_h, tile_w = self._tile_size
+    padded = tf.pad(
+        images, [[0, 0], [0, max(tile_h - height, 0)],
+                 [0, max(tile_w - width, 0)], [0, 0]],
+        constant_values=self._pad_value)
+
+    batches = []
+    windows = []
+    for y, x in self.tiles((height, width)):
+      batches.append(padded[:, y:y + tile_h, x:x + tile_w, :])
+      windows.append([
+          y / height, x / width, (y + tile_h) / height, (x + tile_w) / width
+      ])
+
+    if self._full_pass:
+      scale = min(tile_h / height, tile_w / width)
+      scaled_h = max(int(round(height * scale)), 1)
+      scaled_w = max(int(round(width * scale)), 1)
+      full = tf.image.resize(images, (scaled_h, scaled_w))
+      full = tf.pad(
+          full, [[0, 0], [0, tile_h - scaled_h], [0, tile_w - scaled_w],
+                 [0, 0]],
+          constant_values=self._pad_value)
+      batches.append(tf.cast(full, images.dtype))
+      windows.append([0.0, 0.0, tile_h / scaled_h, tile_w / scaled_w])
+    return tf.concat(batches, axis=0), windows
+
+  def restore_boxes(self, boxes, windows):
+    """Maps boxes [num_tiles, batch, n, 4] normalized to each tile to the
+    image."""
+    windows = tf.constant(windows, tf.float32)[:, None, None, :]
+    low = tf.tile(windows[..., :2], [1, 1, 1, 2])
+    high = tf.tile(windows[..., 2:], [1, 1, 1, 2])
+    return tf.clip_by_value(low + boxes * (high - low), 0.0, 1.0)
+
+  def call(self, images):
+    batch_size = tf.shape(images)[0]
+    tiles, windows = self.slice(images)
+    predictions = self._model(tiles, training=False)
+
+    num_tiles = len(windows)
+    boxes = tf.reshape(
+        tf.cast(predictions['bbox'], tf.float32),
+        [num_tiles, batch_size, -1, 4])
+    boxes = self.restore_boxes(boxes, windows)
+    classes = tf.reshape(
+        tf.cast(predictions['classes'], tf.float32),
+        [num_tiles, batch_size, -1])
+    confidence = tf.reshape(
+        tf.cast(predictions['confidence'], tf.float32),
+        [num_tiles, batch_size, -1])
+
+    # [num_tiles, batch, n, ...] -> [batch, num_tiles * n, ...]
+    boxes = tf.reshape(tf.transpose(boxes, [1, 0, 2, 3]), [batch_size, -1, 4])
+    classes = tf.reshape(tf.transpose(classes, [1, 0, 2]), [batch_size, -1])
+    confidence = tf.reshape(
+        tf.transpose(confidence, [1, 0, 2]), [batch_size, -1])
+
+    k = tf.minimum(self._pre_nms_boxes, tf.shape(confidence)[-1])
+    confidence, boxes, classes = nms_ops.sort_drop(confidence, boxes,
+                                                   classes[..., None], k)
+    boxes, classes, confidence = nms_ops.weighted_box_fusion(
+        boxes,
+        tf.squeeze(classes, axis=-1),
+        confidence,
+        self._max_boxes,
+        self._iou_thresh,
+        fuse=False)
+    return {
+        'bbox': boxes,
+        'classes': classes,
+        'confidence': confidence,
+        'num_dets': tf.reduce_sum(tf.cast(confidence > 0, tf.int32), axis=-1)
+    }
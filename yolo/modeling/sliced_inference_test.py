@@ -0,0 +1,91 @@
+from yolo.modeling import sliced_inference
+
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+class BrightBoxModel(tf.keras.Model):
+  """Detects the bounding box of the bright pixels of every image.
+
+  A box cut by the border of the image is found with a lower score, like an
+  object cut by the border of a tile.
+  """
+
+  def call(self, images, training=False):
+    bright = images[..., 0] > 0.75
+    size = tf.cast(tf.shape(images)[1:3], tf.float32)
+
+    def _span(mask, length):
+      start = tf.argmax(tf.cast(mask, tf.int32), axis=-1)
+      end = length - tf.cast(
+          tf.argmax(tf.cast(mask[:, ::-1], tf.int32), axis=-1), tf.float32)
+      return tf.cast(start, tf.float32) / length, end / length
+
+    ymin, ymax = _span(tf.reduce_any(bright, axis=2), size[0])
+    xmin, xmax = _span(tf.reduce_any(bright, axis=1), size[1])
+    boxes = tf.stack([ymin, xmin, ymax, xmax], axis=-1)
+    cut = tf.logical_or(
+        tf.reduce_any(boxes[..., :2] <= 0, axis=-1),
+        tf.reduce_any(boxes[..., 2:] >= 1, axis=-1))
+    confidence = tf.where(cut, 0.3, 0.9) * tf.cast(
+        tf.reduce_any(bright, axis=[1, 2]), tf.float32)
+    batch_size = tf.shape(images)[0]
+    return {
+        'bbox': tf.concat([boxes[:, None], tf.zeros([batch_size, 1, 4])],
+                          axis=1),
+        'classes': tf.zeros([batch_size, 2]),
+        'confidence': tf.stack([confidence, tf.zeros([batch_size])], axis=-1),
+    }
+
+
+class SlicedInferenceTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((2160, 608, 0.2, [0, 486, 972, 1458, 1552]),
+                            (1216, 608, 0.0, [0, 608]), (400, 608, 0.2, [0]),
+                            (608, 608, 0.5, [0]))
+  def test_tile_offsets(self, length, tile, overlap, expected):
+    self.assertEqual(
+        sliced_inference.tile_offsets(length, tile, overlap), expected)
+
+  @parameterized.parameters(True, False)
+  def test_boxes_are_merged_across_tiles(self, full_pass):
+    images = tf.zeros([2, 128, 192, 3])
+    images = tf.tensor_scatter_nd_update(
+        images, [[1]],
+        tf.pad(tf.ones([1, 16, 20, 3]), [[0, 0], [40, 72], [100, 72], [0, 0]]))
+    sliced = sliced_inference.YoloSliced(
+        BrightBoxModel(),
+        tile_size=64,
+        overlap=0.5,
+        full_pass=full_pass,
+        max_boxes=4)
+    self.assertEqual(sliced.num_tiles((128, 192)), 15 + int(full_pass))
+    predictions = sliced(images)
+
+    self.assertEqual(predictions['bbox'].shape, [2, 4, 4])
+    self.assertAllClose(
+        predictions['bbox'][1, 0], [40 / 128, 100 / 192, 56 / 128, 120 / 192],
+        atol=0.03)
+    # the four tiles that hold the box, and the full pass, agree on it, it is
+    # kept once
+    self.assertAllClose(predictions['confidence'][1, :2], [0.9, 0.0])
+    self.assertAllEqual(predictions['num_dets'][0], 0)
+
+  def test_image_smaller_than_a_tile(self):
+    images = tf.pad(tf.ones([1, 8, 12, 3]), [[0, 0], [10, 30], [4, 24], [0, 0]])
+    sliced = sliced_inference.YoloSliced(
+        BrightBoxModel(), tile_size=(64, 96), full_pass=False, max_boxes=2)
+    predictions = sliced(images)
+    self.assertAllClose(
+        predictions['bbox'][0, 0], [10 / 48, 4 / 40, 18 / 48, 16 / 40])
+    self.assertAllEqual(predictions['num_dets'], [1])
+
+  def test_invalid(self):
+    with self.assertRaises(ValueError):
+      sliced_inference.YoloSliced(BrightBoxModel(), overlap=1.0)
+    with self.assertRaises(ValueError):
+      sliced_inference.YoloSliced(BrightBoxModel(), tile_size=(0, 608))
+
+
+if __name__ == '__main__':
+  tf.test.main()
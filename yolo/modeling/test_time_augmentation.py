@@ -0,0 +1,145 @@
+"""Test time augmentation for Yolo, as one batched forward pass.
+
+Every image is resized to each of the scales, and flipped if asked for, then
+all of the variants are padded into one canvas size and concatenated into a
+single batch of len(scales) * (1 + flip) * batch images. The model runs once
+on it, the boxes of each variant are mapped back to the original image on the
+device and the detections of all variants are merged with
+nms_ops.weighted_box_fusion, or plain nms.
+"""
+import tensorflow as tf
+import tensorflow.keras as ks
+
+from yolo.ops import nms_ops
+
+FUSIONS = ('wbf', 'nms')
+
+
+class YoloTTA(ks.Model):
+  """Wraps a built Yolo model to predict with test time augmentation.
+
+  Args:
+    model: the `Yolo` model, called with training=False.
+    scales: list of `float` resize factors of the variants, 1.0 is the input.
+    flip: `bool` add a left right flipped copy of every scale.
+    fusion: `str` 'wbf' to average the clusters of overlapping boxes, 'nms'
+      to keep the highest scored box of each.
+    iou_thresh: `float` iou at which boxes of the same class are merged.
+    max_boxes: `int` number of detections returned per image.
+    pad_value: `float` value of the canvas around the smaller variants.
+    down_scale: `int` the canvas is rounded up to a multiple of this.
+  """
+
+  def __init__(self,
+               model,
+               scales=(1.0,),
+               flip=True,
+               fusion='wbf',
+               iou_thresh=0.55,
+               max_boxes=200,
+               pad_value=0.5,
+               down_scale=32,
+               **kwargs):
+    super().__init__(**kwargs)
+    if not scales or min(scales) <= 0:
+      raise ValueError(f'tta scales have to be positive, got {scales}')
+    if fusion not in FUSIONS:
+      raise ValueError(f'tta fusion has to be one of {FUSIONS}, got {fusion}')
+
+    self._model = model
+    self._variants = [(float(scale), False) for scale in scales]
+    if flip:
+      self._variants += [(float(scale), True) for scale in scales]
+    self._max_scale = max(scales)
+    self._fusion = fusion
+    self._iou_thresh = iou_thresh
+    self._max_boxes = max_boxes
+    self._pad_value = pad_value
+    self._down_scale = down_scale
+    return
+
+  @classmethod
+  def from_params(cls, model, params, max_boxes=200):
+    """Builds the wrapper of a TestTimeAugmentation config."""
+    return cls(
+        model,
+        scales=params.scales or [1.0],
+        flip=params.flip,
+        fusion=params.fusion,
+        iou_thresh=params.iou_thresh,
+        max_boxes=max_boxes)
+
+  @property
+  def num_variants(self):
+    return len(self._variants)
+
+  def _canvas_size(self, size):
+    scaled = tf.math.ceil(
+        tf.cast(size, tf.float32) * self._max_scale / self._down_scale)
+    return tf.cast(scaled, tf.int32) * self._down_scale
+
+  def augment(self, images):
+    """The batch of all variants and the size of each in the canvas."""
+    size = tf.shape(images)[1:3]
+    canvas = self._canvas_size(size)
+    batches = []
+    sizes = []
+    for scale, flip in self._variants:
+      scaled = tf.cast(
+          tf.math.round(tf.cast(size, tf.float32) * scale), tf.int32)
+      variant = tf.image.resize(images, scaled)
+      if flip:
+        variant = tf.image.flip_left_right(variant)
+      pad = canvas - scaled
+      variant = tf.pad(
+          variant, [[0, 0], [0, pad[0]], [0, pad[1]], [0, 0]],
+          constant_values=self._pad_value)
+      batches.append(tf.cast(variant, images.dtype))
+      sizes.append(tf.cast(scaled, tf.float32) / tf.cast(canvas, tf.float32))
+    return tf.concat(batches, axis=0), sizes
+
+  def restore_boxes(self, boxes, fraction, flip):
+    """Maps boxes normalized to the canvas back to the original image."""
+    boxes = boxes / tf.tile(fraction, [2])
+    boxes = tf.clip_by_value(boxes, 0.0, 1.0)
+    if flip:
+      ymin, xmin, ymax, xmax = tf.split(boxes, 4, axis=-1)
+      boxes = tf.concat([ymin, 1.0 - xmax, ymax, 1.0 - xmin], axis=-1)
+    return boxes
+
+  def call(self, images):
+    batch_size = tf.shape(images)[0]
+    augmented, sizes = self.augment(images)
+    predictions = self._model(augmented, training=False)
+
+    num_variants = self.num_variants
+    boxes = tf.cast(predictions['bbox'], tf.float32)
+    boxes = tf.reshape(boxes, [num_variants, batch_size, -1, 4])
+    classes = tf.reshape(
+        tf.cast(predictions['classes'], tf.float32),
+        [num_variants, batch_size, -1])
+    confidence = tf.reshape(
+        tf.cast(predictions['confidence'], tf.float32),
+        [num_variants, batch_size, -1])
+
+    restored = []
+    for i, (_, flip) in enumerate(self._variants):
+      restored.append(self.restore_boxes(boxes[i], sizes[i], flip))
+    boxes = tf.concat(restored, axis=1)
+    classes = tf.concat(tf.unstack(classes, num=num_variants), axis=1)
+    confidence = tf.concat(tf.unstack(confidence, num=num_variants), axis=1)
+
+    boxes, classes, confidence = nms_ops.weighted_box_fusion(
+        boxes,
+        classes,
+        confidence,
+        self._max_boxes,
+        self._iou_thresh,
+        num_votes=num_variants,
+        fuse=self._fusion == 'wbf')
+    return {
+        'bbox': boxes,
+        'classes': classes,
+        'confidence': confidence,
+        'num_dets': tf.reduce_sum(tf.cast(confidence > 0, tf.int32), axis=-1)
+    }
@@ -0,0 +1,93 @@
+from yolo.modeling import test_time_augmentation
+from yolo.ops import nms_ops
+
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+class BrightBoxModel(tf.keras.Model):
+  """Detects the bounding box of the bright pixels of every image."""
+
+  def call(self, images, training=False):
+    bright = images[..., 0] > 0.5
+    size = tf.cast(tf.shape(images)[1:3], tf.float32)
+
+    def _span(mask, length):
+      start = tf.argmax(tf.cast(mask, tf.int32), axis=-1)
+      end = length - tf.cast(
+          tf.argmax(tf.cast(mask[:, ::-1], tf.int32), axis=-1), tf.float32)
+      return tf.cast(start, tf.float32) / length, end / length
+
+    ymin, ymax = _span(tf.reduce_any(bright, axis=2), size[0])
+    xmin, xmax = _span(tf.reduce_any(bright, axis=1), size[1])
+    boxes = tf.stack([ymin, xmin, ymax, xmax], axis=-1)[:, None, :]
+    batch_size = tf.shape(images)[0]
+    return {
+        'bbox': tf.concat([boxes, tf.zeros([batch_size, 1, 4])], axis=1),
+        'classes': tf.zeros([batch_size, 2]),
+        'confidence': tf.tile([[0.9, 0.0]], [batch_size, 1]),
+    }
+
+
+class TestTimeAugmentationTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(('wbf', (1.0,), True), ('nms', (1.0,), True),
+                            ('wbf', (0.5, 1.0, 1.5), True),
+                            ('wbf', (0.75, 1.25), False))
+  def test_boxes_are_restored(self, fusion, scales, flip):
+    images = tf.zeros([2, 64, 96, 3])
+    images = tf.tensor_scatter_nd_update(
+        images, [[0]],
+        tf.pad(tf.ones([1, 16, 24, 3]), [[0, 0], [8, 40], [60, 12], [0, 0]]))
+    tta = test_time_augmentation.YoloTTA(
+        BrightBoxModel(), scales=scales, flip=flip, fusion=fusion, max_boxes=2)
+    predictions = tta(images)
+
+    self.assertEqual(predictions['bbox'].shape, [2, 2, 4])
+    self.assertAllClose(
+        predictions['bbox'][0, 0], [8 / 64, 60 / 96, 24 / 64, 84 / 96],
+        atol=0.03)
+    self.assertAllEqual(predictions['num_dets'][0], 1)
+    # every variant found the box, so it keeps its full score
+    self.assertAllClose(predictions['confidence'][0, 0], 0.9)
+
+  def test_weighted_box_fusion(self):
+    boxes = tf.constant([[[0.0, 0.0, 0.5, 0.5], [0.0, 0.0, 0.5, 0.6],
+                          [0.0, 0.0, 0.5, 0.5], [0.6, 0.6, 0.9, 0.9]]])
+    classes = tf.constant([[0.0, 0.0, 1.0, 0.0]])
+    confidence = tf.constant([[0.8, 0.2, 0.6, 0.4]])
+    fused_boxes, fused_classes, fused = nms_ops.weighted_box_fusion(
+        boxes, classes, confidence, 4, 0.5, num_votes=2)
+
+    # the first two boxes merge, the class 1 box stays on its own
+    self.assertAllClose(fused[0], [0.5, 0.3, 0.2, 0.0])
+    self.assertAllClose(fused_boxes[0, 0], [0.0, 0.0, 0.5, 0.52])
+    self.assertAllClose(fused_classes[0, :3], [0.0, 1.0, 0.0])
+
+    _, _, kept = nms_ops.weighted_box_fusion(
+        boxes, classes, confidence, 4, 0.5, num_votes=2, fuse=False)
+    self.assertAllClose(kept[0], [0.8, 0.6, 0.4, 0.0])
+
+  @parameterized.parameters((True, [0.85, 0.7, 0.0]), (False, [0.9, 0.7, 0.0]))
+  def test_weighted_box_fusion_chain(self, fuse, expected):
+    # a overlaps b and b overlaps c, but a does not overlap c. b joins a, so
+    # it can not suppress c.
+    boxes = tf.constant([[[0.0, 0.0, 1.0, 1.0], [0.0, 0.3, 1.0, 1.3],
+                          [0.0, 0.6, 1.0, 1.6]]])
+    classes = tf.zeros([1, 3])
+    confidence = tf.constant([[0.9, 0.8, 0.7]])
+    fused_boxes, _, fused = nms_ops.weighted_box_fusion(
+        boxes, classes, confidence, 3, 0.5, fuse=fuse)
+
+    self.assertAllClose(fused[0], expected)
+    self.assertAllClose(fused_boxes[0, 1], [0.0, 0.6, 1.0, 1.6])
+
+  def test_invalid(self):
+    with self.assertRaises(ValueError):
+      test_time_augmentation.YoloTTA(BrightBoxModel(), scales=[0.0])
+    with self.assertRaises(ValueError):
+      test_time_augmentation.YoloTTA(BrightBoxModel(), fusion='soft')
+
+
+if __name__ == '__main__':
+  tf.test.main()
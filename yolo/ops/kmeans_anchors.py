@@ -67,6 +67,11 @@ class AnchorKMeans:
               axis=0)
     self._boxes = box_ls
 
+  def get_box_from_index(self, index):
+    """Reads the box sizes of an annotation_index.AnnotationIndex, without
+    loading the annotation file or decoding any image."""
+    self._boxes = tf.convert_to_tensor(index.normalized_sizes(), tf.float32)
+
   @property
   def boxes(self):
     return self._boxes.numpy()
@@ -103,6 +103,94 @@ def nms(boxes,
   return box_l, class_l, conf_l
 
 
+def weighted_box_fusion(boxes,
+                        classes,
+                        confidence,
+                        k,
+                        iou_thresh,
+                        num_votes=1,
+                        fuse=True):
+  """Merges the overlapping boxes of each class, vectorized over the batch.
+
+  The boxes are sorted by confidence and visited in that order. A box leads
+  a cluster if no higher scored leader of its class overlaps it by
+  iou_thresh, so a box that was itself suppressed does not suppress others,
+  as in greedy nms. Every other box joins
+  the highest scored leader it overlaps, and is dropped if there is none.
+  With fuse the box of a cluster is the confidence weighted mean of its
+  members and its confidence the sum over max(members, num_votes), so boxes
+  only found by a few of num_votes predictions are scored down. Without fuse
+  the leaders are kept as they are, which is plain nms.
+
+  Args:
+    boxes: `Tensor` [batch, n, 4] as [ymin, xmin, ymax, xmax].
+    classes: float `Tensor` [batch, n].
+    confidence: `Tensor` [batch, n], 0 for padding.
+    k: `int` number of boxes to return, at most n.
+    iou_thresh: `float` iou at which two boxes are merged.
+    num_votes: `int` number of predictions the boxes were pooled from.
+    fuse: `bool` average the clusters instead of keeping the leaders.
+
+  Returns:
+    boxes, classes and confidence of the clusters, [batch, k, ...], sorted.
+  """
+  n = tf.shape(confidence)[-1]
+  confidence, boxes, classes = sort_drop(confidence, boxes,
+                                         tf.expand_dims(classes, axis=-1), n)
+  classes = tf.squeeze(classes, axis=-1)
+  valid = confidence > 0
+
+  iou = aggregated_comparitive_iou(boxes)
+  overlap = tf.logical_and(iou >= iou_thresh,
+                           tf.equal(classes[:, :, None], classes[:, None, :]))
+  overlap = tf.logical_and(
+      overlap, tf.logical_and(valid[:, :, None], valid[:, None, :]))
+
+  # earlier[i, j]: box j has a higher score than box i
+  order = tf.range(n)
+  earlier = tf.expand_dims(order[:, None] > order[None, :], axis=0)
+  suppressors = tf.logical_and(overlap, earlier)
+
+  def pick_leader(i, leader):
+    suppressed = tf.reduce_any(
+        tf.logical_and(suppressors[:, i, :], leader), axis=-1)
+    is_leader = tf.logical_and(valid[:, i], tf.logical_not(suppressed))
+    leader = tf.logical_or(
+        leader,
+        tf.logical_and(tf.equal(order, i)[None, :], is_leader[:, None]))
+    return i + 1, leader
+
+  _, leader = tf.while_loop(lambda i, _: i < n, pick_leader,
+                            [tf.constant(0), tf.zeros_like(valid)])
+
+  # every box joins the first leader at or before it that overlaps it, a
+  # leader overlaps itself
+  at_or_before = tf.expand_dims(order[:, None] >= order[None, :], axis=0)
+  candidates = tf.logical_and(
+      overlap, tf.logical_and(leader[:, None, :], at_or_before))
+  joined = tf.reduce_any(candidates, axis=-1)
+  first = tf.argmax(
+      tf.cast(candidates, tf.int32), axis=-1, output_type=tf.int32)
+  assign = tf.one_hot(first, n, dtype=confidence.dtype) * tf.cast(
+      joined, confidence.dtype)[..., None]
+
+  lead = tf.cast(leader, confidence.dtype)
+  if fuse:
+    weight = assign * confidence[..., None]
+    total = tf.reduce_sum(weight, axis=1)
+    count = tf.reduce_sum(assign, axis=1)
+    boxes = tf.einsum('bij,bic->bjc', weight, tf.cast(boxes, weight.dtype))
+    boxes /= tf.maximum(total, 1e-9)[..., None]
+    confidence = total / tf.maximum(count, float(num_votes))
+
+  boxes *= lead[..., None]
+  confidence *= lead
+  classes *= tf.cast(lead, classes.dtype)
+  confidence, boxes, classes = sort_drop(confidence, boxes,
+                                         tf.expand_dims(classes, axis=-1), k)
+  return boxes, tf.squeeze(classes, axis=-1), confidence
+
+
 # def nms2(boxes,
 #          classes,
 #          confidence,
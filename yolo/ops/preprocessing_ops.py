@@ -1,24 +1,91 @@
+import hashlib
+
 import tensorflow as tf
-import tensorflow_addons as tfa
 import tensorflow.keras.backend as K
 from yolo.ops import box_ops
+from official.utils.misc import lazy_loader
 from official.vision.beta.ops import preprocess_ops
 
+tfa = lazy_loader.LazyModule('tensorflow_addons')
+
+# tf.random truncates the op seeds to 31 bits
+_MAX_OP_SEED = 2**31 - 1
+
+
+# The random ops take a `seed` that is either an `int` op seed or None, for
+# the stateful tf.random ops, or a [2] integer tensor, e.g. the example seeds of
+# the InputReader, for the stateless ones, whose results only depend on it.
+def _is_stateful(seed):
+  return seed is None or isinstance(seed, int)
+
+
+def _hash_seed(seed, index):
+  digest = hashlib.blake2b(f'{seed},{index}'.encode(), digest_size=8).digest()
+  return int.from_bytes(digest, 'little') % _MAX_OP_SEED
+
+
+def split_seed(seed, num):
+  """Derives num independent seeds from seed, one for every random op.
+
+  A stateless seed is split with tf.random.experimental.stateless_split. An
+  int seed is hashed together with the index of the op, so the seeds of a
+  nested split, or of the splits of other seeds, look unrelated too. None
+  stays None.
+  """
+  if seed is None:
+    return [None] * num
+  if _is_stateful(seed):
+    return [_hash_seed(seed, i) for i in range(num)]
+  seeds = tf.random.experimental.stateless_split(tf.cast(seed, tf.int64), num)
+  return tf.unstack(seeds, num=num)
+
+
+def random_uniform(shape, minval=0, maxval=None, dtype=tf.float32, seed=None):
+  if _is_stateful(seed):
+    return tf.random.uniform(
+        shape, minval=minval, maxval=maxval, dtype=dtype, seed=seed)
+  return tf.random.stateless_uniform(
+      shape, seed=seed, minval=minval, maxval=maxval, dtype=dtype)
+
+
+def random_normal(shape, mean=0.0, stddev=1.0, dtype=tf.float32, seed=None):
+  if _is_stateful(seed):
+    return tf.random.normal(
+        shape, mean=mean, stddev=stddev, dtype=dtype, seed=seed)
+  return tf.random.stateless_normal(
+      shape, seed=seed, mean=mean, stddev=stddev, dtype=dtype)
 
-def rand_uniform_strong(minval, maxval, dtype=tf.float32):
+
+def rand_uniform_strong(minval, maxval, dtype=tf.float32, seed=None):
   if minval > maxval:
     minval, maxval = maxval, minval
-  return tf.random.uniform([], minval=minval, maxval=maxval, dtype=dtype)
+  return random_uniform([], minval=minval, maxval=maxval, dtype=dtype,
+                        seed=seed)
 
 
-def rand_scale(val, dtype=tf.float32):
-  scale = rand_uniform_strong(1, val, dtype=dtype)
-  do_ret = tf.random.uniform([], minval=0, maxval=1, dtype=tf.int32)
+def rand_scale(val, dtype=tf.float32, seed=None):
+  scale_seed, ret_seed = split_seed(seed, 2)
+  scale = rand_uniform_strong(1, val, dtype=dtype, seed=scale_seed)
+  do_ret = random_uniform([], minval=0, maxval=1, dtype=tf.int32, seed=ret_seed)
   if (do_ret == 1):
     return scale
   return 1.0 / scale
 
 
+def random_horizontal_flip(image, normalized_boxes, seed=None):
+  """Flips the image and its boxes horizontally with a probability of 0.5."""
+  with tf.name_scope('random_horizontal_flip'):
+    do_flip = tf.greater(random_uniform([], seed=seed), 0.5)
+    image = tf.cond(do_flip,
+                    lambda: preprocess_ops.horizontal_flip_image(image),
+                    lambda: image)
+    normalized_boxes = tf.cond(
+        do_flip,
+        lambda: preprocess_ops.horizontal_flip_boxes(normalized_boxes),
+        lambda: normalized_boxes)
+  return image, normalized_boxes
+
+
 def shift_zeros(data, mask, axis=-2, fill=0):
   zeros = tf.zeros_like(data) + fill
 
@@ -56,8 +123,8 @@ def scale_image(image, resize=False, w=None, h=None):
   return image
 
 
-def random_jitter(image, box, classes, t, seed=10):
-  jx = 1 + tf.random.uniform(minval=-t, maxval=t, shape=(), dtype=tf.float32)
+def random_jitter(image, box, classes, t, seed=None):
+  jx = 1 + random_uniform((), minval=-t, maxval=t, dtype=tf.float32, seed=seed)
   jy = jx  # 1 + tf.random.uniform(minval=-t, maxval=t, shape=(), dtype=tf.float32)
   shape = tf.shape(image)
 
@@ -72,19 +139,27 @@ def random_jitter(image, box, classes, t, seed=10):
   return image, box, classes
 
 
-def random_translate(image, box, classes, t, seed=10):
-  t_x = tf.random.uniform(minval=-t, maxval=t, shape=(), dtype=tf.float32)
-  t_y = tf.random.uniform(minval=-t, maxval=t, shape=(), dtype=tf.float32)
+def random_translate(image, box, classes, t, seed=None):
+  x_seed, y_seed = split_seed(seed, 2)
+  t_x = random_uniform((), minval=-t, maxval=t, dtype=tf.float32, seed=x_seed)
+  t_y = random_uniform((), minval=-t, maxval=t, dtype=tf.float32, seed=y_seed)
   box, classes = translate_boxes(box, classes, t_x, t_y)
   image = translate_image(image, t_x, t_y)
   return image, box, classes
 
 
-def random_zoom_crop(image, boxes, classes, zoom_factor):
-  jx = 1 + tf.random.uniform(
-      minval=-zoom_factor, maxval=zoom_factor, shape=(), dtype=tf.float32)
-  jy = 1 + tf.random.uniform(
-      minval=-zoom_factor, maxval=zoom_factor, shape=(), dtype=tf.float32)
+def random_zoom_crop(image, boxes, classes, zoom_factor, seed=None):
+  x_seed, y_seed, crop_seed = split_seed(seed, 3)
+  jx = 1 + random_uniform((),
+                          minval=-zoom_factor,
+                          maxval=zoom_factor,
+                          dtype=tf.float32,
+                          seed=x_seed)
+  jy = 1 + random_uniform((),
+                          minval=-zoom_factor,
+                          maxval=zoom_factor,
+                          dtype=tf.float32,
+                          seed=y_seed)
   shape = tf.shape(image)
   if tf.shape(shape)[0] == 4:
     width = shape[2]
@@ -100,7 +175,8 @@ def random_zoom_crop(image, boxes, classes, zoom_factor):
       default_height=height,
       target_width=tf.cast(tf.cast(width, jx.dtype) * jx, tf.int32),
       target_height=tf.cast(tf.cast(height, jy.dtype) * jy, tf.int32),
-      randomize=True)
+      randomize=True,
+      seed=crop_seed)
   return image, boxes, classes
 
 
@@ -149,7 +225,8 @@ def resize_crop_filter(image,
                        default_height,
                        target_width,
                        target_height,
-                       randomize=False):
+                       randomize=False,
+                       seed=None):
   with tf.name_scope('resize_crop_filter'):
     dx = (tf.math.maximum(default_width, target_width) -
           tf.math.minimum(default_width, target_width)) // 2
@@ -157,10 +234,11 @@ def resize_crop_filter(image,
           tf.math.minimum(default_height, target_height)) // 2
 
     if randomize:
-      dx = tf.random.uniform([], minval=0, maxval=dx *
-                             2, dtype=tf.int32) if dx != 0 else 0
-      dy = tf.random.uniform([], minval=0, maxval=dy *
-                             2, dtype=tf.int32) if dy != 0 else 0
+      x_seed, y_seed = split_seed(seed, 2)
+      dx = random_uniform([], minval=0, maxval=dx * 2, dtype=tf.int32,
+                          seed=x_seed) if dx != 0 else 0
+      dy = random_uniform([], minval=0, maxval=dy * 2, dtype=tf.int32,
+                          seed=y_seed) if dy != 0 else 0
 
     if target_width > default_width:
       image, boxes, classes = pad_filter_to_bbox(image, boxes, classes,
@@ -359,8 +437,14 @@ def cutmix_1(image_to_crop, boxes1, classes1, image_mask, boxes2, classes2,
   return image, boxes, classes
 
 
-def cutmix_batch(image, boxes, classes, target_width, target_height,
-                 offset_width, offset_height):
+def cutmix_batch(image,
+                 boxes,
+                 classes,
+                 target_width,
+                 target_height,
+                 offset_width,
+                 offset_height,
+                 seed=None):
   with tf.name_scope('cutmix_batch'):
 
     image_, boxes_, classes_ = cut_out(image, boxes, classes, target_width,
@@ -376,7 +460,7 @@ def cutmix_batch(image, boxes, classes, target_width, target_height,
         offset_height,
         fix=True)
 
-    mix = tf.random.uniform([], minval=0, maxval=1)
+    mix = random_uniform([], minval=0, maxval=1, seed=seed)
     if mix > 0.5:
       i_split1, i_split2 = tf.split(image__, 2, axis=0)
       b_split1, b_split2 = tf.split(boxes__, 2, axis=0)
@@ -411,7 +495,9 @@ def cutmix_batch(image, boxes, classes, target_width, target_height,
   return image, boxes, classes, num_detections
 
 
-def randomized_cutmix_batch(image, boxes, classes):
+def randomized_cutmix_batch(image, boxes, classes, seed=None):
+  (twidth_seed, theight_seed, owidth_seed, oheight_seed,
+   mix_seed) = split_seed(seed, 5)
   shape = tf.shape(image)
 
   width = shape[2]
@@ -420,27 +506,30 @@ def randomized_cutmix_batch(image, boxes, classes):
   w_limit = 3 * width // 4
   h_limit = 3 * height // 4
 
-  twidth = tf.random.uniform([],
-                             minval=width // 4,
-                             maxval=w_limit,
-                             dtype=tf.int32)
-  theight = tf.random.uniform([],
-                              minval=height // 4,
-                              maxval=h_limit,
-                              dtype=tf.int32)
-
-  owidth = tf.random.uniform([],
-                             minval=0,
-                             maxval=width - twidth,
-                             dtype=tf.int32)
-  oheight = tf.random.uniform([],
-                              minval=0,
-                              maxval=height - theight,
-                              dtype=tf.int32)
-
-  image, boxes, classes, num_detections = cutmix_batch(image, boxes, classes,
-                                                       twidth, theight, owidth,
-                                                       oheight)
+  twidth = random_uniform([],
+                          minval=width // 4,
+                          maxval=w_limit,
+                          dtype=tf.int32,
+                          seed=twidth_seed)
+  theight = random_uniform([],
+                           minval=height // 4,
+                           maxval=h_limit,
+                           dtype=tf.int32,
+                           seed=theight_seed)
+
+  owidth = random_uniform([],
+                          minval=0,
+                          maxval=width - twidth,
+                          dtype=tf.int32,
+                          seed=owidth_seed)
+  oheight = random_uniform([],
+                           minval=0,
+                           maxval=height - theight,
+                           dtype=tf.int32,
+                           seed=oheight_seed)
+
+  image, boxes, classes, num_detections = cutmix_batch(
+      image, boxes, classes, twidth, theight, owidth, oheight, seed=mix_seed)
   return image, boxes, classes, num_detections
 
 
@@ -473,6 +562,150 @@ def randomized_cutmix_split(image, boxes, classes):
   return image, boxes, classes, num_detections
 
 
+def mosaic_batch(image,
+                 boxes,
+                 classes,
+                 max_num_instances=None,
+                 min_split=0.25,
+                 max_split=0.75,
+                 min_area=0.25,
+                 seed=None):
+  """4 image mosaic of a batch, every sample gets its own split point.
+
+  The output of sample b is cut into 4 quadrants at a random point, quadrant q
+  shows a random window of image (b - q) % batch_size at its native scale.
+  The boxes of the 4 sources are moved with their windows, clipped to their
+  quadrant and kept if at least min_area of them is still visible. The kept
+  boxes are packed to the front in one pass, the rest is padded with zeros
+  and a class of -1.
+
+  Args:
+    image: a `Tensor` of shape [batch, height, width, channels].
+    boxes: a `Tensor` of shape [batch, num_boxes, 4], normalized yxyx boxes,
+      padded with zeros.
+    classes: a `Tensor` of shape [batch, num_boxes], padded with -1.
+    max_num_instances: an optional `int`, the number of boxes to keep per
+      sample, defaults to 4 * num_boxes.
+    min_split: a `float` lower bound of the split point, relative to the size.
+    max_split: a `float` upper bound of the split point, relative to the size.
+    min_area: a `float` fraction of a box that has to stay visible.
+    seed: an `int` op seed for tf.random, or a [2] integer `Tensor` for
+      stateless random ops.
+
+  Returns:
+    image: the mixed images, same shape as the input.
+    boxes: a `Tensor` of shape [batch, max_num_instances, 4].
+    classes: a `Tensor` of shape [batch, max_num_instances].
+    num_detections: a `Tensor` of shape [batch], the number of kept boxes.
+  """
+  with tf.name_scope('mosaic_batch'):
+    position_seed, offset_seed = split_seed(seed, 2)
+    shape = tf.shape(image)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    fheight = tf.cast(height, tf.float32)
+    fwidth = tf.cast(width, tf.float32)
+
+    # split point of every sample in pixels
+    split = random_uniform([batch_size, 2],
+                           minval=min_split,
+                           maxval=max_split,
+                           seed=position_seed)
+    split_y = tf.cast(split[:, 0] * fheight, tf.int32)
+    split_x = tf.cast(split[:, 1] * fwidth, tf.int32)
+
+    # quadrant bounds [batch, 4], top left, top right, bottom left, bottom right
+    zeros = tf.zeros_like(split_y)
+    full_h = tf.fill([batch_size], height)
+    full_w = tf.fill([batch_size], width)
+    y0 = tf.stack([zeros, zeros, split_y, split_y], axis=-1)
+    y1 = tf.stack([split_y, split_y, full_h, full_h], axis=-1)
+    x0 = tf.stack([zeros, split_x, zeros, split_x], axis=-1)
+    x1 = tf.stack([split_x, full_w, split_x, full_w], axis=-1)
+
+    # offset of the window of the source image shown in each quadrant, the
+    # window always lies inside of the source
+    offset = random_uniform([batch_size, 4, 2], seed=offset_seed)
+    dy = tf.cast(offset[..., 0] * tf.cast(height - (y1 - y0), tf.float32),
+                 tf.int32) - y0
+    dx = tf.cast(offset[..., 1] * tf.cast(width - (x1 - x0), tf.float32),
+                 tf.int32) - x0
+
+    rows = tf.range(height)[tf.newaxis]
+    cols = tf.range(width)[tf.newaxis]
+    box_dtype = boxes.dtype
+    boxes = tf.cast(boxes, tf.float32)
+    classes = tf.convert_to_tensor(classes)
+    box_area = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+
+    mosaic = tf.zeros_like(image)
+    all_boxes = []
+    all_valid = []
+    all_classes = []
+    for q in range(4):
+      source = tf.roll(image, shift=q, axis=0)
+      row_index = tf.clip_by_value(rows + dy[:, q:q + 1], 0, height - 1)
+      col_index = tf.clip_by_value(cols + dx[:, q:q + 1], 0, width - 1)
+      window = tf.gather(source, row_index, axis=1, batch_dims=1)
+      window = tf.gather(window, col_index, axis=2, batch_dims=1)
+
+      in_rows = tf.logical_and(rows >= y0[:, q:q + 1], rows < y1[:, q:q + 1])
+      in_cols = tf.logical_and(cols >= x0[:, q:q + 1], cols < x1[:, q:q + 1])
+      mask = tf.logical_and(in_rows[:, :, tf.newaxis, tf.newaxis],
+                            in_cols[:, tf.newaxis, :, tf.newaxis])
+      mosaic = tf.where(mask, window, mosaic)
+
+      # move the boxes with the window and clip them to the quadrant
+      shift = tf.stack([
+          tf.cast(dy[:, q], tf.float32) / fheight,
+          tf.cast(dx[:, q], tf.float32) / fwidth
+      ], axis=-1)
+      shift = tf.tile(shift, [1, 2])[:, tf.newaxis]
+      lower = tf.stack([
+          tf.cast(y0[:, q], tf.float32) / fheight,
+          tf.cast(x0[:, q], tf.float32) / fwidth
+      ], axis=-1)
+      upper = tf.stack([
+          tf.cast(y1[:, q], tf.float32) / fheight,
+          tf.cast(x1[:, q], tf.float32) / fwidth
+      ], axis=-1)
+      lower = tf.tile(lower, [1, 2])[:, tf.newaxis]
+      upper = tf.tile(upper, [1, 2])[:, tf.newaxis]
+      moved = tf.clip_by_value(
+          tf.roll(boxes, shift=q, axis=0) - shift, lower, upper)
+
+      box_h = moved[..., 2] - moved[..., 0]
+      box_w = moved[..., 3] - moved[..., 1]
+      source_area = tf.roll(box_area, shift=q, axis=0)
+      source_classes = tf.roll(classes, shift=q, axis=0)
+      valid = tf.logical_and(box_h > 0, box_w > 0)
+      valid = tf.logical_and(valid, source_area > 0)
+      valid = tf.logical_and(valid, box_h * box_w >= min_area * source_area)
+      valid = tf.logical_and(valid, source_classes >= 0)
+
+      all_boxes.append(moved)
+      all_valid.append(valid)
+      all_classes.append(source_classes)
+
+    boxes = tf.concat(all_boxes, axis=1)
+    valid = tf.concat(all_valid, axis=1)
+    classes = tf.concat(all_classes, axis=1)
+
+    # pack the kept boxes to the front, keeping their order
+    order = tf.argsort(
+        tf.cast(tf.logical_not(valid), tf.int32), axis=-1, stable=True)
+    if max_num_instances is not None:
+      order = order[:, :max_num_instances]
+    boxes = tf.gather(boxes, order, axis=1, batch_dims=1)
+    valid = tf.gather(valid, order, axis=1, batch_dims=1)
+    classes = tf.gather(classes, order, axis=1, batch_dims=1)
+
+    boxes = tf.where(valid[..., tf.newaxis], boxes, tf.zeros_like(boxes))
+    boxes = tf.cast(boxes, box_dtype)
+    classes = tf.where(valid, classes, -tf.ones_like(classes))
+    num_detections = tf.reduce_sum(tf.cast(valid, tf.int32), axis=-1)
+  return mosaic, boxes, classes, num_detections
+
+
 def fit_preserve_aspect_ratio(image,
                               boxes,
                               width=None,
@@ -657,7 +890,13 @@ def get_best_anchor_batch(y_true, anchors, width=1, height=1):
   return tf.cast(iou_index, dtype=tf.float32)
 
 
-def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
+def build_grided_gt(y_true,
+                    mask,
+                    size,
+                    num_classes,
+                    dtype,
+                    use_tie_breaker,
+                    seed=None):
   """
     convert ground truth for use in loss functions
     Args:
@@ -672,10 +911,62 @@ def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
       dtype: expected output datatype
       use_tie_breaker: boolean value for wether or not to use
         the tie_breaker
+      seed: the seed of the tie breaker, see random_uniform
 
     Return:
       tf.Tensor[] of shape [size, size, #of_anchors, 4, 1, num_classes]
   """
+  update_index, update = build_sparse_grided_gt(y_true, mask, size, dtype,
+                                                use_tie_breaker, seed)
+  return scatter_grided_gt(update_index, update, size, tf.shape(mask)[0], dtype)
+
+
+def scatter_grided_gt(update_index, update, size, num_anchors, dtype):
+  """
+    expand sparse ground truth into the dense grid used by the loss
+    Args:
+      update_index: tf.Tensor[] of shape [n, 3], the [y, x, anchor] cell of
+        every update
+      update: tf.Tensor[] of shape [n, 6], [x, y, w, h, 1, class] of every
+        update
+      size: the dimensions of this output
+      num_anchors: the number of anchors of this output
+      dtype: expected output datatype
+
+    Return:
+      tf.Tensor[] of shape [size, size, num_anchors, 6]
+  """
+  full = tf.zeros([size, size, num_anchors, 6], dtype=dtype)
+  update_index = tf.cast(tf.reshape(update_index, [-1, 3]), tf.int32)
+  update = tf.cast(tf.reshape(update, [-1, 6]), dtype)
+  return tf.tensor_scatter_nd_update(full, update_index, update)
+
+
+def build_sparse_grided_gt(y_true,
+                           mask,
+                           size,
+                           dtype,
+                           use_tie_breaker,
+                           seed=None):
+  """
+    cells and values of the ground truth grid for use in loss functions
+    Args:
+      y_true: tf.Tensor[] ground truth
+        [box coords[0:4], classes_onehot[0:-1], best_fit_anchor_box]
+      mask: list of the anchor boxes choresponding to the output,
+        ex. [1, 2, 3] tells this layer to predict only the first 3
+        anchors in the total.
+      size: the dimensions of this output, for regular, it progresses
+        from 13, to 26, to 52
+      dtype: expected output datatype
+      use_tie_breaker: boolean value for wether or not to use
+        the tie_breaker
+      seed: the seed of the tie breaker, see random_uniform
+
+    Return:
+      update_index: tf.Tensor[] of shape [n, 3], the [y, x, anchor] cells
+      update: tf.Tensor[] of shape [n, 6], [x, y, w, h, 1, class] per cell
+  """
   # unpack required components from the input ground truth
   boxes = tf.cast(y_true['bbox'], dtype)
   classes = tf.expand_dims(tf.cast(y_true['classes'], dtype=dtype), axis=-1)
@@ -686,9 +977,6 @@ def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
   # get the number of anchor boxes used for this anchor scale
   len_masks = tf.shape(mask)[0]
 
-  # init a fixed memeory size grid for this prediction scale
-  # [size, size, # of anchors, 1 + 1 + number of anchors per scale]
-  full = tf.zeros([size, size, len_masks, 6], dtype=dtype)
   # init a grid to use to track which locations have already
   # been used before (for the tie breaker)
   depth_track = tf.zeros((size, size, len_masks), dtype=tf.int32)
@@ -699,8 +987,9 @@ def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
 
   # init all the tensorArrays to be used in storeing the index
   # and the values to be used to update both depth_track and full
-  update_index = tf.TensorArray(tf.int32, size=0, dynamic_size=True)
-  update = tf.TensorArray(dtype, size=0, dynamic_size=True)
+  update_index = tf.TensorArray(
+      tf.int32, size=0, dynamic_size=True, element_shape=[3])
+  update = tf.TensorArray(dtype, size=0, dynamic_size=True, element_shape=[6])
 
   # init constants and match data types before entering loop
   i = 0
@@ -708,6 +997,8 @@ def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
   const = tf.cast(tf.convert_to_tensor([1.]), dtype=dtype)
   mask = tf.cast(mask, dtype=dtype)
   rand_update = 0.0
+  # one draw per box, so a stateless seed gives every box its own number
+  tie_breaks = random_uniform([num_boxes], maxval=1, seed=seed)
 
   for box_id in range(num_boxes):
     # if the width or height of the box is zero, skip it
@@ -737,7 +1028,7 @@ def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
             # create random numbr to trigger a replacment if the cell
             # is used already
             if tf.math.equal(used, 1):
-              rand_update = tf.random.uniform([], maxval=1)
+              rand_update = tie_breaks[box_id]
             else:
               rand_update = 1.0
 
@@ -774,17 +1065,17 @@ def build_grided_gt(y_true, mask, size, num_classes, dtype, use_tie_breaker):
         update = update.write(i, value)
         i += 1
 
-  # if the size of the update list is not 0, do an update, other wise,
-  # no boxes and pass an empty grid
-  if tf.math.greater(update_index.size(), 0):
-    update_index = update_index.stack()
-    update = update.stack()
-    full = tf.tensor_scatter_nd_update(full, update_index, update)
-  return full
+  # with no boxes both lists stack to empty tensors
+  return update_index.stack(), update.stack()
 
 
-def build_batch_grided_gt(y_true, mask, size, num_classes, dtype,
-                          use_tie_breaker):
+def build_batch_grided_gt(y_true,
+                          mask,
+                          size,
+                          num_classes,
+                          dtype,
+                          use_tie_breaker,
+                          seed=None):
   """
     convert ground truth for use in loss functions
     Args:
@@ -799,6 +1090,7 @@ def build_batch_grided_gt(y_true, mask, size, num_classes, dtype,
       dtype: expected output datatype
       use_tie_breaker: boolean value for wether or not to use the tie
         breaker
+      seed: the seed of the tie breaker, see random_uniform
 
     Return:
       tf.Tensor[] of shape [batch, size, size, #of_anchors, 4, 1, num_classes]
@@ -837,6 +1129,8 @@ def build_batch_grided_gt(y_true, mask, size, num_classes, dtype,
   const = tf.cast(tf.convert_to_tensor([1.]), dtype=dtype)
   mask = tf.cast(mask, dtype=dtype)
   rand_update = 0.0
+  # one draw per box, so a stateless seed gives every box its own number
+  tie_breaks = random_uniform([batches, num_boxes], maxval=1, seed=seed)
 
   for batch in range(batches):
     for box_id in range(num_boxes):
@@ -867,7 +1161,7 @@ def build_batch_grided_gt(y_true, mask, size, num_classes, dtype,
               # create random number to trigger a replacment if the cell
               # is used already
               if tf.math.equal(used, 1):
-                rand_update = tf.random.uniform([], maxval=1)
+                rand_update = tie_breaks[batch, box_id]
               else:
                 rand_update = 1.0
 
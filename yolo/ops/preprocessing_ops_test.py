@@ -48,6 +48,124 @@ class InputUtilsTest(parameterized.TestCase, tf.test.TestCase):
         np.ones(input_shape), instances, pad_axis=pad_axis)
     self.assertAllEqual(expected_output_shape, tf.shape(output).numpy())
 
+  @parameterized.parameters((4, 64, 64, 5, None), (3, 96, 128, 7, 10))
+  def testMosaicBatch(self, batch_size, height, width, num_boxes,
+                      max_num_instances):
+    image = tf.random.uniform([batch_size, height, width, 3])
+    yx = tf.random.uniform([batch_size, num_boxes, 2], maxval=0.5)
+    hw = tf.random.uniform([batch_size, num_boxes, 2], 0.1, 0.5)
+    boxes = tf.concat([yx, yx + hw], axis=-1)
+    # the last box of every sample is padding
+    boxes = tf.concat([boxes[:, :-1], tf.zeros_like(boxes[:, -1:])], axis=1)
+    classes = tf.concat([
+        tf.ones([batch_size, num_boxes - 1]),
+        -tf.ones([batch_size, 1])
+    ], axis=1)
+
+    mixed, boxes, classes, num_dets = preprocessing_ops.mosaic_batch(
+        image, boxes, classes, max_num_instances=max_num_instances)
+    instances = max_num_instances or 4 * num_boxes
+    self.assertAllEqual(mixed.shape, image.shape)
+    self.assertAllEqual(boxes.shape, [batch_size, instances, 4])
+    self.assertAllEqual(classes.shape, [batch_size, instances])
+
+    # every pixel comes from one of the 4 source images
+    self.assertAllInRange(mixed, 0.0, 1.0)
+    for b in range(batch_size):
+      count = int(num_dets[b])
+      self.assertLessEqual(count, 4 * (num_boxes - 1))
+      self.assertAllEqual(classes[b, :count], np.ones([count]))
+      self.assertAllEqual(classes[b, count:], -np.ones([instances - count]))
+      self.assertAllEqual(boxes[b, count:], np.zeros([instances - count, 4]))
+      self.assertAllInRange(boxes[b, :count], 0.0, 1.0)
+      self.assertAllGreater(boxes[b, :count, 2] - boxes[b, :count, 0], 0.0)
+      self.assertAllGreater(boxes[b, :count, 3] - boxes[b, :count, 1], 0.0)
+
+  def testMosaicBatchKeepsFullImageBoxes(self):
+    # a box covering the whole image is visible in every quadrant
+    image = tf.random.uniform([4, 32, 32, 3])
+    boxes = tf.constant([[[0.0, 0.0, 1.0, 1.0]]] * 4)
+    classes = tf.constant([[3.0]] * 4)
+    _, boxes, classes, num_dets = preprocessing_ops.mosaic_batch(
+        image, boxes, classes, min_area=0.0)
+    self.assertAllEqual(num_dets, [4, 4, 4, 4])
+    self.assertAllClose(tf.reduce_sum(
+        (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1]),
+        axis=-1), np.ones([4]), atol=1e-5)
+
+  @parameterized.parameters((13, True), (26, False))
+  def testSparseGridedGt(self, size, use_tie_breaker):
+    boxes = tf.constant([[0.5, 0.5, 0.2, 0.3], [0.1, 0.8, 0.05, 0.1],
+                         [0.0, 0.0, 0.0, 0.0]])
+    y_true = {
+        'bbox': boxes,
+        'classes': tf.constant([3.0, 7.0, -1.0]),
+        'best_anchors': tf.constant([[1.0, -1.0], [0.0, 2.0], [0.0, -1.0]])
+    }
+    mask = tf.constant([0, 1, 2])
+    index, value = preprocessing_ops.build_sparse_grided_gt(
+        y_true, mask, size, tf.float32, use_tie_breaker)
+    self.assertEqual(index.shape[-1], 3)
+    self.assertEqual(value.shape[-1], 6)
+
+    grid = preprocessing_ops.scatter_grided_gt(index, value, size, 3,
+                                               tf.float32)
+    self.assertAllEqual(grid.shape, [size, size, 3, 6])
+    self.assertAllEqual(
+        grid[int(0.5 * size), int(0.5 * size), 1],
+        [0.5, 0.5, 0.2, 0.3, 1.0, 3.0])
+    self.assertAllEqual(
+        grid[int(0.8 * size), int(0.1 * size), 0],
+        [0.1, 0.8, 0.05, 0.1, 1.0, 7.0])
+
+    # no boxes, no targets and an empty grid
+    empty = {key: value[:0] for key, value in y_true.items()}
+    index, value = preprocessing_ops.build_sparse_grided_gt(
+        empty, mask, size, tf.float32, use_tie_breaker)
+    self.assertAllEqual(index.shape, [0, 3])
+    grid = preprocessing_ops.scatter_grided_gt(index, value, size, 3,
+                                               tf.float32)
+    self.assertAllEqual(grid, np.zeros([size, size, 3, 6]))
+
+  @parameterized.parameters(0, 1, 10)
+  def testSplitIntSeed(self, seed):
+    seeds = preprocessing_ops.split_seed(seed, 4)
+    self.assertEqual(seeds, preprocessing_ops.split_seed(seed, 4))
+    self.assertLen(set(seeds), 4)
+    self.assertNotIn(seed, seeds)
+    # a nested split, e.g. of the noise seed, reuses none of its siblings
+    nested = preprocessing_ops.split_seed(seeds[0], 4)
+    self.assertEmpty(set(nested) & set(seeds))
+    # and neither do the splits of neighbouring seeds
+    self.assertEmpty(
+        set(preprocessing_ops.split_seed(seed + 1, 4)) & set(seeds))
+    for value in seeds:
+      self.assertBetween(value, 0, 2**31 - 1)
+    self.assertEqual(preprocessing_ops.split_seed(None, 2), [None, None])
+
+  @parameterized.parameters(([0, 0],), ([3, 7],))
+  def testSplitStatelessSeed(self, seed):
+    seeds = preprocessing_ops.split_seed(tf.constant(seed), 100)
+    values = {tuple(value.numpy()) for value in seeds}
+    self.assertLen(values, 100)
+    self.assertNotIn(tuple(seed), values)
+    nested = preprocessing_ops.split_seed(seeds[0], 4)
+    self.assertEmpty({tuple(value.numpy()) for value in nested} & values)
+
+  def testStatelessMosaicBatch(self):
+    image = tf.random.uniform([4, 32, 32, 3])
+    boxes = tf.constant([[[0.1, 0.1, 0.6, 0.7]]] * 4)
+    classes = tf.constant([[1.0]] * 4)
+
+    def mosaic(seed):
+      return preprocessing_ops.mosaic_batch(
+          image, boxes, classes, seed=tf.constant(seed, tf.int64))
+
+    first, second, other = mosaic([3, 7]), mosaic([3, 7]), mosaic([3, 8])
+    for a, b in zip(first, second):
+      self.assertAllEqual(a, b)
+    self.assertNotAllEqual(first[0], other[0])
+
 
 if __name__ == '__main__':
   tf.test.main()
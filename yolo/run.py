@@ -1,28 +1,8 @@
-from yolo.utils.run_utils import prep_gpu
-try:
-  prep_gpu()
-except BaseException:
-  print("GPUs ready")
-
 from absl import app
 from absl import flags
-import gin
-import sys
-
-from official.core import train_utils
-# pylint: disable=unused-import
-from yolo.common import registry_imports
-# pylint: enable=unused-import
-from official.common import flags as tfm_flags
-
-from typing import Tuple, List
-from official.core import train_utils
-from official.modeling import performance
-from official.core import task_factory
-import os
-
-from yolo.demos import video_detect_gpu as vgu
-from yolo.demos import video_detect_cpu as vcu
+
+# TensorFlow, the registered tasks and the demos are imported where they are
+# used, so `--help` and flag errors return without loading them.
 """
 python3.8 -m yolo.run --experiment=yolo_custom --out_resolution 416 --config_file=yolo/configs/experiments/yolov4-eval.yaml --video ../videos/nyc.mp4  --max_batch 5
 """
@@ -103,8 +83,53 @@ def define_flags():
 
   flags.DEFINE_integer("scale_que", default=1, help="preprocess on the gpu")
 
+  flags.DEFINE_multi_integer(
+      "process_sizes",
+      default=None,
+      help="square resolutions to switch between under load, all of them are "
+      "traced before the video starts")
+
+  flags.DEFINE_float(
+      "latency_slo",
+      default=None,
+      help="target latency in seconds used to pick the process size")
+
+  flags.DEFINE_integer(
+      "tile_size",
+      default=None,
+      help="run sliced inference, frames are cut into overlapping tiles of "
+      "this size instead of being resized")
+
+  flags.DEFINE_float(
+      "tile_overlap",
+      default=0.2,
+      help="fraction of a tile shared with its neighbours")
+
+  flags.DEFINE_bool(
+      "tile_full_pass",
+      default=True,
+      help="also run every frame resized to one tile when slicing")
+
+
+def load_model(experiment="yolo_custom",
+               config_path=[],
+               model_dir="",
+               use_ema=True):
+  """Builds the task and model of an experiment and restores its checkpoint.
+
+  If the task keeps a moving average of the weights and use_ema is set, the
+  averaged weights are swapped into the returned model, so demos and exports
+  run on them.
+  """
+  import tensorflow as tf
+  from official.core import task_factory
+  from official.core import train_utils
+  from official.modeling import performance
+  # pylint: disable=unused-import
+  from yolo.common import registry_imports
+  # pylint: enable=unused-import
+  from yolo.utils.training import ema
 
-def load_model(experiment="yolo_custom", config_path=[], model_dir=""):
   CFG = train_utils.ParseConfigOptions(
       experiment=experiment, config_file=config_path)
   params = train_utils.parse_configuration(CFG)
@@ -120,11 +145,11 @@ def load_model(experiment="yolo_custom", config_path=[], model_dir=""):
     optimizer = task.create_optimizer(params.trainer.optimizer_config,
                                       params.runtime)
     # optimizer = tf.keras.mixed_precision.LossScaleOptimizer(tf.keras.optimizers.SGD(), dynamic = True)
-    ckpt = tf.train.Checkpoint(model=model, optimizer=optimizer)
-    status = ckpt.restore(tf.train.latest_checkpoint(model_dir))
-
-    status.expect_partial().assert_existing_objects_matched()
-    print(dir(status), status)
+    ema.restore_averaged(
+        model,
+        tf.train.latest_checkpoint(model_dir),
+        use_ema=use_ema,
+        optimizer=optimizer)
   else:
     task.initialize(model)
 
@@ -132,6 +157,15 @@ def load_model(experiment="yolo_custom", config_path=[], model_dir=""):
 
 
 def load_flags(CFG):
+  import tensorflow as tf
+  from official.core import task_factory
+  from official.core import train_utils
+  from official.modeling import performance
+  # pylint: disable=unused-import
+  from yolo.common import registry_imports
+  # pylint: enable=unused-import
+  from yolo.utils.training import ema
+
   params = train_utils.parse_configuration(CFG)
   model_dir = CFG.model_dir
 
@@ -146,11 +180,8 @@ def load_flags(CFG):
     optimizer = task.create_optimizer(params.trainer.optimizer_config,
                                       params.runtime)
     # optimizer = tf.keras.mixed_precision.LossScaleOptimizer(tf.keras.optimizers.SGD(), dynamic = True)
-    ckpt = tf.train.Checkpoint(model=model, optimizer=optimizer)
-    status = ckpt.restore(tf.train.latest_checkpoint(model_dir))
-
-    status.expect_partial().assert_existing_objects_matched()
-    print(dir(status), status)
+    ema.restore_averaged(
+        model, tf.train.latest_checkpoint(model_dir), optimizer=optimizer)
   else:
     task.initialize(model)
 
@@ -158,9 +189,16 @@ def load_flags(CFG):
 
 
 def main(_):
+  from yolo.utils.run_utils import prep_gpu
+  try:
+    prep_gpu()
+  except BaseException:
+    print("GPUs ready")
+
   task, model, params = load_flags(FLAGS)
 
   if FLAGS.gpu:
+    from yolo.demos import video_detect_gpu as vgu
     cap = vgu.FastVideo(
         FLAGS.video,
         model=model,
@@ -171,9 +209,15 @@ def main(_):
         max_batch=FLAGS.max_batch,
         disp_h=FLAGS.out_resolution,
         scale_que=FLAGS.scale_que,
-        wait_time=FLAGS.wait_time)
+        wait_time=FLAGS.wait_time,
+        process_sizes=FLAGS.process_sizes,
+        latency_slo=FLAGS.latency_slo,
+        tile_size=FLAGS.tile_size,
+        tile_overlap=FLAGS.tile_overlap,
+        tile_full_pass=FLAGS.tile_full_pass)
     cap.run()
   else:
+    from yolo.demos import video_detect_cpu as vcu
     vcu.runner(model, FLAGS.video, FLAGS.process_size, FLAGS.out_resolution)
 
 
@@ -1,3 +1,5 @@
+import copy
+
 import tensorflow as tf
 from tensorflow.keras.mixed_precision import experimental as mixed_precision
 
@@ -5,17 +7,28 @@ from absl import logging
 from official.core import base_task
 from official.core import input_reader
 from official.core import task_factory
+from official.utils.misc import lazy_loader
 from yolo.configs import yolo as exp_cfg
 
-from official.vision.beta.evaluation import coco_evaluator
-
+from yolo.dataloaders import multi_scale
+from yolo.dataloaders import synthetic_coco
 from yolo.dataloaders import yolo_input
+from yolo.dataloaders.decoders import precomputed_decoder
 from yolo.dataloaders.decoders import tfds_coco_decoder
+from yolo.evaluation import packing
+from yolo.evaluation import streaming_coco_evaluator
 from yolo.ops.kmeans_anchors import BoxGenInputReader
+from yolo.utils.training import ema as ema_lib
 from yolo.ops.box_ops import xcycwh_to_yxyx
 
 from official.vision.beta.ops import box_ops, preprocess_ops
 from yolo.modeling.layers.detection_generator import YoloGTFilter
+from yolo.modeling import test_time_augmentation
+
+# pycocotools, and the cv2 of the mask ops, are only imported for evaluations
+# that do not stream.
+coco_evaluator = lazy_loader.LazyModule(
+    'official.vision.beta.evaluation.coco_evaluator')
 
 
 @task_factory.register_task_cls(exp_cfg.YoloTask)
@@ -39,6 +52,10 @@ class YoloTask(base_task.Task):
     self.coco_metric = None
     self._metric_names = []
     self._metrics = []
+    self._jit_fns = {}
+    self._trace_stats = multi_scale.TraceStats('step_trace')
+    self._ema = None
+    self._tta = None
     return
 
   def build_model(self):
@@ -59,11 +76,30 @@ class YoloTask(base_task.Task):
     model, losses = build_yolo(input_specs, model_base_cfg, l2_regularizer,
                                masks, xy_scales, path_scales)
     self._loss_dict = losses
+
+    ema_cfg = self.task_config.ema
+    if ema_cfg.enable:
+      self._ema = ema_lib.ModelEMA(
+          model,
+          decay=ema_cfg.decay,
+          update_every=ema_cfg.update_every,
+          warmup_steps=ema_cfg.warmup_steps)
+      model.attach_ema(self._ema)
+
+    if self.task_config.tta.enable:
+      self._tta = test_time_augmentation.YoloTTA.from_params(
+          model,
+          self.task_config.tta,
+          max_boxes=model_base_cfg.filter.max_boxes)
+
     return model
 
   def build_inputs(self, params, input_context=None):
     """Build input dataset."""
-    decoder = tfds_coco_decoder.MSCOCODecoder()
+    if params.parser.precomputed_targets:
+      decoder = precomputed_decoder.PrecomputedDecoder(self._get_masks()[0])
+    else:
+      decoder = tfds_coco_decoder.MSCOCODecoder()
     """
     decoder_cfg = params.decoder.get()
     if params.decoder.type == 'simple_decoder':
@@ -76,14 +112,40 @@ class YoloTask(base_task.Task):
     else:
         raise ValueError('Unknown decoder type: {}!'.format(params.decoder.type))
     """
+    parser = self.build_parser(params)
+    params, dataset_fn = self._dataset_source(params)
+
+    reader = input_reader.InputReader(
+        params,
+        dataset_fn=dataset_fn,
+        decoder_fn=decoder.decode,
+        parser_fn=parser.parse_fn(params.is_training),
+        transform_and_batch_fn=parser.multi_scale_batch_fn(
+            params.global_batch_size, params.drop_remainder),
+        postprocess_fn=parser.postprocess_fn(params.is_training),
+        # stateless augmentation, reproducible with train_data.seed
+        example_seed_key=(yolo_input.EXAMPLE_SEED_KEY
+                          if params.is_training else None))
+    dataset = reader.read(input_context=input_context)
+    return dataset
 
+  def _dataset_source(self, params):
+    """The data config and dataset_fn to hand the InputReader."""
+    if not params.synthetic.enable:
+      return params, tf.data.TFRecordDataset
+    source = synthetic_coco.SyntheticCOCO.from_config(
+        params.synthetic, num_classes=self.task_config.model.num_classes)
+    return source.data_config(params), source.dataset_fn
+
+  def build_parser(self, params):
+    """Builds the yolo_input.Parser of a data config."""
     model = self.task_config.model
 
     masks, path_scales, xy_scales = self._get_masks()
     anchors = self._get_boxes(gen_boxes=params.is_training)
 
     print(masks, path_scales, xy_scales)
-    parser = yolo_input.Parser(
+    return yolo_input.Parser(
         image_w=params.parser.image_w,
         image_h=params.parser.image_h,
         num_classes=model.num_classes,
@@ -95,6 +157,7 @@ class YoloTask(base_task.Task):
         masks=masks,
         letter_box=params.parser.letter_box,
         cutmix=params.parser.cutmix,
+        mosaic=params.parser.mosaic,
         use_tie_breaker=params.parser.use_tie_breaker,
         min_process_size=params.parser.min_process_size,
         max_process_size=params.parser.max_process_size,
@@ -106,18 +169,14 @@ class YoloTask(base_task.Task):
         aug_rand_brightness=params.parser.aug_rand_brightness,
         aug_rand_zoom=params.parser.aug_rand_zoom,
         aug_rand_hue=params.parser.aug_rand_hue,
+        aug_rand_blur=params.parser.aug_rand_blur,
         anchors=anchors,
+        multi_scale_resolutions=params.parser.multi_scale_resolutions
+        if params.is_training else None,
+        multi_scale_interval=params.parser.multi_scale_interval,
+        precomputed_targets=params.parser.precomputed_targets,
         dtype=params.dtype)
 
-    reader = input_reader.InputReader(
-        params,
-        dataset_fn=tf.data.TFRecordDataset,
-        decoder_fn=decoder.decode,
-        parser_fn=parser.parse_fn(params.is_training),
-        postprocess_fn=parser.postprocess_fn(params.is_training))
-    dataset = reader.read(input_context=input_context)
-    return dataset
-
   def build_losses(self, outputs, labels, aux_losses=None):
     loss = 0.0
     loss_box = 0.0
@@ -153,7 +212,11 @@ class YoloTask(base_task.Task):
       metrics.append(tf.keras.metrics.Mean(name, dtype=tf.float32))
 
     self._metrics = metrics
-    if not training:
+    if not training and self.task_config.streaming_eval:
+      self.coco_metric = streaming_coco_evaluator.StreamingCOCOEvaluator(
+          num_classes=self.task_config.model.num_classes,
+          per_category_metrics=self._task_config.per_category_metrics)
+    elif not training:
       self.coco_metric = coco_evaluator.COCOEvaluator(
           annotation_file=self.task_config.annotation_file,
           include_mask=False,
@@ -161,23 +224,57 @@ class YoloTask(base_task.Task):
           per_category_metrics=self._task_config.per_category_metrics)
     return metrics
 
-  def train_step(self, inputs, model, optimizer, metrics=None):
-    # get the data point
-    image, label = inputs
+  def _jit(self, fn):
+    """Wraps fn with XLA if the task config asks for it.
+
+    Traces of the wrapped function are counted either way, see trace_stats.
+    """
+    if fn.__name__ not in self._jit_fns:
+      traced = self._trace_stats.wrap(fn)
+      if self.task_config.jit_compile:
+        traced = tf.function(traced, experimental_compile=True)
+      self._jit_fns[fn.__name__] = traced
+    return self._jit_fns[fn.__name__]
+
+  @property
+  def trace_stats(self):
+    return self._trace_stats
+
+  def _compute_gradients(self, image, label, model, loss_scale):
     num_replicas = tf.distribute.get_strategy().num_replicas_in_sync
     with tf.GradientTape() as tape:
       # compute a prediction
       # cast to float32
       y_pred = model(image, training=True)
       loss, loss_metrics = self.build_losses(y_pred['raw_output'], label)
-      scaled_loss = loss / num_replicas
-
-      # scale the loss for numerical stability
-      if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
-        scaled_loss = optimizer.get_scaled_loss(scaled_loss)
+      # scale the loss for numerical stability, the scale is passed in as a
+      # tensor so the optimizer is not part of the function signature
+      scaled_loss = loss / num_replicas * loss_scale
     # compute the gradient
     train_vars = model.trainable_variables
     gradients = tape.gradient(scaled_loss, train_vars)
+    return loss, loss_metrics, gradients
+
+  def _compute_raw_outputs(self, image, label, model):
+    # the detection filter uses dynamic shapes, so it is left out of here
+    maps = model.backbone(image, training=False)
+    raw_predictions = model.head(model.decoder(maps, training=False))
+    loss, loss_metrics = self.build_losses(raw_predictions, label)
+    return raw_predictions, loss, loss_metrics
+
+  def train_step(self, inputs, model, optimizer, metrics=None):
+    # get the data point
+    image, label = inputs
+    # only the grid is used by the loss, the rest of the label is not XLA
+    # friendly (source ids and padded boxes)
+    grid = {'grid_form': label['grid_form']}
+    loss_scale = tf.constant(1.0)
+    if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
+      loss_scale = optimizer.get_scaled_loss(loss_scale)
+    loss, loss_metrics, gradients = self._jit(self._compute_gradients)(
+        image, grid, model, loss_scale)
+
+    train_vars = model.trainable_variables
     # get unscaled loss if the scaled_loss was used
     if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
       gradients = optimizer.get_unscaled_gradients(gradients)
@@ -185,53 +282,42 @@ class YoloTask(base_task.Task):
       gradients, _ = tf.clip_by_global_norm(gradients,
                                             self.task_config.gradient_clip_norm)
     optimizer.apply_gradients(zip(gradients, train_vars))
+    if self._ema is not None:
+      self._jit(self._ema.update)(model, optimizer.iterations)
 
-    # custom metrics
+    if tf.reduce_any(tf.math.is_nan(loss)):
+      tf.print('\nerror: stop training')
+    self._trace_stats.write_summaries()
+
+    # custom metrics, the controller writes them out every summary interval
     logs = {'loss': loss}
 
     if metrics:
       for m in metrics:
         m.update_state(loss_metrics[m.name])
         logs.update({m.name: m.result()})
-
-    tf.print(logs, end='\n')
-
-    ret = '\033[F' * (len(logs.keys()) + 1)
-    tf.print(ret, end='\n')
     return logs
 
   def validation_step(self, inputs, model, metrics=None):
     # get the data point
     image, label = inputs
 
-    # computer detivative and apply gradients
-    y_pred = model(image, training=False)
-    loss, loss_metrics = self.build_losses(y_pred['raw_output'], label)
+    grid = {'grid_form': label['grid_form']}
+    # evaluate the averaged weights, swapped back once the outputs are there
+    if self._ema is not None:
+      self._ema.replica_swap(model)
+    raw_predictions, loss, loss_metrics = self._jit(self._compute_raw_outputs)(
+        image, grid, model)
+    y_pred = self._predict(image, model, raw_predictions)
+    if self._ema is not None:
+      with tf.control_dependencies(tf.nest.flatten(y_pred)):
+        self._ema.replica_swap(model)
 
     # #custom metrics
     logs = {'loss': loss}
     # loss_metrics.update(metrics)
-    image_shape = tf.shape(image)[1:-1]
-
-    label['boxes'] = box_ops.denormalize_boxes(
-        tf.cast(label['bbox'], tf.float32), image_shape)
-    del label['bbox']
-
-    coco_model_outputs = {
-        'detection_boxes':
-            box_ops.denormalize_boxes(
-                tf.cast(y_pred['bbox'], tf.float32), image_shape),
-        'detection_scores':
-            y_pred['confidence'],
-        'detection_classes':
-            y_pred['classes'],
-        'num_detections':
-            tf.shape(y_pred['bbox'])[:-1],
-        'source_id':
-            label['source_id'],
-    }
-
-    logs.update({self.coco_metric.name: (label, coco_model_outputs)})
+    logs.update(
+        {self.coco_metric.name: self._coco_outputs(image, label, y_pred)})
 
     if metrics:
       for m in metrics:
@@ -239,6 +325,54 @@ class YoloTask(base_task.Task):
         logs.update({m.name: m.result()})
     return logs
 
+  def _predict(self, image, model, raw_predictions):
+    """The detections to evaluate, with test time augmentation if enabled."""
+    if self._tta is not None:
+      return self._tta(image)
+    return model.filter(raw_predictions)
+
+  def _coco_outputs(self, image, label, y_pred):
+    """Ground truth and detections of a batch, packed for the host copy.
+
+    Only the valid rows are kept, the detections with a positive confidence
+    and the first num_detections ground truth boxes of every image, see
+    yolo/evaluation/packing.py.
+    """
+    image_shape = tf.shape(image)[1:-1]
+    num_instances = tf.shape(label['classes'])[1]
+    gt_valid = tf.logical_and(
+        tf.range(num_instances)[None, :] < tf.cast(
+            label['num_detections'], tf.int32)[:, None],
+        label['classes'] >= 0)
+    groundtruths = packing.pack(
+        {
+            'boxes':
+                box_ops.denormalize_boxes(
+                    tf.cast(label['bbox'], tf.float32), image_shape),
+            'classes':
+                label['classes'],
+            'is_crowd':
+                label['is_crowd'],
+        }, gt_valid)
+    groundtruths.update({
+        'source_id': label['source_id'],
+        'height': label['height'],
+        'width': label['width'],
+    })
+
+    predictions = packing.pack(
+        {
+            'detection_boxes':
+                box_ops.denormalize_boxes(
+                    tf.cast(y_pred['bbox'], tf.float32), image_shape),
+            'detection_scores':
+                y_pred['confidence'],
+            'detection_classes':
+                y_pred['classes'],
+        }, y_pred['confidence'] > 0)
+    predictions['source_id'] = label['source_id']
+    return groundtruths, predictions
+
   def aggregate_logs(self, state=None, step_outputs=None):
     # return super().aggregate_logs(state=state, step_outputs=step_outputs)
 
@@ -247,14 +381,36 @@ class YoloTask(base_task.Task):
       #   metric.reset_states()
       self.coco_metric.reset_states()
       state = self.coco_metric
-    self.coco_metric.update_state(step_outputs[self.coco_metric.name][0],
-                                  step_outputs[self.coco_metric.name][1])
+    groundtruths, predictions = step_outputs[self.coco_metric.name]
+    if not isinstance(self.coco_metric,
+                      streaming_coco_evaluator.StreamingCOCOEvaluator):
+      # pycocotools reads the padded form, with the same K for every batch
+      groundtruths = packing.unpack(
+          packing.to_numpy(groundtruths),
+          packing.GROUNDTRUTH_KEYS, {'classes': -1},
+          num_rows=self.task_config.validation_data.parser.max_num_instances)
+      predictions = packing.unpack(
+          packing.to_numpy(predictions),
+          packing.PREDICTION_KEYS,
+          num_rows=self.task_config.model.filter.max_boxes)
+      groundtruths, predictions = tf.nest.map_structure(
+          tf.convert_to_tensor, (groundtruths, predictions))
+    self.coco_metric.update_state(groundtruths, predictions)
     return state
 
   def reduce_aggregated_logs(self, aggregated_logs):
     # return super().reduce_aggregated_logsI(aggregated_logs)
     return self.coco_metric.result()
 
+  def aggregated_logs_reducer(self, aggregated_logs):
+    # reset_states replaces the accumulated arrays, so a shallow copy keeps
+    # this evaluation's results while the next evaluation aggregates.
+    return copy.copy(aggregated_logs).result
+
+  @property
+  def ema(self):
+    return self._ema
+
   @property
   def anchors(self):
     return self.task_config.model.boxes
@@ -27,6 +27,11 @@ class YoloSubDivTask(yolo.YoloTask):
   post-processing, and customized metrics with reduction.
   """
 
+  def __init__(self, params, logging_dir: str = None):
+    super().__init__(params, logging_dir)
+    self._accumulators = None
+    return
+
   def build_inputs(self, params, input_context=None):
     """Build input dataset."""
     decoder = tfds_coco_decoder.MSCOCODecoder()
@@ -74,6 +79,7 @@ class YoloSubDivTask(yolo.YoloTask):
         aug_rand_brightness=params.parser.aug_rand_brightness,
         aug_rand_zoom=params.parser.aug_rand_zoom,
         aug_rand_hue=params.parser.aug_rand_hue,
+        aug_rand_blur=params.parser.aug_rand_blur,
         anchors=anchors,
         dtype=params.dtype)
 
@@ -82,12 +88,15 @@ class YoloSubDivTask(yolo.YoloTask):
     else:
       post_process_fn = None
 
+    params, dataset_fn = self._dataset_source(params)
     reader = input_reader.InputReader(
         params,
-        dataset_fn=tf.data.TFRecordDataset,
+        dataset_fn=dataset_fn,
         decoder_fn=decoder.decode,
         parser_fn=parser.parse_fn(params.is_training),
-        postprocess_fn=post_process_fn)
+        postprocess_fn=post_process_fn,
+        example_seed_key=(yolo_input.EXAMPLE_SEED_KEY
+                          if params.is_training else None))
     dataset = reader.read(input_context=input_context)
 
     if params.is_training:
@@ -122,6 +131,30 @@ class YoloSubDivTask(yolo.YoloTask):
     metric_dict['total_loss'] = loss
     return loss, metric_dict
 
+  def _get_accumulators(self, model):
+    """One gradient accumulator per trainable variable of the model.
+
+    The accumulators are local to each replica, so a replica only ever sums
+    its own micro batches, the cross replica reduction is still done once by
+    the optimizer when the summed gradients are applied.
+    """
+    if self._accumulators is None:
+      self._accumulators = [
+          tf.Variable(
+              tf.zeros(var.shape, dtype=var.dtype),
+              trainable=False,
+              synchronization=tf.VariableSynchronization.ON_READ,
+              aggregation=tf.VariableAggregation.SUM,
+              name='grad_accumulator') for var in model.trainable_variables
+      ]
+    return self._accumulators
+
+  def build_model(self):
+    model = super().build_model()
+    # build the accumulators here, the model is built in the strategy scope
+    self._get_accumulators(model)
+    return model
+
   def train_step(self, inputs, model, optimizer, metrics=None):
     # get the data point
     image, label = inputs
@@ -129,44 +162,61 @@ class YoloSubDivTask(yolo.YoloTask):
     logs = {}
     net_loss = 0
 
-    with tf.GradientTape() as tape:
-      # compute a prediction
-      # cast to float32
-      for i in range(self.task_config.subdivisions):
-        y_pred = model(image[i], training=True)
-        loss, loss_metrics = self.build_losses(
-            y_pred['raw_output'], label, div=i)
-        net_loss += loss
-
-        # if metrics:
-        #   for m in metrics:
-        #     m.update_state(loss_metrics[m.name])
-        #     logs.update({m.name: tf.stop_gradient(m.result())})
-
-      scaled_loss = net_loss / num_replicas
-
-      # scale the loss for numerical stability
-      if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
-        scaled_loss = optimizer.get_scaled_loss(scaled_loss)
-
-    # compute the gradient
     train_vars = model.trainable_variables
-    gradients = tape.gradient(scaled_loss, train_vars)
-    # get unscaled loss if the scaled_loss was used
+    accumulators = self._get_accumulators(model)
+
+    # one forward and backward pass per micro batch, only one micro batch of
+    # activations is alive at a time
+    deps = []
+    for i in range(self.task_config.subdivisions):
+      with tf.control_dependencies(deps):
+        with tf.GradientTape() as tape:
+          # compute a prediction
+          # cast to float32
+          y_pred = model(image[i], training=True)
+          loss, loss_metrics = self.build_losses(
+              y_pred['raw_output'], label, div=i)
+          scaled_loss = loss / num_replicas
+
+          # scale the loss for numerical stability
+          if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
+            scaled_loss = optimizer.get_scaled_loss(scaled_loss)
+
+        # compute the gradient
+        gradients = tape.gradient(scaled_loss, train_vars)
+        deps = [
+            acc.assign_add(grad)
+            for acc, grad in zip(accumulators, gradients)
+            if grad is not None
+        ]
+      net_loss += loss
+
+      if metrics:
+        for m in metrics:
+          m.update_state(loss_metrics[m.name])
+
+    with tf.control_dependencies(deps):
+      gradients = [tf.identity(acc) for acc in accumulators]
+
+    # the sum is still scaled, unscaling it once keeps the overflow check of
+    # the loss scale optimizer on the gradients it actually applies
     if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
       gradients = optimizer.get_unscaled_gradients(gradients)
     if self.task_config.gradient_clip_norm > 0.0:
       gradients, _ = tf.clip_by_global_norm(gradients,
                                             self.task_config.gradient_clip_norm)
     optimizer.apply_gradients(zip(gradients, train_vars))
+    if self._ema is not None:
+      self._jit(self._ema.update)(model, optimizer.iterations)
+
+    for acc in accumulators:
+      acc.assign(tf.zeros_like(acc))
 
     # custom metrics
     logs['loss'] = net_loss
-
-    tf.print(logs, end='\n')
-
-    ret = '\033[F' * (len(logs.keys()) + 1)
-    tf.print(ret, end='\n')
+    if metrics:
+      for m in metrics:
+        logs.update({m.name: m.result()})
     return logs
 
   def validation_step(self, inputs, model, metrics=None):
@@ -174,33 +224,21 @@ class YoloSubDivTask(yolo.YoloTask):
     image, label = inputs
 
     # computer detivative and apply gradients
+    if self._ema is not None:
+      self._ema.replica_swap(model)
     y_pred = model(image, training=False)
+    if self._tta is not None:
+      y_pred.update(self._tta(image))
+    if self._ema is not None:
+      with tf.control_dependencies(tf.nest.flatten(y_pred)):
+        self._ema.replica_swap(model)
     loss, loss_metrics = self.build_losses(y_pred['raw_output'], label)
 
     # #custom metrics
     logs = {'loss': loss}
     # loss_metrics.update(metrics)
-    image_shape = tf.shape(image)[1:-1]
-
-    label['boxes'] = box_ops.denormalize_boxes(
-        tf.cast(label['bbox'], tf.float32), image_shape)
-    del label['bbox']
-
-    coco_model_outputs = {
-        'detection_boxes':
-            box_ops.denormalize_boxes(
-                tf.cast(y_pred['bbox'], tf.float32), image_shape),
-        'detection_scores':
-            y_pred['confidence'],
-        'detection_classes':
-            y_pred['classes'],
-        'num_detections':
-            tf.shape(y_pred['bbox'])[:-1],
-        'source_id':
-            label['source_id'],
-    }
-
-    logs.update({self.coco_metric.name: (label, coco_model_outputs)})
+    logs.update(
+        {self.coco_metric.name: self._coco_outputs(image, label, y_pred)})
 
     if metrics:
       for m in metrics:
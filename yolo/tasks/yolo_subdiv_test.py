@@ -0,0 +1,103 @@
+from yolo.tasks import yolo_subdiv
+from yolo.configs import yolo as exp_cfg
+
+import numpy as np
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+def _build_task(subdivisions):
+  config = exp_cfg.YoloSubDivTask(
+      model=exp_cfg.Yolo(base='v4tiny', min_level=4),
+      load_darknet_weights=False,
+      subdivisions=subdivisions)
+  task = yolo_subdiv.YoloSubDivTask(config)
+  model = task.build_model()
+  return task, model
+
+
+def _subdivided_batch(task, subdivisions, micro_batch, size=128):
+  """Synthetic batch laid out like the subdivided training dataset."""
+  image = tf.random.uniform([subdivisions, micro_batch, size, size, 3])
+  grid = {}
+  for key, mask in task._masks.items():
+    width = size // 2**int(key)
+    shape = [subdivisions, micro_batch, width, width, len(mask)]
+    conf = tf.cast(tf.random.uniform(shape + [1]) < 0.05, tf.float32)
+    box = tf.random.uniform(shape + [4], 0.1, 0.9)
+    grid[key] = tf.concat([box * conf, conf, tf.zeros_like(conf)], axis=-1)
+  return image, {'grid_form': grid}
+
+
+class YoloSubDivTaskTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((2,), (4,))
+  def test_matches_single_tape(self, subdivisions):
+    task, model = _build_task(subdivisions)
+    image, label = _subdivided_batch(task, subdivisions, 1)
+
+    # the old behaviour, every micro batch under one tape
+    with tf.GradientTape() as tape:
+      net_loss = 0
+      for i in range(subdivisions):
+        y_pred = model(image[i], training=True)
+        loss, _ = task.build_losses(y_pred['raw_output'], label, div=i)
+        net_loss += loss
+    expected = tape.gradient(net_loss, model.trainable_variables)
+
+    before = [v.numpy() for v in model.trainable_variables]
+    optimizer = tf.keras.optimizers.SGD(learning_rate=1.0)
+    logs = task.train_step((image, label), model, optimizer)
+    self.assertIn('loss', logs)
+    self.assertEqual(int(optimizer.iterations.numpy()), 1)
+
+    for start, var, grad in zip(before, model.trainable_variables, expected):
+      if grad is None:
+        continue
+      self.assertAllClose(start - var.numpy(), grad, rtol=1e-3, atol=1e-4)
+    for acc in task._accumulators:
+      self.assertAllEqual(acc.numpy(), np.zeros(acc.shape))
+
+  def test_loss_scale_optimizer(self):
+    task, model = _build_task(2)
+    image, label = _subdivided_batch(task, 2, 1)
+    optimizer = tf.keras.mixed_precision.experimental.LossScaleOptimizer(
+        tf.keras.optimizers.SGD(learning_rate=1e-3), loss_scale=1024)
+    before = [v.numpy() for v in model.trainable_variables]
+    task.train_step((image, label), model, optimizer)
+    moved = [
+        np.any(start != var.numpy())
+        for start, var in zip(before, model.trainable_variables)
+    ]
+    self.assertTrue(any(moved))
+    for var in model.trainable_variables:
+      self.assertTrue(np.all(np.isfinite(var.numpy())))
+
+  def test_peak_memory_follows_micro_batch(self):
+    if not tf.config.list_physical_devices('GPU'):
+      self.skipTest('peak memory is only tracked on the GPU')
+    if not hasattr(tf.config.experimental, 'get_memory_info'):
+      self.skipTest('needs tf.config.experimental.get_memory_info')
+
+    def peak(subdivisions, micro_batch):
+      task, model = _build_task(subdivisions)
+      inputs = _subdivided_batch(task, subdivisions, micro_batch, size=416)
+      optimizer = tf.keras.optimizers.SGD(learning_rate=1e-4)
+      step = tf.function(lambda x: task.train_step(x, model, optimizer))
+      step(inputs)
+      tf.config.experimental.reset_memory_stats('GPU:0')
+      step(inputs)
+      return tf.config.experimental.get_memory_info('GPU:0')['peak']
+
+    # the same effective batch of 8, in one pass or in 8 micro batches
+    full = peak(1, 8)
+    micro = peak(8, 1)
+    # a single micro batch on its own
+    single = peak(1, 1)
+
+    self.assertLess(micro, full * 0.75)
+    self.assertLess(micro, single * 1.5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -18,6 +18,9 @@ class YoloTaskTest(tf.test.TestCase, parameterized.TestCase):
   def test_task(self, config_name):
     config = exp_factory.get_exp_config(config_name)
     config.task.train_data.global_batch_size = 2
+    # runs without the coco dataset on disk
+    config.task.train_data.synthetic.enable = True
+    config.task.train_data.synthetic.num_examples = 8
 
     task = yolo.YoloTask(config.task)
     model = task.build_model()
@@ -14,11 +14,10 @@
 # limitations under the License.
 # ==============================================================================
 """TensorFlow Model Garden Vision training driver."""
-from yolo.utils.run_utils import prep_gpu
-try:
-  prep_gpu()
-except BaseException:
-  print('GPUs ready')
+import time
+
+# Taken before the imports, so the startup breakdown includes them.
+_START_TIME = time.time()
 
 from absl import app
 from absl import flags
@@ -33,7 +32,9 @@ from official.common import distribute_utils
 from official.common import flags as tfm_flags
 from official.core import task_factory
 from official.core import train_lib
+from official.core import warm_start
 from official.modeling import performance
+from yolo.utils.run_utils import prep_gpu
 
 FLAGS = flags.FLAGS
 """
@@ -61,6 +62,14 @@ nohup python3 -m yolo.train --mode=train_and_eval --experiment=yolo_custom --mod
 
 
 def main(_):
+  startup_profile = warm_start.StartupProfile(start_time=_START_TIME)
+  startup_profile.mark('imports')
+  # Called before anything touches the GPUs, not at import time, so importing
+  # this module does not set up the devices.
+  try:
+    prep_gpu()
+  except BaseException:
+    print('GPUs ready')
   gin.parse_config_files_and_bindings(FLAGS.gin_file, FLAGS.gin_params)
   print(FLAGS.experiment)
   params = train_utils.parse_configuration(FLAGS)
@@ -97,7 +106,8 @@ def main(_):
       task=task,
       mode=FLAGS.mode,
       params=params,
-      model_dir=model_dir)
+      model_dir=model_dir,
+      startup_profile=startup_profile)
 
 
 if __name__ == '__main__':
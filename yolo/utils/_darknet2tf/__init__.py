@@ -90,94 +90,31 @@ class DarkNetConverter(_DarkNetSectionList):
     read_weights(full_net, config_file, weights_file)
     return full_net
 
+  def compile(self):
+    """
+        Check the layer graph and precompute its shapes, FLOPs and parameter
+        counts without building any TensorFlow layer.
+
+        Returns:
+          a compiler.CompiledNet
+
+        Raises:
+          ValueError: listing every layer that cannot be built
+        """
+    from .compiler import compile_net
+    return compile_net(self)
+
   def to_tf(self,
             thresh=0.45,
-            class_thresh=0.45,
+            nms_iou_thresh=0.45,
             max_boxes=200,
             use_mixed=True):
-    import tensorflow as tf
-
-    tensors = _DarkNetSectionList()
-    layers = _DarkNetSectionList()
-    yolo_tensors = []
-    for i, cfg in enumerate(self.data):
-      tensor = cfg.to_tf(tensors)
-
-      # Handle weighted layers
-      if isinstance(tensor, tuple):
-        tensor, layer = tensor
-      else:
-        layer = None
-
-      assert tensor.shape[1:] == cfg.shape, str(
-          cfg
-      ) + f" shape inconsistent\n\tExpected: {cfg.shape}\n\tGot: {tensor.shape[1:]}"
-      if cfg._type == 'yolo':
-        yolo_tensors.append((i, cfg, tensor))
-      tensors.append(tensor)
-      layers.append(layer)
-
-    model = tf.keras.Model(
-        inputs=tensors.net,
-        outputs=self._process_yolo_layer(
-            yolo_tensors,
-            thresh=thresh,
-            class_thresh=class_thresh,
-            max_boxes=max_boxes,
-            use_mixed=use_mixed))
-    model.build(self.net.shape)
-
-    for cfg, layer in zip(self, layers):
-      if layer is not None:
-        layer.set_weights(cfg.get_weights())
-    return model
-
-  def _process_yolo_layer(self,
-                          yolo_tensors,
-                          thresh=0.45,
-                          class_thresh=0.45,
-                          max_boxes=200,
-                          use_mixed=True):
-    import tensorflow as tf
-    from yolo.modeling.layers import YoloLayer
-
-    if use_mixed:
-      from tensorflow.keras.mixed_precision import experimental as mixed_precision
-      # using mixed type policy give better performance than strictly float32
-      policy = mixed_precision.Policy('mixed_float16')
-      mixed_precision.set_policy(policy)
-      dtype = policy.compute_dtype
-    else:
-      dtype = tf.float32
-
-    outs = collections.OrderedDict()
-    masks = {}
-    anchors = None
-    scale_x_y = {}
-    path_scales = {}
-
-    for i, yolo_cfg, yolo_tensor in yolo_tensors:
-      masks[yolo_tensor.name] = yolo_cfg.mask
-
-      if anchors is None:
-        anchors = yolo_cfg.anchors
-      elif anchors != yolo_cfg.anchors:
-        raise ValueError('Anchors inconsistent in [yolo] layers')
-
-      scale_x_y[yolo_tensor.name] = yolo_cfg.scale_x_y
-
-      outs[yolo_tensor.name] = yolo_tensor
-
-      path_scales[yolo_tensor.name] = self.data[i - 1].c >> 5
-
-    yolo_layer = YoloLayer(
-        masks=masks,
-        anchors=anchors,
+    """
+        Build the Keras model of the DarkNet model with the weights that were
+        read. See compiler.CompiledNet.to_tf.
+        """
+    return self.compile().to_tf(
         thresh=thresh,
-        cls_thresh=class_thresh,
+        nms_iou_thresh=nms_iou_thresh,
         max_boxes=max_boxes,
-        dtype=dtype,
-        # scale_boxes=self.net.w,
-        scale_xy=scale_x_y,
-        path_scale=path_scales)
-    return yolo_layer(outs)
+        use_mixed=use_mixed)
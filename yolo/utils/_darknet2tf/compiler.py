@@ -0,0 +1,452 @@
+"""
+Compiles a parsed DarkNet model into an immutable layer graph.
+
+DarkNetConverter holds the Config objects of the cfg file, whose inputs are
+relative indices into the layers parsed before them. compile_net resolves
+every reference to an absolute layer index once, recomputes the output shape
+of every layer from the [net] input, counts its FLOPs and parameters and
+checks the whole graph, reporting every problem at once, without importing
+TensorFlow. CompiledNet.to_tf then emits the Keras model in a single pass,
+loading the weights of every layer as it is created.
+
+The shapes are (width, height, channels) like the Config objects. FLOPs count
+a multiply and an add as two operations.
+"""
+
+import collections
+import types
+
+from .config_classes import _LayerBuilder
+
+_ALIASES = {'conv': 'convolutional', 'network': 'net'}
+
+
+def _canonical_type(layer_type):
+  return _ALIASES.get(layer_type, layer_type)
+
+
+def _as_tuple(value):
+  if isinstance(value, (tuple, list)):
+    return tuple(value)
+  return (value,)
+
+
+class LayerIR(object):
+  """
+  A compiled layer. Immutable once created.
+
+  Attributes:
+    index: position of the layer in DarkNetConverter.data, 0 is [net]
+    type: canonical DarkNet section name of the layer
+    inputs: absolute indices of the layers the layer reads
+    shape: output shape as (width, height, channels)
+    flops: floating point operations of one image
+    params: number of weights
+    options: read only mapping of the parameters the layer is emitted with
+    config: the Config object the layer was compiled from, for its weights
+  """
+  __slots__ = ('index', 'type', 'inputs', 'shape', 'flops', 'params',
+               'options', 'config')
+
+  def __init__(self, index, type, inputs, shape, flops, params, options,
+               config):
+    for name, value in zip(self.__slots__, (index, type, inputs, shape, flops,
+                                            params, options, config)):
+      object.__setattr__(self, name, value)
+
+  def __setattr__(self, name, value):
+    raise AttributeError(f'{type(self).__name__} is immutable')
+
+  def __delattr__(self, name):
+    raise AttributeError(f'{type(self).__name__} is immutable')
+
+  def __repr__(self):
+    return (f'LayerIR(index={self.index}, type={self.type!r}, '
+            f'inputs={self.inputs}, shape={self.shape}, flops={self.flops}, '
+            f'params={self.params})')
+
+
+# Shape rules: function of (config, input shapes) to (shape, flops, params,
+# options). They raise ValueError for graphs that cannot be emitted.
+shape_rules = _LayerBuilder()
+
+
+def _elements(shape):
+  w, h, c = shape
+  return w * h * c
+
+
+@shape_rules.register('convolutional')
+def _conv_shape(cfg, shapes):
+  (w, h, c), = shapes
+  if cfg.groups != 1:
+    raise ValueError(f'grouped convolutions are not supported, got '
+                     f'groups={cfg.groups}')
+  if cfg.dilation != 1:
+    raise ValueError(f'dilated convolutions are not supported, got '
+                     f'dilation={cfg.dilation}')
+  pad = cfg.size // 2 if cfg.pad else 0
+  out_w = (w + 2 * pad - cfg.size) // cfg.stride + 1
+  out_h = (h + 2 * pad - cfg.size) // cfg.stride + 1
+  if out_w <= 0 or out_h <= 0:
+    raise ValueError(f'a {cfg.size}x{cfg.size} kernel does not fit the '
+                     f'input {(w, h, c)}')
+  kernel = cfg.size * cfg.size * c * cfg.filters
+  shape = (out_w, out_h, cfg.filters)
+  params = kernel + cfg.filters * (4 if cfg.batch_normalize else 1)
+  options = {
+      'filters': cfg.filters,
+      'size': cfg.size,
+      'stride': cfg.stride,
+      'padding': 'same' if pad else 'valid',
+      'batch_normalize': bool(cfg.batch_normalize),
+      'activation': cfg.activation,
+  }
+  return shape, 2 * out_w * out_h * kernel, params, options
+
+
+@shape_rules.register('shortcut')
+def _shortcut_shape(cfg, shapes):
+  if any(shape != shapes[0] for shape in shapes[1:]):
+    raise ValueError(f'shortcut inputs have different shapes {shapes}')
+  flops = _elements(shapes[0]) * (len(shapes) - 1)
+  return shapes[0], flops, 0, {'activation': cfg.activation}
+
+
+@shape_rules.register('route')
+def _route_shape(cfg, shapes):
+  w, h, _ = shapes[0]
+  if any(shape[:2] != (w, h) for shape in shapes[1:]):
+    raise ValueError(f'route inputs have different sizes {shapes}')
+  c = sum(shape[2] for shape in shapes)
+  if c % cfg.groups:
+    raise ValueError(f'{c} channels do not split into {cfg.groups} groups')
+  options = {'groups': cfg.groups, 'group_id': cfg.group_id}
+  return (w, h, c // cfg.groups), 0, 0, options
+
+
+@shape_rules.register('upsample')
+def _upsample_shape(cfg, shapes):
+  (w, h, c), = shapes
+  return (w * cfg.stride, h * cfg.stride, c), 0, 0, {'stride': cfg.stride}
+
+
+@shape_rules.register('maxpool')
+def _maxpool_shape(cfg, shapes):
+  (w, h, c), = shapes
+  # 'same' padding
+  shape = (-(-w // cfg.stride), -(-h // cfg.stride), c)
+  options = {'size': cfg.size, 'stride': cfg.stride}
+  return shape, _elements(shape) * cfg.size * cfg.size, 0, options
+
+
+@shape_rules.register('avgpool')
+def _avgpool_shape(cfg, shapes):
+  (_, _, c), = shapes
+  return (1, 1, c), _elements(shapes[0]), 0, {}
+
+
+@shape_rules.register('softmax')
+def _softmax_shape(cfg, shapes):
+  return shapes[0], 3 * _elements(shapes[0]), 0, {}
+
+
+@shape_rules.register('yolo')
+def _yolo_shape(cfg, shapes):
+  (w, h, c), = shapes
+  mask = _as_tuple(cfg.mask)
+  anchors = tuple(tuple(anchor) for anchor in cfg.anchors)
+  if c % len(mask) or c // len(mask) < 5:
+    raise ValueError(f'{c} channels are not {len(mask)} anchors of 4 box '
+                     'coordinates, an objectness and the classes')
+  if any(not 0 <= i < len(anchors) for i in mask):
+    raise ValueError(f'mask {mask} indexes past the {len(anchors)} anchors')
+  options = {
+      'mask': mask,
+      'anchors': anchors,
+      'scale_x_y': cfg.scale_x_y,
+      'classes': c // len(mask) - 5,
+  }
+  return (w, h, c), 0, 0, options
+
+
+def _references(cfg, layer_type):
+  if layer_type == 'route':
+    return _as_tuple(cfg.layers)
+  if layer_type == 'shortcut':
+    return (-1,) + _as_tuple(cfg._from)
+  if layer_type == 'net':
+    return ()
+  return (-1,)
+
+
+def _resolve(reference, position):
+  # like _DarkNetSectionList, positive references skip [net] and negative
+  # ones are relative to the layer
+  return reference + 1 if reference >= 0 else position + reference
+
+
+class CompiledNet(object):
+  """
+  The compiled layer graph of a DarkNet model, built by compile_net.
+
+  Attributes:
+    layers: tuple of LayerIR, layers[0] is the [net] input
+  """
+  __slots__ = ('layers',)
+
+  def __init__(self, layers):
+    object.__setattr__(self, 'layers', tuple(layers))
+
+  def __setattr__(self, name, value):
+    raise AttributeError(f'{type(self).__name__} is immutable')
+
+  def __len__(self):
+    return len(self.layers)
+
+  def __getitem__(self, i):
+    return self.layers[i]
+
+  @property
+  def input_shape(self):
+    return self.layers[0].shape
+
+  @property
+  def flops(self):
+    return sum(layer.flops for layer in self.layers)
+
+  @property
+  def params(self):
+    return sum(layer.params for layer in self.layers)
+
+  @property
+  def heads(self):
+    return tuple(layer for layer in self.layers if layer.type == 'yolo')
+
+  def report(self):
+    """A darknet style table of the layers and the total cost."""
+    lines = [
+        f'{"layer":>5} {"type":<14} {"inputs":<12} {"output":<16} '
+        f'{"BFLOPs":>8} {"params":>10}'
+    ]
+    for layer in self.layers[1:]:
+      inputs = ','.join(str(i - 1) for i in layer.inputs)
+      output = 'x'.join(str(size) for size in layer.shape)
+      lines.append(f'{layer.index - 1:5d} {layer.type:<14} {inputs:<12} '
+                   f'{output:<16} {layer.flops / 1e9:8.3f} '
+                   f'{layer.params:10d}')
+    lines.append(f'total: {self.flops / 1e9:.3f} BFLOPs, '
+                 f'{self.params / 1e6:.3f} M params')
+    return '\n'.join(lines)
+
+  def to_tf(self,
+            thresh=0.45,
+            nms_iou_thresh=0.45,
+            max_boxes=200,
+            use_mixed=True,
+            load_weights=True):
+    """
+    Emits the Keras model of the graph.
+
+    Args:
+      thresh: objectness threshold of the detections
+      nms_iou_thresh: iou threshold of the non max suppression
+      max_boxes: maximum number of detections
+      use_mixed: run the detection layer in mixed_float16. Only that layer
+        gets the policy, the global policy is left as it is.
+      load_weights: set the weights the Config objects were read with
+
+    Returns:
+      a tf.keras.Model of the image to the dict of the detections, or to the
+      last layer if the graph has no [yolo] layers
+    """
+    import tensorflow as tf
+
+    tensors = []
+    for layer in self.layers:
+      emit = emitters[layer.type]
+      tensor, keras_layer = emit(layer, [tensors[i] for i in layer.inputs])
+      if load_weights and keras_layer is not None:
+        weights = layer.config.get_weights()
+        if weights and weights[0] is not None:
+          keras_layer.set_weights(weights)
+      tensors.append(tensor)
+
+    heads = self.heads
+    if not heads:
+      return tf.keras.Model(inputs=tensors[0], outputs=tensors[-1])
+
+    from yolo.modeling.layers.detection_generator import YoloLayer
+
+    anchors = heads[0].options['anchors']
+    input_width = self.input_shape[0]
+    outputs = collections.OrderedDict()
+    masks = {}
+    scale_xy = {}
+    for head in heads:
+      # the heads are keyed by the log2 of their stride
+      key = str((input_width // head.shape[0]).bit_length() - 1)
+      outputs[key] = tensors[head.index]
+      masks[key] = list(head.options['mask'])
+      scale_xy[key] = head.options['scale_x_y']
+
+    dtype = tf.float32
+    if use_mixed:
+      dtype = tf.keras.mixed_precision.experimental.Policy('mixed_float16')
+    yolo_layer = YoloLayer(
+        masks=masks,
+        anchors=[list(anchor) for anchor in anchors],
+        classes=heads[0].options['classes'],
+        iou_thresh=thresh,
+        nms_thresh=nms_iou_thresh,
+        max_boxes=max_boxes,
+        scale_xy=scale_xy,
+        dtype=dtype)
+    return tf.keras.Model(inputs=tensors[0], outputs=yolo_layer(outputs))
+
+
+def compile_net(net):
+  """
+  Compiles the Config objects of a DarkNetConverter.
+
+  Args:
+    net: a DarkNetConverter, or a list of Config objects starting with [net]
+
+  Returns:
+    the CompiledNet of the model
+
+  Raises:
+    ValueError: listing every layer that cannot be compiled
+  """
+  configs = list(getattr(net, 'data', net))
+  errors = []
+  layers = []
+  anchors = None
+  for position, cfg in enumerate(configs):
+    layer_type = _canonical_type(cfg._type)
+    name = f'[{layer_type}] #{position - 1}'
+    if (position == 0) != (layer_type == 'net'):
+      errors.append(f'{name}: the model has to start with its only [net]')
+      layers.append(None)
+      continue
+
+    inputs = tuple(
+        _resolve(reference, position)
+        for reference in _references(cfg, layer_type))
+    bad = [i for i in inputs if not 0 <= i < position]
+    if bad:
+      errors.append(f'{name}: references layers {[i - 1 for i in bad]} that '
+                    'are not before it')
+      layers.append(None)
+      continue
+    if any(layers[i] is None for i in inputs):
+      # the error of the input is reported already
+      layers.append(None)
+      continue
+
+    if layer_type == 'net':
+      shape, flops, params, options = (cfg.w, cfg.h, cfg.c), 0, 0, {}
+    else:
+      try:
+        rule = shape_rules[layer_type]
+        shape, flops, params, options = rule(
+            cfg, [layers[i].shape for i in inputs])
+      except (KeyError, ValueError) as e:
+        errors.append(f'{name}: {e}')
+        layers.append(None)
+        continue
+
+    if layer_type == 'yolo':
+      if anchors is None:
+        anchors = options['anchors']
+      elif anchors != options['anchors']:
+        errors.append(f'{name}: anchors differ from the first [yolo] layer')
+      stride = configs[0].w // shape[0]
+      if configs[0].w % shape[0] or stride & (stride - 1):
+        errors.append(f'{name}: the stride of {shape} is not a power of two')
+
+    layers.append(
+        LayerIR(position, layer_type, inputs, shape, flops, params,
+                types.MappingProxyType(options), cfg))
+
+  if errors:
+    raise ValueError('Cannot compile the DarkNet model:\n  ' +
+                     '\n  '.join(errors))
+  return CompiledNet(layers)
+
+
+# Emitters: function of (LayerIR, input tensors) to the output tensor and the
+# Keras layer holding its weights, or None.
+emitters = _LayerBuilder()
+
+
+@emitters.register('net')
+def _emit_net(layer, inputs):
+  import tensorflow as tf
+  return tf.keras.Input(shape=list(layer.shape)), None
+
+
+@emitters.register('convolutional')
+def _emit_conv(layer, inputs):
+  from yolo.modeling.layers.nn_blocks import ConvBN
+  options = layer.options
+  keras_layer = ConvBN(
+      filters=options['filters'],
+      kernel_size=(options['size'], options['size']),
+      strides=(options['stride'], options['stride']),
+      padding=options['padding'],
+      use_bn=options['batch_normalize'],
+      activation=options['activation'])
+  return keras_layer(inputs[0]), keras_layer
+
+
+@emitters.register('shortcut')
+def _emit_shortcut(layer, inputs):
+  import tensorflow as tf
+  tensor = tf.keras.layers.add(inputs)
+  return tf.keras.activations.get(layer.options['activation'])(tensor), None
+
+
+@emitters.register('route')
+def _emit_route(layer, inputs):
+  import tensorflow as tf
+  tensor = inputs[0] if len(inputs) == 1 else tf.keras.layers.concatenate(
+      inputs)
+  groups = layer.options['groups']
+  if groups == 1:
+    return tensor, None
+  return tf.split(tensor, groups, axis=-1)[layer.options['group_id']], None
+
+
+@emitters.register('upsample')
+def _emit_upsample(layer, inputs):
+  import tensorflow as tf
+  stride = layer.options['stride']
+  return tf.keras.layers.UpSampling2D(size=(stride, stride))(inputs[0]), None
+
+
+@emitters.register('maxpool')
+def _emit_maxpool(layer, inputs):
+  import tensorflow as tf
+  size, stride = layer.options['size'], layer.options['stride']
+  return tf.keras.layers.MaxPooling2D(
+      pool_size=(size, size), strides=(stride, stride),
+      padding='same')(inputs[0]), None
+
+
+@emitters.register('avgpool')
+def _emit_avgpool(layer, inputs):
+  import tensorflow as tf
+  tensor = tf.keras.layers.GlobalAveragePooling2D()(inputs[0])
+  return tf.keras.layers.Reshape(list(layer.shape))(tensor), None
+
+
+@emitters.register('softmax')
+def _emit_softmax(layer, inputs):
+  import tensorflow as tf
+  return tf.keras.layers.Softmax()(inputs[0]), None
+
+
+@emitters.register('yolo')
+def _emit_yolo(layer, inputs):
+  return inputs[0], None
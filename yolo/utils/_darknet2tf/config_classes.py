@@ -33,6 +33,9 @@ class Config(ABC):
   included in the Config class due to limitations in the dataclasses package.
   (w, h, c) will correspond to the different input dimensions of a DarkNet
   layer: the width, height, and number of channels.
+
+  The Keras layers are built from the compiled graph, by the emitters in
+  compiler.py, not from the Config objects.
   """
 
   @property
@@ -87,19 +90,6 @@ class Config(ABC):
       l = layer_dict
     return clz(**l)
 
-  @abstractmethod
-  def to_tf(self, tensors):
-    """
-    Convert the DarkNet configuration object to a tensor given the previous
-    tensors that occoured in the network. This function should also return
-    a Keras layer if it has weights.
-
-    Returns:
-      if weights: a tuple consisting of the output tensor and Keras layer
-      if no weights: the output tensor
-    """
-    return None
-
 
 class _LayerBuilder(dict):
   """
@@ -198,19 +188,6 @@ class convCFG(Config):
     else:
       return [self.weights, self.biases]
 
-  def to_tf(self, tensors):
-    from yolo.modeling.layers.nn_blocks import DarkConv
-    layer = DarkConv(
-        filters=self.filters,
-        kernel_size=(self.size, self.size),
-        strides=(self.stride, self.stride),
-        padding='same',  # TODO: THIS ONE
-        dilation_rate=(self.dilation, self.dilation),
-        use_bn=bool(self.batch_normalize),
-        activation=activation_function_dn_to_keras_name(self.activation),
-    )  # TODO: Where does groups go
-    return layer(tensors[-1]), layer
-
 
 @layer_builder.register('shortcut')
 @dataclass
@@ -249,17 +226,6 @@ class shortcutCFG(Config):
     }
     return clz(**l)
 
-  def to_tf(self, tensors):
-    from tensorflow.keras.layers import add
-    from tensorflow.keras.activations import get
-    activation = get(activation_function_dn_to_keras_name(self.activation))
-
-    my_tensors = [tensors[-1]]
-    for i in self._from:
-      my_tensors.append(tensors[i])
-
-    return activation(add(my_tensors))
-
 
 @layer_builder.register('route')
 @dataclass
@@ -306,23 +272,6 @@ class routeCFG(Config):
     l['layers'] = layers
     return clz(**l)
 
-  def to_tf(self, tensors):
-    import tensorflow as tf
-    from tensorflow.keras.layers import concatenate
-
-    if len(self.layers) == 1:
-      stacked = tensors[self.layers[0]]
-    else:
-      my_tensors = []
-      for i in self.layers:
-        my_tensors.append(tensors[i])
-      stacked = concatenate(my_tensors)
-
-    if self.groups == 1:
-      return stacked
-    else:
-      return tf.split(stacked, self.groups, axis=-1)[self.group_id]
-
 
 @layer_builder.register('net', 'network')
 @dataclass
@@ -349,10 +298,6 @@ class netCFG(Config):
     }
     return clz(**l)
 
-  def to_tf(self, tensors):
-    from tensorflow.keras import Input
-    return Input(shape=[self.w, self.h, self.c])
-
 
 @layer_builder.register('yolo')
 @dataclass
@@ -383,9 +328,6 @@ class yoloCFG(Config):
     }
     return clz(**l)
 
-  def to_tf(self, tensors):
-    return tensors[-1]  # TODO: Fill out
-
 
 @layer_builder.register('upsample')
 @dataclass
@@ -401,10 +343,6 @@ class upsampleCFG(Config):
   def shape(self):
     return (self.stride * self.w, self.stride * self.h, self.c)
 
-  def to_tf(self, tensors):
-    from tensorflow.keras.layers import UpSampling2D
-    return UpSampling2D(size=(self.stride, self.stride))(tensors[-1])
-
 
 @layer_builder.register('maxpool')
 @dataclass
@@ -425,15 +363,6 @@ class maxpoolCFG(Config):
         self.w // self.stride, self.h // self.stride, self.c
     )  # ((self.w - self.size) // self.stride + 2, (self.h - self.size) // self.stride + 2, self.c)
 
-  def to_tf(self, tensors):
-    #from tensorflow.nn import max_pool2d
-    from tensorflow.keras.layers import MaxPooling2D
-    return MaxPooling2D(
-        pool_size=(self.size, self.size),
-        strides=(self.stride, self.stride),
-        padding='same')(
-            tensors[-1])
-
 
 @layer_builder.register('upsample')
 @dataclass
@@ -449,10 +378,6 @@ class upsampleCFG(Config):
   def shape(self):
     return (self.stride * self.w, self.stride * self.h, self.c)
 
-  def to_tf(self, tensors):
-    from tensorflow.keras.layers import UpSampling2D
-    return UpSampling2D(size=(self.stride, self.stride))(tensors[-1])
-
 
 @layer_builder.register('avgpool')
 @dataclass
@@ -473,15 +398,6 @@ class avgpoolCFG(Config):
         1, 1, self.c
     )  # ((self.w - self.size) // self.stride + 2, (self.h - self.size) // self.stride + 2, self.c)
 
-  def to_tf(self, tensors):
-    #from tensorflow.nn import max_pool2d
-    from tensorflow.keras.layers import MaxPooling2D
-    return MaxPooling2D(
-        pool_size=(self.size, self.size),
-        strides=(self.stride, self.stride),
-        padding='same')(
-            tensors[-1])
-
 
 @layer_builder.register('softmax')
 @dataclass
@@ -501,15 +417,6 @@ class softmaxCFG(Config):
         self.w // self.stride, self.h // self.stride, self.c
     )  # ((self.w - self.size) // self.stride + 2, (self.h - self.size) // self.stride + 2, self.c)
 
-  def to_tf(self, tensors):
-    #from tensorflow.nn import max_pool2d
-    from tensorflow.keras.layers import MaxPooling2D
-    return MaxPooling2D(
-        pool_size=(self.size, self.size),
-        strides=(self.stride, self.stride),
-        padding='same')(
-            tensors[-1])
-
 
 def len_width(n, f, p, s):
   """
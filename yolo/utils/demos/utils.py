@@ -54,6 +54,119 @@ def get_run_fn(model, signature="serving_default") -> Callable:
     return model
 
 
+def get_resolution_fns(model, resolutions, dtype=tf.float32, warmup=True):
+  """Traces one concrete function per square input resolution.
+
+  Keras models are wrapped in a `tf.function` and traced once for each value in
+  `resolutions` so that switching resolution at run time does not trigger a
+  retrace. Saved models and plain callables cannot be retraced, so the same run
+  function is returned for every resolution.
+
+  Args:
+    model: a `tf.keras.Model`, a loaded saved model or a callable.
+    resolutions: a list of `int` input sizes to prepare.
+    dtype: the input `tf.DType` the model expects.
+    warmup: `bool` for whether to run each function once on a blank batch so
+      that the first real batch does not pay for kernel selection.
+
+  Returns:
+    a `dict` mapping each resolution to its run function.
+  """
+  if "saved_model" in str(type(model)) or not hasattr(model, "call"):
+    run_fn = get_run_fn(model)
+    return {res: run_fn for res in resolutions}
+
+  run_fn = tf.function(lambda image: model(image, training=False))
+  fns = {}
+  for res in resolutions:
+    fns[res] = run_fn.get_concrete_function(
+        tf.TensorSpec([None, res, res, 3], dtype=dtype))
+    if warmup:
+      fns[res](tf.zeros([1, res, res, 3], dtype=dtype))
+  return fns
+
+
+class ResolutionScheduler(object):
+  """Picks an input resolution per batch from queue depth and latency.
+
+  Resolutions are ordered from the highest to the lowest. When a latency SLO
+  is given, the highest resolution whose estimated time to drain the current
+  queue fits inside the SLO is used. Per frame latency is tracked with an
+  exponential moving average for each resolution; resolutions that have not
+  been measured yet are estimated from the measured ones by pixel count.
+  Without an SLO the resolution steps down linearly as the queue fills.
+  """
+
+  def __init__(self, resolutions, latency_slo=None, que_size=None, alpha=0.1):
+    """
+    Args:
+      resolutions: an `int` or list of `int` square input sizes.
+      latency_slo: `float` target latency in seconds for a frame that enters
+        the queue now, or None to schedule purely on queue depth.
+      que_size: `int` capacity of the input queue, used when no SLO is set.
+      alpha: `float` weight of the newest sample in the latency averages.
+    """
+    if isinstance(resolutions, int):
+      resolutions = [resolutions]
+    self._resolutions = sorted(set(resolutions), reverse=True)
+    self._latency_slo = latency_slo
+    self._que_size = que_size
+    self._alpha = alpha
+    self._frame_latency = {res: None for res in self._resolutions}
+    self._resolution = self._resolutions[0]
+    return
+
+  @property
+  def resolutions(self):
+    return self._resolutions
+
+  @property
+  def resolution(self):
+    return self._resolution
+
+  @property
+  def max_resolution(self):
+    return self._resolutions[0]
+
+  def estimate(self, resolution):
+    """Returns the estimated per frame latency at `resolution` or None."""
+    if self._frame_latency[resolution] is not None:
+      return self._frame_latency[resolution]
+    for res, latency in self._frame_latency.items():
+      if latency is not None:
+        return latency * (resolution / res)**2
+    return None
+
+  def update(self, resolution, latency, frames=1):
+    """Records that `frames` frames at `resolution` took `latency` seconds."""
+    per_frame = latency / max(frames, 1)
+    prev = self._frame_latency[resolution]
+    if prev is None:
+      self._frame_latency[resolution] = per_frame
+    else:
+      self._frame_latency[resolution] = (
+          self._alpha * per_frame + (1 - self._alpha) * prev)
+    return
+
+  def select(self, que_depth):
+    """Returns the resolution to use for a batch given `que_depth` frames."""
+    que_depth = max(que_depth, 1)
+    if len(self._resolutions) == 1:
+      self._resolution = self._resolutions[0]
+    elif self._latency_slo is not None:
+      self._resolution = self._resolutions[-1]
+      for res in self._resolutions:
+        latency = self.estimate(res)
+        if latency is None or latency * que_depth <= self._latency_slo:
+          self._resolution = res
+          break
+    elif self._que_size:
+      level = (que_depth * len(self._resolutions)) // (self._que_size + 1)
+      level = min(level, len(self._resolutions) - 1)
+      self._resolution = self._resolutions[level]
+    return self._resolution
+
+
 def udp_socket(address, port, server=False):
   sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
   if server:
@@ -0,0 +1,55 @@
+from yolo.utils.demos import utils
+
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+class ResolutionSchedulerTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_resolutions(self):
+    scheduler = utils.ResolutionScheduler([320, 608, 416, 320])
+    self.assertEqual(scheduler.resolutions, [608, 416, 320])
+    self.assertEqual(scheduler.max_resolution, 608)
+    self.assertEqual(scheduler.resolution, 608)
+
+    scheduler = utils.ResolutionScheduler(416, latency_slo=0.1, que_size=10)
+    self.assertEqual(scheduler.resolutions, [416])
+    self.assertEqual(scheduler.select(100), 416)
+
+  @parameterized.parameters((0, 608), (1, 608), (10, 608), (11, 416),
+                            (20, 416), (21, 320), (30, 320), (100, 320))
+  def test_queue_depth(self, que_depth, resolution):
+    scheduler = utils.ResolutionScheduler([608, 416, 320], que_size=30)
+    self.assertEqual(scheduler.select(que_depth), resolution)
+    self.assertEqual(scheduler.resolution, resolution)
+
+  def test_no_que_size(self):
+    scheduler = utils.ResolutionScheduler([608, 416, 320])
+    self.assertEqual(scheduler.select(100), 608)
+
+  def test_estimate(self):
+    scheduler = utils.ResolutionScheduler([608, 304], alpha=0.5)
+    self.assertIsNone(scheduler.estimate(608))
+    scheduler.update(608, 0.2, frames=2)
+    self.assertAllClose(scheduler.estimate(608), 0.1)
+    # unmeasured resolutions scale with the pixel count
+    self.assertAllClose(scheduler.estimate(304), 0.025)
+    scheduler.update(608, 0.3)
+    self.assertAllClose(scheduler.estimate(608), 0.2)
+    scheduler.update(304, 0.01)
+    self.assertAllClose(scheduler.estimate(304), 0.01)
+
+  @parameterized.parameters((1, 608), (2, 608), (3, 416), (5, 416), (6, 320),
+                            (9, 320), (50, 320))
+  def test_latency_slo(self, que_depth, resolution):
+    scheduler = utils.ResolutionScheduler([608, 416, 320],
+                                          latency_slo=0.25,
+                                          que_size=30)
+    # nothing is measured yet, so the highest resolution is tried first
+    self.assertEqual(scheduler.select(que_depth), 608)
+    scheduler.update(608, 0.1)
+    self.assertEqual(scheduler.select(que_depth), resolution)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,143 @@
+"""Exports a Yolo model as a saved model with a sliced inference signature.
+
+Both signatures take uint8 images and scale them like the tflite conversion:
+
+  serving_default: every image is resized to the model resolution.
+  sliced: every image is cut into overlapping tiles of the model resolution,
+    see yolo.modeling.sliced_inference. The tiles are laid out from the image
+    size, so the signature is fixed to --image_size.
+
+python3 -m yolo.utils.export.sliced_export --experiment=yolo_custom \
+  --config_file=yolo/configs/experiments/yolov4-eval.yaml \
+  --checkpoint=/models/yolov4/ckpt-1000 --image_size 2160,3840 \
+  --tile_size 608 --export_dir saved_models/v4_sliced
+"""
+from absl import app
+from absl import flags
+import tensorflow as tf
+
+from official.core import task_factory
+from official.core import train_utils
+# pylint: disable=unused-import
+from yolo.common import registry_imports
+# pylint: enable=unused-import
+from yolo.modeling import sliced_inference
+from yolo.utils.training import ema
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('experiment', default='yolo_custom', help='experiment')
+flags.DEFINE_multi_string('config_file', default=[], help='config overrides')
+flags.DEFINE_string(
+    'params_override', default='', help='overrides on top of config_file')
+flags.DEFINE_string(
+    'checkpoint', default=None, help='weights to export, random if unset')
+flags.DEFINE_string('export_dir', default=None, help='saved model directory')
+flags.DEFINE_list(
+    'image_size', default=['2160', '3840'], help='height,width of the images '
+    'of the sliced signature')
+flags.DEFINE_integer('tile_size', default=None, help='model resolution')
+flags.DEFINE_float(
+    'tile_overlap', default=0.2, help='fraction of a tile shared with its '
+    'neighbours')
+flags.DEFINE_bool(
+    'full_pass', default=True, help='also run every image resized to a tile')
+
+
+def _outputs(pred):
+  return {
+      'bbox': tf.cast(pred['bbox'], tf.float32),
+      'classes': tf.cast(pred['classes'], tf.float32),
+      'confidence': tf.cast(pred['confidence'], tf.float32),
+      'num_dets': tf.cast(pred['num_dets'], tf.float32)
+  }
+
+
+def build_signatures(model, sliced, image_size):
+  """The serving_default and sliced concrete functions of a model.
+
+  Args:
+    model: the `Yolo` model.
+    sliced: the `YoloSliced` wrapper of the model.
+    image_size: (height, width) of the images of the sliced signature.
+
+  Returns:
+    dict of the signature name to its concrete function.
+  """
+  tile_h, tile_w = sliced.tile_size
+
+  @tf.function
+  def serving_default(image):
+    image = tf.cast(image, tf.float32) / 255.0
+    image = tf.image.resize(image, (tile_h, tile_w))
+    return _outputs(model(image, training=False))
+
+  @tf.function
+  def sliced_fn(image):
+    image = tf.cast(image, tf.float32) / 255.0
+    return _outputs(sliced(image))
+
+  height, width = image_size
+  return {
+      'serving_default':
+          serving_default.get_concrete_function(
+              tf.TensorSpec([None, None, None, 3], tf.uint8, name='image')),
+      'sliced':
+          sliced_fn.get_concrete_function(
+              tf.TensorSpec([None, height, width, 3], tf.uint8, name='image')),
+  }
+
+
+def export(model,
+           export_dir,
+           image_size,
+           tile_size,
+           overlap=0.2,
+           full_pass=True,
+           max_boxes=200):
+  """Saves the model with a serving_default and a sliced signature."""
+  sliced = sliced_inference.YoloSliced(
+      model,
+      tile_size=tile_size,
+      overlap=overlap,
+      full_pass=full_pass,
+      max_boxes=max_boxes)
+  signatures = build_signatures(model, sliced, image_size)
+  tf.saved_model.save(sliced, export_dir, signatures=signatures)
+  return signatures
+
+
+def main(_):
+  config = train_utils.ParseConfigOptions(
+      experiment=FLAGS.experiment,
+      config_file=FLAGS.config_file,
+      params_override=FLAGS.params_override)
+  params = train_utils.parse_configuration(config)
+  task = task_factory.get_task(params.task)
+  model = task.build_model()
+  if FLAGS.checkpoint:
+    ema.restore_averaged(model, FLAGS.checkpoint)
+
+  tile_size = FLAGS.tile_size
+  if tile_size is None:
+    input_size = params.task.model.input_size
+    if None in input_size[:2]:
+      raise ValueError('--tile_size is needed for a model without a fixed '
+                       'input size')
+    tile_size = tuple(input_size[:2])
+  image_size = [int(size) for size in FLAGS.image_size]
+  signatures = export(
+      model,
+      FLAGS.export_dir,
+      image_size,
+      tile_size,
+      overlap=FLAGS.tile_overlap,
+      full_pass=FLAGS.full_pass,
+      max_boxes=params.task.model.filter.max_boxes)
+  for name, signature in signatures.items():
+    print(f'{name}: {signature.structured_input_signature}')
+
+
+if __name__ == '__main__':
+  flags.mark_flag_as_required('export_dir')
+  app.run(main)
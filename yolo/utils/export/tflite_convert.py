@@ -3,6 +3,7 @@ import tensorflow as tf
 from yolo.utils.run_utils import prep_gpu
 from yolo.configs import yolo as exp_cfg
 from yolo.tasks.yolo import YoloTask
+from yolo.utils.training import ema
 from skimage import io
 import cv2
 prep_gpu()
@@ -199,6 +200,7 @@ def uniary_convert():
     task = YoloTask(config)
     model = task.build_model()
     task.initialize(model)
+    ema.use_averages(model)
     #model.build((1, 416, 416, 3))
     model(tf.ones((1, 416, 416, 3), dtype=tf.float32), training=False)
 
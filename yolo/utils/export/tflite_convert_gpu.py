@@ -2,6 +2,7 @@ import tensorflow as tf
 from yolo.utils.run_utils import prep_gpu
 from yolo.configs import yolo as exp_cfg
 from yolo.tasks.yolo import YoloTask
+from yolo.utils.training import ema
 from skimage import io
 import cv2
 prep_gpu()
@@ -113,6 +114,7 @@ def get_model(model, input_size=[416, 416, 3], training=True):
     task = YoloTask(config)
     model = task.build_model()
     task.initialize(model)
+    ema.use_averages(model)
     model(tf.ones((1, *input_size), dtype=tf.float32), training=False)
     return model, name
 
@@ -0,0 +1,146 @@
+"""Writes records with precomputed Yolo grid targets.
+
+For fixed size training without random geometric augmentation, and for eval,
+the anchor assignment and the grids of an example never change. This tool
+runs them once and stores the sparse targets, the [y, x, anchor] cell and the
+[x, y, w, h, 1, class] value of every filled grid cell per level, next to the
+image and ground truth in a new set of TFRecords. Training on them with
+parser.precomputed_targets=True and the records as input_path replaces the
+per-sample IoU and grid building with one scatter per level. The parser then
+has to turn off random_flip, jitter_im, jitter_boxes, aug_rand_zoom and
+pct_rand, the colour augmentations are still applied. The source id is stored
+as the int64 image id of the tfds example, the id of the COCO annotations.
+
+python3 -m yolo.utils.precompute_targets --experiment=yolo_custom \
+  --config_file=yolo/configs/experiments/yolov4-tiny-eval.yaml \
+  --split=validation --output_path=/data/coco_targets/val --num_shards=32
+"""
+import os
+
+from absl import app
+from absl import flags
+from absl import logging
+import tensorflow as tf
+import tensorflow_datasets as tfds
+
+from official.core import task_factory
+from official.core import train_utils
+# pylint: disable=unused-import
+from yolo.common import registry_imports
+# pylint: enable=unused-import
+from yolo.dataloaders.decoders import precomputed_decoder
+from yolo.dataloaders.decoders import tfds_coco_decoder
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('experiment', default='yolo_custom', help='experiment')
+flags.DEFINE_multi_string('config_file', default=[], help='config overrides')
+flags.DEFINE_enum(
+    'split',
+    default='train',
+    enum_values=['train', 'validation'],
+    help='which data config of the task to convert')
+flags.DEFINE_string(
+    'output_path', default=None, help='prefix of the written records')
+flags.DEFINE_integer('num_shards', default=32, help='number of output files')
+flags.DEFINE_integer(
+    'max_examples', default=-1, help='stop after this many, -1 for all')
+
+
+def _bytes_feature(value):
+  return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
+
+
+def _float_feature(value):
+  return tf.train.Feature(float_list=tf.train.FloatList(value=value))
+
+
+def _int64_feature(value):
+  return tf.train.Feature(int64_list=tf.train.Int64List(value=value))
+
+
+def to_example(encoded, data, targets):
+  """Builds the tf.train.Example read by PrecomputedDecoder."""
+  # the regenerated ids of examples without image/id are decimal strings
+  source_id = int(data['source_id'])
+  feature = {
+      'image/encoded':
+          _bytes_feature(encoded),
+      'image/source_id':
+          _int64_feature([source_id]),
+      'image/object/bbox':
+          _float_feature(data['groundtruth_boxes'].reshape(-1).tolist()),
+      'image/object/class/label':
+          _int64_feature(data['groundtruth_classes'].reshape(-1).tolist()),
+      'image/object/area':
+          _float_feature(data['groundtruth_area'].reshape(-1).tolist()),
+      'image/object/is_crowd':
+          _int64_feature(
+              data['groundtruth_is_crowd'].astype('int64').reshape(-1).tolist()
+          ),
+  }
+  for level, target in targets.items():
+    index_key, value_key = precomputed_decoder.target_keys(level)
+    feature[index_key] = _int64_feature(target['index'].reshape(-1).tolist())
+    feature[value_key] = _float_feature(target['value'].reshape(-1).tolist())
+  return tf.train.Example(features=tf.train.Features(feature=feature))
+
+
+def build_dataset(task, params, is_training):
+  """Decoded examples of a data config together with their sparse targets."""
+  if not params.tfds_name:
+    raise ValueError('only tfds datasets are supported as the source')
+  dataset = tfds.load(
+      params.tfds_name,
+      split=params.tfds_split,
+      data_dir=params.tfds_data_dir or None,
+      download=params.tfds_download,
+      shuffle_files=False)
+  decoder = tfds_coco_decoder.MSCOCODecoder()
+  parser = task.build_parser(params)
+
+  def _map(example):
+    data = decoder.decode(example)
+    targets = parser.sparse_targets(data, is_training)
+    encoded = tf.io.encode_jpeg(data['image'], quality=100)
+    return encoded, data, targets
+
+  return dataset.map(_map, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+
+def main(_):
+  config = train_utils.ParseConfigOptions(
+      experiment=FLAGS.experiment, config_file=FLAGS.config_file)
+  params = train_utils.parse_configuration(config)
+  if params.task.model.boxes is None:
+    raise ValueError('the model config needs fixed anchor boxes')
+  task = task_factory.get_task(params.task)
+
+  is_training = FLAGS.split == 'train'
+  data_params = (
+      params.task.train_data if is_training else params.task.validation_data)
+  dataset = build_dataset(task, data_params, is_training)
+  if FLAGS.max_examples > 0:
+    dataset = dataset.take(FLAGS.max_examples)
+
+  tf.io.gfile.makedirs(os.path.dirname(FLAGS.output_path))
+  writers = [
+      tf.io.TFRecordWriter(
+          f'{FLAGS.output_path}-{i:05d}-of-{FLAGS.num_shards:05d}.tfrecord')
+      for i in range(FLAGS.num_shards)
+  ]
+  count = 0
+  for encoded, data, targets in tfds.as_numpy(dataset):
+    example = to_example(encoded, data, targets)
+    writers[count % FLAGS.num_shards].write(example.SerializeToString())
+    count += 1
+    if count % 1000 == 0:
+      logging.info('wrote %d examples', count)
+  for writer in writers:
+    writer.close()
+  logging.info('wrote %d examples to %s', count, FLAGS.output_path)
+
+
+if __name__ == '__main__':
+  flags.mark_flag_as_required('output_path')
+  app.run(main)
@@ -0,0 +1,353 @@
+"""Structured channel pruning for Darknet/CSP Yolo models.
+
+Only channels that live inside a block are pruned: the bottleneck of a
+DarkResidual, the partial branches of CSPRoute/CSPConnect and CSPTiny, and the
+inner convolutions of a DarkRouteProcess. Every tensor that is tied to another
+one by a residual add, a route or a concat keeps its width, so the slim model
+is wired exactly like the original one and its surviving weights can be copied
+over one for one.
+
+python3 -m yolo.utils.pruning --experiment=yolo_custom \
+  --config_file=yolo/configs/experiments/yolov4-tiny-eval.yaml \
+  --ratios 0.25 --ratios 0.5 --finetune_steps 500 --export_dir prune_out
+"""
+import collections
+import json
+import os
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from yolo.modeling.layers import nn_blocks
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string('experiment', default='yolo_custom', help='experiment')
+flags.DEFINE_multi_string('config_file', default=[], help='config overrides')
+flags.DEFINE_string(
+    'model_dir', default='', help='checkpoint dir of the model to prune')
+flags.DEFINE_multi_float(
+    'ratios', default=[0.25, 0.5], help='fractions of channels to drop')
+flags.DEFINE_enum(
+    'criterion',
+    default='bn_gamma',
+    enum_values=['bn_gamma', 'l1'],
+    help='how channels are ranked')
+flags.DEFINE_integer(
+    'finetune_steps', default=0, help='train steps after each pruning')
+flags.DEFINE_float('learning_rate', default=1e-3, help='fine tune lr')
+flags.DEFINE_integer('runs', default=20, help='timed cpu runs per ratio')
+flags.DEFINE_string(
+    'export_dir', default=None, help='where to save pruned checkpoints')
+
+# producer: (parent, key) of the ConvBN whose output channels are pruned.
+# consumers: (parent, key, prefix) of the ConvBNs that read those channels,
+#   prefix lists the (parent, key) ConvBNs concatenated in front of them.
+ChannelGroup = collections.namedtuple('ChannelGroup',
+                                      ['name', 'producer', 'consumers'])
+
+
+def _get(parent, key):
+  if isinstance(key, int):
+    return parent.layers[key]
+  return getattr(parent, key)
+
+
+def _set(parent, key, layer):
+  if isinstance(key, int):
+    parent.layers[key] = layer
+  else:
+    setattr(parent, key, layer)
+
+
+def _width(ref):
+  return int(_get(*ref).conv.kernel.shape[-1])
+
+
+def _csp_route_of(connect):
+  """The CSPRoute whose partial branch a CSPConnect merges, or None.
+
+  CSPConnect is called on [x, x_route], so the route is the layer of its
+  second input in the keras graph.
+  """
+  for node in connect.inbound_nodes:
+    inbound = tf.nest.flatten(node.inbound_layers)
+    if len(inbound) == 2 and isinstance(inbound[1], nn_blocks.CSPRoute):
+      return inbound[1]
+  return None
+
+
+def prunable_groups(model):
+  """Finds every ConvBN whose output channels can be pruned in isolation.
+
+  Args:
+    model: a built Yolo model, or any of its built sub models.
+
+  Returns:
+    a list of ChannelGroup in a deterministic order.
+  """
+  modules = [model] + list(model.submodules)
+  groups = []
+  for layer in modules:
+    if isinstance(layer, nn_blocks.DarkResidual):
+      groups.append(
+          ChannelGroup(f'{layer.name}/conv1', (layer, '_conv1'),
+                       [(layer, '_conv2', [])]))
+    elif isinstance(layer, nn_blocks.CSPConnect):
+      groups.append(
+          ChannelGroup(f'{layer.name}/conv1', (layer, '_conv1'),
+                       [(layer, '_conv2', [])]))
+      route = _csp_route_of(layer)
+      if route is not None:
+        groups.append(
+            ChannelGroup(f'{route.name}/conv2', (route, '_conv2'),
+                         [(layer, '_conv2', [(layer, '_conv1')])]))
+    elif isinstance(layer, nn_blocks.CSPTiny):
+      groups.append(
+          ChannelGroup(f'{layer.name}/convlayer3', (layer, '_convlayer3'),
+                       [(layer, '_convlayer4', [])]))
+      groups.append(
+          ChannelGroup(f'{layer.name}/convlayer2', (layer, '_convlayer2'),
+                       [(layer, '_convlayer3', []),
+                        (layer, '_convlayer4', [(layer, '_convlayer3')])]))
+    elif isinstance(layer, nn_blocks.DarkRouteProcess):
+      # the last two layers are returned as the route and the output
+      for i in range(layer._lim - 2):
+        if (isinstance(layer.layers[i], nn_blocks.ConvBN) and
+            isinstance(layer.layers[i + 1], nn_blocks.ConvBN)):
+          groups.append(
+              ChannelGroup(f'{layer.name}/{i}', (layer, i),
+                           [(layer, i + 1, [])]))
+  return groups
+
+
+def channel_importance(conv_bn, criterion='bn_gamma'):
+  """Scores the output channels of a ConvBN.
+
+  Args:
+    conv_bn: a built nn_blocks.ConvBN.
+    criterion: 'bn_gamma' for the magnitude of the batch norm scale, 'l1' for
+      the l1 norm of each output filter.
+
+  Returns:
+    a numpy array with one score per output channel.
+  """
+  if criterion == 'bn_gamma' and isinstance(
+      conv_bn.bn, tf.keras.layers.BatchNormalization):
+    return np.abs(conv_bn.bn.gamma.numpy())
+  elif criterion in ('bn_gamma', 'l1'):
+    return np.sum(np.abs(conv_bn.conv.kernel.numpy()), axis=(0, 1, 2))
+  raise ValueError(f'unknown pruning criterion {criterion}')
+
+
+def _keep_count(channels, ratio, divisor):
+  keep = int(np.ceil(channels * (1 - ratio) / divisor) * divisor)
+  return int(min(channels, max(divisor, keep)))
+
+
+def _rebuild_conv_bn(layer, filters, in_channels):
+  new = nn_blocks.ConvBN(
+      filters=filters,
+      kernel_size=layer._kernel_size,
+      strides=layer._strides,
+      padding=layer._padding,
+      dilation_rate=layer._dilation_rate,
+      kernel_initializer=layer._kernel_initializer,
+      bias_initializer=layer._bias_initializer,
+      bias_regularizer=layer._bias_regularizer,
+      kernel_regularizer=layer._kernel_regularizer,
+      use_bn=layer._use_bn,
+      use_sync_bn=layer._use_sync_bn,
+      norm_momentum=layer._norm_moment,
+      norm_epsilon=layer._norm_epsilon,
+      activation=layer._activation,
+      leaky_alpha=layer._leaky_alpha,
+      name=layer.name)
+  new(tf.zeros([1, 16, 16, in_channels]))
+  return new
+
+
+def _copy_weights(old, new, out_index=None, in_index=None):
+  for old_var, new_var in zip(old.weights, new.weights):
+    value = old_var.numpy()
+    if out_index is not None:
+      value = np.take(value, out_index, axis=-1)
+    if in_index is not None and value.ndim == 4:
+      value = np.take(value, in_index, axis=2)
+    new_var.assign(value)
+
+
+def _narrow(group, keep):
+  """Replaces the layers of a group with ones that only carry `keep`."""
+  producer = _get(*group.producer)
+  channels = _width(group.producer)
+
+  # consumer offsets have to be read before the producer is swapped out
+  updates = []
+  for parent, key, prefix in group.consumers:
+    consumer = _get(parent, key)
+    offset = sum(_width(ref) for ref in prefix)
+    c_in = int(consumer.conv.kernel.shape[2])
+    in_index = np.concatenate([
+        np.arange(offset), offset + keep,
+        np.arange(offset + channels, c_in)
+    ]).astype(np.int64)
+    updates.append((parent, key, consumer, in_index))
+
+  c_in = int(producer.conv.kernel.shape[2])
+  new = _rebuild_conv_bn(producer, len(keep), c_in)
+  _copy_weights(producer, new, out_index=keep)
+  _set(*group.producer, new)
+
+  for parent, key, consumer, in_index in updates:
+    new = _rebuild_conv_bn(consumer, int(consumer.conv.kernel.shape[-1]),
+                           len(in_index))
+    _copy_weights(consumer, new, in_index=in_index)
+    _set(parent, key, new)
+
+
+def prune_model(model, ratio, criterion='bn_gamma', divisor=8):
+  """Prunes a built model in place.
+
+  Args:
+    model: a built Yolo model with its trained weights loaded.
+    ratio: float in [0, 1), the fraction of channels to drop in every group.
+    criterion: 'bn_gamma' or 'l1', see channel_importance.
+    divisor: int, pruned widths are rounded up to a multiple of this.
+
+  Returns:
+    a list with the new width of every prunable group, pass it to apply_widths
+    to rebuild the same slim structure before restoring a checkpoint.
+  """
+  if not 0 <= ratio < 1:
+    raise ValueError(f'pruning ratio has to be in [0, 1), got {ratio}')
+  widths = []
+  for group in prunable_groups(model):
+    producer = _get(*group.producer)
+    scores = channel_importance(producer, criterion)
+    count = _keep_count(scores.shape[0], ratio, divisor)
+    keep = np.sort(np.argsort(-scores, kind='stable')[:count])
+    if count < scores.shape[0]:
+      _narrow(group, keep)
+    widths.append(count)
+  return widths
+
+
+def apply_widths(model, widths):
+  """Narrows a freshly built model to the widths returned by prune_model."""
+  groups = prunable_groups(model)
+  if len(groups) != len(widths):
+    raise ValueError(f'model has {len(groups)} prunable groups, '
+                     f'got {len(widths)} widths')
+  for group, count in zip(groups, widths):
+    if count < _width(group.producer):
+      _narrow(group, np.arange(count))
+  return model
+
+
+def _feature_fn(model):
+  return lambda x: model.head(model.decoder(model.backbone(x)))
+
+
+def count_params(model):
+  return int(sum(np.prod(v.shape) for v in model.weights))
+
+
+def count_flops(model, input_size):
+  """Floating point ops for one image through backbone, decoder and head."""
+  from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+  fn = tf.function(_feature_fn(model))
+  concrete = fn.get_concrete_function(
+      tf.TensorSpec([1, input_size, input_size, 3], tf.float32))
+  frozen = convert_variables_to_constants_v2(concrete)
+  opts = tf.compat.v1.profiler.ProfileOptionBuilder(
+      tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+  ).with_empty_output().build()
+  info = tf.compat.v1.profiler.profile(
+      graph=frozen.graph,
+      run_meta=tf.compat.v1.RunMetadata(),
+      cmd='op',
+      options=opts)
+  return int(info.total_float_ops)
+
+
+def cpu_latency(model, input_size, batch_size=1, runs=20, warmup=3):
+  """Median wall time in ms of one batch through the model on the CPU."""
+  with tf.device('/CPU:0'):
+    fn = tf.function(_feature_fn(model))
+    image = tf.random.uniform([batch_size, input_size, input_size, 3])
+    for _ in range(warmup):
+      tf.nest.map_structure(lambda x: x.numpy(), fn(image))
+    times = []
+    for _ in range(runs):
+      start = time.time()
+      tf.nest.map_structure(lambda x: x.numpy(), fn(image))
+      times.append(time.time() - start)
+  return float(np.median(times) * 1000)
+
+
+def report(model, input_size, runs=20):
+  return {
+      'params': count_params(model),
+      'flops': count_flops(model, input_size),
+      'cpu_ms': cpu_latency(model, input_size, runs=runs)
+  }
+
+
+def finetune(task, model, train_data, steps, learning_rate=1e-3):
+  """Short fine tune of a pruned model with the task's own train step."""
+  dataset = task.build_inputs(train_data)
+  optimizer = tf.keras.optimizers.SGD(learning_rate, momentum=0.9)
+  metrics = task.build_metrics(training=True)
+
+  @tf.function
+  def step_fn(inputs):
+    return task.train_step(inputs, model, optimizer, metrics=metrics)
+
+  logs = None
+  for inputs in dataset.take(steps):
+    logs = step_fn(inputs)
+  return logs
+
+
+def main(_):
+  from yolo.run import load_model
+
+  results = []
+  for ratio in [0.0] + FLAGS.ratios:
+    # rebuild from the checkpoint every time, so ratios do not compound
+    task, model = load_model(
+        experiment=FLAGS.experiment,
+        config_path=FLAGS.config_file,
+        model_dir=FLAGS.model_dir)
+    input_size = task.task_config.model.input_size[0]
+    widths = prune_model(model, ratio, criterion=FLAGS.criterion)
+    if ratio > 0 and FLAGS.finetune_steps > 0:
+      finetune(task, model, task.task_config.train_data, FLAGS.finetune_steps,
+               FLAGS.learning_rate)
+    stats = report(model, input_size, runs=FLAGS.runs)
+    stats['ratio'] = ratio
+    results.append(stats)
+    print(f"ratio {ratio:4.2f} | params {stats['params'] / 1e6:7.2f} M | "
+          f"flops {stats['flops'] / 1e9:7.2f} G | "
+          f"cpu {stats['cpu_ms']:8.1f} ms")
+
+    if FLAGS.export_dir is not None and ratio > 0:
+      path = os.path.join(FLAGS.export_dir, f'ratio_{ratio:.2f}')
+      tf.io.gfile.makedirs(path)
+      tf.train.Checkpoint(model=model).save(os.path.join(path, 'ckpt'))
+      with tf.io.gfile.GFile(os.path.join(path, 'widths.json'), 'w') as f:
+        json.dump({'criterion': FLAGS.criterion, 'widths': widths}, f)
+
+  if FLAGS.export_dir is not None:
+    tf.io.gfile.makedirs(FLAGS.export_dir)
+    with tf.io.gfile.GFile(
+        os.path.join(FLAGS.export_dir, 'report.json'), 'w') as f:
+      json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+  app.run(main)
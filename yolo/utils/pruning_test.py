@@ -0,0 +1,90 @@
+import tensorflow as tf
+import tensorflow.keras as ks
+import numpy as np
+from absl.testing import parameterized
+
+from yolo.modeling.backbones.darknet import Darknet
+from yolo.modeling.decoders.yolo_decoder import YoloDecoder
+from yolo.modeling.layers import nn_blocks
+from yolo.utils import pruning
+
+
+class PruningTest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_dead_channels_are_exact(self):
+    x = ks.Input(shape=(32, 32, 32))
+    block = nn_blocks.DarkResidual(filters=32, filter_scale=2)
+    model = ks.Model(inputs=x, outputs=block(x))
+
+    # channels with a zero scale and offset only ever output zeros
+    gamma = block._conv1.bn.gamma.numpy()
+    beta = block._conv1.bn.beta.numpy()
+    gamma[::2] = 0
+    beta[::2] = 0
+    block._conv1.bn.gamma.assign(gamma)
+    block._conv1.bn.beta.assign(beta)
+
+    image = tf.random.uniform([2, 32, 32, 32])
+    before = model(image)
+    widths = pruning.prune_model(model, 0.5, criterion='bn_gamma')
+    after = model(image)
+
+    self.assertAllEqual(widths, [8])
+    self.assertAllEqual(block._conv1.conv.kernel.shape.as_list(),
+                        [1, 1, 32, 8])
+    self.assertAllEqual(block._conv2.conv.kernel.shape.as_list(),
+                        [3, 3, 8, 32])
+    self.assertAllClose(before, after, atol=1e-5)
+
+  @parameterized.named_parameters(("csp_tiny", "cspdarknettiny", 2, 1),
+                                  ("darknet53", "darknet53", 6, 6))
+  def test_shapes_are_kept(self, model_id, max_level_process_len,
+                           path_process_len):
+    backbone = Darknet(model_id=model_id, min_level=4, max_level=5)
+    decoder = YoloDecoder(
+        max_level_process_len=max_level_process_len,
+        path_process_len=path_process_len)
+    decoder.build(backbone.output_specs)
+    x = ks.Input(shape=(None, None, 3))
+    model = ks.Model(inputs=x, outputs=decoder(backbone(x)))
+
+    image = tf.random.uniform([1, 128, 128, 3])
+    before = model(image)
+    params = pruning.count_params(model)
+    for criterion in ["bn_gamma", "l1"]:
+      widths = pruning.prune_model(model, 0.5, criterion=criterion)
+      self.assertLen(widths, len(pruning.prunable_groups(model)))
+
+    after = model(image)
+    self.assertLess(pruning.count_params(model), params)
+    for key in before.keys():
+      self.assertAllEqual(before[key].shape, after[key].shape)
+
+  def test_csp_route_is_found_from_the_graph(self):
+    x = ks.Input(shape=(32, 32, 16))
+    route = nn_blocks.CSPRoute(filters=16, filter_scale=2, name='split')
+    connect = nn_blocks.CSPConnect(filters=16, filter_scale=2, name='merge')
+    y, y_route = route(x)
+    model = ks.Model(inputs=x, outputs=connect([y, y_route]))
+
+    groups = {group.name: group for group in pruning.prunable_groups(model)}
+    self.assertIn('split/conv2', groups)
+    self.assertIs(groups['split/conv2'].producer[0], route)
+    self.assertIs(groups['split/conv2'].consumers[0][0], connect)
+
+  def test_apply_widths(self):
+    x = ks.Input(shape=(None, None, 3))
+    backbone = Darknet(model_id="cspdarknettiny", min_level=4, max_level=5)
+    pruned = ks.Model(inputs=x, outputs=backbone(x))
+    widths = pruning.prune_model(pruned, 0.5)
+
+    x = ks.Input(shape=(None, None, 3))
+    backbone = Darknet(model_id="cspdarknettiny", min_level=4, max_level=5)
+    rebuilt = pruning.apply_widths(ks.Model(inputs=x, outputs=backbone(x)),
+                                   widths)
+    self.assertEqual(
+        pruning.count_params(pruned), pruning.count_params(rebuilt))
+
+
+if __name__ == "__main__":
+  tf.test.main()
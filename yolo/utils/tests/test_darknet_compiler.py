@@ -0,0 +1,138 @@
+import contextlib
+import io
+
+from absl.testing import parameterized
+import tensorflow as tf
+
+from yolo.utils import DarkNetConverter
+from yolo.utils._darknet2tf.dn2dicts import convertConfigFile
+from yolo.utils._darknet2tf.read_weights import read_file
+
+CFG = """
+[net]
+width=64
+height=64
+channels=3
+
+[convolutional]
+batch_normalize=1
+filters=8
+size=3
+stride=1
+pad=1
+activation=leaky
+
+[convolutional]
+batch_normalize=1
+filters=16
+size=3
+stride=2
+pad=1
+activation=leaky
+
+[convolutional]
+filters=16
+size=1
+stride=1
+pad=1
+activation=leaky
+
+[shortcut]
+from=-2
+activation=linear
+
+[maxpool]
+size=2
+stride=2
+
+[convolutional]
+size=1
+stride=1
+pad=1
+filters=21
+activation=linear
+
+[yolo]
+mask=3,4,5
+anchors=10,14,23,27,37,58,81,82,135,169,344,319
+classes=2
+num=6
+
+[route]
+layers=-3
+
+[upsample]
+stride=2
+
+[route]
+layers=-1,1
+
+[convolutional]
+size=1
+stride=1
+pad=1
+filters=21
+activation=linear
+
+[yolo]
+mask=0,1,2
+anchors=10,14,23,27,37,58,81,82,135,169,344,319
+classes=2
+num=6
+"""
+
+
+def _read(cfg):
+  net = DarkNetConverter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    read_file(net, convertConfigFile(io.StringIO(cfg)))
+  return net
+
+
+class darknet_compiler_test(tf.test.TestCase, parameterized.TestCase):
+
+  def test_compile(self):
+    compiled = _read(CFG).compile()
+    self.assertLen(compiled, 13)
+    self.assertEqual(compiled.input_shape, (64, 64, 3))
+    self.assertEqual(compiled[4].inputs, (3, 2))
+    self.assertEqual(compiled[10].inputs, (9, 2))
+    self.assertEqual(compiled[10].shape, (32, 32, 32))
+    self.assertEqual([head.shape for head in compiled.heads],
+                     [(16, 16, 21), (32, 32, 21)])
+
+    # 3x3x3x8 kernel on a 64x64 output, with 4 batch norm values per filter
+    self.assertEqual(compiled[1].flops, 2 * 64 * 64 * 8 * 27)
+    self.assertEqual(compiled[1].params, 27 * 8 + 4 * 8)
+    self.assertEqual(compiled.params, sum(l.params for l in compiled.layers))
+    self.assertIn('BFLOPs', compiled.report())
+
+    with self.assertRaises(AttributeError):
+      compiled[1].shape = (1, 1, 1)
+    with self.assertRaises(TypeError):
+      compiled[1].options['filters'] = 4
+
+  @parameterized.named_parameters(
+      ('shortcut', ('from=-2', 'from=-3'), 'shortcut inputs'),
+      ('groups', ('filters=16\nsize=1', 'groups=2\nfilters=16\nsize=1'),
+       'grouped'),
+      ('yolo', ('filters=21\nactivation=linear\n\n[yolo]\nmask=3',
+                'filters=20\nactivation=linear\n\n[yolo]\nmask=3'),
+       'channels'))
+  def test_invalid(self, replace, message):
+    with self.assertRaisesRegex(ValueError, message):
+      _read(CFG.replace(*replace, 1)).compile()
+
+  def test_to_tf(self):
+    policy = tf.keras.mixed_precision.experimental.global_policy().name
+    model = _read(CFG).to_tf(use_mixed=True)
+    self.assertEqual(
+        tf.keras.mixed_precision.experimental.global_policy().name, policy)
+
+    outputs = model(tf.zeros([2, 64, 64, 3]))
+    self.assertEqual(outputs['bbox'].shape[0], 2)
+    self.assertEqual(outputs['bbox'].shape[-1], 4)
+
+
+if __name__ == '__main__':
+  tf.test.main()
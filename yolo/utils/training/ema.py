@@ -0,0 +1,196 @@
+"""Exponential moving average of the weights of a model.
+
+The averages are updated from inside the train step, after the optimizer, and
+swapped into the model whenever the averaged weights are wanted: in the
+validation step, before an export and in checkpoints, which save them next to
+the raw weights.
+
+ema = ModelEMA(model, decay=0.9999, update_every=1)
+...
+optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+ema.update(model, optimizer.iterations)
+...
+with ema.swapped(model):
+  model.save(path)
+
+Exports restore the checkpoint of a trainer with `restore_averaged`, which
+leaves the averages in the model.
+"""
+import contextlib
+
+import tensorflow as tf
+
+
+class ModelEMA(object):
+  """Keeps an exponential moving average of every weight of a model.
+
+  The decay ramps up as decay * (1 - exp(-updates / warmup_steps)), so the
+  average follows the weights closely early on, or after it was restored from
+  a checkpoint that did not have it. With update_every = n the average is
+  only updated every n-th step, using decay**n to keep the same horizon.
+
+  The averages start out as the current weights, so swapping them in before
+  the first update, or after restoring a checkpoint without them, leaves the
+  model as it is.
+
+  The averages are replica local variables, every replica applies the update
+  to its own copy. The model weights are mirrored, so all copies stay equal,
+  and the update does not need any cross replica communication, which also
+  lets it be compiled and fused with XLA.
+
+  The averages live in their own tf.Module rather than on this object, so a
+  keras model the ema is attached to does not pick them up as its own
+  weights. Checkpoint them through `checkpoint_item`.
+
+  Args:
+    model: the `tf.keras.Model` to average, it has to be built.
+    decay: `float` decay of the average per step.
+    update_every: `int` number of steps between two updates.
+    warmup_steps: `int` number of updates it takes the decay to ramp up.
+  """
+
+  def __init__(self, model, decay=0.9999, update_every=1, warmup_steps=2000):
+    if not 0.0 <= decay < 1.0:
+      raise ValueError(f'ema decay has to be in [0, 1), got {decay}')
+    if update_every < 1:
+      raise ValueError(f'update_every has to be positive, got {update_every}')
+
+    self._decay = decay
+    self._update_every = update_every
+    self._warmup_steps = float(warmup_steps)
+
+    self._module = tf.Module(name='model_ema')
+    self._module.averages = [
+        tf.Variable(
+            weight.read_value(),
+            trainable=False,
+            synchronization=tf.VariableSynchronization.ON_READ,
+            aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA,
+            name=weight.name.split(':')[0].replace('/', '_'))
+        for weight in model.weights
+    ]
+    self._module.num_updates = tf.Variable(
+        0,
+        dtype=tf.int64,
+        trainable=False,
+        synchronization=tf.VariableSynchronization.ON_READ,
+        aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA,
+        name='num_updates')
+    return
+
+  @property
+  def averages(self):
+    return self._module.averages
+
+  @property
+  def num_updates(self):
+    return self._module.num_updates
+
+  @property
+  def checkpoint_item(self):
+    """The trackable to put into a tf.train.Checkpoint."""
+    return self._module
+
+  def _check(self, weights):
+    if len(weights) != len(self.averages):
+      raise ValueError(f'the model has {len(weights)} weights, the ema was '
+                       f'built for {len(self.averages)}')
+
+  def update(self, model, step):
+    """Updates the averages if step is a multiple of update_every.
+
+    Runs in replica context, for example at the end of a train step.
+
+    Args:
+      model: the model the ema was built for.
+      step: an int `Tensor`, the number of optimizer steps so far.
+
+    Returns:
+      the number of updates done so far.
+    """
+    weights = model.weights
+    self._check(weights)
+
+    def _update():
+      num_updates = self.num_updates.assign_add(1)
+      ramp = 1.0 - tf.exp(-tf.cast(num_updates, tf.float32) /
+                          self._warmup_steps)
+      rate = 1.0 - (self._decay**self._update_every) * ramp
+      ops = []
+      for average, weight in zip(self.averages, weights):
+        delta = average - tf.cast(weight, average.dtype)
+        ops.append(average.assign_sub(delta * tf.cast(rate, average.dtype)))
+      with tf.control_dependencies(ops):
+        return tf.identity(num_updates)
+
+    if self._update_every == 1:
+      return _update()
+    step = tf.cast(step, tf.int64)
+    return tf.cond(
+        tf.equal(step % self._update_every, 0), _update,
+        lambda: tf.identity(self.num_updates))
+
+  def swap(self, model):
+    """Exchanges the model weights and the averages.
+
+    Runs in cross replica context, swapping twice restores the model.
+    """
+    weights = model.weights
+    self._check(weights)
+    for average, weight in zip(self.averages, weights):
+      value = tf.identity(weight)
+      weight.assign(tf.cast(average, weight.dtype))
+      average.assign(tf.cast(value, average.dtype))
+
+  def replica_swap(self, model):
+    """Same as swap, callable from replica context, e.g. in a step fn."""
+    replica_context = tf.distribute.get_replica_context()
+    if replica_context is None:
+      self.swap(model)
+    else:
+      replica_context.merge_call(lambda _: self.swap(model))
+
+  @contextlib.contextmanager
+  def swapped(self, model):
+    """Runs a block with the averaged weights in the model."""
+    self.swap(model)
+    try:
+      yield model
+    finally:
+      self.swap(model)
+
+
+def use_averages(model):
+  """Swaps the averages into model if it keeps an ema that was updated.
+
+  Returns:
+    True if the averaged weights were swapped in.
+  """
+  ema = getattr(model, 'ema', None)
+  if ema is None or int(ema.num_updates.numpy()) == 0:
+    return False
+  ema.swap(model)
+  return True
+
+
+def restore_averaged(model, path, use_ema=True, **items):
+  """Restores a trainer checkpoint into model, for a demo or an export.
+
+  With use_ema set, the averages of an attached `ModelEMA` are restored with
+  the weights and swapped into the model.
+
+  Args:
+    model: the model the checkpoint was trained with.
+    path: the checkpoint to restore.
+    use_ema: `bool` whether to swap the averaged weights in.
+    **items: other trackables of the checkpoint, for example the optimizer.
+
+  Returns:
+    True if the averaged weights were swapped in.
+  """
+  ema = getattr(model, 'ema', None)
+  if use_ema and ema is not None:
+    items['ema'] = ema.checkpoint_item
+  status = tf.train.Checkpoint(model=model, **items).restore(path)
+  status.expect_partial().assert_existing_objects_matched()
+  return use_ema and use_averages(model)
@@ -0,0 +1,130 @@
+from yolo.utils.training import ema as ema_lib
+
+import numpy as np
+import tensorflow as tf
+from absl.testing import parameterized
+
+
+def _build_model():
+  inputs = tf.keras.Input(shape=(8, 8, 3))
+  x = tf.keras.layers.Conv2D(4, 3)(inputs)
+  x = tf.keras.layers.BatchNormalization()(x)
+  return tf.keras.Model(inputs=inputs, outputs=x)
+
+
+class ModelEMATest(tf.test.TestCase, parameterized.TestCase):
+
+  def test_average(self):
+    model = _build_model()
+    decay, warmup = 0.9, 10
+    ema = ema_lib.ModelEMA(model, decay=decay, warmup_steps=warmup)
+    self.assertLen(ema.averages, len(model.weights))
+
+    expected = [w.numpy() for w in model.weights]
+    for step in range(1, 6):
+      for weight in model.trainable_weights:
+        weight.assign_add(tf.ones_like(weight))
+      ema.update(model, step)
+      rate = 1 - decay * (1 - np.exp(-step / warmup))
+      expected = [
+          e - (e - w.numpy()) * rate for e, w in zip(expected, model.weights)
+      ]
+    self.assertEqual(int(ema.num_updates.numpy()), 5)
+    for average, value in zip(ema.averages, expected):
+      self.assertAllClose(average, value, rtol=1e-5, atol=1e-5)
+
+  @parameterized.parameters((2,), (3,))
+  def test_update_every(self, update_every):
+    model = _build_model()
+    ema = ema_lib.ModelEMA(model, update_every=update_every)
+    for step in range(1, 10):
+      ema.update(model, step)
+    self.assertEqual(int(ema.num_updates.numpy()), 9 // update_every)
+
+  def test_swap(self):
+    model = _build_model()
+    ema = ema_lib.ModelEMA(model, decay=0.5, warmup_steps=1)
+    ema.update(model, 1)
+    raw = [w.numpy() for w in model.weights]
+    averages = [a.numpy() for a in ema.averages]
+
+    with ema.swapped(model):
+      for weight, average in zip(model.weights, averages):
+        self.assertAllEqual(weight, average)
+    for weight, value in zip(model.weights, raw):
+      self.assertAllEqual(weight, value)
+    for average, value in zip(ema.averages, averages):
+      self.assertAllEqual(average, value)
+
+    # the same from inside a traced step
+    tf.function(lambda: ema.replica_swap(model))()
+    for weight, average in zip(model.weights, averages):
+      self.assertAllEqual(weight, average)
+
+  def test_swap_before_update(self):
+    model = _build_model()
+    for weight in model.weights:
+      weight.assign(tf.random.uniform(weight.shape))
+    raw = [w.numpy() for w in model.weights]
+    ema = ema_lib.ModelEMA(model)
+    ema.swap(model)
+    for weight, value in zip(model.weights, raw):
+      self.assertAllEqual(weight, value)
+
+  def test_checkpoint(self):
+    model = _build_model()
+    ema = ema_lib.ModelEMA(model)
+    for weight in model.weights:
+      weight.assign(tf.random.uniform(weight.shape))
+    ema.update(model, 1)
+    path = tf.train.Checkpoint(ema=ema.checkpoint_item).save(
+        self.get_temp_dir() + '/ckpt')
+
+    restored = ema_lib.ModelEMA(_build_model())
+    tf.train.Checkpoint(ema=restored.checkpoint_item).restore(
+        path).assert_consumed()
+    self.assertEqual(int(restored.num_updates.numpy()), 1)
+    for a, b in zip(ema.averages, restored.averages):
+      self.assertAllEqual(a, b)
+
+  def test_export_averages(self):
+    model = _build_model()
+    model.ema = ema_lib.ModelEMA(model, decay=0.5, warmup_steps=1)
+    for step in range(1, 4):
+      for weight in model.weights:
+        weight.assign(tf.random.uniform(weight.shape))
+      model.ema.update(model, step)
+    averages = [a.numpy() for a in model.ema.averages]
+    path = tf.train.Checkpoint(
+        model=model, ema=model.ema.checkpoint_item).save(
+            self.get_temp_dir() + '/ckpt')
+
+    exported = _build_model()
+    exported.ema = ema_lib.ModelEMA(exported)
+    self.assertTrue(ema_lib.restore_averaged(exported, path))
+    export_dir = self.get_temp_dir() + '/saved_model'
+    tf.saved_model.save(exported, export_dir)
+    loaded = tf.saved_model.load(export_dir)
+    self.assertLen(loaded.variables, len(averages))
+    for variable, average in zip(loaded.variables, averages):
+      self.assertAllEqual(variable, average)
+
+  def test_restore_without_averages(self):
+    model = _build_model()
+    path = tf.train.Checkpoint(model=model).save(self.get_temp_dir() + '/ckpt')
+
+    restored = _build_model()
+    restored.ema = ema_lib.ModelEMA(restored)
+    self.assertFalse(ema_lib.restore_averaged(restored, path))
+    for weight, value in zip(restored.weights, model.weights):
+      self.assertAllEqual(weight, value)
+
+  def test_not_tracked_by_model(self):
+    model = _build_model()
+    num_weights = len(model.weights)
+    model.ema = ema_lib.ModelEMA(model)
+    self.assertLen(model.weights, num_weights)
+
+
+if __name__ == '__main__':
+  tf.test.main()